@@ -0,0 +1,91 @@
+"""
+Columnar results benchmark: time and peak memory (tracemalloc) of
+reading a million rows into columns with ``fetch_columns()``,
+compared to ``list(db.sql(...))`` pivoted into a list per field.
+
+Documents are made as the cursor is read, as a driver decoding them
+would, from an in-memory collection.
+
+Usage: python benchmarks/bench_columns.py [number of rows]
+"""
+
+import gc
+import sys
+import time
+
+from mongosql import parse
+
+try:
+    import tracemalloc
+except ImportError:  # Python < 3.4
+    tracemalloc = None
+
+
+QUERY = 'SELECT n, price, name, active FROM c'
+
+
+class _Cursor(object):
+    def __init__(self, rows):
+        self.rows = rows
+
+    def batch_size(self, size):
+        return self
+
+    def __iter__(self):
+        for i in range(self.rows):
+            yield {'_id': i, 'n': i, 'price': i * 0.5,
+                   'name': 'item', 'active': i % 2 == 0}
+
+
+class _Collection(object):
+    def __init__(self, rows):
+        self.rows = rows
+
+    def find(self, **kwargs):
+        return _Cursor(self.rows)
+
+
+class _Database(dict):
+    pass
+
+
+def _dicts(db, operation):
+    documents = list(operation.apply(db))
+    return dict((name, [d.get(name) for d in documents])
+                for name in operation.fields)
+
+
+def _columns(db, operation):
+    return operation.fetch_columns(db)
+
+
+def _measure(func, *args):
+    """Time of a run, then peak memory of another (tracemalloc is slow)"""
+    gc.collect()
+    start = time.time()
+    func(*args)
+    elapsed = time.time() - start
+    if tracemalloc is None:
+        return elapsed, None
+    gc.collect()
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    db = _Database(c=_Collection(rows))
+    operation = parse(QUERY)
+    for title, func in (('list of dicts', _dicts),
+                        ('fetch_columns()', _columns)):
+        elapsed, peak = _measure(func, db, operation)
+        print('{0:16s} {1:7.2f} s  {2} peak'.format(
+            title, elapsed, '?' if peak is None else
+            '{0:7.1f} MB'.format(peak / 1e6)))
+
+
+if __name__ == '__main__':
+    main()
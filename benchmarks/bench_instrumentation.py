@@ -0,0 +1,63 @@
+"""
+Instrumentation benchmark: cost of ``MongoSqlDatabase.sql()`` (parse
+cache hit, spec, find() and reading 10 documents, against an
+in-memory collection) with no hooks, with a no-op hook and with the
+stats registry, compared to what ``sql()`` runs without
+instrumentation: ``parse(query).apply(db)``.
+
+Needs pymongo, but no server.
+
+Usage: python benchmarks/bench_instrumentation.py
+"""
+
+import timeit
+
+from mongosql import instrumentation, parse
+from mongosql.client import MongoSqlClient, MongoSqlDatabase
+
+
+QUERY = 'SELECT * FROM c WHERE a == 1 AND b > 2 LIMIT 10'
+
+DOCUMENTS = [{'_id': i, 'a': 1, 'b': i} for i in range(10)]
+
+
+class _Collection(object):
+    def find(self, **kwargs):
+        return iter(DOCUMENTS)
+
+
+class _Database(MongoSqlDatabase):
+    def __getitem__(self, name):
+        return _Collection()
+
+
+def _best(func, number=20000):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    client = MongoSqlClient('mongodb://localhost:1', connect=False)
+    db = _Database(client, 'bench')
+    baseline = _best(lambda: list(
+        parse(QUERY).apply(db, options=db.cursor_options)))
+    results = [('parse().apply()', baseline)]
+    results.append(('sql(), no hooks', _best(lambda: list(db.sql(QUERY)))))
+
+    def noop(event):
+        pass
+
+    for title, hook in (('sql(), no-op hook', noop),
+                        ('sql(), registry', instrumentation.registry)):
+        instrumentation.add_hook(hook)
+        try:
+            results.append((title, _best(lambda: list(db.sql(QUERY)))))
+        finally:
+            instrumentation.remove_hook(hook)
+
+    for title, value in results:
+        print('{0:20s} {1:8.2f} us  (+{2:.2f} us)'.format(
+            title, value * 1e6, (value - baseline) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Tokenizer benchmark: PLY lexer vs fast tokenizer.
+
+Usage: python benchmarks/bench_lexer.py
+"""
+
+import timeit
+
+from mongosql.lexer import get_lexer
+
+
+def make_queries():
+    values = ', '.join(str(i) for i in range(5000))
+    strings = ', '.join('"value \\"{0}\\""'.format(i) for i in range(2000))
+    conditions = ' AND '.join(
+        'field_{0} >= {0}.5'.format(i) for i in range(1000))
+    return [
+        ('IN, 5000 integers',
+         'SELECT * FROM coll WHERE a IN [{0}]'.format(values)),
+        ('IN, 2000 strings',
+         'SELECT * FROM coll WHERE a IN [{0}]'.format(strings)),
+        ('1000 AND conditions',
+         'SELECT * FROM coll WHERE {0}'.format(conditions)),
+    ]
+
+
+def count_tokens(tokenizer, query):
+    lexer = get_lexer(tokenizer)
+    lexer.input(query)
+    return sum(1 for _ in lexer)
+
+
+def main():
+    for name, query in make_queries():
+        ntokens = count_tokens('ply', query)
+        print('{0} ({1} tokens, {2} bytes)'.format(
+            name, ntokens, len(query)))
+        for tokenizer in ('ply', 'fast'):
+            best = min(timeit.repeat(
+                lambda: count_tokens(tokenizer, query),
+                number=5, repeat=5)) / 5
+            print('    {0:5s} {1:12,.0f} tokens/sec'.format(
+                tokenizer, ntokens / best))
+
+
+if __name__ == '__main__':
+    main()
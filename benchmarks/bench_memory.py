@@ -0,0 +1,79 @@
+"""
+Memory benchmark: bytes taken by each cached statement, for a corpus
+of distinct, realistic queries (measured with tracemalloc).
+
+Usage: python benchmarks/bench_memory.py [number of statements]
+"""
+
+import gc
+import random
+import sys
+
+from mongosql import parse
+from mongosql.cache import LRUCache
+from mongosql import wrapper
+
+try:
+    import tracemalloc
+except ImportError:  # Python < 3.4
+    tracemalloc = None
+
+
+TEMPLATES = [
+    "SELECT name, email FROM users WHERE active == true AND age >= {0} "
+    "ORDER BY name ASC LIMIT 50",
+
+    "SELECT * FROM orders WHERE status IN ['paid', 'shipped'] "
+    "AND total > {1} AND (customer.country == '{2}' OR "
+    "customer.country == 'FR') SORT created DESC LIMIT 100 SKIP {0}",
+
+    "SELECT sku, price, stock FROM products WHERE (price * 1.22 < {0} "
+    "AND stock > 0) OR (category == 'books' AND NOT discontinued == true) "
+    "OR tags IN ['sale', 'clearance', '{2}'] ORDER BY price DESC, "
+    "sku ASC LIMIT 20",
+
+    "SELECT * FROM events WHERE user_id == {0} AND type == ? "
+    "AND created >= :since SORT created DESC LIMIT :n",
+
+    "AGGREGATE article PROJECT title = 1, author = 1, stats = {{ "
+    "pv = '$pageViews', foo = '$other.foo', dpv = '$pageViews' + {0} }}, "
+    "score = ('$likes' * 2 + '$shares' * 3) / '$pageViews'",
+]
+
+
+def corpus(count):
+    rnd = random.Random(0)
+    for i in range(count):
+        yield TEMPLATES[i % len(TEMPLATES)].format(
+            i, rnd.random() * 1000, 'c{0}'.format(rnd.randint(0, 99)))
+
+
+def main():
+    if tracemalloc is None:
+        print('tracemalloc is required (Python 3.4+)')
+        return
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    queries = list(corpus(count))
+    parse(queries[0], cache=False)  # Build lexer and parser
+    wrapper.parse_cache = LRUCache(maxsize=count)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for query in queries:
+        parse(query)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    assert len(wrapper.parse_cache) == count
+    print('{0} cached statements: {1:.1f} MiB'.format(
+        count, (after - before) / 1024.0 ** 2))
+    ## Query strings (the cache keys) were allocated before
+    ## starting, so only the parsed objects are accounted for.
+    print('    {0:.0f} bytes per statement'.format(
+        (after - before) / float(count)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Pagination benchmark: time and documents examined to fetch a page
+at increasing depths, with SKIP and with keyset pagination.
+
+Needs a MongoDB server: the collection ``mongosql_bench.pages`` is
+(re)created on the one at ``$MONGOSQL_BENCH_URI``, default
+``mongodb://localhost:27017``.
+
+Usage: python benchmarks/bench_pagination.py [documents]
+"""
+
+import os
+import sys
+import time
+
+import pymongo
+
+from mongosql import parse
+
+
+PAGE_SIZE = 50
+
+QUERY = ('SELECT * FROM pages WHERE kind == "a" '
+         'ORDER BY created DESC LIMIT {0}').format(PAGE_SIZE)
+
+
+class _Database(object):
+    """Maps the ``find()`` arguments onto the current pymongo API"""
+
+    def __init__(self, db):
+        self.db = db
+        self.explain = False
+        self.explains = []
+
+    def __getitem__(self, name):
+        return _Collection(self, self.db[name])
+
+
+class _Collection(object):
+    def __init__(self, database, collection):
+        self.database = database
+        self.collection = collection
+
+    def find(self, sort=None, **kwargs):
+        if isinstance(sort, dict):
+            sort = list(sort.items())
+        cursor = self.collection.find(sort=sort, **kwargs)
+        if self.database.explain:
+            stats = cursor.clone().explain()['executionStats']
+            self.database.explains.append(stats['totalDocsExamined'])
+        return cursor
+
+
+def setup(collection, count):
+    collection.drop()
+    collection.insert_many(
+        {'kind': 'ab'[i % 2], 'created': i // 3, 'payload': 'x' * 100}
+        for i in range(count))
+    collection.create_index([('kind', 1), ('created', -1), ('_id', 1)])
+
+
+def _timed(func):
+    start = time.time()
+    result = func()
+    return result, (time.time() - start) * 1000
+
+
+def main(count):
+    uri = os.environ.get('MONGOSQL_BENCH_URI', 'mongodb://localhost:27017')
+    client = pymongo.MongoClient(uri, serverSelectionTimeoutMS=2000)
+    db = _Database(client.mongosql_bench)
+    setup(db.db.pages, count)
+
+    operation = parse(QUERY)
+    depths = []
+    depth = 1
+    while depth * PAGE_SIZE * 2 <= count:
+        depths.append(depth)
+        depth *= 4
+
+    ## Walk through the pages once, keeping the keyset tokens
+    tokens = {1: None}
+    documents, token = operation.paginate(db)
+    page = 1
+    while token is not None and page < depths[-1]:
+        page += 1
+        tokens[page] = token
+        documents, token = operation.paginate(db, token)
+
+    print('{0:>8s} {1:>12s} {2:>10s} {3:>12s} {4:>10s}'.format(
+        'page', 'SKIP ms', 'examined', 'keyset ms', 'examined'))
+    for depth in depths:
+        skipped = operation.clone()
+        skipped.skip = (depth - 1) * PAGE_SIZE
+        skipped.sort['_id'] = 1  # Same order as the keyset pages
+        expected, skip_ms = _timed(lambda: list(skipped.apply(db)))
+        (documents, _), keyset_ms = _timed(
+            lambda: operation.paginate(db, tokens[depth]))
+        assert documents == expected
+
+        db.explain = True
+        del db.explains[:]
+        skipped.apply(db)
+        operation.paginate(db, tokens[depth])
+        skip_examined, keyset_examined = db.explains
+        db.explain = False
+        print('{0:8d} {1:12.2f} {2:10d} {3:12.2f} {4:10d}'.format(
+            depth, skip_ms, skip_examined, keyset_ms, keyset_examined))
+
+    db.db.pages.drop()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,85 @@
+"""
+Parser benchmark: PLY (LALR) vs hand-written Pratt parser,
+on typical 100-500 bytes queries.
+
+Whole parse() calls for each engine and tokenizer, then the parsing
+step alone: both engines reading the same pre-built token list.
+
+Usage: python benchmarks/bench_parser.py
+"""
+
+import functools
+import timeit
+
+from mongosql import parse
+from mongosql.lexer import FastLexer
+from mongosql.wrapper import get_parser
+
+
+QUERIES = [
+    "SELECT name, email FROM users WHERE active == true AND age >= 18 "
+    "ORDER BY name ASC LIMIT 50",
+
+    "SELECT * FROM orders WHERE status IN ['paid', 'shipped'] "
+    "AND total > 100.0 AND (customer.country == 'IT' OR "
+    "customer.country == 'FR') SORT created DESC LIMIT 100 SKIP 200",
+
+    "SELECT sku, price, stock FROM products WHERE (price * 1.22 < 50 "
+    "AND stock > 0) OR (category == 'books' AND NOT discontinued == true) "
+    "OR tags IN ['sale', 'clearance', 'last-items'] ORDER BY price DESC, "
+    "sku ASC LIMIT 20",
+
+    "AGGREGATE article PROJECT title = 1, author = 1, stats = { "
+    "pv = '$pageViews', foo = '$other.foo', dpv = '$pageViews' + 10 }, "
+    "score = ('$likes' * 2 + '$shares' * 3) / '$pageViews'",
+]
+
+COMBINATIONS = [
+    ('ply', 'ply'),
+    ('ply', 'fast'),
+    ('pratt', 'ply'),
+    ('pratt', 'fast'),
+]
+
+
+class _TokenList(object):
+    """A lexer replaying a list of tokens"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    def input(self, data):
+        self.lexdata = data
+        self.lineno = 1
+        self.token = functools.partial(next, iter(self.tokens), None)
+
+
+def _best(func):
+    return min(timeit.repeat(func, number=200, repeat=5)) / 200
+
+
+def main():
+    for query in QUERIES:
+        print('{0} bytes: {1}...'.format(len(query), query[:50]))
+        baseline = None
+        for engine, tokenizer in COMBINATIONS:
+            best = _best(lambda: parse(query, cache=False, engine=engine,
+                                       tokenizer=tokenizer))
+            baseline = baseline or best
+            print('    {0:5s} + {1:4s} {2:8.1f} us  ({3:.1f}x)'.format(
+                engine, tokenizer, best * 1e6, baseline / best))
+
+        lexer = FastLexer()
+        lexer.input(query)
+        lexer = _TokenList(list(lexer))
+        baseline = None
+        for engine in ('ply', 'pratt'):
+            parser = get_parser(engine)
+            best = _best(lambda: parser.parse(query, lexer=lexer))
+            baseline = baseline or best
+            print('    {0:5s} only  {1:8.1f} us  ({2:.1f}x)'.format(
+                engine, best * 1e6, baseline / best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Raw BSON results benchmark: CPU time and peak memory (tracemalloc)
+of reading only ``_id`` from wide documents (200 fields): decoded
+into dicts, as pymongo's ``RawBSONDocument``s (all the fields decoded
+on the first read), and with ``WITH (raw)`` (only ``_id`` decoded).
+
+Documents are decoded from batches of BSON data (as received from
+the server) as the cursor is read, with the codec options of the
+collection, as pymongo would; needs pymongo.
+
+Usage: python benchmarks/bench_raw.py [number of documents]
+"""
+
+import gc
+import sys
+import time
+
+import bson
+from bson.raw_bson import DEFAULT_RAW_BSON_OPTIONS
+
+from mongosql import parse
+
+try:
+    import tracemalloc
+except ImportError:  # Python < 3.4
+    tracemalloc = None
+
+
+FIELDS = 200
+BATCH_SIZE = 101
+
+
+def _document(i):
+    document = {'_id': i}
+    for n in range(FIELDS):
+        if n % 4 == 0:
+            document['s{0}'.format(n)] = 'value {0}'.format(n)
+        elif n % 4 == 1:
+            document['f{0}'.format(n)] = n * 0.5
+        elif n % 4 == 2:
+            document['l{0}'.format(n)] = [n, n + 1]
+        else:
+            document['n{0}'.format(n)] = n
+    return document
+
+
+class _Cursor(object):
+    def __init__(self, batches, codec_options):
+        self.batches = batches
+        self.codec_options = codec_options
+
+    def batch_size(self, size):
+        return self
+
+    def __iter__(self):
+        for data in self.batches:
+            for document in bson.decode_all(data, self.codec_options):
+                yield document
+
+
+class _Collection(object):
+    def __init__(self, batches, codec_options=bson.DEFAULT_CODEC_OPTIONS):
+        self.batches = batches
+        self.codec_options = codec_options
+
+    def with_options(self, codec_options=None, **kwargs):
+        return _Collection(self.batches, codec_options)
+
+    def find(self, **kwargs):
+        return _Cursor(self.batches, self.codec_options)
+
+
+class _Database(dict):
+    pass
+
+
+def _ids(db, operation):
+    ## The documents are kept, as by a caller holding on to the results
+    documents = list(operation.apply(db))
+    return [document['_id'] for document in documents]
+
+
+def _measure(func, *args):
+    """CPU time of a run, then peak memory of another"""
+    gc.collect()
+    start = time.process_time()
+    func(*args)
+    elapsed = time.process_time() - start
+    if tracemalloc is None:
+        return elapsed, None
+    gc.collect()
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    size = len(bson.encode(_document(0)))
+    batches = [b''.join(bson.encode(_document(i)) for i in
+                        range(start, min(start + BATCH_SIZE, count)))
+               for start in range(0, count, BATCH_SIZE)]
+    db = _Database(c=_Collection(batches),
+                   r=_Collection(batches, DEFAULT_RAW_BSON_OPTIONS))
+    print('{0} documents of {1} bytes'.format(count, size))
+    for title, query in (('dicts', 'SELECT * FROM c'),
+                         ('RawBSONDocument', 'SELECT * FROM r'),
+                         ('WITH (raw)', 'SELECT * FROM c WITH (raw)')):
+        elapsed, peak = _measure(_ids, db, parse(query))
+        print('{0:16s} {1:7.2f} s CPU  {2} peak'.format(
+            title, elapsed, '?' if peak is None else
+            '{0:7.1f} MB'.format(peak / 1e6)))
+
+
+if __name__ == '__main__':
+    main()
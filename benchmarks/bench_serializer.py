@@ -0,0 +1,73 @@
+"""
+Serializer benchmark: turning a parsed query into a MongoDB spec,
+via the old deepcopy-based tree walk, the current tree walk and
+the compiled spec builder.
+
+Usage: python benchmarks/bench_serializer.py
+"""
+
+import copy
+import timeit
+
+from mongosql import parse, support
+from mongosql.serializer import compile_spec
+
+
+def _in_list(values):
+    return 'SELECT * FROM c WHERE a IN [{0}]'.format(
+        ', '.join(repr(v) for v in values))
+
+
+QUERIES = [
+    ('wide: IN 1000 integers', _in_list(range(1000)), ()),
+    ('wide: IN 1000 strings',
+     _in_list(['item-{0}'.format(i) for i in range(1000)]), ()),
+    ('wide: OR of 200 terms', 'SELECT * FROM c WHERE ' + ' OR '.join(
+        'f{0} == {0}'.format(i) for i in range(200)), ()),
+    ('wide: OR of 200 parameters', 'SELECT * FROM c WHERE ' + ' OR '.join(
+        'f{0} == ?'.format(i) for i in range(200)), list(range(200))),
+    ('deep: 60 nested additions',
+     'SELECT * FROM c WHERE a == ' + '(1 + ' * 60 + 'b' + ')' * 60, ()),
+    ('deep: 30 nested AND / OR', 'SELECT * FROM c WHERE ' + ''.join(
+        '(f{0} == {0} {1} '.format(i, ('AND', 'OR')[i % 2])
+        for i in range(30)) + 'x == 1' + ')' * 30, ()),
+    ('small: typical query',
+     "SELECT * FROM orders WHERE status IN ['paid', 'shipped'] "
+     "AND total > 100.0 AND (customer.country == 'IT' OR "
+     "customer.country == 'FR')", ()),
+]
+
+
+def _best(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    copy_literal = support.copy_literal
+    for title, query, params in QUERIES:
+        expression = parse(query).query
+        tree = support.bind(expression, params)
+        builder = compile_spec(expression)
+        assert builder(params) == support.to_mongo(tree)
+
+        number = 200
+        support.copy_literal = copy.deepcopy
+        try:
+            legacy = _best(lambda: support.to_mongo(tree), number)
+        finally:
+            support.copy_literal = copy_literal
+        walk = _best(lambda: support.to_mongo(tree), number)
+        compiled = _best(lambda: builder(params), number)
+        compiling = _best(lambda: compile_spec(expression), 20)
+
+        print(title)
+        for name, value in (('deepcopy walk', legacy), ('tree walk', walk),
+                            ('compiled', compiled)):
+            print('    {0:14s} {1:9.1f} us  ({2:.1f}x)'.format(
+                name, value * 1e6, legacy / value))
+        print('    {0:14s} {1:9.1f} us  (once per query)'.format(
+            'compile', compiling * 1e6))
+
+
+if __name__ == '__main__':
+    main()
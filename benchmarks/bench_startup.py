@@ -0,0 +1,44 @@
+"""
+Startup benchmark: time to import mongosql, and to parse
+the first query in a fresh interpreter.
+
+Usage: python benchmarks/bench_startup.py
+"""
+
+import os
+import subprocess
+import sys
+
+
+CODE = '''
+import time
+t0 = time.time()
+import mongosql
+t1 = time.time()
+mongosql.parse("SELECT * FROM c WHERE a == 1", engine={engine!r})
+t2 = time.time()
+print((t1 - t0) * 1000, (t2 - t1) * 1000)
+'''
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(engine, repeat=5):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    results = []
+    for _ in range(repeat):
+        out = subprocess.check_output(
+            [sys.executable, '-c', CODE.format(engine=engine)], env=env)
+        results.append([float(x) for x in out.split()])
+    return min(r[0] for r in results), min(r[1] for r in results)
+
+
+def main():
+    for engine in ('ply', 'pratt'):
+        import_ms, parse_ms = run(engine)
+        print('{0:5s} import: {1:6.1f} ms   first parse: {2:6.1f} ms'.format(
+            engine, import_ms, parse_ms))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Write benchmark: rows per second of ``executemany()`` INSERT and UPDATE
+statements, in chunks of different sizes, against an in-memory
+collection counting what it gets; compared to one ``execute()`` (one
+server call) per row.
+
+Needs pymongo, but no server.
+
+Usage: python benchmarks/bench_writes.py
+"""
+
+import timeit
+
+from mongosql import prepare
+
+
+ROWS = 20000
+
+
+class _Result(object):
+    def __init__(self, count):
+        self.inserted_ids = range(count)
+        self.matched_count = self.modified_count = count
+        self.upserted_count = 0
+        self.upserted_id = None
+        self.upserted_ids = {}
+        self.deleted_count = count
+
+
+class _Collection(object):
+    def __init__(self):
+        self.calls = 0
+
+    def insert_many(self, documents, **kwargs):
+        self.calls += 1
+        return _Result(len(documents))
+
+    def update_many(self, spec, update, **kwargs):
+        self.calls += 1
+        return _Result(1)
+
+    def bulk_write(self, requests, **kwargs):
+        self.calls += 1
+        return _Result(len(requests))
+
+
+class _Database(object):
+    def __init__(self):
+        self.collection = _Collection()
+
+    def __getitem__(self, name):
+        return self.collection
+
+
+def _best(func, number=1):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+def _rows():
+    return ((i, i * 2) for i in range(ROWS))
+
+
+def main():
+    queries = (('INSERT', 'INSERT INTO c VALUES {a = ?, b = ?}'),
+               ('UPDATE', 'UPDATE c SET b = ? WHERE a == ?'))
+    for title, query in queries:
+        statement = prepare(query)
+        db = _Database()
+        value = _best(lambda: [statement.execute(db, row) for row in _rows()])
+        print('{0:6s} one by one   {1:10.0f} rows/s'.format(
+            title, ROWS / value))
+        for size in (100, 1000, 10000):
+            chunked = prepare(query + ' WITH (chunk_size = {0})'.format(size))
+            value = _best(lambda: chunked.executemany(db, _rows()))
+            print('{0:6s} chunks {1:5d} {2:10.0f} rows/s'.format(
+                title, size, ROWS / value))
+
+
+if __name__ == '__main__':
+    main()
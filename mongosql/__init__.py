@@ -1,2 +1,30 @@
-from mongosql.wrapper import parse
-from mongosql.client import MongoSqlClient
+import sys
+import types
+
+from mongosql.wrapper import parse, prepare
+
+
+def _lazy_attribute(name):
+    ## Don't import pymongo until the client is actually needed
+    if name == 'MongoSqlClient':
+        from mongosql.client import MongoSqlClient
+        return MongoSqlClient
+    raise AttributeError(
+        "module 'mongosql' has no attribute {0!r}".format(name))
+
+
+if sys.version_info >= (3, 7):
+    __getattr__ = _lazy_attribute
+else:
+    ## No module __getattr__ (PEP 562): the module is replaced by an
+    ## instance of a subclass defining it, with the same namespace.
+    class _LazyModule(types.ModuleType):
+        def __getattr__(self, name):
+            return _lazy_attribute(name)
+
+    _module = _LazyModule(__name__, __doc__)
+    _module.__dict__.update(sys.modules[__name__].__dict__)
+    ## Keep the original alive: Python 2 clears the globals of the
+    ## modules it frees, and the functions above still use them.
+    _module._original = sys.modules[__name__]
+    sys.modules[__name__] = _module
@@ -0,0 +1,183 @@
+"""
+asyncio client: ``db.sql()`` is a coroutine, returning a cursor
+to be iterated with ``async for``::
+
+    client = AsyncMongoSqlClient('mongodb://localhost')
+    async for document in await client.mydb.sql('SELECT * FROM c'):
+        ...
+
+Queries run through an async driver: pymongo's ``AsyncMongoClient``
+(pymongo >= 4.9) by default, Motor's ``AsyncIOMotorClient``, or any
+client (or database, for ``AsyncMongoSqlDatabase``) with the same
+interface: collections whose ``find()`` returns a cursor and whose
+``aggregate()`` returns a cursor or a coroutine for one, cursors
+supporting ``async for`` and ``close()``.
+
+Queries are parsed on the event loop: it's quick, and most of them
+are in the parse cache anyway. The ones longer than
+``parse_in_executor`` characters (and not in the cache) are parsed in
+the default executor, not to block the loop.
+
+Results are fetched a batch at a time, as they're iterated: a slow
+consumer doesn't pile up documents in memory, at most a batch (see
+the ``batch_size`` option). Closing the cursor, leaving its
+``async with`` block or cancelling the task iterating it kill the
+cursor on the server.
+
+Python >= 3.5 only; instrumentation hooks, the result cache and
+single flight are for the blocking ``MongoSqlClient``.
+"""
+
+import asyncio
+import inspect
+
+from mongosql.support import (
+    AggregateOperation, SelectOperation, aggregate_kwargs,
+    apply_cursor_options)
+from mongosql.wrapper import _cache_key, parse, parse_cache
+
+## Queries longer than this (characters) are parsed in an executor
+parse_in_executor = 4096
+
+
+async def _resolve(value):
+    ## Drivers differ on what returns a coroutine
+    if inspect.isawaitable(value):
+        value = await value
+    return value
+
+
+class AsyncCursor(object):
+    """Results of a query, wrapping a driver cursor"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.closed = False
+        self._iterator = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed:
+            raise StopAsyncIteration
+        if self._iterator is None:
+            self._iterator = self.cursor.__aiter__()
+        try:
+            return await self._iterator.__anext__()
+        except StopAsyncIteration:
+            await self.close()
+            raise
+        except BaseException:
+            ## Cancelled (or failed): don't leave the cursor
+            ## open on the server
+            await self.close()
+            raise
+
+    async def to_list(self, length=None):
+        """The (first ``length``) documents, as a list"""
+        documents = []
+        async for document in self:
+            documents.append(document)
+            if length is not None and len(documents) >= length:
+                await self.close()
+                break
+        return documents
+
+    async def close(self):
+        """Kill the cursor on the server, if still open"""
+        if not self.closed:
+            self.closed = True
+            await _resolve(self.cursor.close())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class AsyncMongoSqlDatabase(object):
+    """
+    Database of an async driver, with a ``sql()`` coroutine;
+    anything else is delegated to ``database``.
+    """
+
+    def __init__(self, database, cursor_options=None):
+        self.database = database
+        self.cursor_options = dict(cursor_options or ())
+
+    def __getattr__(self, name):
+        return getattr(self.database, name)
+
+    def __getitem__(self, name):
+        return self.database[name]
+
+    async def parse(self, query):
+        if (len(query) <= parse_in_executor or
+                _cache_key(query) in parse_cache):
+            return parse(query)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, parse, query)
+
+    async def sql(self, query, params=None):
+        """Run ``query``: returns an ``AsyncCursor``"""
+        return await self.execute(await self.parse(query), params)
+
+    async def execute(self, operation, params=None):
+        """Run a parsed query: returns an ``AsyncCursor``"""
+        if not isinstance(operation, (SelectOperation, AggregateOperation)):
+            raise TypeError("Can't run {0} queries asynchronously".format(
+                type(operation).__name__))
+        collection = self.database[operation.collection]
+        options = operation._cursor_options(params, self.cursor_options)
+        if isinstance(operation, SelectOperation):
+            cursor = await _resolve(
+                collection.find(**operation.find_kwargs(params)))
+            if options:
+                cursor = apply_cursor_options(cursor, options)
+        else:
+            kwargs = aggregate_kwargs(options)
+            cursor = await _resolve(collection.aggregate(
+                operation._build_spec(params), **kwargs))
+            batch_size = kwargs['cursor'].get('batchSize')
+            if batch_size is not None:
+                cursor = cursor.batch_size(batch_size)
+        return AsyncCursor(cursor)
+
+
+def _default_client(*args, **kwargs):
+    try:
+        from pymongo import AsyncMongoClient
+    except ImportError:
+        from motor.motor_asyncio import AsyncIOMotorClient as AsyncMongoClient
+    return AsyncMongoClient(*args, **kwargs)
+
+
+class AsyncMongoSqlClient(object):
+    """
+    asyncio counterpart of ``MongoSqlClient``: returns databases with
+    a ``sql()`` coroutine.
+
+    ``client`` is the async driver client, or the arguments for one
+    (pymongo's ``AsyncMongoClient``, or else Motor's); for the other
+    arguments, see ``MongoSqlClient``.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.cursor_options = dict(kwargs.pop('cursor_options', None) or ())
+        client = kwargs.pop('client', None)
+        if client is None:
+            client = _default_client(*args, **kwargs)
+        self.client = client
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        return AsyncMongoSqlDatabase(self.client[name], self.cursor_options)
+
+    def close(self):
+        return self.client.close()
@@ -0,0 +1,179 @@
+"""
+Batches of independent queries, run concurrently: see
+``MongoSqlDatabase.sql_many()``.
+
+All the queries are parsed first: the ones that fail get their error,
+and the others are run. Queries with the same results (same
+collection and spec, see ``mongosql.resultcache``) are run once.
+The rest are run on up to ``max_workers`` threads, all sharing the
+connection pool of the client: more workers than its
+``maxPoolSize`` (100 by default) only wait for a connection.
+
+Each query gets a ``QueryResult``, in the order they were given:
+errors are kept there, not raised, so one failing query doesn't
+affect the others. Those not done within ``deadline`` seconds (from
+the call) get a ``DeadlineExceeded`` error; the ones already running
+are not interrupted, give them a ``max_time_ms`` for that.
+"""
+
+import copy
+import threading
+import time
+
+from six.moves.queue import Empty, Queue
+
+from mongosql.resultcache import result_key
+from mongosql.support import AggregateOperation, SelectOperation
+from mongosql.wrapper import parse
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class QueryResult(object):
+    """
+    Outcome of a query: either its ``documents`` (a list, or the
+    report of EXPLAIN) or its ``error``; ``duration`` (milliseconds)
+    of running it, None if it was never run.
+    """
+
+    __slots__ = ('query', 'params', 'documents', 'error', 'duration')
+
+    def __init__(self, query, params=None):
+        self.query = query
+        self.params = params
+        self.documents = None
+        self.error = None
+        self.duration = None
+
+    def result(self):
+        """The documents, or raise the error"""
+        if self.error is not None:
+            raise self.error
+        return self.documents
+
+    def __repr__(self):
+        return '<{0} {1!r}: {2}>'.format(
+            self.__class__.__name__, self.query,
+            'error' if self.error is not None else
+            '{0} documents'.format(len(self.documents or ())))
+
+
+class BatchResults(list):
+    """
+    The ``QueryResult`` of each query, in order; ``wall_time`` of
+    the whole batch and ``query_time``, the sum of the durations of
+    the queries (both in milliseconds).
+    """
+
+    wall_time = 0.0
+    query_time = 0.0
+    unique = 0  # Queries actually run
+
+    def stats(self):
+        return {
+            'queries': len(self),
+            'unique': self.unique,
+            'errors': sum(1 for r in self if r.error is not None),
+            'wall_time': self.wall_time,
+            'query_time': self.query_time,
+            ## How many queries were running at once, on average
+            'parallelism': (self.query_time / self.wall_time
+                            if self.wall_time else None),
+        }
+
+
+def _prepare(db, queries, results):
+    ## {key: [QueryResult]}, for the queries to run
+    groups = {}
+    order = []
+    for item in queries:
+        if isinstance(item, basestring):
+            query, params = item, None
+        else:
+            query, params = item
+        result = QueryResult(query, params)
+        results.append(result)
+        try:
+            operation = parse(query)
+            if isinstance(operation, (SelectOperation, AggregateOperation)):
+                key = result_key(getattr(db, 'name', None), operation,
+                                 params, getattr(db, 'cursor_options', None))
+            else:
+                key = len(results)  # Never shared
+        except Exception as e:
+            result.error = e
+            continue
+        if key not in groups:
+            groups[key] = []
+            order.append(key)
+        groups[key].append(result)
+    return [groups[key] for key in order]
+
+
+def run_many(db, queries, max_workers=8, deadline=None):
+    """
+    Run ``queries`` (query strings, or ``(query, params)``) on ``db``
+    with its ``sql()``; returns ``BatchResults``.
+    """
+    start = _timer()
+    end = None if deadline is None else start + deadline
+    results = BatchResults()
+    pending = Queue()
+    groups = _prepare(db, queries, results)
+    for group in groups:
+        pending.put(group)
+    lock = threading.Lock()
+    state = {'closed': False, 'query_time': 0.0}
+
+    def work():
+        while True:
+            try:
+                group = pending.get_nowait()
+            except Empty:
+                return
+            if end is not None and _timer() >= end:
+                continue  # Left to the deadline
+            began = _timer()
+            first = group[0]
+            try:
+                documents = db.sql(first.query, first.params)
+                if not isinstance(documents, dict):  # EXPLAIN report
+                    documents = list(documents)
+                error = None
+            except Exception as e:
+                documents, error = None, e
+            duration = (_timer() - began) * 1000
+            copies = [documents] + [
+                copy.deepcopy(documents) for _ in group[1:]]
+            with lock:
+                state['query_time'] += duration
+                if state['closed']:
+                    return
+                for result, documents in zip(group, copies):
+                    result.documents = documents
+                    result.error = error
+                    result.duration = duration
+
+    threads = [threading.Thread(target=work)
+               for _ in range(min(max_workers, len(groups)))]
+    for thread in threads:
+        thread.daemon = True  # Not waited for, after the deadline
+        thread.start()
+    for thread in threads:
+        thread.join(None if end is None else max(0, end - _timer()))
+
+    with lock:
+        state['closed'] = True
+        for group in groups:
+            for result in group:
+                if result.documents is None and result.error is None:
+                    result.error = DeadlineExceeded(
+                        "Not done within {0}s".format(deadline))
+        results.unique = len(groups)
+        results.query_time = state['query_time']
+    results.wall_time = (_timer() - start) * 1000
+    return results
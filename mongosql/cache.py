@@ -0,0 +1,184 @@
+"""
+Caching utilities for MongoSQL
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Bounded, thread-safe LRU mapping.
+
+    Keeps track of hits, misses and evictions; a ``maxsize`` of ``0``
+    disables caching altogether (every lookup is a miss).
+    """
+
+    def __init__(self, maxsize=128):
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                ## Re-insert the item, to mark it as most recently used
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if self.maxsize == 0:
+                return
+            self._data.pop(key, None)
+            self._data[key] = value
+            self._evict()
+
+    def resize(self, maxsize):
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+            }
+
+    def _evict(self):
+        ## Must be called with the lock held
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class TTLCache(object):
+    """
+    Bounded, thread-safe LRU mapping whose items expire after their
+    own time to live (seconds), and can be dropped by tag.
+
+    Bounded both in number of items (``maxsize``) and in total size
+    (``maxbytes``, as given to ``put()``).
+    """
+
+    def __init__(self, maxsize=1024, maxbytes=64 * 1024 * 1024,
+                 clock=time.time):
+        if maxsize < 0 or maxbytes < 0:
+            raise ValueError("maxsize and maxbytes must be >= 0")
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.clock = clock
+        self.size = 0  # Total size of the items
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._data = OrderedDict()  # {key: (value, expires, size, tag)}
+        self._tags = {}  # {tag: set(keys)}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] <= self.clock():
+                self._remove(key)
+                self.expirations += 1
+                item = None
+            if item is None:
+                self.misses += 1
+                return default
+            ## Re-insert the item, to mark it as most recently used
+            del self._data[key]
+            self._data[key] = item
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, ttl, size=0, tag=None):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if size > self.maxbytes or self.maxsize == 0:
+                return
+            self._data[key] = (value, self.clock() + ttl, size, tag)
+            self.size += size
+            self._tags.setdefault(tag, set()).add(key)
+            while (len(self._data) > self.maxsize or
+                   self.size > self.maxbytes):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate(self, tag):
+        """Drop all the items with ``tag``; returns how many"""
+        with self._lock:
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def _remove(self, key):
+        ## Must be called with the lock held
+        _, _, size, tag = self._data.pop(key)
+        self.size -= size
+        keys = self._tags[tag]
+        keys.discard(key)
+        if not keys:
+            del self._tags[tag]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+            self.size = 0
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'items': len(self._data),
+                'bytes': self.size,
+                'maxsize': self.maxsize,
+                'maxbytes': self.maxbytes,
+            }
+
+    def __contains__(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and item[1] > self.clock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
@@ -2,17 +2,189 @@
 Custom MongoClient
 """
 
-from pymongo.mongo_client import MongoClient
+import functools
+
+from pymongo.collection import Collection
 from pymongo.database import Database
+from pymongo.mongo_client import MongoClient
 
-from mongosql import parse
+from mongosql import instrumentation, parse, prepare
+from mongosql.resultcache import ResultCache
+from mongosql.singleflight import SingleFlight
 
 
 class MongoSqlClient(MongoClient):
+    """
+    ``MongoClient`` returning databases with a ``.sql()`` method.
+
+    ``cursor_options`` are the defaults for the ``WITH (...)``
+    clause of queries run through this client, eg.
+    ``MongoSqlClient(uri, cursor_options={'batch_size': 1000})``;
+    the ones a kind of query doesn't support are ignored.
+
+    ``result_cache`` keeps the results of the queries, see
+    ``mongosql.resultcache``: a ``ResultCache``, or True for one with
+    the default settings. The results of the queries on a collection
+    are dropped when it's written to through this client.
+
+    ``single_flight`` makes identical queries running at the same time
+    share one server query, see ``mongosql.singleflight``: a
+    ``SingleFlight``, or True for one with the default settings.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.cursor_options = dict(kwargs.pop('cursor_options', None) or ())
+        result_cache = kwargs.pop('result_cache', None)
+        if result_cache is True:
+            result_cache = ResultCache()
+        self.result_cache = result_cache or None
+        single_flight = kwargs.pop('single_flight', None)
+        if single_flight is True:
+            single_flight = SingleFlight()
+        self.single_flight = single_flight or None
+        super(MongoSqlClient, self).__init__(*args, **kwargs)
+
     def __getattr__(self, name):
-        return MongoSqlDatabase(self, name)
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        return MongoSqlDatabase(self, name, self.cursor_options,
+                                result_cache=self.result_cache,
+                                single_flight=self.single_flight)
 
 
 class MongoSqlDatabase(Database):
-    def sql(self, query):
-        return parse(query).apply(self)
+    def __init__(self, client, name, cursor_options=None, result_cache=None,
+                 single_flight=None, **kwargs):
+        super(MongoSqlDatabase, self).__init__(client, name, **kwargs)
+        self.cursor_options = dict(cursor_options or ())
+        self.result_cache = result_cache
+        self.single_flight = single_flight
+        ## How parsed queries are run, if not by their apply(): as
+        ## run(operation, db, params, options). Queries in flight are
+        ## shared before looking into the cache, so that concurrent
+        ## misses are run once.
+        self._run = None
+        if result_cache is not None:
+            self._run = result_cache.apply
+        if single_flight is not None:
+            self._run = functools.partial(single_flight.apply, run=self._run)
+
+    def __getitem__(self, name):
+        if self.result_cache is None:
+            return super(MongoSqlDatabase, self).__getitem__(name)
+        return MongoSqlCollection(self, name)
+
+    def get_collection(self, name, *args, **kwargs):
+        if self.result_cache is None:
+            return super(MongoSqlDatabase, self).get_collection(
+                name, *args, **kwargs)
+        return MongoSqlCollection(self, name, *args, **kwargs)
+
+    def drop_collection(self, name_or_collection, *args, **kwargs):
+        try:
+            return super(MongoSqlDatabase, self).drop_collection(
+                name_or_collection, *args, **kwargs)
+        finally:
+            if self.result_cache is not None:
+                name = getattr(name_or_collection, 'name', name_or_collection)
+                self.result_cache.invalidate(self.name, name)
+
+    def sql(self, query, params=None):
+        if instrumentation.hooks:
+            return instrumentation.execute(
+                self, query, params, options=self.cursor_options,
+                run=self._run)
+        if self._run is not None:
+            return self._run(parse(query), self, params, self.cursor_options)
+        if params is not None:
+            return prepare(query).execute(
+                self, params, options=self.cursor_options)
+        return parse(query).apply(self, options=self.cursor_options)
+
+    def executemany(self, query, params_seq):
+        """
+        Run an INSERT, UPDATE or DELETE ``query`` once for each set of
+        parameter values in ``params_seq``, in unordered batches
+        (``WITH (chunk_size = ...)``); returns the counts written.
+        """
+        return prepare(query).executemany(
+            self, params_seq, options=self.cursor_options)
+
+    def sql_many(self, queries, max_workers=8, deadline=None):
+        """
+        Run independent ``queries`` (query strings, or ``(query,
+        params)``) concurrently, on up to ``max_workers`` threads;
+        returns their results in order, with timings: see
+        ``mongosql.batch``.
+        """
+        from mongosql.batch import run_many
+        return run_many(self, queries, max_workers, deadline)
+
+    def load(self, collection, source, format='csv', **kwargs):
+        """
+        Insert the documents of a CSV or JSON Lines file (a path or a
+        file object) into ``collection``, streaming it through a pool
+        of writer threads; see ``mongosql.loader.load()`` for the
+        options, and the ``progress`` callback.
+        """
+        from mongosql.loader import load
+        return load(self, collection, source, format, **kwargs)
+
+    def export(self, query, sink, format=None, params=None, **kwargs):
+        """
+        Write the results of a SELECT or AGGREGATE ``query`` to
+        ``sink`` (a path or a file object) as CSV, JSON Lines, Parquet
+        or Arrow, a batch at a time; see ``mongosql.export.export()``.
+        """
+        from mongosql.export import export
+        kwargs.setdefault('options', self.cursor_options)
+        return export(self, query, sink, format, params, **kwargs)
+
+
+## Collection methods that write to it, dropping the cached results
+_writes = (
+    'insert_one', 'insert_many', 'replace_one', 'update_one', 'update_many',
+    'delete_one', 'delete_many', 'find_one_and_delete',
+    'find_one_and_replace', 'find_one_and_update', 'bulk_write', 'drop',
+    ## pymongo < 4
+    'insert', 'update', 'remove', 'save', 'find_and_modify',
+)
+
+
+def _invalidating(name):
+    def method(self, *args, **kwargs):
+        try:
+            return getattr(super(MongoSqlCollection, self), name)(
+                *args, **kwargs)
+        finally:
+            self.database.result_cache.invalidate(
+                self.database.name, self.name)
+    method.__name__ = name
+    method.__doc__ = getattr(Collection, name).__doc__
+    return method
+
+
+class MongoSqlCollection(Collection):
+    """
+    ``Collection`` of a ``MongoSqlDatabase`` with a result cache:
+    writes drop the cached results of the queries on it.
+    """
+
+    def rename(self, new_name, *args, **kwargs):
+        ## Both the old and the new name have a different collection now
+        try:
+            return super(MongoSqlCollection, self).rename(
+                new_name, *args, **kwargs)
+        finally:
+            for name in (self.name, new_name):
+                self.database.result_cache.invalidate(
+                    self.database.name, name)
+    rename.__doc__ = Collection.rename.__doc__
+
+
+for _name in _writes:
+    if hasattr(Collection, _name):
+        setattr(MongoSqlCollection, _name, _invalidating(_name))
@@ -0,0 +1,207 @@
+"""
+Columnar results: ``SelectOperation.fetch_columns()`` and
+``to_numpy()``.
+
+Instead of a dict per document, the results are read from the cursor
+a batch at a time into a ``Column`` per field: the fields of the
+``SELECT`` (dotted paths into embedded documents are fine), or for
+``SELECT *`` the fields as they show up, the documents before
+missing them.
+
+Columns of numbers and booleans are typed, contiguous buffers
+(``array.array``, grown in place as batches are added): 8 bytes per
+integer or float, 1 per boolean, instead of a Python object each
+(integers are kept in a list where ``array`` has no 64-bit type).
+Strings and dates are kept in lists, and so are columns mixing
+types, which become ``object`` columns; integers and floats together
+make a float column.
+
+Missing and null values get a placeholder (0, NaN, False, '' or
+None) and are flagged in ``mask``, a ``bytearray`` created on the
+first one. ``to_numpy()`` turns the buffers into NumPy arrays without
+copying them, masked arrays where values are missing.
+"""
+
+import datetime
+from array import array
+from collections import OrderedDict
+
+from mongosql.support import _chunks, get_field
+
+## Kind of column for each type of value
+_kinds = {
+    bool: 'bool',
+    int: 'int',
+    long: 'int',
+    float: 'float',
+    str: 'str',
+    unicode: 'str',
+    datetime.datetime: 'datetime',
+}
+
+
+def _int64_typecode():
+    ## 'q' is only there from Python 3.3; 'l' is 8 bytes on most
+    ## 64-bit platforms (not on Windows)
+    for typecode in ('q', 'l'):
+        try:
+            if array(typecode).itemsize == 8:
+                return typecode
+        except ValueError:
+            pass
+    return None
+
+
+## Buffers of the typed kinds: array type codes, placeholders
+_typecodes = {'bool': 'B', 'int': _int64_typecode(), 'float': 'd'}
+if _typecodes['int'] is None:
+    del _typecodes['int']
+_placeholders = {
+    'bool': False, 'int': 0, 'float': float('nan'), 'str': u'',
+    'datetime': None, 'object': None,
+}
+
+## NumPy types of the kinds
+_dtypes = {
+    'bool': 'bool', 'int': 'int64', 'float': 'float64', 'str': 'U',
+    'datetime': 'datetime64[us]', 'object': 'object',
+}
+
+## Range of the integers of an int column
+_int_range = (-2 ** 63, 2 ** 63 - 1)
+
+
+def _batch_kind(values):
+    """Kind of column for ``values`` (no None), None if there's none"""
+    kinds = set(_kinds.get(t, 'object') for t in set(map(type, values)))
+    if len(kinds) == 1:
+        kind = kinds.pop()
+        if kind == 'int' and not (
+                _int_range[0] <= min(values) and
+                max(values) <= _int_range[1]):
+            return 'object'
+        return kind
+    if kinds == set(['int', 'float']):
+        return 'float'
+    if kinds:
+        return 'object'
+    return None
+
+
+def _merge_kinds(old, new):
+    if new is None:  # Only missing values: any kind will do
+        return old
+    if old is None or old == new:
+        return new
+    if set([old, new]) == set(['int', 'float']):
+        return 'float'
+    return 'object'
+
+
+class Column(object):
+    """
+    Values of a field: ``values`` (an ``array.array`` or a list) of
+    ``kind`` (bool, int, float, str, datetime or object; None while
+    all the values are missing), ``mask`` (``bytearray``, 1 for the
+    missing values, None if there's none).
+    """
+
+    __slots__ = ('kind', 'values', 'mask')
+
+    def __init__(self, missing=0):
+        self.kind = None
+        self.values = []
+        self.mask = None
+        if missing:
+            self.extend([None] * missing)
+
+    def __len__(self):
+        return len(self.values)
+
+    def _promote(self, kind):
+        """Change the kind of the column, converting its values"""
+        if kind == 'object':
+            values = self.tolist()
+        elif self.kind is None:  # Only missing values so far
+            values = [_placeholders[kind]] * len(self.values)
+        else:  # int to float
+            values = self.values
+            if self.mask is not None:
+                values = [_placeholders[kind] if missing else value
+                          for value, missing in zip(values, self.mask)]
+        if kind in _typecodes:
+            values = array(_typecodes[kind], values)
+        self.kind = kind
+        self.values = values
+
+    def extend(self, values):
+        """Add ``values``, None for the missing ones"""
+        present = [value for value in values if value is not None]
+        kind = _merge_kinds(self.kind, _batch_kind(present))
+        if kind != self.kind:
+            self._promote(kind)
+        if len(present) < len(values):
+            if self.mask is None:
+                self.mask = bytearray(len(self.values))
+            self.mask.extend(bytearray(value is None for value in values))
+            placeholder = _placeholders.get(self.kind)
+            values = [placeholder if value is None else value
+                      for value in values]
+        elif self.mask is not None:
+            self.mask.extend(bytearray(len(values)))
+        self.values.extend(values)
+
+    def tolist(self):
+        """The values, with None for the missing ones"""
+        if self.mask is None:
+            return list(self.values)
+        return [None if missing else value
+                for value, missing in zip(self.values, self.mask)]
+
+    def to_numpy(self):
+        """
+        NumPy array of the values, sharing the buffer of the typed
+        kinds; a masked array if any is missing.
+        """
+        import numpy
+        if self.kind in _typecodes:
+            data = numpy.frombuffer(self.values, dtype=_dtypes[self.kind])
+        elif self.kind == 'object' or self.kind is None:
+            data = numpy.empty(len(self.values), dtype='object')
+            data[:] = self.values
+        else:
+            data = numpy.array(self.values, dtype=_dtypes[self.kind])
+        if self.mask is not None and any(self.mask):
+            return numpy.ma.MaskedArray(
+                data, mask=numpy.frombuffer(self.mask, dtype='bool'))
+        return data
+
+    def __repr__(self):
+        return '<{0} {1}, {2} values>'.format(
+            self.__class__.__name__, self.kind, len(self.values))
+
+
+def fetch_columns(cursor, fields=None, batch_size=1000):
+    """
+    Read the documents of ``cursor`` into columns: returns
+    ``{name: Column}``, for ``fields`` (the names, or None for all the
+    fields), in order.
+    """
+    columns = OrderedDict((name, Column()) for name in fields or ())
+    length = 0
+    for batch in _chunks(cursor, batch_size):
+        if fields is None:
+            for document in batch:
+                for name in document:
+                    if name not in columns:
+                        columns[name] = Column(missing=length)
+        for name, column in columns.iteritems():
+            column.extend([get_field(document, name) for document in batch])
+        length += len(batch)
+    return columns
+
+
+def to_numpy(columns):
+    """``{name: numpy array}``, for the columns of ``fetch_columns()``"""
+    return OrderedDict(
+        (name, column.to_numpy()) for name, column in columns.iteritems())
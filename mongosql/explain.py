@@ -0,0 +1,228 @@
+"""
+EXPLAIN [ANALYZE]: how a query is translated, planned and run.
+
+``EXPLAIN <query>`` doesn't run the query, and returns a report with:
+
+``spec``
+    What is sent to MongoDB: the ``find()`` arguments, or the
+    aggregation pipeline.
+
+``explain``
+    The server ``explain`` output (``queryPlanner`` verbosity).
+
+``plan``
+    A summary of it: ``stages`` of the winning plan (outermost first),
+    ``indexes`` used, ``collscan`` if the whole collection is scanned.
+
+``timings``
+    Client-side time (in milliseconds) taken by each phase of the
+    translation: ``lex``, ``parse``, ``optimize`` (None if the query
+    isn't optimized) and ``serialize``.
+
+``warnings``
+    Things worth a look, such as collection scans and in-memory sorts.
+
+``EXPLAIN ANALYZE <query>`` also runs the query: ``explain`` comes with
+the execution statistics (``executionStats`` verbosity), summarized as
+``keys_examined``, ``docs_examined`` and ``returned`` in ``plan``, and
+``timings`` include the ``fetch`` of the first batch of results.
+"""
+
+import time
+from collections import OrderedDict
+
+from mongosql.support import SelectOperation, aggregate_kwargs, to_mongo
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+
+def _timed(func, *args):
+    start = _timer()
+    result = func(*args)
+    return result, (_timer() - start) * 1000
+
+
+class _Tokens(object):
+    """Lexer interface over already lexed tokens"""
+
+    def __init__(self, tokens):
+        self._tokens = iter(tokens)
+
+    def input(self, data):
+        pass
+
+    def token(self):
+        return next(self._tokens, None)
+
+
+def _lex(query, tokenizer):
+    from mongosql.lexer import get_lexer
+    lexer = get_lexer(tokenizer)
+    lexer.input(query)
+    return list(iter(lexer.token, None))
+
+
+def phase_timings(query, engine=None, tokenizer=None, rules=None):
+    """
+    Time the phases of parsing the operation in ``query``, an
+    EXPLAIN statement; returns ``(timings, operation)``.
+    """
+    ## Imported here, as the wrapper depends on this module
+    from mongosql.optimizer import optimize
+    from mongosql.wrapper import get_parser
+
+    timings = OrderedDict()
+    tokens, timings['lex'] = _timed(_lex, query, tokenizer)
+    while tokens and tokens[0].type in ('EXPLAIN', 'ANALYZE'):
+        tokens.pop(0)
+    operation, timings['parse'] = _timed(
+        get_parser(engine).parse, query, _Tokens(tokens))
+    timings['optimize'] = None
+    if rules is not None:
+        operation, timings['optimize'] = _timed(optimize, operation, rules)
+    return timings, operation
+
+
+def _find_command(operation, kwargs, options):
+    command = OrderedDict([('find', operation.collection)])
+    if 'filter' in kwargs:
+        command['filter'] = kwargs['filter']
+    if 'projection' in kwargs:
+        command['projection'] = dict(
+            (name, 1) for name in kwargs['projection'])
+    if 'sort' in kwargs:
+        command['sort'] = OrderedDict(kwargs['sort'])
+    for name in ('skip', 'limit'):
+        if name in kwargs:
+            command[name] = kwargs[name]
+    for name, value in options.items():
+        value = to_mongo(value)
+        if name == 'hint' and isinstance(value, dict):
+            value = OrderedDict(value)
+        if name in ('hint', 'comment'):
+            command[name] = value
+        elif name == 'max_time_ms':
+            command['maxTimeMS'] = value
+        elif name == 'batch_size':
+            command['batchSize'] = value
+    return command
+
+
+def _aggregate_command(operation, pipeline, options):
+    command = OrderedDict([
+        ('aggregate', operation.collection), ('pipeline', pipeline)])
+    kwargs = aggregate_kwargs(options)
+    if isinstance(kwargs.get('hint'), list):
+        kwargs['hint'] = OrderedDict(kwargs['hint'])
+    command.update(sorted(kwargs.items()))
+    return command
+
+
+def _serialize(operation, params, options):
+    """``(spec, command)`` for the operation"""
+    if isinstance(operation, SelectOperation):
+        kwargs = operation.find_kwargs(params)
+        return kwargs, _find_command(operation, kwargs, options)
+    pipeline = operation._build_spec(params)
+    return pipeline, _aggregate_command(operation, pipeline, options)
+
+
+##------------------------------------------------------------
+## Query plans
+##------------------------------------------------------------
+
+def _planner_and_stats(explain):
+    if 'queryPlanner' in explain:
+        return explain['queryPlanner'], explain.get('executionStats')
+    ## Aggregation, with the query part in the first stage
+    stages = explain.get('stages') or [{}]
+    cursor = stages[0].get('$cursor', {})
+    return cursor.get('queryPlanner', {}), cursor.get('executionStats')
+
+
+def _walk(plan, stages, indexes):
+    if 'queryPlan' in plan:  # Slot based execution engine
+        plan = plan['queryPlan']
+    if 'stage' in plan:
+        stages.append(plan['stage'])
+    if 'indexName' in plan:
+        indexes.append(plan['indexName'])
+    for shard in plan.get('shards', ()):
+        _walk(shard.get('winningPlan', {}), stages, indexes)
+    if 'inputStage' in plan:
+        _walk(plan['inputStage'], stages, indexes)
+    for child in plan.get('inputStages', ()):
+        _walk(child, stages, indexes)
+
+
+def summarize(explain):
+    """Summary of the output of the ``explain`` command"""
+    planner, stats = _planner_and_stats(explain)
+    stages, indexes = [], []
+    _walk(planner.get('winningPlan', {}), stages, indexes)
+    summary = OrderedDict([
+        ('stages', stages),
+        ('indexes', indexes),
+        ('collscan', 'COLLSCAN' in stages),
+    ])
+    if stats:
+        summary['keys_examined'] = stats.get('totalKeysExamined')
+        summary['docs_examined'] = stats.get('totalDocsExamined')
+        summary['returned'] = stats.get('nReturned')
+    return summary
+
+
+def _warnings(plan, spec, optimized_spec):
+    warnings = []
+    if plan['collscan']:
+        warnings.append(
+            'COLLSCAN: no index is used, the whole collection is read')
+        if optimized_spec is not None and optimized_spec != spec:
+            warnings.append(
+                'The query is not optimized: with parse(query, '
+                'optimize=True) the spec is {0!r}'.format(optimized_spec))
+    if 'SORT' in plan['stages']:
+        warnings.append('SORT: results are sorted in memory, not by index')
+    return warnings
+
+
+def explain(statement, db, params=None, options=None):
+    """Report for an ``ExplainOperation``, see the module docstring"""
+    from mongosql.optimizer import optimize
+
+    operation = statement.operation
+    report = OrderedDict([
+        ('analyze', statement.analyze),
+        ('collection', operation.collection),
+    ])
+
+    if statement._source is not None:
+        timings, _ = phase_timings(*statement._source)
+    else:
+        timings = OrderedDict(
+            [('lex', None), ('parse', None), ('optimize', None)])
+    options = operation._cursor_options(params, options)
+    (spec, command), timings['serialize'] = _timed(
+        _serialize, operation, params, options)
+    report['spec'] = spec
+
+    verbosity = 'executionStats' if statement.analyze else 'queryPlanner'
+    report['explain'] = db.command(
+        OrderedDict([('explain', command), ('verbosity', verbosity)]))
+    report['plan'] = summarize(report['explain'])
+
+    optimized_spec = None
+    if statement._source is None or statement._source[3] is None:
+        optimized_spec, _ = _serialize(optimize(operation), params, options)
+    report['warnings'] = _warnings(report['plan'], spec, optimized_spec)
+
+    if statement.analyze:
+        cursor = operation.apply(db, params, options)
+        try:
+            _, timings['fetch'] = _timed(next, iter(cursor), None)
+        finally:
+            ## Not to leave the rest of the results on the server
+            if hasattr(cursor, 'close'):
+                cursor.close()
+    report['timings'] = timings
+    return report
@@ -0,0 +1,318 @@
+"""
+Streaming export of query results: ``export()``, also run by
+``SELECT ... INTO OUTFILE 'path' [FORMAT csv|jsonl|parquet|arrow|bson]``
+and ``MongoSqlDatabase.export()``.
+
+Results are read from the cursor ``batch_size`` documents at a time
+(also its batch size, unless set with ``WITH (batch_size = ...)``),
+and each batch is written before the next one is read: memory only
+depends on the batch size.
+
+Table formats (CSV, Parquet, Arrow) have a column per field of the
+``SELECT`` (names can be dotted paths, into embedded documents); for
+``SELECT *`` and ``AGGREGATE``, the fields of the first batch of
+documents: fields only in later batches are left out, with a warning
+(pass the ``columns`` to export). JSON Lines gets the documents as
+they are.
+
+CSV values are written so that ``COPY`` reads them back: ``true`` /
+``false``, nothing for null or missing values, JSON for embedded
+documents and arrays. Parquet and Arrow need pyarrow; the column
+types come from the first batch.
+
+BSON files (as written by ``mongodump``, read by ``mongorestore``)
+get the batches of results as received from the server: they are
+never decoded.
+"""
+
+import csv
+import datetime
+import io
+import json
+import os
+import struct
+import sys
+import warnings
+from collections import OrderedDict
+
+from mongosql.support import (
+    AggregateOperation, SelectOperation, _chunks, export_formats, get_field)
+from mongosql.wrapper import parse
+
+## File extensions of the formats, for ``guess_format()``
+extensions = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.bson': 'bson',
+}
+
+## Length of a BSON document, at its start
+_int32 = struct.Struct('<i')
+
+_dates = (datetime.datetime, datetime.date, datetime.time)
+
+## The csv module of Python 2 writes bytes
+_csv_bytes = sys.version_info < (3,)
+
+
+def guess_format(sink):
+    """Format for a path, from its extension; CSV by default"""
+    if isinstance(sink, basestring):
+        extension = os.path.splitext(sink)[1].lower()
+        return extensions.get(extension, 'csv')
+    return 'csv'
+
+
+def _json_default(obj):
+    ## ObjectId, Decimal128, UUID, ..: their text
+    if isinstance(obj, _dates):
+        return obj.isoformat()
+    return unicode(obj)
+
+
+def _columns(documents):
+    """Names of the fields of ``documents``, in order of appearance"""
+    columns = OrderedDict()
+    for document in documents:
+        for name in document:
+            columns[name] = None
+    return list(columns)
+
+
+def _left_out(columns, documents):
+    """Fields of ``documents`` not exported in ``columns``"""
+    exported = set(name.split('.')[0] for name in columns)
+    return set(name for document in documents
+               for name in document) - exported
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default, separators=(',', ':'))
+    if isinstance(value, _dates):
+        return value.isoformat()
+    return value
+
+
+def _arrow_value(value):
+    if isinstance(value, (basestring, int, long, float, bool, dict, list,
+                          type(None)) + _dates):
+        return value
+    return _json_default(value)
+
+
+class _FileWriter(object):
+    """
+    Writes to a path (opened and closed here), or to a file object.
+    ``left_out`` are the fields not exported, when the columns come
+    from the first batch.
+    """
+
+    def __init__(self, sink, columns):
+        self.columns = columns
+        self.left_out = set()
+        self._owned = isinstance(sink, basestring)
+        if self._owned:
+            sink = io.open(sink, 'w', encoding='utf-8', newline='')
+        self.file = sink
+
+    def close(self, failed=False):
+        if self._owned:
+            self.file.close()
+
+
+class _CsvWriter(_FileWriter):
+    def __init__(self, sink, columns):
+        super(_CsvWriter, self).__init__(sink, columns)
+        ## Rows are formatted here, to write a batch at once
+        self._buffer = io.BytesIO() if _csv_bytes else io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+        self._inferred = self._header = columns is None
+        if columns is not None:
+            self._writerows([columns])
+
+    def _writerows(self, rows):
+        if _csv_bytes:
+            rows = ([value.encode('utf-8') if isinstance(value, unicode)
+                     else value for value in row] for row in rows)
+        self._writer.writerows(rows)
+
+    def _flush(self):
+        text = self._buffer.getvalue()
+        self.file.write(text.decode('utf-8') if _csv_bytes else text)
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+    def write(self, documents):
+        if self._header:
+            self.columns = _columns(documents)
+            self._writerows([self.columns])
+            self._header = False
+        elif self._inferred:
+            self.left_out.update(_left_out(self.columns, documents))
+        self._writerows(
+            [_csv_value(get_field(document, name)) for name in self.columns]
+            for document in documents)
+        self._flush()
+
+    def close(self, failed=False):
+        try:
+            if self._buffer.tell():  # Just the header
+                self._flush()
+        finally:
+            super(_CsvWriter, self).close(failed)
+
+
+class _JsonlWriter(_FileWriter):
+    def write(self, documents):
+        self.file.write(u''.join(
+            json.dumps(document, default=_json_default) + u'\n'
+            for document in documents))
+
+
+class _ArrowWriter(object):
+    """Parquet or Arrow IPC files, through a pyarrow writer"""
+
+    def __init__(self, sink, columns, parquet=False):
+        try:
+            import pyarrow
+            if parquet:
+                import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Exporting to {0} needs pyarrow".format(
+                'parquet' if parquet else 'arrow'))
+        self.pyarrow = pyarrow
+        self.sink = sink
+        self.columns = columns
+        self.parquet = parquet
+        self.schema = None
+        self.left_out = set()
+        self._inferred = columns is None
+        self._writer = None
+
+    def write(self, documents):
+        if self.columns is None:
+            self.columns = _columns(documents)
+        elif self._inferred:
+            self.left_out.update(_left_out(self.columns, documents))
+        table = self.pyarrow.Table.from_pydict(OrderedDict(
+            (name, [_arrow_value(get_field(document, name))
+                    for document in documents])
+            for name in self.columns), schema=self.schema)
+        if self._writer is None:
+            self.schema = table.schema
+            if self.parquet:
+                self._writer = self.pyarrow.parquet.ParquetWriter(
+                    self.sink, self.schema)
+            else:
+                self._writer = self.pyarrow.ipc.new_file(
+                    self.sink, self.schema)
+        self._writer.write_table(table)
+
+    def close(self, failed=False):
+        if self._writer is None:
+            if failed:  # Nothing to write, nor to close
+                return
+            self.write([])  # No results: just the columns
+        self._writer.close()
+
+
+def _count_documents(data):
+    """Number of documents in ``data``, BSON documents back to back"""
+    count = position = 0
+    while position < len(data):
+        position += _int32.unpack_from(data, position)[0]
+        count += 1
+    return count
+
+
+def _export_bson(db, query, sink, params, options):
+    """Write the raw batches of results of ``query`` to ``sink``"""
+    owned = isinstance(sink, basestring)
+    if owned:
+        sink = io.open(sink, 'wb')
+    cursor = None
+    exported = 0
+    try:
+        cursor = query.apply_raw_batches(db, params, options=options)
+        for data in cursor:
+            sink.write(data)
+            exported += _count_documents(data)
+    finally:
+        if owned:
+            sink.close()
+        if hasattr(cursor, 'close'):
+            cursor.close()
+    return {'exported': exported}
+
+
+_writers = {
+    'csv': _CsvWriter,
+    'jsonl': _JsonlWriter,
+    'parquet': lambda sink, columns: _ArrowWriter(sink, columns, True),
+    'arrow': _ArrowWriter,
+}
+
+
+def export(db, query, sink, format=None, params=None, batch_size=1000,
+           options=None, columns=None):
+    """
+    Write the results of ``query`` (a SELECT or AGGREGATE, as a
+    string or parsed) on ``db`` to ``sink``, a path or a file object
+    (text for CSV and JSON Lines); returns ``{'exported': n}``.
+
+    ``format`` is one of ``export_formats``, guessed from the path
+    by default; ``columns`` are the fields to write, instead of the
+    ones of the query (not for BSON, a binary file object, which gets
+    the documents as they are). ``options`` are the default cursor
+    options.
+    """
+    if isinstance(query, basestring):
+        query = parse(query)
+    if not isinstance(query, (SelectOperation, AggregateOperation)):
+        raise TypeError("Only SELECT and AGGREGATE results can be exported")
+    if format is None:
+        format = guess_format(sink)
+    if format not in export_formats:
+        raise ValueError("Unknown format: {0!r}".format(format))
+    if columns is None and isinstance(query, SelectOperation):
+        columns = query.fields
+    options = dict(options or {})
+    options.setdefault('batch_size', batch_size)
+    if format == 'bson':
+        return _export_bson(db, query, sink, params, options)
+
+    writer = _writers[format](sink, columns)
+    cursor = None
+    exported = 0
+    failed = True
+    try:
+        cursor = query.apply(db, params, options=options)
+        for batch in _chunks(cursor, batch_size):
+            writer.write(batch)
+            exported += len(batch)
+        failed = False
+    finally:
+        if hasattr(cursor, 'close'):  # When stopped by an error
+            cursor.close()
+        try:
+            writer.close(failed)
+        except Exception:
+            if not failed:
+                raise
+            ## Else, don't hide the error that stopped the export
+    left_out = getattr(writer, 'left_out', None)
+    if left_out:
+        warnings.warn(
+            "Fields not in the first batch of results, left out of the "
+            "export: {0}; pass the columns to export them".format(
+                ', '.join(sorted(left_out))), stacklevel=2)
+    return {'exported': exported}
@@ -0,0 +1,381 @@
+"""
+Instrumentation: events on the way a query is run, and a registry
+of per-query statistics.
+
+Hooks are callables taking an ``Event``, registered with
+``add_hook()``. Queries run through ``MongoSqlDatabase.sql()`` emit,
+in order:
+
+``parse_start``
+    Before parsing.
+``cache_hit``
+    The parsed query came from the parse cache (emitted by ``parse()``).
+``parse_end``
+    ``duration`` of the parsing.
+``translate``
+    ``duration`` of building the spec or pipeline.
+``execute``
+    ``duration`` of sending it: the ``find()`` / ``aggregate()`` call
+    and setting the cursor options.
+``shared_result``
+    Instead of ``translate`` and ``execute``: the results came from
+    the result cache of the client, or from an identical query in
+    flight (see ``mongosql.resultcache`` and ``mongosql.singleflight``).
+``first_batch``
+    ``duration`` of the wait for the first document.
+``exhausted``
+    The cursor has no more results: ``duration`` of the whole query,
+    from ``parse_start`` to the last document, with the ``documents``
+    returned and their BSON ``size`` in bytes.
+
+Sizes cost encoding each document back to BSON (unless it is raw), so
+they are only computed when a registered hook asks for them with a
+true ``sizes`` attribute, such as ``QueryStats(sizes=True)``; ``size``
+is None otherwise, or without pymongo.
+
+Durations are in milliseconds. With no hooks registered, ``sql()``
+only pays for a truth test of ``hooks``, see
+``benchmarks/bench_instrumentation.py``.
+
+Exceptions raised by hooks are not caught: hooks run inline, on the
+thread running the query, and should be quick.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+## Registered hooks, called in order for each event
+hooks = []
+
+
+def add_hook(hook):
+    if hook not in hooks:
+        hooks.append(hook)
+
+
+def remove_hook(hook):
+    hooks.remove(hook)
+
+
+class Event(object):
+    """
+    Something happening to ``query``; ``fingerprint`` identifies the
+    statement (by default, the one of ``mongosql.normalizer``), for
+    aggregating the events of its executions.
+    """
+
+    __slots__ = ('name', 'query', 'fingerprint', 'duration', 'documents',
+                 'size')
+
+    def __init__(self, name, query, fingerprint=None, duration=None,
+                 documents=None, size=None):
+        self.name = name
+        self.query = query
+        if fingerprint is None:
+            ## Imported here, as the wrapper depends on this module
+            from mongosql.normalizer import fingerprint as get_fingerprint
+            fingerprint = get_fingerprint(query)
+        self.fingerprint = fingerprint
+        self.duration = duration  # Milliseconds
+        self.documents = documents
+        self.size = size  # Bytes
+
+    def __repr__(self):
+        return '{0}({1!r}, {2!r}, duration={3!r}, documents={4!r})'.format(
+            self.__class__.__name__, self.name, self.query, self.duration,
+            self.documents)
+
+
+def emit(name, query, **kwargs):
+    event = Event(name, query, **kwargs)
+    for hook in list(hooks):
+        hook(event)
+
+
+def _elapsed(start):
+    return (_timer() - start) * 1000
+
+
+def _sizes_wanted():
+    return any(getattr(hook, 'sizes', False) for hook in hooks)
+
+
+## BSON encoder, looked up on first use: pymongo is only imported
+## when hooks are actually used
+_bson_encode = None
+
+
+def _bson_size(document):
+    """Size of ``document`` in BSON, None without pymongo"""
+    global _bson_encode
+    raw = getattr(document, 'raw', None)  # RawBSONDocument
+    if isinstance(raw, (bytes, memoryview)):
+        return len(raw)
+    if _bson_encode is None:
+        try:
+            import bson
+            _bson_encode = getattr(bson, 'encode', None) or bson.BSON.encode
+        except ImportError:
+            _bson_encode = False
+    if not _bson_encode:
+        return None
+    return len(_bson_encode(document))
+
+
+##------------------------------------------------------------
+## Instrumented execution
+##------------------------------------------------------------
+
+class _TimedDatabase(object):
+    """Records when queries are sent to the collections of ``db``"""
+
+    def __init__(self, db):
+        self._db = db
+        self.sent = None  # Start of the first find() / aggregate() call
+
+    def __getitem__(self, name):
+        return _TimedCollection(self, self._db[name])
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+
+class _TimedCollection(object):
+    def __init__(self, database, collection):
+        self._database = database
+        self._collection = collection
+
+    def _sent(self):
+        if self._database.sent is None:
+            self._database.sent = _timer()
+
+    def find(self, *args, **kwargs):
+        self._sent()
+        return self._collection.find(*args, **kwargs)
+
+    def aggregate(self, *args, **kwargs):
+        self._sent()
+        return self._collection.aggregate(*args, **kwargs)
+
+    def with_options(self, *args, **kwargs):
+        return _TimedCollection(
+            self._database, self._collection.with_options(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+class InstrumentedCursor(object):
+    """
+    Iterates over ``cursor``, emitting ``first_batch`` and
+    ``exhausted``; anything else is delegated to the cursor. Cursors
+    returned by its methods are instrumented too: ``limit()``,
+    ``batch_size()``... return the ``InstrumentedCursor``.
+    """
+
+    def __init__(self, cursor, query, fingerprint, start):
+        self._cursor = cursor
+        self._iterator = None
+        self._waiting = None
+        self._query = query
+        self._fingerprint = fingerprint
+        self._start = start
+        self._done = False
+        self.documents = 0
+        self.size = 0 if _sizes_wanted() else None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._iterator is None:
+            self._iterator = iter(self._cursor)
+            self._waiting = _timer()
+        try:
+            document = next(self._iterator)
+        except StopIteration:
+            if not self._done:
+                self._done = True
+                emit('exhausted', self._query, fingerprint=self._fingerprint,
+                     duration=_elapsed(self._start),
+                     documents=self.documents, size=self.size)
+            raise
+        if not self.documents:
+            emit('first_batch', self._query, fingerprint=self._fingerprint,
+                 duration=_elapsed(self._waiting), documents=0)
+        self.documents += 1
+        if self.size is not None:
+            size = _bson_size(document)
+            self.size = None if size is None else self.size + size
+        return document
+
+    next = __next__  # Python 2
+
+    def __getattr__(self, name):
+        attribute = getattr(self._cursor, name)
+        if not callable(attribute):
+            return attribute
+
+        def method(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            if result is self._cursor:  # Chained calls
+                return self
+            if isinstance(result, type(self._cursor)):  # clone()
+                return InstrumentedCursor(
+                    result, self._query, self._fingerprint, _timer())
+            return result
+        return method
+
+
+def execute(db, query, params=None, options=None, run=None):
+    """
+    Run ``query`` on ``db`` as ``MongoSqlDatabase.sql()`` does,
+    emitting the events to the hooks. ``run(operation, db, params,
+    options)`` runs the parsed query instead of its ``apply()``.
+    """
+    ## Imported here, as the wrapper depends on this module
+    from mongosql.normalizer import fingerprint as get_fingerprint
+    from mongosql.support import (
+        ExplainOperation, ExportOperation, WriteOperation)
+    from mongosql.wrapper import parse
+
+    start = _timer()
+    fingerprint = get_fingerprint(query)
+    emit('parse_start', query, fingerprint=fingerprint)
+    operation = parse(query)
+    emit('parse_end', query, fingerprint=fingerprint,
+         duration=_elapsed(start))
+    if isinstance(operation,
+                  (ExplainOperation, ExportOperation, WriteOperation)):
+        return operation.apply(db, params, options=options)
+
+    timed = _TimedDatabase(db)
+    applying = _timer()
+    if run is not None:
+        cursor = run(operation, timed, params, options)
+    else:
+        cursor = operation.apply(timed, params, options=options)
+    if timed.sent is None and run is not None:
+        emit('shared_result', query, fingerprint=fingerprint,
+             duration=_elapsed(applying))
+    elif timed.sent is not None:
+        emit('translate', query, fingerprint=fingerprint,
+             duration=(timed.sent - applying) * 1000)
+        emit('execute', query, fingerprint=fingerprint,
+             duration=_elapsed(timed.sent))
+    return InstrumentedCursor(cursor, query, fingerprint, start)
+
+
+##------------------------------------------------------------
+## Statistics
+##------------------------------------------------------------
+
+class Histogram(object):
+    """
+    Latencies (milliseconds) counted in buckets growing by ~19%, so
+    percentiles are off by at most that much, in constant memory.
+    """
+
+    minimum = 0.001
+    growth = 2 ** 0.25
+
+    def __init__(self):
+        self.buckets = {}  # {index: count}, bucket i up to minimum*growth**i
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        index = 0
+        if value > self.minimum:
+            index = int(math.ceil(
+                math.log(value / self.minimum, self.growth) - 1e-9))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        """Upper bound of the ``percent``-th percentile, None if empty"""
+        if not self.count:
+            return None
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                break
+        return min(self.minimum * self.growth ** index, self.max)
+
+
+class QueryStats(object):
+    """
+    Hook aggregating the events of each statement (by fingerprint):
+    its normalized ``query``, ``count`` of executions (shared results
+    included), parse ``cache_hits``, latency (of the whole query, for
+    the ones read to the end) percentiles and totals of the
+    ``documents`` returned and their ``size`` (None unless ``sizes``
+    is true).
+    """
+
+    def __init__(self, sizes=False):
+        self.sizes = sizes
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        if event.name not in ('cache_hit', 'execute', 'shared_result',
+                              'exhausted'):
+            return
+        with self._lock:
+            stats = self._stats.get(event.fingerprint)
+            if stats is None:
+                from mongosql.normalizer import normalize
+                stats = self._stats[event.fingerprint] = {
+                    'query': normalize(event.query), 'count': 0,
+                    'cache_hits': 0, 'latency': Histogram(), 'documents': 0,
+                    'size': 0}
+            if event.name == 'cache_hit':
+                stats['cache_hits'] += 1
+            elif event.name in ('execute', 'shared_result'):
+                stats['count'] += 1
+            else:
+                stats['latency'].add(event.duration)
+                stats['documents'] += event.documents
+                if event.size is None:
+                    stats['size'] = None
+                elif stats['size'] is not None:
+                    stats['size'] += event.size
+
+    def snapshot(self):
+        """``{fingerprint: {statistic: value}}``"""
+        with self._lock:
+            result = {}
+            for fingerprint, stats in self._stats.items():
+                latency = stats['latency']
+                result[fingerprint] = OrderedDict([
+                    ('query', stats['query']),
+                    ('count', stats['count']),
+                    ('cache_hits', stats['cache_hits']),
+                    ('p50', latency.percentile(50)),
+                    ('p95', latency.percentile(95)),
+                    ('p99', latency.percentile(99)),
+                    ('max', latency.max if latency.count else None),
+                    ('total_time', latency.total),
+                    ('documents', stats['documents']),
+                    ('size', stats['size']),
+                ])
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+## Built-in registry: enable with ``add_hook(registry)``, and
+## ``registry.sizes = True`` for the sizes of the results
+registry = QueryStats()
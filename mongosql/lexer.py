@@ -2,8 +2,11 @@
 Lexer for MongoSQL expressions
 """
 
+import functools
 import os
 import re
+import sys
+import threading
 
 import ply.lex as lex
 
@@ -19,6 +22,10 @@ tokens = [
     'FALSE',
     'NULL',
     'SYMBOL',
+
+    ## Bind parameters
+    'PARAM',
+    'NAMED_PARAM',
 ]
 
 ## Order matters!
@@ -63,6 +70,22 @@ reserved = [
     'WHERE',
     'ORDER',
     'BY',
+    'WITH',
+
+    ## Query plans
+    'EXPLAIN',
+    'ANALYZE',
+
+    ## Writes
+    'INSERT',
+    'INTO',
+    'VALUES',
+    'UPDATE',
+    'SET',
+    'DELETE',
+    'COPY',
+    'FORMAT',
+    'OUTFILE',
 
     ## For naming stuff
     'AS',
@@ -94,6 +117,30 @@ reserved = [
 tokens.extend(reserved)
 
 
+## Marks keywords whose token value is the matched text
+_keep = object()
+
+
+class _FrozenDict(dict):
+    """A dict that can't be changed once built"""
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("{0} is read-only".format(self.__class__.__name__))
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+
+## Symbols matching one of these (case-insensitive)
+## become a (type, value) token instead.
+keywords = _FrozenDict(
+    [(name, (name, _keep)) for name in reserved] + [
+        ('TRUE', ('TRUE', True)),
+        ('FALSE', ('FALSE', False)),
+        ('NULL', ('NULL', None)),
+    ])
+
+
 ## Whitespace gets ignored
 t_ignore = " \t"
 
@@ -142,10 +189,75 @@ def t_COMMENT(t):
 symbol_part = r'([a-zA-Z_][a-zA-Z0-9_]*)'
 
 
-@lex.TOKEN(r'{sp}(\.{sp})*'.format(sp=symbol_part))
+symbol = r'{sp}(\.{sp})*'.format(sp=symbol_part)
+
+
+@lex.TOKEN(symbol)
 def t_SYMBOL(t):
-    t_name = t.value.upper()
-    t.type = t_name if (t_name in reserved) else 'SYMBOL'
+    keyword = keywords.get(t.value.upper())
+    if keyword is not None:
+        t.type, value = keyword
+        if value is not _keep:
+            t.value = value
+    return t
+
+
+##------------------------------------------------------------
+## Bind parameters:
+##
+##   ?       positional, numbered from 0 in order of appearance
+##   :name   named
+##------------------------------------------------------------
+
+def t_PARAM(t):
+    r'\?'
+    ## The counter is restarted every time the lexer
+    ## is fed with some new input.
+    last_data, last_pos, index = getattr(
+        t.lexer, 'param_state', (None, None, -1))
+    if last_data is not t.lexer.lexdata or t.lexpos <= last_pos:
+        index = -1
+    index += 1
+    t.lexer.param_state = (t.lexer.lexdata, t.lexpos, index)
+    t.value = index
+    return t
+
+
+## Characters of symbols, and of the text between tokens
+_symbol_chars = frozenset(
+    'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.')
+_blank_chars = frozenset(t_ignore + '\r\n')
+
+
+def _after_map_key(data, pos):
+    """
+    Whether the colon at ``pos`` follows a map key, a symbol or a
+    string (``{key:value}``, ``{key :value}``): it's then a separator,
+    as parameters can't come right after those.
+    """
+    end = pos
+    while end > 0 and data[end - 1] in _blank_chars:
+        end -= 1
+    if end == 0:
+        return False
+    if data[end - 1] in '\'"':  # End of a string
+        return True
+    start = end
+    while start > 0 and data[start - 1] in _symbol_chars:
+        start -= 1
+    word = data[start:end]
+    return (word[:1].isalpha() or word[:1] == '_') and (
+        keywords.get(word.upper()) is None)
+
+
+@lex.TOKEN(r':' + symbol)
+def t_NAMED_PARAM(t):
+    if _after_map_key(t.lexer.lexdata, t.lexpos):
+        t.type = 'COLON'
+        t.value = ':'
+        t.lexer.lexpos = t.lexpos + 1
+        return t
+    t.value = t.value[1:]
     return t
 
 ##------------------------------------------------------------
@@ -171,12 +283,39 @@ string_single = ''.join(("'", string_single_char, "*'"))
 
 @lex.TOKEN('|'.join((string_single, string_double)))
 def t_STRING(t):
-    assert t.value[0] == t.value[-1]
-    assert t.value[0] in ('"', "'")
-    # todo: already return the string with escapes processed?
+    t.value = unescape(t.value[1:-1])
     return t
 
 
+_escape_chars = {
+    'a': '\a', 'b': '\b', 'f': '\f', 'n': '\n',
+    'r': '\r', 't': '\t', 'v': '\v',
+}
+_escape_re = re.compile(r'\\(x[0-9a-fA-F]{1,2}|\d{1,3}|.)')
+
+
+def _replace_escape(match):
+    esc = match.group(1)
+    if esc[0] == 'x' and len(esc) > 1:
+        return unichr(int(esc[1:], 16))
+    if esc.isdigit():
+        return unichr(int(esc))
+    return _escape_chars.get(esc, esc)
+
+
+def unescape(text):
+    """Process escape sequences in the body of a string literal"""
+    if isinstance(text, bytes):
+        if b'\\' not in text:
+            return text
+        ## Escapes give unicode characters: a byte string (from a
+        ## UTF-8 query) is decoded first
+        text = text.decode('utf-8')
+    elif '\\' not in text:
+        return text
+    return _escape_re.sub(_replace_escape, text)
+
+
 ##------------------------------------------------------------
 ## Numbers tokenization
 ##------------------------------------------------------------
@@ -193,27 +332,200 @@ def t_INTEGER(t):
     return t
 
 
+debug = True if os.environ.get('MONGOSQL_DEBUG') else False
+
 ##------------------------------------------------------------
-## Boolean/None
+## The PLY lexer is only built the first time it's needed
 ##------------------------------------------------------------
 
-def t_TRUE(t):
-    r'true'
-    t.value = True
-    return t
+_ply_lexer = None
+_ply_lexer_lock = threading.Lock()
 
 
-def t_FALSE(t):
-    r'false'
-    t.value = False
-    return t
+def get_ply_lexer():
+    global _ply_lexer
+    if _ply_lexer is None:
+        with _ply_lexer_lock:
+            if _ply_lexer is None:
+                _ply_lexer = lex.lex(
+                    module=sys.modules[__name__], debug=debug)
+    return _ply_lexer
 
 
-def t_NULL(t):
-    r'null'
-    t.value = None
-    return t
+class _LazyLexer(object):
+    """Stands for the PLY lexer object, building it on first use"""
 
+    def __getattr__(self, name):
+        return getattr(get_ply_lexer(), name)
 
-debug = True if os.environ.get('MONGOSQL_DEBUG') else False
-lexer = lex.lex(debug=debug)
+    def __iter__(self):
+        return iter(get_ply_lexer())
+
+
+## Shared lexer, kept for backwards compatibility: it holds the
+## scanning state, so it must not be used by more than one thread.
+lexer = _LazyLexer()
+
+
+def new_ply_lexer():
+    """
+    Return a new PLY lexer, with its own scanning state; the
+    (expensive to build) master regexes are shared by all copies.
+    """
+    return get_ply_lexer().clone()
+
+
+##------------------------------------------------------------
+## Fast tokenizer
+##
+## Produces the same token stream as the PLY lexer, but matches
+## everything in a single pass of one precompiled master regex,
+## instead of trying each token rule in turn.
+##------------------------------------------------------------
+
+class Token(object):
+    ## PLY sets .lexer on the offending token before calling p_error
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'lexer')
+
+    def __init__(self, type, value, lineno, lexpos):
+        self.type = type
+        self.value = value
+        self.lineno = lineno
+        self.lexpos = lexpos
+
+    def __repr__(self):
+        return 'LexToken({0},{1!r},{2},{3})'.format(
+            self.type, self.value, self.lineno, self.lexpos)
+
+
+_operator_types = dict((value, name) for name, value in token_symbols)
+
+## Same language as the string regexes above, but "unrolled"
+## so that runs of plain characters are matched in one go.
+_fast_string = r'''{q}[^{q}\\\n]*(?:\\(?:{e})[^{q}\\\n]*)*{q}'''
+_fast_escape = '|'.join((simple_escape, decimal_escape, hex_escape))
+
+## Whitespace is consumed along with the following token, to save
+## a round of the matching loop. Alternatives are sorted by how often
+## they are expected to show up; the only constraints are comments
+## and named parameters winning over the operators they start with,
+## and floats winning over integers.
+_master_re = re.compile('[{0}]*(?:{1})'.format(t_ignore, '|'.join(
+    '(?P<{0}>{1})'.format(name, regex) for name, regex in (
+        ('SYMBOL', symbol),
+        ('NAMED_PARAM', r':' + symbol),
+        ('COMMENT', t_COMMENT.regex),
+        ## Longest operators first, so that "==" wins over "="
+        ('OPERATOR', '|'.join(
+            re.escape(value) for value in
+            sorted(_operator_types, key=len, reverse=True))),
+        ('FLOAT', t_FLOAT.__doc__),
+        ('INTEGER', t_INTEGER.__doc__),
+        ('STRING', '|'.join((
+            _fast_string.format(q="'", e=_fast_escape),
+            _fast_string.format(q='"', e=_fast_escape)))),
+        ('newline', r'\n+'),
+        ('PARAM', r'\?'),
+        ('error', '.'),
+    )) + r'|\Z'))
+
+
+class FastLexer(object):
+    """
+    Drop-in replacement for the PLY lexer object:
+    supports ``input()``, ``token()`` and iteration.
+    """
+
+    def __init__(self):
+        self.lexdata = ''
+        self.lineno = 1
+        self._tokens = iter(())
+
+    def input(self, data):
+        self.lexdata = data
+        self.lineno = 1
+        self._tokens = self._tokenize(data)
+        ## Hot path: token() without a Python frame of its own
+        self.token = functools.partial(next, self._tokens, None)
+
+    def token(self):
+        return next(self._tokens, None)
+
+    def clone(self):
+        return FastLexer()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        tok = self.token()
+        if tok is None:
+            raise StopIteration
+        return tok
+
+    next = __next__  # Python 2
+
+    def _tokenize(self, data):
+        ## Hot loop: keep everything in local variables
+        param_index = 0
+        lineno = 1
+        get_keyword = keywords.get
+        operator_types = _operator_types
+
+        for match in _master_re.finditer(data):
+            kind = match.lastgroup
+            if kind is None:
+                continue  # Trailing whitespace
+
+            value = match.group(kind)
+            pos = match.start(kind)
+            if kind == 'SYMBOL':
+                keyword = get_keyword(value.upper())
+                if keyword is None:
+                    yield Token('SYMBOL', value, lineno, pos)
+                elif keyword[1] is _keep:
+                    yield Token(keyword[0], value, lineno, pos)
+                else:
+                    yield Token(keyword[0], keyword[1], lineno, pos)
+            elif kind == 'OPERATOR':
+                yield Token(operator_types[value], value, lineno, pos)
+            elif kind == 'INTEGER':
+                yield Token('INTEGER', int(value), lineno, pos)
+            elif kind == 'STRING':
+                yield Token('STRING', unescape(value[1:-1]), lineno, pos)
+            elif kind == 'FLOAT':
+                yield Token('FLOAT', float(value), lineno, pos)
+            elif kind == 'newline':
+                lineno += len(value)
+                self.lineno = lineno
+            elif kind == 'COMMENT':
+                continue
+            elif kind == 'PARAM':
+                yield Token('PARAM', param_index, lineno, pos)
+                param_index += 1
+            elif kind == 'NAMED_PARAM':
+                if _after_map_key(data, pos):
+                    ## Not a parameter: {key:value} map separator
+                    yield Token('COLON', ':', lineno, pos)
+                    for tok in self._tokenize(value[1:]):
+                        tok.lineno = lineno
+                        tok.lexpos += pos + 1
+                        yield tok
+                else:
+                    yield Token('NAMED_PARAM', value[1:], lineno, pos)
+            else:
+                raise LexerError("Unknown text {0!r}".format(data[pos:]))
+
+
+## Tokenizer used by default, either 'ply' or 'fast'
+default_tokenizer = os.environ.get('MONGOSQL_TOKENIZER', 'ply')
+
+
+def get_lexer(tokenizer=None):
+    """Return a new lexer object for the given tokenizer kind"""
+    tokenizer = tokenizer or default_tokenizer
+    if tokenizer == 'ply':
+        return new_ply_lexer()
+    if tokenizer == 'fast':
+        return FastLexer()
+    raise ValueError("Unknown tokenizer: {0!r}".format(tokenizer))
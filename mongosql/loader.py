@@ -0,0 +1,236 @@
+"""
+Streaming bulk loads from CSV or JSON Lines files: ``load()``, run
+by ``COPY <collection> FROM 'path' FORMAT csv|jsonl`` statements
+and ``MongoSqlDatabase.load()``.
+
+The file goes through a pipeline of generators: lines are read,
+parsed into documents (CSV rows are keyed on the header), their
+values converted, then grouped in chunks of ``chunk_size``
+documents. Chunks are inserted by a pool of ``workers`` threads,
+with ``insert_many()``: the reader waits while ``workers`` chunks
+are already queued, so at most ``2 * workers + 1`` chunks are in
+memory, however big the file.
+
+CSV values are converted by ``convert_value()``: integers, floats,
+``true`` / ``false`` and ``null`` get their type, empty values are
+left out of the document. ``types`` ({column: callable}) overrides
+that per column, for CSV and JSON Lines alike.
+"""
+
+import csv
+import io
+import json
+import re
+import sys
+import threading
+import time
+
+from six.moves.queue import Queue
+
+from mongosql.support import _chunks
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+## Python 2's csv module only reads bytes: lines are encoded to UTF-8
+## for it, and the values decoded back
+_csv_bytes = sys.version_info < (3,)
+
+_integer = re.compile(r'-?(0|[1-9][0-9]*)$')
+_float = re.compile(
+    r'-?(?=\.?[0-9])(0|[1-9][0-9]*)?(\.[0-9]+)?([eE][-+]?[0-9]+)?$')
+_constants = {'true': True, 'false': False, 'null': None}
+
+
+class LoadError(ValueError):
+    """A line of the file that can't be loaded"""
+
+    def __init__(self, message, line):
+        super(LoadError, self).__init__(
+            '{0} (line {1})'.format(message, line))
+        self.line = line
+
+
+class LoadProgress(object):
+    """
+    State of a load, passed to the ``progress`` callback after each
+    chunk is inserted: ``rows`` read from the file so far, documents
+    ``inserted``, ``chunks`` inserted and ``elapsed`` seconds.
+    """
+
+    __slots__ = ('rows', 'inserted', 'chunks', 'elapsed')
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.chunks = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        """Throughput: documents inserted per second"""
+        if not self.elapsed:
+            return 0.0
+        return self.inserted / self.elapsed
+
+    def __repr__(self):
+        return '<{0} {1} inserted, {2:.0f} rows/s>'.format(
+            self.__class__.__name__, self.inserted, self.rows_per_second)
+
+
+def convert_value(text):
+    """Type of a CSV value, from its text"""
+    if _integer.match(text):
+        return int(text)
+    if _float.match(text):
+        return float(text)
+    return _constants.get(text.lower(), text)
+
+
+def _lines(source):
+    """Lines of ``source``: a path, or a file object (or any iterable)"""
+    if not isinstance(source, basestring):
+        for line in source:
+            yield line
+        return
+    with io.open(source, encoding='utf-8', newline='') as f:
+        for line in f:
+            yield line
+
+
+def _encoded(lines):
+    for line in lines:
+        if isinstance(line, unicode):
+            line = line.encode('utf-8')
+        yield line
+
+
+def _read_csv(lines, delimiter=',', columns=None, types=None):
+    if _csv_bytes:
+        lines = _encoded(lines)
+        delimiter = str(delimiter)
+    reader = csv.reader(lines, delimiter=delimiter)
+    if columns is None:
+        columns = next(reader, None)
+        if columns is None:
+            return
+        if _csv_bytes:
+            columns = [name.decode('utf-8') for name in columns]
+    types = types or {}
+    for row in reader:
+        if not row:
+            continue
+        if _csv_bytes:
+            row = [text.decode('utf-8') for text in row]
+        if len(row) > len(columns):
+            raise LoadError('{0} values, for {1} columns'.format(
+                len(row), len(columns)), reader.line_num)
+        document = {}
+        for name, text in zip(columns, row):
+            if text == '':
+                continue
+            try:
+                document[name] = types.get(name, convert_value)(text)
+            except ValueError as e:
+                raise LoadError('{0}: {1}'.format(name, e), reader.line_num)
+        yield document
+
+
+def _read_jsonl(lines, types=None):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            document = json.loads(line)
+            if not isinstance(document, dict):
+                raise ValueError('not an object')
+            for name, convert in (types or {}).iteritems():
+                if document.get(name) is not None:
+                    document[name] = convert(document[name])
+        except ValueError as e:
+            raise LoadError(str(e), number)
+        yield document
+
+
+def read(source, format='csv', delimiter=',', columns=None, types=None):
+    """
+    Documents in ``source`` (a path or a file object), read lazily.
+
+    For CSV, ``columns`` are the field names when the file has no
+    header row.
+    """
+    if format == 'csv':
+        return _read_csv(_lines(source), delimiter, columns, types)
+    if format == 'jsonl':
+        return _read_jsonl(_lines(source), types)
+    raise ValueError("Unknown format: {0!r}".format(format))
+
+
+def load(db, collection, source, format='csv', chunk_size=1000, workers=4,
+         ordered=False, bypass_document_validation=False, progress=None,
+         **kwargs):
+    """
+    Insert the documents in ``source`` (see ``read()``, which gets
+    the other keyword arguments) into ``db[collection]``; returns
+    ``{'inserted': n}``.
+
+    ``progress(state)`` is called with a ``LoadProgress`` after each
+    chunk, from the writer threads, one call at a time. ``ordered``
+    inserts the chunks in order, on a single thread, stopping at the
+    first error. Otherwise the first error stops the load as well,
+    but chunks already sent by the other threads go on.
+    """
+    if chunk_size < 1 or workers < 1:
+        raise ValueError("Invalid chunk_size / workers")
+    if ordered:
+        workers = 1
+    insert_kwargs = {'ordered': bool(ordered)}
+    if bypass_document_validation:
+        insert_kwargs['bypass_document_validation'] = True
+    target = db[collection]
+    state = LoadProgress()
+    lock = threading.Lock()
+    errors = []
+    pending = Queue(maxsize=workers)  # The backpressure
+    start = _timer()
+
+    def counted(documents):
+        for document in documents:
+            state.rows += 1
+            yield document
+
+    def write():
+        while True:
+            chunk = pending.get()
+            if chunk is None:
+                return
+            if errors:
+                continue  # Draining the queue
+            try:
+                result = target.insert_many(chunk, **insert_kwargs)
+                with lock:
+                    state.inserted += len(result.inserted_ids)
+                    state.chunks += 1
+                    state.elapsed = _timer() - start
+                    if progress is not None:
+                        progress(state)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(workers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    try:
+        documents = counted(read(source, format, **kwargs))
+        for chunk in _chunks(documents, chunk_size):
+            if errors:
+                break
+            pending.put(chunk)
+    finally:
+        for _ in threads:
+            pending.put(None)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    return {'inserted': state.inserted}
@@ -0,0 +1,173 @@
+"""
+Text-level query normalization, straight from the token stream.
+
+``normalize(query)`` returns the canonical text of a query: values
+(literals and parameters) are replaced by ``?``, lists of values by a
+single ``[?]``, keywords are uppercased and ``SORT`` / ``ORDER BY``
+spelled the same way; whitespace and comments are gone. Strings
+starting with ``$`` are field paths, not values, and are kept::
+
+    >>> normalize("select * from c -- recent\\n where a IN [1, 2] sort t")
+    'SELECT * FROM c WHERE a IN [?] ORDER BY t'
+
+The operands of AND / OR are sorted, as they commute::
+
+    >>> normalize("SELECT * FROM c WHERE c == 1 OR b == 2 AND a == 3")
+    'SELECT * FROM c WHERE a == ? AND b == ? OR c == ?'
+
+``fingerprint(query)`` is a stable hash of it: the same in every
+process, for grouping statistics and spotting hot queries.
+
+Nothing is parsed, so this is cheaper than the ``fingerprint()`` of
+parsed queries (see ``mongosql.support.shape()``): operands are told
+apart by the operators of lower precedence than OR around them (and
+brackets). Results are kept in ``fingerprint_cache``.
+"""
+
+import json
+import os
+
+from mongosql import lexer
+from mongosql.cache import LRUCache
+from mongosql.lexer import get_lexer, reserved
+from mongosql.support import digest
+
+## Normalized queries, keyed on the query text and tokenizer
+fingerprint_cache = LRUCache(
+    maxsize=int(os.environ.get('MONGOSQL_PARSE_CACHE_SIZE', 512)))
+
+_values = frozenset([
+    'STRING', 'INTEGER', 'FLOAT', 'TRUE', 'FALSE', 'NULL', 'PARAM',
+    'NAMED_PARAM'])
+
+## Tokens after which a minus is an operator, not a sign
+_operands = frozenset(['VALUE', 'SYMBOL', 'RPAREN', 'RBRACKET', 'RBRACE'])
+
+_openings = frozenset(['LPAREN', 'LBRACKET', 'LBRACE'])
+_closings = frozenset(['RPAREN', 'RBRACKET', 'RBRACE'])
+
+## No space before these
+_tight = _closings | frozenset(['COMMA', 'COLON'])
+
+_keywords = frozenset(reserved)
+
+## Tokens ending the operands of AND / OR: everything of lower
+## precedence than OR, clauses included
+_separators = (
+    (_keywords - frozenset(['AND', 'OR', 'NOT', 'IN'])) |
+    frozenset(['COMMA', 'COLON', 'EQUAL', 'SEMICOLON']))
+
+
+def _canonical(tokens):
+    """``[(type, text)]`` of the canonical tokens"""
+    result, brackets, value = [], [], None
+    for tok in tokens:
+        kind = tok.type
+        previous = result[-1][0] if result else None
+        if (kind == 'COLON' and previous == 'VALUE' and
+                brackets[-1:] == ['LBRACE']):
+            ## Not a value, but the key of a {"key": value} map
+            result[-1] = ('STRING', json.dumps(value.value))
+        if kind == 'STRING' and previous == 'UNWIND':
+            result.append(('SYMBOL', tok.value.lstrip('$')))
+        elif kind == 'STRING' and tok.value.startswith('$'):
+            ## Field paths, in aggregation expressions
+            result.append(('STRING', json.dumps(tok.value)))
+        elif kind in _values:
+            value = tok
+            if previous == 'MINUS' and (
+                    len(result) < 2 or result[-2][0] not in _operands):
+                result.pop()  # -1 is a value as well
+            if (brackets[-1:] == ['LBRACKET'] and
+                    [k for k, _ in result[-2:]] == ['VALUE', 'COMMA']):
+                result.pop()  # [?, ?, ?] -> [?]
+                continue
+            result.append(('VALUE', '?'))
+        elif kind in ('SORT', 'ORDER'):
+            result.append(('ORDER', 'ORDER BY'))
+        elif kind == 'BY' and previous == 'ORDER':
+            continue
+        elif kind == 'SEMICOLON':
+            continue
+        else:
+            if kind in _openings:
+                brackets.append(kind)
+            elif kind in _closings and brackets:
+                brackets.pop()
+            result.append((kind, kind if kind in _keywords else tok.value))
+    return result
+
+
+def _sorted_operands(terms):
+    """Tokens of the ``[[operand]]`` ORed, after sorting them"""
+    terms = [sorted(factors, key=lambda f: [t for _, t in f])
+             for factors in terms]
+    terms = [sum(_joined(factors, 'AND'), []) for factors in terms]
+    terms.sort(key=lambda f: [t for _, t in f])
+    return sum(_joined(terms, 'OR'), [])
+
+
+def _joined(operands, operator):
+    for i, operand in enumerate(operands):
+        if i:
+            yield [(operator, operator)]
+        yield operand
+
+
+def _sort_operands(tokens, position=0, nested=False):
+    """
+    Canonical tokens from ``position`` to the end, or to the closing
+    bracket if ``nested``, with the AND / OR operands sorted; and the
+    position of that bracket.
+    """
+    result, terms = [], [[[]]]
+    while position < len(tokens):
+        tok = tokens[position]
+        kind = tok[0]
+        if kind in _closings and nested:
+            break
+        if kind in _openings:
+            inside, position = _sort_operands(tokens, position + 1, True)
+            terms[-1][-1].append(tok)
+            terms[-1][-1].extend(inside)
+            if position < len(tokens):
+                terms[-1][-1].append(tokens[position])
+        elif kind == 'AND':
+            terms[-1].append([])
+        elif kind == 'OR':
+            terms.append([[]])
+        elif kind in _separators or kind in _closings:
+            result.extend(_sorted_operands(terms))
+            result.append(tok)
+            terms = [[[]]]
+        else:
+            terms[-1][-1].append(tok)
+        position += 1
+    result.extend(_sorted_operands(terms))
+    return result, position
+
+
+def normalize(query, tokenizer=None):
+    """Canonical text of a query, see the module docstring"""
+    lex = get_lexer(tokenizer)
+    lex.input(query)
+    words, previous = [], None
+    tokens, _ = _sort_operands(_canonical(iter(lex.token, None)))
+    for kind, text in tokens:
+        if (previous is not None and kind not in _tight and
+                previous not in _openings and
+                not (kind == 'LPAREN' and previous == 'SYMBOL')):
+            words.append(' ')
+        words.append(text)
+        previous = kind
+    return ''.join(words)
+
+
+def fingerprint(query, tokenizer=None):
+    """Stable hash of the normalized query"""
+    key = (query, tokenizer or lexer.default_tokenizer)
+    result = fingerprint_cache.get(key)
+    if result is None:
+        result = digest(normalize(query, tokenizer))
+        fingerprint_cache.put(key, result)
+    return result
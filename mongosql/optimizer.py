@@ -0,0 +1,717 @@
+"""
+Logical optimizer for MongoSQL queries.
+
+Rewrites the expression tree of a parsed query, between parsing and
+``to_mongo()``, so that the resulting spec is simpler for the MongoDB
+query planner (ideally, a single index scan)::
+
+    a == 1 OR a == 2 OR a == 3      ->  {'a': {'$in': [1, 2, 3]}}
+    x > 5 AND x < 10 AND y == 1     ->  {'x': {'$gt': 5, '$lt': 10}, 'y': 1}
+
+Each rule can be turned on / off on its own:
+
+``constant_folding``
+    Compute arithmetic on literal numbers (``1 + 2 * 3`` -> ``7``),
+    with the same semantics as MongoDB's ``$add``, ``$mod``, ..
+
+``negation``
+    ``NOT NOT x`` -> ``x``, ``NOT a == 1`` -> ``a != 1`` (and back).
+
+``flatten``
+    Merge nested ANDs / ORs and drop duplicated conditions.
+
+``or_to_in``
+    ``a == 1 OR a IN [2, 3]`` -> ``a IN [1, 2, 3]``;
+    ``a IN [1]`` -> ``a == 1``.
+
+``merge_ranges``
+    Keep only the tightest bound on each side of a range
+    (``x > 1 AND x >= 5`` -> ``x >= 5``), and drop ranges implied
+    by an equality (``x == 7 AND x > 5`` -> ``x == 7``).
+
+``contradictions``
+    Drop literal ``true`` / ``false`` terms, and spot conditions
+    that can never / always hold: ``x AND NOT x``, ``a == 1 AND
+    a != 1``, ``x OR NOT x``, ``a IN []``..
+
+``range_contradictions``
+    Also consider ``x > 10 AND x < 5`` or ``a == 1 AND a == 2`` as
+    contradictions.  **Off by default**: on arrays these do match
+    (``{x: [1, 20]}``), as each condition can hold on a different
+    element.
+
+``implicit_and``
+    Render ANDs as a single document (see ``support.Conjunction``)
+    instead of an explicit ``$and``.
+
+In aggregation pipelines, ``MATCH`` conditions get the same rewrites
+as ``WHERE`` ones; in the other stages, where logical operators work
+on values rather than on documents, only ``constant_folding`` applies.
+Then stages are reordered, to reduce the documents flowing through
+each one:
+
+``match_pushdown``
+    Move ``$match`` before ``$project``, ``$unwind`` and ``$sort``,
+    when it only looks at fields they pass through unchanged.
+
+``merge_stages``
+    Merge adjacent ``$match`` stages, ``$project`` stages (when the
+    second one only keeps fields of the first one), ``$limit`` and
+    ``$skip`` stages.
+
+``sort_limit``
+    ``$skip n, $limit m`` -> ``$limit n + m, $skip n``, so that with
+    ``limit_pushdown`` a ``$sort`` gets followed by a ``$limit``, and
+    only has to keep the top ``n + m`` documents.
+
+``limit_pushdown``
+    Move ``$limit`` and ``$skip`` before ``$project``, which doesn't
+    change the number of documents.
+"""
+
+import math
+
+from mongosql.support import (
+    AggregateCmdGroup, AggregateCmdLimit, AggregateCmdMatch,
+    AggregateCmdProject, AggregateCmdSkip, AggregateCmdSort,
+    AggregateCmdUnwind, AggregateOperation, Comparison, Conjunction,
+    ExplainOperation, ExportOperation, FunctionCall, LogicalAnd, LogicalNot,
+    LogicalOr, Map, MatchNothing, NamedExpression, Operation, SelectOperation,
+    Symbol, WriteOperation)
+
+
+RULES = (
+    'constant_folding',
+    'negation',
+    'flatten',
+    'or_to_in',
+    'merge_ranges',
+    'contradictions',
+    'range_contradictions',
+    'implicit_and',
+    'match_pushdown',
+    'merge_stages',
+    'sort_limit',
+    'limit_pushdown',
+)
+
+default_rules = frozenset(RULES) - frozenset(['range_contradictions'])
+
+_range_rules = frozenset(['merge_ranges', 'range_contradictions'])
+
+
+def get_rules(rules):
+    """
+    Normalize a rules selection: ``True`` means the default rules,
+    ``False`` / ``None`` no optimization at all (returns None).
+    """
+    if rules is None or rules is False:
+        return None
+    if rules is True:
+        return default_rules
+    rules = frozenset(rules)
+    unknown = rules - frozenset(RULES)
+    if unknown:
+        raise ValueError("Unknown optimizer rules: {0}".format(
+            ', '.join(sorted(unknown))))
+    return rules
+
+
+##------------------------------------------------------------
+## Helpers
+##------------------------------------------------------------
+
+_string_types = (str, unicode)
+_number_types = (int, long, float)
+_scalar_types = _string_types + _number_types + (bool, type(None))
+
+## MongoDB integers are 64 bit at most
+_int_range = (-2 ** 63, 2 ** 63 - 1)
+
+_negated = {'==': '!=', '!=': '=='}
+_lower_bounds = ('>', '>=')
+_upper_bounds = ('<', '<=')
+_bounds = _lower_bounds + _upper_bounds
+
+
+def _is_scalar(value):
+    return type(value) in _scalar_types
+
+
+def _is_number(value):
+    return type(value) in _number_types
+
+
+def _bracket(value):
+    """
+    Type bracket of a value: range conditions only match values of
+    the same one, and only numbers and strings are ordered here.
+    """
+    if _is_number(value):
+        return 'number'
+    if isinstance(value, _string_types):
+        return 'string'
+    return None
+
+
+def _comparable(first, second):
+    bracket = _bracket(first)
+    return bracket is not None and bracket == _bracket(second)
+
+
+def _holds(value, operator, bound):
+    """Whether ``value <operator> bound``, for comparable values"""
+    if operator == '>':
+        return value > bound
+    if operator == '>=':
+        return value >= bound
+    if operator == '<':
+        return value < bound
+    return value <= bound
+
+
+def _field_condition(expr):
+    """``(field, operator, value)`` for field comparisons, or None"""
+    if isinstance(expr, Comparison) and isinstance(expr.first, Symbol):
+        return expr.first.name, expr.operator, expr.second
+    return None
+
+
+def key(obj):
+    """Hashable structural key: equal keys mean equivalent objects"""
+    if isinstance(obj, Symbol):
+        return ('symbol', obj.name)
+    if isinstance(obj, LogicalNot):
+        return ('not', key(obj._expression))
+    if isinstance(obj, (LogicalAnd, LogicalOr)):
+        ## Conjunctions are just a different rendering of an AND
+        name = 'and' if isinstance(obj, LogicalAnd) else 'or'
+        return (name, tuple(key(e) for e in obj._expressions))
+    if isinstance(obj, (Operation, Comparison)):
+        return (type(obj).__name__, obj.operator,
+                key(obj.first), key(obj.second))
+    if isinstance(obj, FunctionCall):
+        return ('call', obj.function, tuple(key(a) for a in obj.args))
+    if isinstance(obj, dict):
+        return ('map', tuple(sorted((k, key(v)) for k, v in obj.items())))
+    if isinstance(obj, list):
+        return ('list', tuple(key(x) for x in obj))
+    if isinstance(obj, bool):
+        return ('bool', obj)  # true is not 1, for MongoDB
+    if _is_scalar(obj):
+        return ('scalar', obj)
+    return (type(obj).__name__, getattr(obj, 'key', id(obj)))
+
+
+def _unique(items):
+    seen, result = set(), []
+    for item in items:
+        item_key = key(item)
+        if item_key not in seen:
+            seen.add(item_key)
+            result.append(item)
+    return result
+
+
+##------------------------------------------------------------
+## Constant folding
+##------------------------------------------------------------
+
+def _fold_mod(first, second):
+    ## Same as $mod: the result has the sign of the dividend
+    if isinstance(first, float) or isinstance(second, float):
+        return math.fmod(first, second)
+    result = abs(first) % abs(second)
+    return -result if first < 0 else result
+
+
+def _fold(operator, first, second):
+    """Result of a literal arithmetic operation, or None"""
+    if operator == '+':
+        result = first + second
+    elif operator == '-':
+        result = first - second
+    elif operator == '*':
+        result = first * second
+    elif second == 0:
+        return None  # Leave division errors to the server
+    elif operator == '/':
+        result = float(first) / second  # $divide always returns a double
+    elif operator == '%':
+        result = _fold_mod(first, second)
+    else:
+        return None
+    if isinstance(result, float):
+        if math.isinf(result) or math.isnan(result):
+            return None
+    elif not _int_range[0] <= result <= _int_range[1]:
+        return None
+    return result
+
+
+##------------------------------------------------------------
+## Pipeline stages
+##------------------------------------------------------------
+
+def _is_count(value):
+    ## Parameters are only known at run time
+    return type(value) in (int, long)
+
+
+def _included(value):
+    return value is True or (type(value) in (int, long) and value == 1)
+
+
+def _excluded(value):
+    return value is False or (type(value) in (int, long) and value == 0)
+
+
+def _fields(expr):
+    """Names of all the fields a condition refers to"""
+    if isinstance(expr, Symbol):
+        return set([expr.name])
+    if isinstance(expr, LogicalNot):
+        return _fields(expr._expression)
+    if isinstance(expr, (LogicalAnd, LogicalOr)):
+        return set().union(*[_fields(e) for e in expr._expressions])
+    if isinstance(expr, (Operation, Comparison)):
+        return _fields(expr.first) | _fields(expr.second)
+    if isinstance(expr, FunctionCall):
+        return _fields(expr.args)
+    if isinstance(expr, dict):
+        return _fields(list(expr.values()))
+    if isinstance(expr, list):
+        return set().union(*[_fields(x) for x in expr])
+    return set()
+
+
+def _overlaps(name, path):
+    """Whether the ``name`` field is, contains or is part of ``path``"""
+    return (name == path or name.startswith(path + '.') or
+            path.startswith(name + '.'))
+
+
+def _inclusion(project):
+    """
+    Whether a $project is an inclusion one (keeping only the listed
+    fields), rather than an exclusion one (dropping them).
+    """
+    return any(not _excluded(item.expression)
+               for item in project._args if item.name != '_id')
+
+
+def _passes_through(stage, fields):
+    """Whether ``stage`` leaves ``fields`` unchanged"""
+    stage_type = type(stage)
+    if stage_type is AggregateCmdSort:
+        return True
+    if stage_type is AggregateCmdUnwind:
+        return not any(_overlaps(name, stage.path) for name in fields)
+    if stage_type is not AggregateCmdProject:
+        return False
+
+    items = dict((item.name, item.expression) for item in stage._args)
+    inclusion = _inclusion(stage)
+    for name in fields:
+        if name == '_id' or name.startswith('_id.'):
+            if '_id' in items and not _included(items['_id']):
+                return False
+            continue
+        related = [path for path in items if _overlaps(name, path)]
+        if inclusion:
+            ## Must be within a field that is kept as it is
+            if not any(name == path or name.startswith(path + '.')
+                       for path in related):
+                return False
+            if not all(_included(items[path]) for path in related):
+                return False
+        elif related:
+            return False
+    return True
+
+
+def _merge_projects(first, second):
+    """
+    A single $project doing the same as two consecutive ones, or
+    None: only if the second one just keeps fields of the first one.
+    """
+    if not _inclusion(first):
+        return None
+    items = dict((item.name, item) for item in first._args)
+    id_item = items.get('_id')
+    args = []
+    for item in second._args:
+        if item.name == '_id':
+            if _excluded(item.expression):
+                id_item = item
+            elif not _included(item.expression):
+                return None
+        elif _included(item.expression) and item.name in items:
+            args.append(items[item.name])
+        else:
+            return None
+    if not any(item.name != '_id' for item in second._args):
+        ## Only excluding _id: everything else is kept
+        args = [item for item in first._args if item.name != '_id']
+    if id_item is not None:
+        args.insert(0, id_item)
+    return AggregateCmdProject(args)
+
+
+##------------------------------------------------------------
+## The optimizer
+##------------------------------------------------------------
+
+class Optimizer(object):
+    """
+    Rewrites expression trees according to a set of ``rules``
+    (the default ones, if not specified).
+    """
+
+    def __init__(self, rules=None):
+        if rules is None:
+            rules = default_rules
+        self.rules = get_rules(rules) or frozenset()
+
+    def optimize(self, obj):
+        """
+        Return an optimized copy of a parsed query, be it an
+        operation or a bare expression; the original is unchanged.
+        """
+        if isinstance(obj, SelectOperation):
+            other = obj.clone()
+            if obj.query is not None:
+                other.query = self.optimize_query(obj.query)
+            return other
+        if isinstance(obj, WriteOperation):
+            other = obj.clone()
+            if getattr(obj, 'query', None) is not None:  # UPDATE, DELETE
+                other.query = self.optimize_query(obj.query)
+            return other
+        if isinstance(obj, AggregateOperation):
+            other = obj.clone()
+            other.pipeline = self.optimize_pipeline(obj.pipeline)
+            return other
+        if isinstance(obj, (ExplainOperation, ExportOperation)):
+            other = obj.clone()
+            other.operation = self.optimize(obj.operation)
+            return other
+        return self.optimize_query(obj)
+
+    def optimize_query(self, expr):
+        """
+        Optimize a query condition; returns None if it always holds
+        (no condition at all), ``MatchNothing`` if it never does.
+        """
+        expr = self.rewrite(expr)
+        if 'implicit_and' in self.rules:
+            expr = self._conjunctions(expr)
+        if expr is True:
+            return None
+        if expr is False:
+            return MatchNothing()
+        return expr
+
+    ##------------------------------------------------------------
+    ## Aggregation pipelines
+
+    def optimize_pipeline(self, pipeline):
+        """Return an optimized copy of a list of pipeline stages"""
+        stages = [self._stage(s) for s in pipeline]
+        stages = [s for s in stages if s is not None]
+        changed = True
+        while changed:
+            changed = False
+            for i in range(len(stages) - 1):
+                replacement = self._reorder(stages[i], stages[i + 1])
+                if replacement is not None:
+                    stages[i:i + 2] = replacement
+                    changed = True
+                    break
+        return stages
+
+    def _stage(self, stage):
+        """Optimize a single stage; None if it can be dropped"""
+        if isinstance(stage, AggregateCmdMatch):
+            query = self.optimize_query(stage.query)
+            if query is None:
+                return None
+            return AggregateCmdMatch(query)
+        if isinstance(stage, AggregateCmdGroup):
+            return AggregateCmdGroup(
+                self._fold_args(stage._args), key=self.fold(stage.key))
+        if isinstance(stage, AggregateCmdProject):  # Also $geoNear
+            return stage.__class__(self._fold_args(stage._args))
+        return stage
+
+    def _fold_args(self, args):
+        return [item._replace(expression=self.fold(item.expression))
+                for item in args]
+
+    def _reorder(self, first, second):
+        """
+        Replacement for two adjacent stages,
+        or None if they're fine as they are.
+        """
+        rules = self.rules
+        first_type, second_type = type(first), type(second)
+
+        if 'merge_stages' in rules and first_type is second_type:
+            if first_type is AggregateCmdMatch:
+                query = self.optimize_query(
+                    LogicalAnd(first.query, second.query))
+                return [] if query is None else [AggregateCmdMatch(query)]
+            if first_type is AggregateCmdProject:
+                merged = _merge_projects(first, second)
+                if merged is not None:
+                    return [merged]
+            if (first_type in (AggregateCmdLimit, AggregateCmdSkip) and
+                    _is_count(first.value) and _is_count(second.value)):
+                if first_type is AggregateCmdLimit:
+                    return [AggregateCmdLimit(min(first.value, second.value))]
+                return [AggregateCmdSkip(first.value + second.value)]
+
+        if ('match_pushdown' in rules and
+                second_type is AggregateCmdMatch and
+                _passes_through(first, _fields(second.query))):
+            return [second, first]
+
+        if ('sort_limit' in rules and
+                first_type is AggregateCmdSkip and
+                second_type is AggregateCmdLimit and
+                _is_count(first.value) and _is_count(second.value)):
+            return [AggregateCmdLimit(first.value + second.value), first]
+
+        if ('limit_pushdown' in rules and
+                first_type is AggregateCmdProject and
+                second_type in (AggregateCmdLimit, AggregateCmdSkip)):
+            return [second, first]
+
+        return None
+
+    ##------------------------------------------------------------
+    ## Values: constant folding only
+
+    def fold(self, value):
+        if 'constant_folding' not in self.rules:
+            return value
+        if isinstance(value, Operation):
+            first, second = self.fold(value.first), self.fold(value.second)
+            if _is_number(first) and _is_number(second):
+                result = _fold(value.operator, first, second)
+                if result is not None:
+                    return result
+            if first is value.first and second is value.second:
+                return value
+            return Operation(first, value.operator, second)
+        if isinstance(value, FunctionCall):
+            return FunctionCall(value.function, self.fold(value.args))
+        if isinstance(value, Map):
+            return Map((k, self.fold(v)) for k, v in value.iteritems())
+        if isinstance(value, NamedExpression):
+            return NamedExpression(value.name, self.fold(value.expression))
+        if isinstance(value, list):
+            return [self.fold(x) for x in value]
+        return value
+
+    ##------------------------------------------------------------
+    ## Conditions; True / False stand for the literal conditions
+
+    def rewrite(self, expr):
+        if isinstance(expr, LogicalAnd):
+            return self._and([self.rewrite(e) for e in expr._expressions])
+        if isinstance(expr, LogicalOr):
+            return self._or([self.rewrite(e) for e in expr._expressions])
+        if isinstance(expr, LogicalNot):
+            return self._not(self.rewrite(expr._expression))
+        if isinstance(expr, Comparison):
+            return self._comparison(Comparison(
+                self.fold(expr.first), expr.operator,
+                self.fold(expr.second)))
+        return self.fold(expr)
+
+    def _comparison(self, expr):
+        if 'or_to_in' in self.rules and expr.operator == 'IN':
+            values = expr.second
+            if (isinstance(values, list) and len(values) == 1 and
+                    _is_scalar(values[0])):
+                return Comparison(expr.first, '==', values[0])
+        if ('contradictions' in self.rules and expr.operator == 'IN' and
+                isinstance(expr.first, Symbol) and expr.second == []):
+            return False
+        return expr
+
+    def _not(self, expr):
+        if 'negation' not in self.rules:
+            return LogicalNot(expr)
+        if isinstance(expr, LogicalNot):
+            return expr._expression
+        if isinstance(expr, bool):
+            return not expr
+        condition = _field_condition(expr)
+        if (condition is not None and condition[1] in _negated and
+                _is_scalar(condition[2])):
+            return Comparison(
+                expr.first, _negated[condition[1]], expr.second)
+        return LogicalNot(expr)
+
+    def _and(self, terms):
+        if 'flatten' in self.rules:
+            terms = _unique(self._flatten(terms, LogicalAnd))
+        if 'contradictions' in self.rules:
+            if any(t is False for t in terms):
+                return False
+            terms = [t for t in terms if t is not True]
+            if self._complementary(terms):
+                return False
+        if self.rules & _range_rules:
+            merged = self._merge_ranges(terms)
+            if merged is False:
+                return False
+            if 'merge_ranges' in self.rules:
+                terms = merged
+        if not terms:
+            return True
+        if len(terms) == 1:
+            return terms[0]
+        return LogicalAnd(*terms)
+
+    def _or(self, terms):
+        if 'flatten' in self.rules:
+            terms = _unique(self._flatten(terms, LogicalOr))
+        if 'contradictions' in self.rules:
+            if any(t is True for t in terms):
+                return True
+            terms = [t for t in terms if t is not False]
+            if self._complementary(terms):
+                return True
+        if 'or_to_in' in self.rules:
+            terms = self._or_to_in(terms)
+        if not terms:
+            return False
+        if len(terms) == 1:
+            return terms[0]
+        return LogicalOr(*terms)
+
+    def _flatten(self, terms, cls):
+        result = []
+        for term in terms:
+            if isinstance(term, cls):
+                result.extend(term._expressions)
+            else:
+                result.append(term)
+        return result
+
+    def _complementary(self, terms):
+        """
+        Whether some term is the negation of another one: the
+        AND of them never holds, the OR of them always does.
+        """
+        keys = set(key(t) for t in terms)
+        for term in terms:
+            if isinstance(term, LogicalNot):
+                if key(term._expression) in keys:
+                    return True
+            condition = _field_condition(term)
+            if (condition is not None and condition[1] == '==' and
+                    _is_scalar(condition[2])):
+                negated = Comparison(term.first, '!=', term.second)
+                if key(negated) in keys:
+                    return True
+        return False
+
+    def _or_to_in(self, terms):
+        values, positions, result = {}, {}, []
+        for term in terms:
+            condition = _field_condition(term)
+            if condition is not None:
+                name, operator, value = condition
+                if operator == '==' and _is_scalar(value):
+                    value = [value]
+                elif not (operator == 'IN' and isinstance(value, list) and
+                          all(_is_scalar(v) for v in value)):
+                    value = None
+                if value is not None:
+                    if name not in values:
+                        values[name] = []
+                        positions[name] = len(result)
+                        result.append(term)
+                    values[name].extend(value)
+                    continue
+            result.append(term)
+
+        for name, position in positions.items():
+            merged = _unique(values[name])
+            first = result[position].first
+            if len(merged) == 1:
+                result[position] = Comparison(first, '==', merged[0])
+            else:
+                result[position] = Comparison(first, 'IN', merged)
+        return result
+
+    def _merge_ranges(self, terms):
+        ## Tightest lower / upper bound on each (field, type bracket),
+        ## and the literal value each field must be equal to.
+        lower, upper, equal = {}, {}, {}
+        for term in terms:
+            condition = _field_condition(term)
+            if condition is None or not _is_scalar(condition[2]):
+                continue
+            name, operator, value = condition
+            if operator == '==':
+                if (name in equal and key(equal[name]) != key(value) and
+                        'range_contradictions' in self.rules):
+                    return False
+                equal.setdefault(name, value)
+            elif operator in _bounds and _bracket(value) is not None:
+                bounds = lower if operator in _lower_bounds else upper
+                best = bounds.get((name, _bracket(value)))
+                if best is None or not _holds(best.second, operator, value):
+                    bounds[name, _bracket(value)] = term
+
+        if 'range_contradictions' in self.rules:
+            for name in set(lower) & set(upper):
+                low, high = lower[name], upper[name]
+                if not (_holds(low.second, high.operator, high.second) and
+                        _holds(high.second, low.operator, low.second)):
+                    return False
+
+        result = []
+        for term in terms:
+            condition = _field_condition(term)
+            if (condition is None or condition[1] not in _bounds or
+                    _bracket(condition[2]) is None):
+                result.append(term)
+                continue
+            name, operator, value = condition
+            bounds = lower if operator in _lower_bounds else upper
+            if bounds[name, _bracket(value)] is not term:
+                continue  # There's a tighter bound
+            if name in equal and _comparable(equal[name], value):
+                if _holds(equal[name], operator, value):
+                    continue  # Implied by the equality
+                if 'range_contradictions' in self.rules:
+                    return False
+            result.append(term)
+        return result
+
+    ##------------------------------------------------------------
+    ## Implicit conjunctions
+
+    def _conjunctions(self, expr):
+        if isinstance(expr, LogicalAnd):
+            terms = self._flatten(
+                [self._conjunctions(e) for e in expr._expressions],
+                LogicalAnd)
+            return Conjunction(*terms)
+        if isinstance(expr, LogicalOr):
+            return LogicalOr(*[
+                self._conjunctions(e) for e in expr._expressions])
+        if isinstance(expr, LogicalNot):
+            return LogicalNot(self._conjunctions(expr._expression))
+        return expr
+
+
+def optimize(obj, rules=None):
+    """Return an optimized copy of a parsed query, see ``Optimizer``"""
+    return Optimizer(rules).optimize(obj)
@@ -0,0 +1,144 @@
+"""
+Keyset ("seek") pagination.
+
+``SKIP n`` makes the server walk and discard ``n`` documents, so deep
+pages get slower and slower. Here each page starts right after the
+last document of the previous one, through a range condition on the
+sort keys: with ``ORDER BY a ASC, b DESC`` and a previous page ending
+on ``a = 1, b = 2, _id = 3`` the next page matches::
+
+    {'$or': [{'a': {'$gt': 1}},
+             {'a': 1, 'b': {'$lt': 2}},
+             {'a': 1, 'b': 2, '_id': {'$gt': 3}}]}
+
+``_id`` is appended to the sort keys as a tiebreaker, so that the order
+is total and no document is skipped or repeated. With an index on the
+sort keys, the cost of a page doesn't depend on its depth.
+
+The position is returned to the caller as an opaque token.
+
+Sort keys must be present, and of the same type, in all the documents:
+MongoDB range conditions only match values of the same type.
+"""
+
+import base64
+import binascii
+import json
+
+try:
+    from bson import json_util
+except ImportError:  # No pymongo: only JSON types in the sort keys
+    json_util = None
+
+from mongosql.support import apply_cursor_options
+
+_json_default = json_util.default if json_util is not None else None
+_json_object_hook = json_util.object_hook if json_util is not None else None
+
+
+def sort_keys(sort):
+    """``[(name, direction), ...]`` for a sort spec, ending on ``_id``"""
+    keys = list((sort or {}).items())
+    if '_id' not in (sort or {}):
+        keys.append(('_id', 1))
+    return keys
+
+
+def encode_token(keys, values):
+    payload = json.dumps(
+        [keys, values], separators=(',', ':'), default=_json_default)
+    token = base64.urlsafe_b64encode(payload.encode('utf-8'))
+    return token.decode('ascii').rstrip('=')
+
+
+def decode_token(token, keys):
+    """Values of the sort ``keys`` in ``token``"""
+    try:
+        padding = '=' * (-len(token) % 4)
+        payload = base64.urlsafe_b64decode((token + padding).encode('ascii'))
+        token_keys, values = json.loads(
+            payload.decode('utf-8'), object_hook=_json_object_hook)
+    except (TypeError, ValueError, UnicodeError, binascii.Error):
+        raise ValueError("Invalid page token: {0!r}".format(token))
+    if [tuple(k) for k in token_keys] != list(keys):
+        raise ValueError("The page token is for a different sort order")
+    return values
+
+
+def after_condition(keys, values):
+    """Condition matching the documents after ``values``, in order"""
+    conditions = []
+    for i, (name, direction) in enumerate(keys):
+        condition = {}
+        for (previous, _), value in zip(keys[:i], values):
+            if isinstance(value, dict):
+                value = {'$eq': value}
+            condition[previous] = value
+        condition[name] = {'$gt' if direction > 0 else '$lt': values[i]}
+        conditions.append(condition)
+    if len(conditions) == 1:
+        return conditions[0]
+    return {'$or': conditions}
+
+
+def _get_value(document, name):
+    value = document
+    for part in name.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            raise ValueError(
+                "Missing sort key {0!r} in document: {1!r}".format(
+                    name, document))
+        value = value[part]
+    return value
+
+
+def paginate(operation, db, token=None, page_size=None, params=None,
+             options=None):
+    """Run a page of the ``SelectOperation``, see its ``paginate()``"""
+    kwargs = operation.find_kwargs(params)
+    if 'skip' in kwargs:
+        raise ValueError("SKIP can't be used with keyset pagination")
+    if page_size is None:
+        page_size = kwargs.get('limit')
+    if not page_size or page_size < 0:
+        raise ValueError("Need a page size: pass page_size or use LIMIT")
+
+    keys = sort_keys(operation.sort)
+    kwargs['sort'] = keys
+    ## One more document, to know if there's a next page
+    kwargs['limit'] = page_size + 1
+
+    drop = ()
+    if 'projection' in kwargs:
+        ## The sort keys are needed for the token
+        fields = kwargs['projection']
+        added = [name for name, _ in keys
+                 if name != '_id' and name not in fields]
+        kwargs['projection'] = list(fields) + added
+        drop = (set(name.split('.')[0] for name in added) -
+                set(name.split('.')[0] for name in fields))
+
+    if token is not None:
+        condition = after_condition(keys, decode_token(token, keys))
+        spec = kwargs.get('filter')
+        if spec is None:
+            kwargs['filter'] = condition
+        else:
+            kwargs['filter'] = {'$and': [spec, condition]}
+
+    cursor = db[operation.collection].find(**kwargs)
+    options = operation._cursor_options(params, options)
+    if options:
+        cursor = apply_cursor_options(cursor, options)
+
+    documents = list(cursor)
+    next_token = None
+    if len(documents) > page_size:
+        del documents[page_size:]
+        last = documents[-1]
+        next_token = encode_token(
+            keys, [_get_value(last, name) for name, _ in keys])
+    for document in documents:
+        for name in drop:
+            document.pop(name, None)
+    return documents, next_token
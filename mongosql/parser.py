@@ -11,7 +11,7 @@ LIMIT {limit:INTEGER}
 SORT {sort:SORT_LIST}
 
 ->  db['{collection}'].find(
-        {condition}, fields={fields}, limit={limit},
+        filter={condition}, projection={fields}, limit={limit},
         skip={skip}, sort={sort})
 
 
@@ -19,8 +19,11 @@ SORT {sort:SORT_LIST}
 
 """
 
+import copy
 import os
-from collections import namedtuple
+import sys
+import threading
+from collections import OrderedDict, namedtuple
 
 import ply.yacc as yacc
 
@@ -28,15 +31,24 @@ from mongosql.lexer import lexer, tokens  # NOQA
 from mongosql.support import (
     Symbol, Map, SelectOperation, Expression, Operation, Comparison,
     LogicalAnd, LogicalOr, LogicalNot, FunctionCall, AggregateOperation,
-    AggregateCmdProject)
+    AggregateCmdProject, AggregateCmdMatch, AggregateCmdLimit,
+    AggregateCmdSkip, AggregateCmdUnwind, AggregateCmdGroup,
+    AggregateCmdSort, AggregateCmdGeoNear, ExplainOperation, Parameter,
+    InsertOperation, UpdateOperation, DeleteOperation, CopyOperation,
+    ExportOperation, copy_formats, export_formats)
+
+
+class ParserError(Exception):
+    pass
 
 
 def p_error(p):
-    raise Exception("Parser error!", p)
+    raise ParserError("Parser error!", p)
 
 
 ## Precedence rules
-## todo: we need to handle unary minus!
+## Operator tokens must be listed along with the %prec names used
+## by the rules, as conflicts are resolved against the lookahead token.
 precedence = (
     ('left', 'COMMA'),
     ('left', 'COLON'),
@@ -45,8 +57,8 @@ precedence = (
     ('left', 'AND'),
     ('left', 'NE', 'DBLEQUAL', 'IN'),
     ('left', 'GT', 'GTE', 'LT', 'LTE'),
-    ('left', 'SUM', 'SUBTRACT'),
-    ('left', 'TIMES', 'DIVIDE', 'MODULO'),
+    ('left', 'PLUS', 'MINUS', 'SUM', 'SUBTRACT'),
+    ('left', 'STAR', 'SLASH', 'PERCENT', 'TIMES', 'DIVIDE', 'MODULO'),
     ('right', 'NOT', 'UMINUS'),  # Unary operators
 )
 
@@ -71,6 +83,7 @@ def p_statement(p):
 
 def p_statement_semicolon(p):
     """statement : statement SEMICOLON"""
+    p[0] = p[1]
 
 
 def p_operation(p):
@@ -81,6 +94,41 @@ def p_operation(p):
     p[0] = p[1]
 
 
+def p_statement_explain(p):
+    """
+    statement : EXPLAIN operation
+              | EXPLAIN ANALYZE operation
+    """
+    p[0] = ExplainOperation(p[len(p) - 1], analyze=len(p) == 4)
+
+
+def p_statement_export(p):
+    """
+    statement : operation outfile
+              | operation outfile FORMAT SYMBOL
+    """
+    p[0] = ExportOperation(p[1], target=p[2], format=(
+        file_format(p[4], export_formats) if len(p) == 5 else None))
+
+
+def p_outfile(p):
+    """
+    outfile : INTO OUTFILE string
+            | INTO OUTFILE parameter
+    """
+    p[0] = p[3]
+
+
+def p_statement_write(p):
+    """
+    statement : operation_insert
+              | operation_update
+              | operation_delete
+              | operation_copy
+    """
+    p[0] = p[1]
+
+
 ##----------------------------------------------------------------------------
 ## Parsing of simple expressions
 ##
@@ -109,9 +157,14 @@ def p_expression_symbol(p):
     p[0] = Symbol(p[1])
 
 
+def p_expression_parameter(p):
+    """expression : parameter"""
+    p[0] = p[1]
+
+
 def p_expression_not(p):
     """expression : NOT expression"""
-    p[0] = LogicalNot(p[1])
+    p[0] = LogicalNot(p[2])
 
 
 def p_expression_logical_and(p):
@@ -227,6 +280,78 @@ def p_operation_aggregate_project(p):
     p[0].pipeline.append(AggregateCmdProject(p[3]))
 
 
+def p_operation_aggregate_match(p):
+    """
+    operation_aggregate : operation_aggregate MATCH expression
+    """
+    assert isinstance(p[3], Expression)
+    p[0] = p[1]
+    p[0].pipeline.append(AggregateCmdMatch(p[3]))
+
+
+def p_operation_aggregate_limit(p):
+    """
+    operation_aggregate : operation_aggregate LIMIT INTEGER
+                        | operation_aggregate LIMIT parameter
+    """
+    p[0] = p[1]
+    p[0].pipeline.append(AggregateCmdLimit(p[3]))
+
+
+def p_operation_aggregate_skip(p):
+    """
+    operation_aggregate : operation_aggregate SKIP INTEGER
+                        | operation_aggregate SKIP parameter
+    """
+    p[0] = p[1]
+    p[0].pipeline.append(AggregateCmdSkip(p[3]))
+
+
+def p_operation_aggregate_unwind(p):
+    """
+    operation_aggregate : operation_aggregate UNWIND SYMBOL
+                        | operation_aggregate UNWIND string
+    """
+    p[0] = p[1]
+    p[0].pipeline.append(AggregateCmdUnwind(p[3]))
+
+
+def p_operation_aggregate_group(p):
+    """
+    operation_aggregate : operation_aggregate GROUP assignment_list
+    """
+    assert all(isinstance(x, assignment) for x in p[3])
+    p[0] = p[1]
+    p[0].pipeline.append(AggregateCmdGroup(p[3]))
+
+
+def p_operation_aggregate_group_by(p):
+    """
+    operation_aggregate : operation_aggregate GROUP BY expression \
+                          COMMA assignment_list
+    """
+    assert all(isinstance(x, assignment) for x in p[6])
+    p[0] = p[1]
+    p[0].pipeline.append(AggregateCmdGroup(p[6], key=p[4]))
+
+
+def p_operation_aggregate_sort(p):
+    """
+    operation_aggregate : operation_aggregate sort_keyword sort_spec
+    """
+    p[0] = p[1]
+    p[0].pipeline.append(AggregateCmdSort(OrderedDict(p[3])))
+
+
+def p_operation_aggregate_geo_near(p):
+    """
+    operation_aggregate : operation_aggregate GEO_NEAR assignment_list
+    """
+    assert all(isinstance(x, assignment) for x in p[3])
+    p[0] = p[1]
+    p[0].pipeline.append(AggregateCmdGeoNear(p[3]))
+
+
 ##----------------------------------------------------------------------------
 ## The SELECT query:
 ##
@@ -254,18 +379,24 @@ def p_operation_select_condition(p):
 
 
 def p_operation_select_limit(p):
-    """operation_select : operation_select LIMIT INTEGER"""
+    """
+    operation_select : operation_select LIMIT INTEGER
+                     | operation_select LIMIT parameter
+    """
     p[0] = p[1]
     assert isinstance(p[0], SelectOperation)
-    assert isinstance(p[3], (int, long))
+    assert isinstance(p[3], (int, long, Parameter))
     p[0].limit = p[3]
 
 
 def p_operation_select_skip(p):
-    """operation_select : operation_select SKIP INTEGER"""
+    """
+    operation_select : operation_select SKIP INTEGER
+                     | operation_select SKIP parameter
+    """
     p[0] = p[1]
     assert isinstance(p[0], SelectOperation)
-    assert isinstance(p[3], (int, long))
+    assert isinstance(p[3], (int, long, Parameter))
     p[0].skip = p[3]
 
 
@@ -286,7 +417,145 @@ def p_operation_select_sort(p):
     p[0] = p[1]
     assert isinstance(p[0], SelectOperation)
     assert isinstance(p[3], (list, tuple))
-    p[0].sort = dict(p[3])
+    p[0].sort = OrderedDict(p[3])
+
+
+##----------------------------------------------------------------------------
+## Writes:
+##
+## INSERT INTO <collection> VALUES <map or parameter>, ...
+## UPDATE <collection> SET <assignment_list> WHERE <expression>
+## DELETE FROM <collection> WHERE <expression>
+##----------------------------------------------------------------------------
+
+def insert_values(values):
+    """Check the VALUES of an INSERT: documents, or parameters for them"""
+    for value in values:
+        if not isinstance(value, (Map, Parameter)):
+            raise ParserError("INSERT values must be maps: {0!r}".format(
+                value))
+    return values
+
+
+def p_operation_insert(p):
+    """operation_insert : INSERT INTO SYMBOL VALUES expression_list"""
+    p[0] = InsertOperation(collection=p[3], documents=insert_values(p[5]))
+
+
+def p_operation_update(p):
+    """operation_update : UPDATE SYMBOL SET assignment_list"""
+    assert all(isinstance(x, assignment) for x in p[4])
+    p[0] = UpdateOperation(collection=p[2], assignments=p[4])
+
+
+def p_operation_delete(p):
+    """operation_delete : DELETE FROM SYMBOL"""
+    p[0] = DeleteOperation(collection=p[3])
+
+
+def p_operation_write_condition(p):
+    """
+    operation_update : operation_update WHERE expression
+    operation_delete : operation_delete WHERE expression
+    """
+    p[0] = p[1]
+    assert isinstance(p[3], Expression)
+    p[0].query = p[3]
+
+
+##----------------------------------------------------------------------------
+## Bulk loads:
+##
+## COPY <collection> FROM <path or parameter> FORMAT csv|jsonl
+##----------------------------------------------------------------------------
+
+def file_format(name, formats):
+    """Check the FORMAT of a COPY, or INTO OUTFILE"""
+    if name.lower() not in formats:
+        raise ParserError("Unknown file format: {0}".format(name))
+    return name.lower()
+
+
+def p_operation_copy(p):
+    """
+    operation_copy : COPY SYMBOL FROM string FORMAT SYMBOL
+                   | COPY SYMBOL FROM parameter FORMAT SYMBOL
+    """
+    p[0] = CopyOperation(collection=p[2], source=p[4],
+                         format=file_format(p[6], copy_formats))
+
+
+##----------------------------------------------------------------------------
+## Options, for all the operations:
+##
+## WITH (batch_size = 1000, max_time_ms = 5000, hint = 'a_1', exhaust)
+##
+## A bare name sets a boolean option.
+##----------------------------------------------------------------------------
+
+def cursor_option(name, value):
+    """Return a (name, value) pair for a cursor option"""
+    return (name.lower(), value)
+
+
+def set_options(operation, options):
+    """Add the ``options`` of a WITH (...) clause to ``operation``"""
+    for name, _ in options:
+        if name not in operation.option_names:
+            raise ParserError("Unknown cursor option: {0}".format(name))
+    if operation.options is None:
+        operation.options = {}
+    operation.options.update(options)
+
+
+def p_operation_select_options(p):
+    """
+    operation_select : operation_select WITH LPAREN option_list RPAREN
+    """
+    p[0] = p[1]
+    assert isinstance(p[0], SelectOperation)
+    set_options(p[0], p[4])
+
+
+def p_operation_aggregate_options(p):
+    """
+    operation_aggregate : operation_aggregate WITH LPAREN option_list RPAREN
+    """
+    p[0] = p[1]
+    assert isinstance(p[0], AggregateOperation)
+    set_options(p[0], p[4])
+
+
+def p_operation_write_options(p):
+    """
+    operation_insert : operation_insert WITH LPAREN option_list RPAREN
+    operation_update : operation_update WITH LPAREN option_list RPAREN
+    operation_delete : operation_delete WITH LPAREN option_list RPAREN
+    operation_copy : operation_copy WITH LPAREN option_list RPAREN
+    """
+    p[0] = p[1]
+    set_options(p[0], p[4])
+
+
+def p_option(p):
+    """option : SYMBOL EQUAL expression"""
+    p[0] = cursor_option(p[1], p[3])
+
+
+def p_option_flag(p):
+    """option : SYMBOL"""
+    p[0] = cursor_option(p[1], True)
+
+
+def p_option_list_one(p):
+    """option_list : option"""
+    p[0] = [p[1]]
+
+
+def p_option_list(p):
+    """option_list : option_list COMMA option"""
+    p[0] = p[1]
+    p[0].append(p[3])
 
 
 ##----------------------------------------------------------------------------
@@ -396,14 +665,24 @@ def p_number_negative(p):
     number : MINUS INTEGER  %prec UMINUS
            | MINUS FLOAT    %prec UMINUS
     """
-    p[0] = -p[1]
+    p[0] = -p[2]
 
 
 def p_string(p):
     """string : STRING"""
-    assert p[1][0] == p[1][-1]
-    assert p[1][0] in '\'"'
-    p[0] = p[1][1:-1]  # todo: replace escapes
+    p[0] = p[1]  # Escapes are already processed by the lexer
+
+
+##----------------------------------------------------------------------------
+## Bind parameters: ? (positional) or :name (named)
+##----------------------------------------------------------------------------
+
+def p_parameter(p):
+    """
+    parameter : PARAM
+              | NAMED_PARAM
+    """
+    p[0] = Parameter(p[1])
 
 
 ##----------------------------------------------------------------------------
@@ -478,4 +757,52 @@ def p_list(p):
 
 
 debug = True if os.environ.get('MONGOSQL_DEBUG') else False
-parser = yacc.yacc(debug=debug)
+
+##----------------------------------------------------------------------------
+## Parse tables are shipped in mongosql/parsetab.py, and never written
+## at runtime. PLY checks them against the grammar signature and falls
+## back to regenerating them in memory if they're stale: after changing
+## the grammar, rebuild them with ``build_parser(write_tables=True)``.
+##----------------------------------------------------------------------------
+
+_tabmodule = 'mongosql.parsetab'
+_tabdir = os.path.dirname(os.path.abspath(__file__))
+
+
+def build_parser(write_tables=False):
+    return yacc.yacc(
+        module=sys.modules[__name__], tabmodule=_tabmodule,
+        outputdir=_tabdir, write_tables=write_tables, debug=debug)
+
+
+_ply_parser = None
+_ply_parser_lock = threading.Lock()
+
+
+def get_ply_parser():
+    global _ply_parser
+    if _ply_parser is None:
+        with _ply_parser_lock:
+            if _ply_parser is None:
+                _ply_parser = build_parser()
+    return _ply_parser
+
+
+class _LazyParser(object):
+    """Stands for the PLY parser object, building it on first use"""
+
+    def __getattr__(self, name):
+        return getattr(get_ply_parser(), name)
+
+
+## Shared parser, kept for backwards compatibility: PLY keeps
+## the parsing stacks on it, so it is not reentrant.
+parser = _LazyParser()
+
+
+def new_ply_parser():
+    """
+    Return a new PLY parser, with its own parsing state;
+    the LALR tables are shared by all copies.
+    """
+    return copy.copy(get_ply_parser())
@@ -0,0 +1,151 @@
+
+# parsetab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'leftCOMMAleftCOLONleftEQUALleftORleftANDleftNEDBLEQUALINleftGTGTELTLTEleftPLUSMINUSSUMSUBTRACTleftSTARSLASHPERCENTTIMESDIVIDEMODULOrightNOTUMINUSAGGREGATE ANALYZE AND AS ASC BY COLON COMMA COMMENT COPY DBLEQUAL DELETE DESC EQUAL EXPLAIN FALSE FLOAT FORMAT FROM GEO_NEAR GROUP GT GTE IN INSERT INTEGER INTO LBRACE LBRACKET LIMIT LPAREN LT LTE MATCH MINUS NAMED_PARAM NE NOT NULL OR ORDER OUTFILE PARAM PERCENT PLUS PROJECT RBRACE RBRACKET RPAREN SELECT SEMICOLON SET SKIP SLASH SORT STAR STRING SYMBOL TRUE UNWIND UPDATE VALUES WHERE WITH\n    statement : expression\n              | operation\n    statement : statement SEMICOLON\n    operation : operation_select\n              | operation_aggregate\n    \n    statement : EXPLAIN operation\n              | EXPLAIN ANALYZE operation\n    \n    statement : operation outfile\n              | operation outfile FORMAT SYMBOL\n    \n    outfile : INTO OUTFILE string\n            | INTO OUTFILE parameter\n    \n    statement : operation_insert\n              | operation_update\n              | operation_delete\n              | operation_copy\n    expression : LPAREN expression RPARENexpression : base_typeexpression : SYMBOLexpression : parameterexpression : NOT expressionexpression : expression AND expressionexpression : expression OR expression\n    expression : expression PLUS expression     %prec SUM\n               | expression MINUS expression    %prec SUBTRACT\n               | expression STAR expression     %prec TIMES\n               | expression SLASH expression    %prec DIVIDE\n               | expression PERCENT expression  %prec MODULO\n    \n    expression : expression LT expression\n               | expression LTE expression\n               | expression GT expression\n               | expression GTE expression\n               | expression DBLEQUAL expression\n               | expression NE expression\n               | expression IN expression\n    \n    expression : SYMBOL LPAREN expression_list RPAREN\n               | SYMBOL LPAREN RPAREN\n    expression_list : expressionexpression_list : expression_list COMMA expressionassignment : expression AS SYMBOLassignment : SYMBOL EQUAL expressionassignment_list : assignmentassignment_list : assignment_list COMMA assignment\n    operation_aggregate : AGGREGATE SYMBOL\n    \n    operation_aggregate : operation_aggregate PROJECT assignment_list\n    \n    operation_aggregate : operation_aggregate MATCH expression\n    \n    operation_aggregate : operation_aggregate LIMIT INTEGER\n                        | operation_aggregate LIMIT parameter\n    \n    operation_aggregate : operation_aggregate SKIP INTEGER\n                        | operation_aggregate SKIP parameter\n    \n    operation_aggregate : operation_aggregate UNWIND SYMBOL\n                        | operation_aggregate UNWIND string\n    \n    operation_aggregate : operation_aggregate GROUP assignment_list\n    \n    operation_aggregate : operation_aggregate GROUP BY expression                           COMMA assignment_list\n    \n    operation_aggregate : operation_aggregate sort_keyword sort_spec\n    \n    operation_aggregate : operation_aggregate GEO_NEAR assignment_list\n    operation_select : SELECT fields_spec FROM SYMBOLoperation_select : operation_select WHERE expression\n    operation_select : operation_select LIMIT INTEGER\n                     | operation_select LIMIT parameter\n    \n    operation_select : operation_select SKIP INTEGER\n                     | operation_select SKIP parameter\n    \n    sort_keyword : SORT BY\n                 | SORT\n                 | ORDER BY\n                 | ORDER\n    \n    operation_select : operation_select sort_keyword sort_spec\n    operation_insert : INSERT INTO SYMBOL VALUES expression_listoperation_update : UPDATE SYMBOL SET assignment_listoperation_delete : DELETE FROM SYMBOL\n    operation_update : operation_update WHERE expression\n    operation_delete : operation_delete WHERE expression\n    \n    operation_copy : COPY SYMBOL FROM string FORMAT SYMBOL\n                   | COPY SYMBOL FROM parameter FORMAT SYMBOL\n    \n    operation_select : operation_select WITH LPAREN option_list RPAREN\n    \n    operation_aggregate : operation_aggregate WITH LPAREN option_list RPAREN\n    \n    operation_insert : operation_insert WITH LPAREN option_list RPAREN\n    operation_update : operation_update WITH LPAREN option_list RPAREN\n    operation_delete : operation_delete WITH LPAREN option_list RPAREN\n    operation_copy : operation_copy WITH LPAREN option_list RPAREN\n    option : SYMBOL EQUAL expressionoption : SYMBOLoption_list : optionoption_list : option_list COMMA optionfields_spec : STARfields_spec : symbol_listsymbol_list : SYMBOLsymbol_list : symbol_list COMMA SYMBOLsort_direction :sort_direction : ASCsort_direction : DESCsort_spec_item : SYMBOL sort_directionsort_spec : sort_spec_itemsort_spec : sort_spec COMMA sort_spec_item\n    base_type : string\n              | number\n              | boolean\n              | map\n              | list\n              | NULL\n    boolean : TRUEboolean : FALSE\n    number : INTEGER\n           | FLOAT\n    \n    number : MINUS INTEGER  %prec UMINUS\n           | MINUS FLOAT    %prec UMINUS\n    string : STRING\n    parameter : PARAM\n              | NAMED_PARAM\n    \n    map : assignment_map\n        | json_map\n    map : LBRACE RBRACE\n    assignment_map : LBRACE assignment_list RBRACE\n                   | LBRACE assignment_list COMMA RBRACE\n    \n    json_map_item : SYMBOL COLON expression\n                  | string COLON expression\n    \n    json_map : LBRACE json_map_item_list RBRACE\n             | LBRACE json_map_item_list COMMA RBRACE\n    json_map_item_list : json_map_itemlist : LBRACKET RBRACKET\n    list : LBRACKET expression_list RBRACKET\n         | LBRACKET expression_list COMMA RBRACKET\n    '
+    
+_lr_action_items = {'EXPLAIN':([0,],[4,]),'LPAREN':([0,5,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,60,61,62,63,64,65,70,74,77,78,82,84,85,101,144,153,158,164,168,169,170,172,177,189,192,209,215,],[10,59,10,10,10,10,10,10,10,10,10,10,10,10,10,10,10,10,10,10,10,125,10,127,10,129,130,10,140,10,10,10,10,156,59,59,10,10,10,10,10,10,10,10,10,10,10,10,]),'SYMBOL':([0,10,13,18,20,29,31,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,73,75,76,77,78,81,82,83,84,86,88,120,125,127,129,130,140,141,142,153,156,158,161,162,164,167,168,169,170,172,177,184,189,192,208,209,215,218,219,],[5,5,5,87,89,91,94,101,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,139,-63,-65,144,5,150,144,139,144,157,159,173,180,180,180,180,180,-62,-64,5,180,144,196,197,144,201,5,5,5,5,5,139,144,5,180,5,144,223,224,]),'NOT':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,77,78,82,84,153,158,164,168,169,170,172,177,189,192,209,215,],[13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,]),'INSERT':([0,],[17,]),'UPDATE':([0,],[18,]),'DELETE':([0,],[19,]),'COPY':([0,],[20,]),'NULL':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,77,78,82,84,153,158,164,168,169,170,172,177,189,192,209,215,],[26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,]),'PARAM':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,71,72,77,78,79,80,82,84,121,153,158,160,164,168,169,170,172,177,189,192,209,215,],[27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,]),'NAMED_PARAM':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,71,72,77,78,79,80,82,84,121,153,158,160,164,168,169,170,172,177,189,192,209,215,],[28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,28,]),'SELECT':([0,4,58,],[29,29,29,]),'AGGREGATE':([0,4,58,],[31,31,31,]),'STRING':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,77,78,81,82,84,121,153,158,160,164,168,169,170,172,177,189,192,209,215,],[32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,]),'INTEGER':([0,10,13,14,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,71,72,77,78,79,80,82,84,153,158,164,168,169,170,172,177,189,192,209,215,],[30,30,30,68,30,30,30,30,30,30,30,30,30,30,30,30,30,30,30,30,30,30,30,30,133,135,30,30,146,148,30,30,30,30,30,30,30,30,30,30,30,30,30,30,]),'FLOAT':([0,10,13,14,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,77,78,82,84,153,158,164,168,169,170,172,177,189,192,209,215,],[33,33,33,69,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,]),'MINUS':([0,2,5,10,11,12,13,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,66,67,68,69,70,77,78,82,84,95,100,101,102,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,126,128,131,132,144,145,153,158,163,164,165,168,169,170,171,172,176,177,189,190,192,198,200,202,203,204,205,206,209,215,221,],[14,44,-18,14,-17,-19,14,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,44,-20,-104,-105,14,14,14,14,14,-111,44,-18,-94,-119,44,44,44,-23,-24,-25,-26,-27,44,44,44,44,44,44,44,-36,44,44,-16,44,-18,44,14,14,-112,14,-116,14,14,14,-120,14,-35,14,14,44,14,-113,-117,44,44,44,-121,44,14,14,44,]),'TRUE':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,77,78,82,84,153,158,164,168,169,170,172,177,189,192,209,215,],[34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,]),'FALSE':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,77,78,82,84,153,158,164,168,169,170,172,177,189,192,209,215,],[35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,]),'LBRACE':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,77,78,82,84,153,158,164,168,169,170,172,177,189,192,209,215,],[38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,38,]),'LBRACKET':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,77,78,82,84,153,158,164,168,169,170,172,177,189,192,209,215,],[39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,39,]),'$end':([1,2,3,5,6,7,8,9,11,12,15,16,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,40,55,57,67,68,69,94,95,98,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,122,124,126,128,131,132,133,134,135,136,137,138,139,143,145,146,147,148,149,150,151,152,154,155,159,163,165,171,173,174,175,176,185,186,187,193,196,198,199,200,201,202,205,206,207,210,211,212,213,214,216,217,222,223,224,],[0,-1,-2,-18,-12,-13,-14,-15,-17,-19,-4,-5,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,-3,-8,-6,-20,-104,-105,-43,-111,-41,-119,-37,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-7,-36,-70,-71,-16,-57,-58,-59,-60,-61,-66,-92,-88,-44,-45,-46,-47,-48,-49,-50,-51,-52,-54,-55,-69,-112,-116,-120,-9,-10,-11,-35,-91,-89,-90,-68,-56,-113,-42,-117,-39,-40,-121,-38,-76,-77,-78,-79,-93,-74,-75,-67,-53,-72,-73,]),'SEMICOLON':([1,2,3,5,6,7,8,9,11,12,15,16,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,40,55,57,67,68,69,94,95,98,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,122,124,126,128,131,132,133,134,135,136,137,138,139,143,145,146,147,148,149,150,151,152,154,155,159,163,165,171,173,174,175,176,185,186,187,193,196,198,199,200,201,202,205,206,207,210,211,212,213,214,216,217,222,223,224,],[40,-1,-2,-18,-12,-13,-14,-15,-17,-19,-4,-5,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,-3,-8,-6,-20,-104,-105,-43,-111,-41,-119,-37,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-7,-36,-70,-71,-16,-57,-58,-59,-60,-61,-66,-92,-88,-44,-45,-46,-47,-48,-49,-50,-51,-52,-54,-55,-69,-112,-116,-120,-9,-10,-11,-35,-91,-89,-90,-68,-56,-113,-42,-117,-39,-40,-121,-38,-76,-77,-78,-79,-93,-74,-75,-67,-53,-72,-73,]),'AND':([2,5,11,12,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,66,67,68,69,95,100,101,102,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,126,128,131,132,144,145,163,165,171,176,190,198,200,202,203,204,205,206,221,],[41,-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,41,-20,-104,-105,-111,41,-18,-94,-119,41,-21,41,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,41,41,-16,41,-18,41,-112,-116,-120,-35,41,-113,-117,41,41,41,-121,41,41,]),'OR':([2,5,11,12,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,66,67,68,69,95,100,101,102,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,126,128,131,132,144,145,163,165,171,176,190,198,200,202,203,204,205,206,221,],[42,-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,42,-20,-104,-105,-111,42,-18,-94,-119,42,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,42,42,-16,42,-18,42,-112,-116,-120,-35,42,-113,-117,42,42,42,-121,42,42,]),'PLUS':([2,5,11,12,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,66,67,68,69,95,100,101,102,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,126,128,131,132,144,145,163,165,171,176,190,198,200,202,203,204,205,206,221,],[43,-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,43,-20,-104,-105,-111,43,-18,-94,-119,43,43,43,-23,-24,-25,-26,-27,43,43,43,43,43,43,43,-36,43,43,-16,43,-18,43,-112,-116,-120,-35,43,-113,-117,43,43,43,-121,43,43,]),'STAR':([2,5,11,12,21,22,23,24,25,26,27,28,29,30,32,33,34,35,36,37,66,67,68,69,95,100,101,102,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,126,128,131,132,144,145,163,165,171,176,190,198,200,202,203,204,205,206,221,],[45,-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,92,-102,-106,-103,-100,-101,-109,-110,45,-20,-104,-105,-111,45,-18,-94,-119,45,45,45,45,45,-25,-26,-27,45,45,45,45,45,45,45,-36,45,45,-16,45,-18,45,-112,-116,-120,-35,45,-113,-117,45,45,45,-121,45,45,]),'SLASH':([2,5,11,12,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,66,67,68,69,95,100,101,102,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,126,128,131,132,144,145,163,165,171,176,190,198,200,202,203,204,205,206,221,],[46,-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,46,-20,-104,-105,-111,46,-18,-94,-119,46,46,46,46,46,-25,-26,-27,46,46,46,46,46,46,46,-36,46,46,-16,46,-18,46,-112,-116,-120,-35,46,-113,-117,46,46,46,-121,46,46,]),'PERCENT':([2,5,11,12,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,66,67,68,69,95,100,101,102,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,126,128,131,132,144,145,163,165,171,176,190,198,200,202,203,204,205,206,221,],[47,-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,47,-20,-104,-105,-111,47,-18,-94,-119,47,47,47,47,47,-25,-26,-27,47,47,47,47,47,47,47,-36,47,47,-16,47,-18,47,-112,-116,-120,-35,47,-113,-117,47,47,47,-121,47,47,]),'LT':([2,5,11,12,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,66,67,68,69,95,100,101,102,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,126,128,131,132,144,145,163,165,171,176,190,198,200,202,203,204,205,206,221,],[48,-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,48,-20,-104,-105,-111,48,-18,-94,-119,48,48,48,-23,-24,-25,-26,-27,-28,-29,-30,-31,48,48,48,-36,48,48,-16,48,-18,48,-112,-116,-120,-35,48,-113,-117,48,48,48,-121,48,48,]),'LTE':([2,5,11,12,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,66,67,68,69,95,100,101,102,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,126,128,131,132,144,145,163,165,171,176,190,198,200,202,203,204,205,206,221,],[49,-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,49,-20,-104,-105,-111,49,-18,-94,-119,49,49,49,-23,-24,-25,-26,-27,-28,-29,-30,-31,49,49,49,-36,49,49,-16,49,-18,49,-112,-116,-120,-35,49,-113,-117,49,49,49,-121,49,49,]),'GT':([2,5,11,12,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,66,67,68,69,95,100,101,102,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,126,128,131,132,144,145,163,165,171,176,190,198,200,202,203,204,205,206,221,],[50,-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,50,-20,-104,-105,-111,50,-18,-94,-119,50,50,50,-23,-24,-25,-26,-27,-28,-29,-30,-31,50,50,50,-36,50,50,-16,50,-18,50,-112,-116,-120,-35,50,-113,-117,50,50,50,-121,50,50,]),'GTE':([2,5,11,12,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,66,67,68,69,95,100,101,102,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,126,128,131,132,144,145,163,165,171,176,190,198,200,202,203,204,205,206,221,],[51,-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,51,-20,-104,-105,-111,51,-18,-94,-119,51,51,51,-23,-24,-25,-26,-27,-28,-29,-30,-31,51,51,51,-36,51,51,-16,51,-18,51,-112,-116,-120,-35,51,-113,-117,51,51,51,-121,51,51,]),'DBLEQUAL':([2,5,11,12,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,66,67,68,69,95,100,101,102,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,126,128,131,132,144,145,163,165,171,176,190,198,200,202,203,204,205,206,221,],[52,-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,52,-20,-104,-105,-111,52,-18,-94,-119,52,52,52,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,52,52,-16,52,-18,52,-112,-116,-120,-35,52,-113,-117,52,52,52,-121,52,52,]),'NE':([2,5,11,12,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,66,67,68,69,95,100,101,102,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,126,128,131,132,144,145,163,165,171,176,190,198,200,202,203,204,205,206,221,],[53,-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,53,-20,-104,-105,-111,53,-18,-94,-119,53,53,53,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,53,53,-16,53,-18,53,-112,-116,-120,-35,53,-113,-117,53,53,53,-121,53,53,]),'IN':([2,5,11,12,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,66,67,68,69,95,100,101,102,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,126,128,131,132,144,145,163,165,171,176,190,198,200,202,203,204,205,206,221,],[54,-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,54,-20,-104,-105,-111,54,-18,-94,-119,54,54,54,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,54,54,-16,54,-18,54,-112,-116,-120,-35,54,-113,-117,54,54,54,-121,54,54,]),'INTO':([3,5,11,12,15,16,17,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,67,68,69,94,95,98,103,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,131,132,133,134,135,136,137,138,139,143,145,146,147,148,149,150,151,152,154,155,163,165,171,176,185,186,187,196,198,199,200,201,202,205,213,214,216,222,],[56,-18,-17,-19,-4,-5,86,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,-20,-104,-105,-43,-111,-41,-119,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,-16,-57,-58,-59,-60,-61,-66,-92,-88,-44,-45,-46,-47,-48,-49,-50,-51,-52,-54,-55,-112,-116,-120,-35,-91,-89,-90,-56,-113,-42,-117,-39,-40,-121,-93,-74,-75,-53,]),'ANALYZE':([4,],[58,]),'RPAREN':([5,11,12,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,59,66,67,68,69,95,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,123,124,131,163,165,171,176,178,179,180,181,182,183,188,191,198,200,205,206,220,221,],[-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,124,131,-20,-104,-105,-111,-119,-37,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,176,-36,-16,-112,-116,-120,-35,207,-82,-81,210,211,212,214,216,-113,-117,-121,-38,-83,-80,]),'AS':([5,11,12,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,67,68,69,95,100,101,102,103,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,131,144,163,165,171,176,198,200,205,],[-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,-20,-104,-105,-111,167,-18,-94,-119,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,-16,-18,-112,-116,-120,-35,-113,-117,-121,]),'RBRACKET':([5,11,12,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,39,67,68,69,95,103,104,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,131,163,165,171,172,176,198,200,205,206,],[-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,103,-20,-104,-105,-111,-119,171,-37,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,-16,-112,-116,-120,205,-35,-113,-117,-121,-38,]),'COMMA':([5,11,12,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,67,68,69,91,93,95,96,97,98,99,103,104,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,123,124,131,137,138,139,143,152,154,155,163,165,171,176,178,179,180,181,182,183,185,186,187,188,190,191,193,197,198,199,200,201,202,203,204,205,206,213,217,220,221,222,],[-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,-20,-104,-105,-86,162,-111,164,166,-41,-118,-119,172,-37,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,177,-36,-16,184,-92,-88,189,189,184,189,-112,-116,-120,-35,208,-82,-81,208,208,208,-91,-89,-90,208,215,208,189,-87,-113,-42,-117,-39,-40,-114,-115,-121,-38,-93,177,-83,-80,189,]),'WHERE':([5,7,8,11,12,15,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,67,68,69,95,98,103,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,126,128,131,132,133,134,135,136,137,138,139,159,163,165,171,176,185,186,187,193,196,198,199,200,201,202,205,210,211,213,214,],[-18,61,63,-17,-19,70,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,-20,-104,-105,-111,-41,-119,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,-70,-71,-16,-57,-58,-59,-60,-61,-66,-92,-88,-69,-112,-116,-120,-35,-91,-89,-90,-68,-56,-113,-42,-117,-39,-40,-121,-77,-78,-93,-74,]),'WITH':([5,6,7,8,9,11,12,15,16,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,67,68,69,94,95,98,103,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,126,128,131,132,133,134,135,136,137,138,139,143,145,146,147,148,149,150,151,152,154,155,159,163,165,171,176,185,186,187,193,196,198,199,200,201,202,205,206,207,210,211,212,213,214,216,217,222,223,224,],[-18,60,62,64,65,-17,-19,74,85,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,-20,-104,-105,-43,-111,-41,-119,-37,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,-70,-71,-16,-57,-58,-59,-60,-61,-66,-92,-88,-44,-45,-46,-47,-48,-49,-50,-51,-52,-54,-55,-69,-112,-116,-120,-35,-91,-89,-90,-68,-56,-113,-42,-117,-39,-40,-121,-38,-76,-77,-78,-79,-93,-74,-75,-67,-53,-72,-73,]),'LIMIT':([5,11,12,15,16,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,67,68,69,94,95,98,103,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,131,132,133,134,135,136,137,138,139,143,145,146,147,148,149,150,151,152,154,155,163,165,171,176,185,186,187,196,198,199,200,201,202,205,213,214,216,222,],[-18,-17,-19,71,79,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,-20,-104,-105,-43,-111,-41,-119,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,-16,-57,-58,-59,-60,-61,-66,-92,-88,-44,-45,-46,-47,-48,-49,-50,-51,-52,-54,-55,-112,-116,-120,-35,-91,-89,-90,-56,-113,-42,-117,-39,-40,-121,-93,-74,-75,-53,]),'SKIP':([5,11,12,15,16,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,67,68,69,94,95,98,103,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,131,132,133,134,135,136,137,138,139,143,145,146,147,148,149,150,151,152,154,155,163,165,171,176,185,186,187,196,198,199,200,201,202,205,213,214,216,222,],[-18,-17,-19,72,80,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,-20,-104,-105,-43,-111,-41,-119,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,-16,-57,-58,-59,-60,-61,-66,-92,-88,-44,-45,-46,-47,-48,-49,-50,-51,-52,-54,-55,-112,-116,-120,-35,-91,-89,-90,-56,-113,-42,-117,-39,-40,-121,-93,-74,-75,-53,]),'SORT':([5,11,12,15,16,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,67,68,69,94,95,98,103,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,131,132,133,134,135,136,137,138,139,143,145,146,147,148,149,150,151,152,154,155,163,165,171,176,185,186,187,196,198,199,200,201,202,205,213,214,216,222,],[-18,-17,-19,75,75,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,-20,-104,-105,-43,-111,-41,-119,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,-16,-57,-58,-59,-60,-61,-66,-92,-88,-44,-45,-46,-47,-48,-49,-50,-51,-52,-54,-55,-112,-116,-120,-35,-91,-89,-90,-56,-113,-42,-117,-39,-40,-121,-93,-74,-75,-53,]),'ORDER':([5,11,12,15,16,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,67,68,69,94,95,98,103,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,131,132,133,134,135,136,137,138,139,143,145,146,147,148,149,150,151,152,154,155,163,165,171,176,185,186,187,196,198,199,200,201,202,205,213,214,216,222,],[-18,-17,-19,76,76,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,-20,-104,-105,-43,-111,-41,-119,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,-16,-57,-58,-59,-60,-61,-66,-92,-88,-44,-45,-46,-47,-48,-49,-50,-51,-52,-54,-55,-112,-116,-120,-35,-91,-89,-90,-56,-113,-42,-117,-39,-40,-121,-93,-74,-75,-53,]),'PROJECT':([5,11,12,16,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,67,68,69,94,95,98,103,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,131,138,139,143,145,146,147,148,149,150,151,152,154,155,163,165,171,176,185,186,187,198,199,200,201,202,205,213,216,222,],[-18,-17,-19,77,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,-20,-104,-105,-43,-111,-41,-119,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,-16,-92,-88,-44,-45,-46,-47,-48,-49,-50,-51,-52,-54,-55,-112,-116,-120,-35,-91,-89,-90,-113,-42,-117,-39,-40,-121,-93,-75,-53,]),'MATCH':([5,11,12,16,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,67,68,69,94,95,98,103,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,131,138,139,143,145,146,147,148,149,150,151,152,154,155,163,165,171,176,185,186,187,198,199,200,201,202,205,213,216,222,],[-18,-17,-19,78,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,-20,-104,-105,-43,-111,-41,-119,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,-16,-92,-88,-44,-45,-46,-47,-48,-49,-50,-51,-52,-54,-55,-112,-116,-120,-35,-91,-89,-90,-113,-42,-117,-39,-40,-121,-93,-75,-53,]),'UNWIND':([5,11,12,16,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,67,68,69,94,95,98,103,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,131,138,139,143,145,146,147,148,149,150,151,152,154,155,163,165,171,176,185,186,187,198,199,200,201,202,205,213,216,222,],[-18,-17,-19,81,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,-20,-104,-105,-43,-111,-41,-119,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,-16,-92,-88,-44,-45,-46,-47,-48,-49,-50,-51,-52,-54,-55,-112,-116,-120,-35,-91,-89,-90,-113,-42,-117,-39,-40,-121,-93,-75,-53,]),'GROUP':([5,11,12,16,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,67,68,69,94,95,98,103,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,131,138,139,143,145,146,147,148,149,150,151,152,154,155,163,165,171,176,185,186,187,198,199,200,201,202,205,213,216,222,],[-18,-17,-19,82,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,-20,-104,-105,-43,-111,-41,-119,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,-16,-92,-88,-44,-45,-46,-47,-48,-49,-50,-51,-52,-54,-55,-112,-116,-120,-35,-91,-89,-90,-113,-42,-117,-39,-40,-121,-93,-75,-53,]),'GEO_NEAR':([5,11,12,16,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,67,68,69,94,95,98,103,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,131,138,139,143,145,146,147,148,149,150,151,152,154,155,163,165,171,176,185,186,187,198,199,200,201,202,205,213,216,222,],[-18,-17,-19,84,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,-20,-104,-105,-43,-111,-41,-119,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,-16,-92,-88,-44,-45,-46,-47,-48,-49,-50,-51,-52,-54,-55,-112,-116,-120,-35,-91,-89,-90,-113,-42,-117,-39,-40,-121,-93,-75,-53,]),'RBRACE':([5,11,12,21,22,23,24,25,26,27,28,30,32,33,34,35,36,37,38,67,68,69,95,96,97,98,99,103,106,107,108,109,110,111,112,113,114,115,116,117,118,119,124,131,163,164,165,166,171,176,198,199,200,201,202,203,204,205,],[-18,-17,-19,-94,-95,-96,-97,-98,-99,-107,-108,-102,-106,-103,-100,-101,-109,-110,95,-20,-104,-105,-111,163,165,-41,-118,-119,-21,-22,-23,-24,-25,-26,-27,-28,-29,-30,-31,-32,-33,-34,-36,-16,-112,198,-116,200,-120,-35,-113,-42,-117,-39,-40,-114,-115,-121,]),'FROM':([19,89,90,91,92,93,197,],[88,160,161,-86,-84,-85,-87,]),'FORMAT':([27,28,32,55,174,175,194,195,],[-107,-108,-106,120,-10,-11,218,219,]),'COLON':([32,101,102,],[-106,169,170,]),'OUTFILE':([56,],[121,]),'BY':([75,76,82,],[141,142,153,]),'SET':([87,],[158,]),'EQUAL':([101,144,180,],[168,168,209,]),'ASC':([139,],[186,]),'DESC':([139,],[187,]),'VALUES':([157,],[192,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'statement':([0,],[1,]),'expression':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,77,78,82,84,153,158,164,168,169,170,172,177,189,192,209,215,],[2,66,67,100,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,105,126,128,132,100,145,100,100,190,100,100,202,203,204,206,206,100,105,221,100,]),'operation':([0,4,58,],[3,57,122,]),'operation_insert':([0,],[6,]),'operation_update':([0,],[7,]),'operation_delete':([0,],[8,]),'operation_copy':([0,],[9,]),'base_type':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,77,78,82,84,153,158,164,168,169,170,172,177,189,192,209,215,],[11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,]),'parameter':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,71,72,77,78,79,80,82,84,121,153,158,160,164,168,169,170,172,177,189,192,209,215,],[12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,134,136,12,12,147,149,12,12,175,12,12,195,12,12,12,12,12,12,12,12,12,12,]),'operation_select':([0,4,58,],[15,15,15,]),'operation_aggregate':([0,4,58,],[16,16,16,]),'string':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,77,78,81,82,84,121,153,158,160,164,168,169,170,172,177,189,192,209,215,],[21,21,21,102,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,151,21,21,174,21,21,194,21,21,21,21,21,21,21,21,21,21,]),'number':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,77,78,82,84,153,158,164,168,169,170,172,177,189,192,209,215,],[22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,]),'boolean':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,77,78,82,84,153,158,164,168,169,170,172,177,189,192,209,215,],[23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,]),'map':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,77,78,82,84,153,158,164,168,169,170,172,177,189,192,209,215,],[24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,24,]),'list':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,77,78,82,84,153,158,164,168,169,170,172,177,189,192,209,215,],[25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,]),'assignment_map':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,77,78,82,84,153,158,164,168,169,170,172,177,189,192,209,215,],[36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,36,]),'json_map':([0,10,13,38,39,41,42,43,44,45,46,47,48,49,50,51,52,53,54,59,61,63,70,77,78,82,84,153,158,164,168,169,170,172,177,189,192,209,215,],[37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,37,]),'outfile':([3,],[55,]),'sort_keyword':([15,16,],[73,83,]),'fields_spec':([29,],[90,]),'symbol_list':([29,],[93,]),'assignment_list':([38,77,82,84,158,215,],[96,143,152,155,193,222,]),'json_map_item_list':([38,],[97,]),'assignment':([38,77,82,84,158,164,189,215,],[98,98,98,98,98,199,199,98,]),'json_map_item':([38,],[99,]),'expression_list':([39,59,192,],[104,123,217,]),'sort_spec':([73,83,],[137,154,]),'sort_spec_item':([73,83,184,],[138,138,213,]),'option_list':([125,127,129,130,140,156,],[178,181,182,183,188,191,]),'option':([125,127,129,130,140,156,208,],[179,179,179,179,179,179,220,]),'sort_direction':([139,],[185,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> statement","S'",1,None,None,None),
+  ('statement -> expression','statement',1,'p_statement','parser.py',78),
+  ('statement -> operation','statement',1,'p_statement','parser.py',79),
+  ('statement -> statement SEMICOLON','statement',2,'p_statement_semicolon','parser.py',85),
+  ('operation -> operation_select','operation',1,'p_operation','parser.py',91),
+  ('operation -> operation_aggregate','operation',1,'p_operation','parser.py',92),
+  ('statement -> EXPLAIN operation','statement',2,'p_statement_explain','parser.py',99),
+  ('statement -> EXPLAIN ANALYZE operation','statement',3,'p_statement_explain','parser.py',100),
+  ('statement -> operation outfile','statement',2,'p_statement_export','parser.py',107),
+  ('statement -> operation outfile FORMAT SYMBOL','statement',4,'p_statement_export','parser.py',108),
+  ('outfile -> INTO OUTFILE string','outfile',3,'p_outfile','parser.py',116),
+  ('outfile -> INTO OUTFILE parameter','outfile',3,'p_outfile','parser.py',117),
+  ('statement -> operation_insert','statement',1,'p_statement_write','parser.py',124),
+  ('statement -> operation_update','statement',1,'p_statement_write','parser.py',125),
+  ('statement -> operation_delete','statement',1,'p_statement_write','parser.py',126),
+  ('statement -> operation_copy','statement',1,'p_statement_write','parser.py',127),
+  ('expression -> LPAREN expression RPAREN','expression',3,'p_expression_in_parens','parser.py',146),
+  ('expression -> base_type','expression',1,'p_expression_base_type','parser.py',151),
+  ('expression -> SYMBOL','expression',1,'p_expression_symbol','parser.py',156),
+  ('expression -> parameter','expression',1,'p_expression_parameter','parser.py',161),
+  ('expression -> NOT expression','expression',2,'p_expression_not','parser.py',166),
+  ('expression -> expression AND expression','expression',3,'p_expression_logical_and','parser.py',171),
+  ('expression -> expression OR expression','expression',3,'p_expression_logical_or','parser.py',176),
+  ('expression -> expression PLUS expression','expression',3,'p_expression_operation','parser.py',182),
+  ('expression -> expression MINUS expression','expression',3,'p_expression_operation','parser.py',183),
+  ('expression -> expression STAR expression','expression',3,'p_expression_operation','parser.py',184),
+  ('expression -> expression SLASH expression','expression',3,'p_expression_operation','parser.py',185),
+  ('expression -> expression PERCENT expression','expression',3,'p_expression_operation','parser.py',186),
+  ('expression -> expression LT expression','expression',3,'p_expression_comparison','parser.py',193),
+  ('expression -> expression LTE expression','expression',3,'p_expression_comparison','parser.py',194),
+  ('expression -> expression GT expression','expression',3,'p_expression_comparison','parser.py',195),
+  ('expression -> expression GTE expression','expression',3,'p_expression_comparison','parser.py',196),
+  ('expression -> expression DBLEQUAL expression','expression',3,'p_expression_comparison','parser.py',197),
+  ('expression -> expression NE expression','expression',3,'p_expression_comparison','parser.py',198),
+  ('expression -> expression IN expression','expression',3,'p_expression_comparison','parser.py',199),
+  ('expression -> SYMBOL LPAREN expression_list RPAREN','expression',4,'p_expression_call','parser.py',210),
+  ('expression -> SYMBOL LPAREN RPAREN','expression',3,'p_expression_call','parser.py',211),
+  ('expression_list -> expression','expression_list',1,'p_expression_list_one','parser.py',222),
+  ('expression_list -> expression_list COMMA expression','expression_list',3,'p_expression_list','parser.py',227),
+  ('assignment -> expression AS SYMBOL','assignment',3,'p_assignment_as','parser.py',240),
+  ('assignment -> SYMBOL EQUAL expression','assignment',3,'p_assignment','parser.py',245),
+  ('assignment_list -> assignment','assignment_list',1,'p_assignment_list_one','parser.py',250),
+  ('assignment_list -> assignment_list COMMA assignment','assignment_list',3,'p_assignment_list','parser.py',256),
+  ('operation_aggregate -> AGGREGATE SYMBOL','operation_aggregate',2,'p_operation_aggregate','parser.py',268),
+  ('operation_aggregate -> operation_aggregate PROJECT assignment_list','operation_aggregate',3,'p_operation_aggregate_project','parser.py',276),
+  ('operation_aggregate -> operation_aggregate MATCH expression','operation_aggregate',3,'p_operation_aggregate_match','parser.py',285),
+  ('operation_aggregate -> operation_aggregate LIMIT INTEGER','operation_aggregate',3,'p_operation_aggregate_limit','parser.py',294),
+  ('operation_aggregate -> operation_aggregate LIMIT parameter','operation_aggregate',3,'p_operation_aggregate_limit','parser.py',295),
+  ('operation_aggregate -> operation_aggregate SKIP INTEGER','operation_aggregate',3,'p_operation_aggregate_skip','parser.py',303),
+  ('operation_aggregate -> operation_aggregate SKIP parameter','operation_aggregate',3,'p_operation_aggregate_skip','parser.py',304),
+  ('operation_aggregate -> operation_aggregate UNWIND SYMBOL','operation_aggregate',3,'p_operation_aggregate_unwind','parser.py',312),
+  ('operation_aggregate -> operation_aggregate UNWIND string','operation_aggregate',3,'p_operation_aggregate_unwind','parser.py',313),
+  ('operation_aggregate -> operation_aggregate GROUP assignment_list','operation_aggregate',3,'p_operation_aggregate_group','parser.py',321),
+  ('operation_aggregate -> operation_aggregate GROUP BY expression COMMA assignment_list','operation_aggregate',6,'p_operation_aggregate_group_by','parser.py',330),
+  ('operation_aggregate -> operation_aggregate sort_keyword sort_spec','operation_aggregate',3,'p_operation_aggregate_sort','parser.py',340),
+  ('operation_aggregate -> operation_aggregate GEO_NEAR assignment_list','operation_aggregate',3,'p_operation_aggregate_geo_near','parser.py',348),
+  ('operation_select -> SELECT fields_spec FROM SYMBOL','operation_select',4,'p_operation_select_base','parser.py',367),
+  ('operation_select -> operation_select WHERE expression','operation_select',3,'p_operation_select_condition','parser.py',374),
+  ('operation_select -> operation_select LIMIT INTEGER','operation_select',3,'p_operation_select_limit','parser.py',383),
+  ('operation_select -> operation_select LIMIT parameter','operation_select',3,'p_operation_select_limit','parser.py',384),
+  ('operation_select -> operation_select SKIP INTEGER','operation_select',3,'p_operation_select_skip','parser.py',394),
+  ('operation_select -> operation_select SKIP parameter','operation_select',3,'p_operation_select_skip','parser.py',395),
+  ('sort_keyword -> SORT BY','sort_keyword',2,'p_sort_keyword','parser.py',405),
+  ('sort_keyword -> SORT','sort_keyword',1,'p_sort_keyword','parser.py',406),
+  ('sort_keyword -> ORDER BY','sort_keyword',2,'p_sort_keyword','parser.py',407),
+  ('sort_keyword -> ORDER','sort_keyword',1,'p_sort_keyword','parser.py',408),
+  ('operation_select -> operation_select sort_keyword sort_spec','operation_select',3,'p_operation_select_sort','parser.py',415),
+  ('operation_insert -> INSERT INTO SYMBOL VALUES expression_list','operation_insert',5,'p_operation_insert','parser.py',441),
+  ('operation_update -> UPDATE SYMBOL SET assignment_list','operation_update',4,'p_operation_update','parser.py',446),
+  ('operation_delete -> DELETE FROM SYMBOL','operation_delete',3,'p_operation_delete','parser.py',452),
+  ('operation_update -> operation_update WHERE expression','operation_update',3,'p_operation_write_condition','parser.py',458),
+  ('operation_delete -> operation_delete WHERE expression','operation_delete',3,'p_operation_write_condition','parser.py',459),
+  ('operation_copy -> COPY SYMBOL FROM string FORMAT SYMBOL','operation_copy',6,'p_operation_copy','parser.py',481),
+  ('operation_copy -> COPY SYMBOL FROM parameter FORMAT SYMBOL','operation_copy',6,'p_operation_copy','parser.py',482),
+  ('operation_select -> operation_select WITH LPAREN option_list RPAREN','operation_select',5,'p_operation_select_options','parser.py',513),
+  ('operation_aggregate -> operation_aggregate WITH LPAREN option_list RPAREN','operation_aggregate',5,'p_operation_aggregate_options','parser.py',522),
+  ('operation_insert -> operation_insert WITH LPAREN option_list RPAREN','operation_insert',5,'p_operation_write_options','parser.py',531),
+  ('operation_update -> operation_update WITH LPAREN option_list RPAREN','operation_update',5,'p_operation_write_options','parser.py',532),
+  ('operation_delete -> operation_delete WITH LPAREN option_list RPAREN','operation_delete',5,'p_operation_write_options','parser.py',533),
+  ('operation_copy -> operation_copy WITH LPAREN option_list RPAREN','operation_copy',5,'p_operation_write_options','parser.py',534),
+  ('option -> SYMBOL EQUAL expression','option',3,'p_option','parser.py',541),
+  ('option -> SYMBOL','option',1,'p_option_flag','parser.py',546),
+  ('option_list -> option','option_list',1,'p_option_list_one','parser.py',551),
+  ('option_list -> option_list COMMA option','option_list',3,'p_option_list','parser.py',556),
+  ('fields_spec -> STAR','fields_spec',1,'p_fields_spec_star','parser.py',568),
+  ('fields_spec -> symbol_list','fields_spec',1,'p_fields_spec_names','parser.py',573),
+  ('symbol_list -> SYMBOL','symbol_list',1,'p_symbol_list_one','parser.py',582),
+  ('symbol_list -> symbol_list COMMA SYMBOL','symbol_list',3,'p_symbol_list','parser.py',587),
+  ('sort_direction -> <empty>','sort_direction',0,'p_sort_direction_default','parser.py',599),
+  ('sort_direction -> ASC','sort_direction',1,'p_sort_direction_asc','parser.py',604),
+  ('sort_direction -> DESC','sort_direction',1,'p_sort_direction_desc','parser.py',609),
+  ('sort_spec_item -> SYMBOL sort_direction','sort_spec_item',2,'p_sort_spec_item','parser.py',614),
+  ('sort_spec -> sort_spec_item','sort_spec',1,'p_sort_spec_one','parser.py',619),
+  ('sort_spec -> sort_spec COMMA sort_spec_item','sort_spec',3,'p_sort_spec_list','parser.py',624),
+  ('base_type -> string','base_type',1,'p_base_type','parser.py',635),
+  ('base_type -> number','base_type',1,'p_base_type','parser.py',636),
+  ('base_type -> boolean','base_type',1,'p_base_type','parser.py',637),
+  ('base_type -> map','base_type',1,'p_base_type','parser.py',638),
+  ('base_type -> list','base_type',1,'p_base_type','parser.py',639),
+  ('base_type -> NULL','base_type',1,'p_base_type','parser.py',640),
+  ('boolean -> TRUE','boolean',1,'p_true','parser.py',646),
+  ('boolean -> FALSE','boolean',1,'p_false','parser.py',651),
+  ('number -> INTEGER','number',1,'p_number','parser.py',657),
+  ('number -> FLOAT','number',1,'p_number','parser.py',658),
+  ('number -> MINUS INTEGER','number',2,'p_number_negative','parser.py',665),
+  ('number -> MINUS FLOAT','number',2,'p_number_negative','parser.py',666),
+  ('string -> STRING','string',1,'p_string','parser.py',672),
+  ('parameter -> PARAM','parameter',1,'p_parameter','parser.py',682),
+  ('parameter -> NAMED_PARAM','parameter',1,'p_parameter','parser.py',683),
+  ('map -> assignment_map','map',1,'p_map','parser.py',696),
+  ('map -> json_map','map',1,'p_map','parser.py',697),
+  ('map -> LBRACE RBRACE','map',2,'p_map_empty','parser.py',703),
+  ('assignment_map -> LBRACE assignment_list RBRACE','assignment_map',3,'p_assignment_map','parser.py',709),
+  ('assignment_map -> LBRACE assignment_list COMMA RBRACE','assignment_map',4,'p_assignment_map','parser.py',710),
+  ('json_map_item -> SYMBOL COLON expression','json_map_item',3,'p_json_map_item','parser.py',717),
+  ('json_map_item -> string COLON expression','json_map_item',3,'p_json_map_item','parser.py',718),
+  ('json_map -> LBRACE json_map_item_list RBRACE','json_map',3,'p_json_map','parser.py',725),
+  ('json_map -> LBRACE json_map_item_list COMMA RBRACE','json_map',4,'p_json_map','parser.py',726),
+  ('json_map_item_list -> json_map_item','json_map_item_list',1,'p_json_map_item_list_one','parser.py',732),
+  ('list -> LBRACKET RBRACKET','list',2,'p_list_empty','parser.py',747),
+  ('list -> LBRACKET expression_list RBRACKET','list',3,'p_list','parser.py',753),
+  ('list -> LBRACKET expression_list COMMA RBRACKET','list',4,'p_list','parser.py',754),
+]
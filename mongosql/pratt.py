@@ -0,0 +1,426 @@
+"""
+Hand-written MongoSQL parser.
+
+Recursive descent for statements, Pratt-style operator precedence
+parsing for expressions. Accepts the same language as the PLY grammar
+in ``mongosql.parser`` and builds the same objects, without going
+through the generic table-driven LALR loop.
+"""
+
+from collections import OrderedDict
+
+from mongosql.lexer import Token
+from mongosql.parser import (
+    ParserError, assignment, cursor_option, file_format, insert_values,
+    precedence, set_options)
+from mongosql.support import (
+    Symbol, Map, SelectOperation, Expression, Operation, Comparison,
+    LogicalAnd, LogicalOr, LogicalNot, FunctionCall, AggregateOperation,
+    AggregateCmdProject, AggregateCmdMatch, AggregateCmdLimit,
+    AggregateCmdSkip, AggregateCmdUnwind, AggregateCmdGroup,
+    AggregateCmdSort, AggregateCmdGeoNear, ExplainOperation, Parameter,
+    InsertOperation, UpdateOperation, DeleteOperation, CopyOperation,
+    ExportOperation, copy_formats, export_formats)
+
+
+def _binding_powers():
+    ## Build from the parser precedence table: each level
+    ## binds tighter than the previous one.
+    levels = {}
+    for level, entry in enumerate(precedence, 1):
+        for name in entry[1:]:
+            levels[name] = (level, entry[0])
+    nodes = {'OR': LogicalOr, 'AND': LogicalAnd}
+    for token in ('LT', 'LTE', 'GT', 'GTE', 'DBLEQUAL', 'NE', 'IN'):
+        nodes[token] = Comparison
+    for token in ('PLUS', 'MINUS', 'STAR', 'SLASH', 'PERCENT'):
+        nodes[token] = Operation
+
+    powers = {}
+    for token, node in nodes.items():
+        level, associativity = levels[token]
+        assert associativity == 'left'
+        powers[token] = (level, node)
+    return powers, levels['NOT'][0]
+
+
+binary_operators, unary_binding_power = _binding_powers()
+
+_end = Token('$end', None, 0, -1)
+
+
+class PrattParser(object):
+    """
+    Parser object; has the same ``parse(query, lexer)``
+    interface as the PLY one.
+    """
+
+    def parse(self, query, lexer):
+        lexer.input(query)
+        self._token = lexer.token
+        self._next = self._token() or _end
+        statement = self.statement()
+        while self._next.type == 'SEMICOLON':
+            self._advance()
+        if self._next is not _end:
+            self._error()
+        return statement
+
+    ##------------------------------------------------------------
+    ## Token stream helpers
+    ##------------------------------------------------------------
+
+    def _advance(self):
+        tok = self._next
+        self._next = self._token() or _end
+        return tok
+
+    def _accept(self, type_):
+        if self._next.type == type_:
+            return self._advance()
+        return None
+
+    def _expect(self, type_):
+        if self._next.type != type_:
+            self._error()
+        return self._advance()
+
+    def _error(self):
+        tok = self._next
+        raise ParserError("Parser error!", None if tok is _end else tok)
+
+    ##------------------------------------------------------------
+    ## Statements
+    ##------------------------------------------------------------
+
+    def statement(self):
+        if self._accept('EXPLAIN'):
+            analyze = self._accept('ANALYZE') is not None
+            return ExplainOperation(self.operation(), analyze=analyze)
+        if self._next.type in ('SELECT', 'AGGREGATE'):
+            operation = self.operation()
+            if self._next.type == 'INTO':
+                return self.outfile(operation)
+            return operation
+        if self._next.type == 'INSERT':
+            return self.operation_insert()
+        if self._next.type in ('UPDATE', 'DELETE'):
+            return self.operation_filtered_write()
+        if self._next.type == 'COPY':
+            return self.operation_copy()
+        return self.expression()
+
+    def outfile(self, operation):
+        self._expect('INTO')
+        self._expect('OUTFILE')
+        if self._next.type == 'STRING':
+            target = self._advance().value
+        else:
+            target = self.parameter()
+        format = None
+        if self._accept('FORMAT'):
+            format = file_format(self._expect('SYMBOL').value, export_formats)
+        return ExportOperation(operation, target=target, format=format)
+
+    def operation(self):
+        if self._next.type == 'SELECT':
+            return self.operation_select()
+        if self._next.type == 'AGGREGATE':
+            return self.operation_aggregate()
+        self._error()
+
+    def operation_select(self):
+        self._expect('SELECT')
+        if self._accept('STAR'):
+            fields = None
+        else:
+            fields = [self._expect('SYMBOL').value]
+            while self._accept('COMMA'):
+                fields.append(self._expect('SYMBOL').value)
+        self._expect('FROM')
+        operation = SelectOperation(
+            collection=self._expect('SYMBOL').value, fields=fields)
+
+        while True:
+            type_ = self._next.type
+            if type_ == 'WHERE':
+                self._advance()
+                operation.query = self.expression()
+                assert isinstance(operation.query, Expression)
+            elif type_ == 'LIMIT':
+                self._advance()
+                operation.limit = self._integer_or_parameter()
+            elif type_ == 'SKIP':
+                self._advance()
+                operation.skip = self._integer_or_parameter()
+            elif type_ in ('SORT', 'ORDER'):
+                self._advance()
+                self._accept('BY')
+                operation.sort = OrderedDict(self.sort_spec())
+            elif type_ == 'WITH':
+                self.options(operation)
+            else:
+                return operation
+
+    def _integer_or_parameter(self):
+        if self._next.type == 'INTEGER':
+            return self._advance().value
+        return self.parameter()
+
+    def sort_spec(self):
+        spec = [self.sort_spec_item()]
+        while self._accept('COMMA'):
+            spec.append(self.sort_spec_item())
+        return spec
+
+    def sort_spec_item(self):
+        name = self._expect('SYMBOL').value
+        if self._accept('DESC'):
+            return (name, -1)
+        self._accept('ASC')
+        return (name, 1)
+
+    def options(self, operation):
+        self._expect('WITH')
+        self._expect('LPAREN')
+        set_options(operation, self.option_list())
+        self._expect('RPAREN')
+
+    def option_list(self):
+        options = [self.option()]
+        while self._accept('COMMA'):
+            options.append(self.option())
+        return options
+
+    def option(self):
+        name = self._expect('SYMBOL').value
+        if self._accept('EQUAL'):
+            return cursor_option(name, self.expression())
+        return cursor_option(name, True)
+
+    def operation_insert(self):
+        self._expect('INSERT')
+        self._expect('INTO')
+        collection = self._expect('SYMBOL').value
+        self._expect('VALUES')
+        values = [self.expression()]
+        while self._accept('COMMA'):
+            values.append(self.expression())
+        operation = InsertOperation(
+            collection=collection, documents=insert_values(values))
+        while self._next.type == 'WITH':
+            self.options(operation)
+        return operation
+
+    def operation_filtered_write(self):
+        if self._accept('UPDATE'):
+            collection = self._expect('SYMBOL').value
+            self._expect('SET')
+            operation = UpdateOperation(
+                collection=collection, assignments=self.assignment_list())
+        else:
+            self._expect('DELETE')
+            self._expect('FROM')
+            operation = DeleteOperation(
+                collection=self._expect('SYMBOL').value)
+        while True:
+            type_ = self._next.type
+            if type_ == 'WHERE':
+                self._advance()
+                operation.query = self.expression()
+                assert isinstance(operation.query, Expression)
+            elif type_ == 'WITH':
+                self.options(operation)
+            else:
+                return operation
+
+    def operation_copy(self):
+        self._expect('COPY')
+        collection = self._expect('SYMBOL').value
+        self._expect('FROM')
+        if self._next.type == 'STRING':
+            source = self._advance().value
+        else:
+            source = self.parameter()
+        self._expect('FORMAT')
+        operation = CopyOperation(
+            collection=collection, source=source,
+            format=file_format(self._expect('SYMBOL').value, copy_formats))
+        while self._next.type == 'WITH':
+            self.options(operation)
+        return operation
+
+    def operation_aggregate(self):
+        self._expect('AGGREGATE')
+        operation = AggregateOperation(
+            collection=self._expect('SYMBOL').value)
+        pipeline = operation.pipeline
+        while True:
+            type_ = self._next.type
+            if type_ == 'PROJECT':
+                self._advance()
+                pipeline.append(AggregateCmdProject(self.assignment_list()))
+            elif type_ == 'MATCH':
+                self._advance()
+                query = self.expression()
+                assert isinstance(query, Expression)
+                pipeline.append(AggregateCmdMatch(query))
+            elif type_ == 'LIMIT':
+                self._advance()
+                pipeline.append(
+                    AggregateCmdLimit(self._integer_or_parameter()))
+            elif type_ == 'SKIP':
+                self._advance()
+                pipeline.append(AggregateCmdSkip(self._integer_or_parameter()))
+            elif type_ == 'UNWIND':
+                self._advance()
+                tok = self._accept('STRING') or self._expect('SYMBOL')
+                pipeline.append(AggregateCmdUnwind(tok.value))
+            elif type_ == 'GROUP':
+                self._advance()
+                key = None
+                if self._accept('BY'):
+                    key = self.expression()
+                    self._expect('COMMA')
+                pipeline.append(
+                    AggregateCmdGroup(self.assignment_list(), key=key))
+            elif type_ in ('SORT', 'ORDER'):
+                self._advance()
+                self._accept('BY')
+                pipeline.append(
+                    AggregateCmdSort(OrderedDict(self.sort_spec())))
+            elif type_ == 'GEO_NEAR':
+                self._advance()
+                pipeline.append(AggregateCmdGeoNear(self.assignment_list()))
+            elif type_ == 'WITH':
+                self.options(operation)
+            else:
+                return operation
+
+    ##------------------------------------------------------------
+    ## Named expressions
+    ##------------------------------------------------------------
+
+    def assignment_list(self):
+        items = [self.assignment()]
+        while self._accept('COMMA'):
+            items.append(self.assignment())
+        return items
+
+    def assignment(self, first=None):
+        """
+        ``name = expression`` or ``expression AS name``;
+        ``first`` is an already consumed token.
+        """
+        tok = first or self._advance()
+        if tok.type == 'SYMBOL' and self._accept('EQUAL'):
+            return assignment(tok.value, self.expression())
+        expression = self.expression(first=tok)
+        self._expect('AS')
+        return assignment(self._expect('SYMBOL').value, expression)
+
+    ##------------------------------------------------------------
+    ## Expressions
+    ##------------------------------------------------------------
+
+    def expression(self, rbp=0, first=None):
+        """
+        Parse an expression, stopping at the first operator
+        not binding tighter than ``rbp``.
+
+        ``first`` is an already consumed token
+        the expression starts with.
+        """
+        left = self.prefix(first)
+        while True:
+            operator = binary_operators.get(self._next.type)
+            if operator is None or operator[0] <= rbp:
+                return left
+            tok = self._advance()
+            right = self.expression(operator[0])  # left-associative
+            if operator[1] in (LogicalAnd, LogicalOr):
+                left = operator[1](left, right)
+            else:
+                left = operator[1](
+                    first=left, operator=tok.value, second=right)
+
+    def prefix(self, first=None):
+        tok = first or self._advance()
+        type_ = tok.type
+
+        if type_ == 'SYMBOL':
+            if self._accept('LPAREN'):
+                args = []
+                if not self._accept('RPAREN'):
+                    args = self.expression_list()
+                    self._expect('RPAREN')
+                return FunctionCall(tok.value, args)
+            return Symbol(tok.value)
+        if type_ in ('STRING', 'INTEGER', 'FLOAT', 'TRUE', 'FALSE', 'NULL'):
+            return tok.value
+        if type_ in ('PARAM', 'NAMED_PARAM'):
+            return Parameter(tok.value)
+        if type_ == 'MINUS':
+            if self._next.type in ('INTEGER', 'FLOAT'):
+                return -self._advance().value
+        elif type_ == 'NOT':
+            return LogicalNot(self.expression(unary_binding_power))
+        elif type_ == 'LPAREN':
+            expression = self.expression()
+            self._expect('RPAREN')
+            return expression
+        elif type_ == 'LBRACKET':
+            return self.list_body()
+        elif type_ == 'LBRACE':
+            return self.map_body()
+
+        raise ParserError("Parser error!", None if tok is _end else tok)
+
+    def expression_list(self):
+        items = [self.expression()]
+        while self._accept('COMMA'):
+            items.append(self.expression())
+        return items
+
+    def parameter(self):
+        if self._next.type in ('PARAM', 'NAMED_PARAM'):
+            return Parameter(self._advance().value)
+        self._error()
+
+    ##------------------------------------------------------------
+    ## Lists and maps: the opening bracket is already consumed
+    ##------------------------------------------------------------
+
+    def list_body(self):
+        if self._accept('RBRACKET'):
+            return []
+        items = [self.expression()]
+        while self._accept('COMMA'):
+            if self._next.type == 'RBRACKET':
+                break  # Trailing comma
+            items.append(self.expression())
+        self._expect('RBRACKET')
+        return items
+
+    def map_body(self):
+        if self._accept('RBRACE'):
+            return Map()
+
+        ## JSON-like maps have just one {key: value} item
+        if self._next.type in ('SYMBOL', 'STRING'):
+            key = self._advance()
+            if self._accept('COLON'):
+                item = (key.value, self.expression())
+                self._accept('COMMA')
+                self._expect('RBRACE')
+                return Map([item])
+            items = [self.assignment(first=key)]
+        else:
+            items = [self.assignment()]
+
+        while self._accept('COMMA'):
+            if self._next.type == 'RBRACE':
+                break  # Trailing comma
+            items.append(self.assignment())
+        self._expect('RBRACE')
+        return Map((i.name, i.expression) for i in items)
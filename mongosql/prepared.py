@@ -0,0 +1,42 @@
+"""
+Prepared statements: parse once, bind values many times.
+"""
+
+from mongosql.support import WriteOperation, bind
+
+
+class PreparedStatement(object):
+    """
+    A parsed query, containing ``?`` and/or ``:name`` placeholders.
+
+    Parameter values are supplied as a sequence (positional parameters
+    are numbered from 0, in order of appearance) or as a mapping (keyed
+    on names for named parameters, on indexes for positional ones).
+    Values never go through the lexer, so no escaping is needed.
+    """
+
+    def __init__(self, query, operation):
+        self.query = query
+        self.operation = operation
+
+    def bind(self, params=()):
+        """Return a new operation, with all the parameters bound"""
+        return bind(self.operation, params)
+
+    def execute(self, db, params=(), options=None):
+        ## Values go straight into the (compiled) spec,
+        ## without binding a copy of the whole tree.
+        return self.operation.apply(db, params, options=options)
+
+    def executemany(self, db, params_seq, options=None):
+        """
+        Run an INSERT, UPDATE or DELETE once for each set of values
+        in ``params_seq``, sending the writes in batches: returns
+        the total counts (see ``WriteOperation.apply_many()``).
+        """
+        if not isinstance(self.operation, WriteOperation):
+            raise TypeError("executemany() runs INSERT, UPDATE or DELETE")
+        return self.operation.apply_many(db, params_seq, options=options)
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(self.__class__.__name__, self.query)
@@ -0,0 +1,154 @@
+"""
+Lazily decoded documents, for ``WITH (raw)`` results: ``LazyDocument``.
+
+pymongo's ``RawBSONDocument`` keeps the BSON data of a document as
+received, but decodes all of its fields on the first one read. A
+``LazyDocument`` finds the field read in the data instead, skipping
+over the other ones without decoding them, and only decodes that one
+(embedded documents are ``LazyDocument``s too). Reading a couple of
+fields of a wide document costs about as much as the couple of fields.
+
+Iterating over a document, or its ``items()``, decodes all the
+fields, as with ``RawBSONDocument``; ``raw`` is the BSON data, to
+forward the document as it is.
+
+Only public pymongo APIs are used (pymongo >= 3): to pymongo, a
+``LazyDocument`` is a ``RawBSONDocument`` with the usual codec options.
+"""
+
+import struct
+
+import bson
+from bson.errors import InvalidBSON
+from bson.raw_bson import DEFAULT_RAW_BSON_OPTIONS, RawBSONDocument
+
+_int32 = struct.Struct('<i')
+
+## bson.decode() is there from pymongo 3.9
+_decode = getattr(bson, 'decode', None) or (
+    lambda data, codec_options: bson.BSON(data).decode(codec_options))
+
+## Sizes of the values of fixed size, by BSON type: double, undefined,
+## ObjectId, boolean, datetime, null, int32, timestamp, int64,
+## decimal128, max and min keys
+_fixed_sizes = {
+    1: 8, 6: 0, 7: 12, 8: 1, 9: 8, 10: 0, 16: 4, 17: 8, 18: 8, 19: 16,
+    127: 0, 255: 0,
+}
+
+## Types starting with a length: what to add to it, for their size
+_sized = {
+    2: 4,  # String: the length doesn't include itself
+    3: 0,  # Document
+    4: 0,  # Array
+    5: 5,  # Binary: length, subtype, data
+    12: 16,  # DBPointer: string, then an ObjectId
+    13: 4,  # Code
+    14: 4,  # Symbol
+    15: 0,  # Code with scope
+}
+
+
+def _value_end(data, kind, position):
+    """End of the value of BSON type ``kind`` starting at ``position``"""
+    size = _fixed_sizes.get(kind)
+    if size is not None:
+        return position + size
+    extra = _sized.get(kind)
+    if extra is not None:
+        return position + _int32.unpack_from(data, position)[0] + extra
+    if kind == 11:  # Regular expression: pattern, options
+        return data.index(b'\x00', data.index(b'\x00', position) + 1) + 1
+    raise InvalidBSON("Unknown BSON type: {0}".format(kind))
+
+
+def find_element(data, name):
+    """
+    The BSON element (type, name and value) of the field ``name`` in
+    ``data``, a BSON document; None if it isn't there.
+    """
+    key = name.encode('utf-8') + b'\x00'
+    position = 4
+    end = len(data) - 1
+    while position < end:
+        start = position
+        kind = ord(data[position:position + 1])
+        position = data.index(b'\x00', position + 1) + 1
+        found = data[start + 1:position] == key
+        position = _value_end(data, kind, position)
+        if found:
+            return data[start:position]
+    return None
+
+
+## The last codec options given to a LazyDocument, and the same ones
+## for RawBSONDocument, as pymongo only takes those (cached, as each
+## document of a batch gets the same options)
+_raw_options = (None, DEFAULT_RAW_BSON_OPTIONS)
+
+
+def _raw_codec_options(codec_options):
+    global _raw_options
+    options, raw_options = _raw_options
+    if codec_options is not options:
+        raw_options = codec_options.with_options(
+            document_class=RawBSONDocument)
+        _raw_options = (codec_options, raw_options)
+    return raw_options
+
+
+class LazyDocument(RawBSONDocument):
+    """
+    ``RawBSONDocument`` decoding its fields one at a time, as they're
+    read; the ones read are kept.
+    """
+
+    __slots__ = ('_options', '_fields')
+
+    def __init__(self, bson_bytes, codec_options=None):
+        if codec_options is None:
+            codec_options = codec_options_lazy
+        self._options = codec_options
+        self._fields = None
+        super(LazyDocument, self).__init__(
+            bson_bytes, _raw_codec_options(codec_options))
+
+    def __reduce__(self):
+        return self.__class__, (self.raw, self._options)
+
+    def _element(self, name):
+        if not isinstance(name, basestring):
+            return None
+        data = self.raw
+        if not isinstance(data, bytes):  # memoryview
+            data = bytes(data)
+        return find_element(data, name)
+
+    def __getitem__(self, name):
+        if self._fields is not None and name in self._fields:
+            return self._fields[name]
+        element = self._element(name)
+        if element is None:
+            raise KeyError(name)
+        if element[:1] == b'\x03':  # Embedded document: as it is
+            start = len(name.encode('utf-8')) + 2  # Type, name, NUL
+            value = self.__class__(element[start:], self._options)
+        else:
+            ## A document of just that field
+            document = _int32.pack(len(element) + 5) + element + b'\x00'
+            value = _decode(
+                document, _raw_codec_options(self._options))[name]
+        if self._fields is None:
+            self._fields = {}
+        self._fields[name] = value
+        return value
+
+    def __contains__(self, name):
+        if self._fields is not None and name in self._fields:
+            return True
+        return self._element(name) is not None
+
+
+## Codec options returning ``LazyDocument``s
+codec_options_lazy = DEFAULT_RAW_BSON_OPTIONS.with_options(
+    document_class=LazyDocument)
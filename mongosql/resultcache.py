@@ -0,0 +1,161 @@
+"""
+Result cache: materialized results of SELECT / AGGREGATE queries.
+
+Results are keyed on the database, the collection and the MongoDB
+spec (``find()`` arguments or pipeline) they come from: queries
+differing only in spacing, or in parameters bound to the same values,
+share their results. Only small results (up to ``max_documents``)
+are stored; larger ones are streamed from the cursor as usual.
+
+Entries expire after ``ttl`` seconds, and the ones of a collection
+are dropped when it's written to through the same client (see
+``MongoSqlClient``), or with ``invalidate()``. Writes by other
+clients are only seen once the entries expire.
+
+Queries can opt out with ``WITH (no_cache)``, or keep their results
+for a different time with ``WITH (cache_ttl = <seconds>)``.
+
+Results are stored pickled, so that the documents returned can be
+freely modified, and their size (the one counted against the
+``maxbytes`` of ``TTLCache``) is known.
+"""
+
+import itertools
+import pickle
+import threading
+
+from mongosql.cache import TTLCache
+from mongosql.support import AggregateOperation, SelectOperation
+
+
+## Operators whose operands can be in any order
+_commutative = frozenset(['$and', '$or', '$nor'])
+
+
+def _freeze(obj):
+    """Hashable version of a spec; equal specs have equal keys"""
+    if isinstance(obj, dict):
+        items = obj.items()
+        if type(obj) is dict:
+            ## The order of the conditions doesn't matter,
+            ## unlike the one of sort keys (OrderedDict)
+            items = sorted(items)
+        return ('dict', tuple(
+            (k, _freeze_operands(v) if k in _commutative else _freeze(v))
+            for k, v in items))
+    if isinstance(obj, (list, tuple)):
+        return ('list', tuple(_freeze(x) for x in obj))
+    if isinstance(obj, bool):
+        return ('bool', obj)  # true is not 1, for MongoDB
+    try:
+        hash(obj)
+    except TypeError:
+        return (type(obj).__name__, repr(obj))
+    return obj
+
+
+def _freeze_operands(operands):
+    if not isinstance(operands, list):
+        return _freeze(operands)
+    return ('list', tuple(sorted((_freeze(x) for x in operands), key=repr)))
+
+
+def result_key(database, operation, params=None, options=None):
+    """
+    Key of the results of a SELECT / AGGREGATE ``operation``: the
+    same for all the queries with the same spec (and returning the
+    same kind of documents, see ``WITH (raw)``).
+    """
+    if isinstance(operation, SelectOperation):
+        spec = ('find', operation.find_kwargs(params))
+    else:
+        spec = ('aggregate', operation._build_spec(params))
+    if operation._raw(params, options):
+        spec = ('raw',) + spec
+    return (database, operation.collection, _freeze(spec))
+
+
+class ResultCache(object):
+    """
+    Query results cache, for a ``MongoSqlClient``.
+
+    ``backend`` stores the entries, ``TTLCache`` by default;
+    ``ttl`` is the default time to live (seconds) of the entries.
+    """
+
+    def __init__(self, backend=None, ttl=60, max_documents=1000):
+        self.backend = backend if backend is not None else TTLCache()
+        self.ttl = ttl
+        self.max_documents = max_documents
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0  # Too many documents to be stored
+        self.invalidations = 0
+        ## Bumped on each invalidation, so that results read before
+        ## a write aren't stored after it
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def apply(self, operation, db, params=None, options=None):
+        """
+        Run ``operation`` on ``db`` (as its ``apply()``), or get its
+        results from the cache: returns a list of documents, or an
+        iterator over the ones too many to be stored.
+        """
+        if not isinstance(operation, (SelectOperation, AggregateOperation)):
+            return operation.apply(db, params, options=options)
+        cache_options = operation._cache_options(params)
+        ttl = cache_options.get('cache_ttl', self.ttl)
+        if cache_options.get('no_cache') or not ttl:
+            return operation.apply(db, params, options=options)
+
+        database = getattr(db, 'name', None)
+        key = result_key(database, operation, params, options)
+        data = self.backend.get(key)
+        if data is not None:
+            with self._lock:
+                self.hits += 1
+            return pickle.loads(data)
+
+        tag = (database, operation.collection)
+        with self._lock:
+            self.misses += 1
+            generation = self._generations.get(tag, 0)
+        cursor = iter(operation.apply(db, params, options=options))
+        documents = list(itertools.islice(cursor, self.max_documents + 1))
+        if len(documents) > self.max_documents:
+            with self._lock:
+                self.skipped += 1
+            return itertools.chain(documents, cursor)
+        data = pickle.dumps(documents, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if self._generations.get(tag, 0) == generation:
+                self.backend.put(key, data, ttl, size=len(data), tag=tag)
+        return documents
+
+    def invalidate(self, database, collection):
+        """Drop the results of the queries on a collection"""
+        tag = (database, collection)
+        with self._lock:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            self.invalidations += 1
+            self.backend.invalidate(tag)
+
+    def clear(self):
+        with self._lock:
+            self.hits = self.misses = self.skipped = self.invalidations = 0
+            self.backend.clear()
+
+    def stats(self):
+        """Counters, plus the ``items`` stored and their size (``bytes``)"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = self.backend.stats()
+            stats.update({
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / lookups if lookups else None,
+                'skipped': self.skipped,
+                'invalidations': self.invalidations,
+            })
+            return stats
@@ -0,0 +1,120 @@
+"""
+Compiled serializer for MongoSQL expression trees.
+
+Instead of walking the tree (and copying every literal) each time a
+query is run, the tree is serialized once into a template, which is
+then turned into a plain Python function building the spec with dict
+and list displays.  Scalars are shared between all the built specs;
+dicts and lists are created anew at each call, so callers are free to
+modify what they get back.
+"""
+
+from mongosql.support import (
+    BindError, Parameter, bind, copy_literal, to_mongo)
+
+
+class _Slot(object):
+    """Marks the place of a parameter value, inside a template"""
+
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class _SlotParams(object):
+    """Fake parameter values: bind() to this to get a template"""
+
+    def __getitem__(self, key):
+        return _Slot(key)
+
+
+_slot_params = _SlotParams()
+
+## Scalars that can be written in the generated source as-is
+_repr_types = frozenset((str, unicode, int, long, bool, type(None)))
+
+## Lists of scalars longer than this are built from a shared tuple
+_tuple_threshold = 8
+
+## Subtrees nested deeper than this go in a function of their own,
+## to keep within the compiler nesting limits.
+_max_depth = 32
+
+
+class _Compiler(object):
+    def __init__(self):
+        self.env = {'_v': to_mongo, '_c': copy_literal}
+        self.keys = set()
+
+    def function(self, template):
+        source = 'lambda p: {0}'.format(self.source(template, 0))
+        return eval(source, self.env)
+
+    def constant(self, value):
+        name = '_k{0}'.format(len(self.env))
+        self.env[name] = value
+        return name
+
+    def source(self, obj, depth):
+        if depth > _max_depth:
+            return '{0}(p)'.format(self.constant(self.function(obj)))
+        depth += 1
+        cls = type(obj)
+        if cls is _Slot:
+            self.keys.add(obj.key)
+            return '_v(p[{0!r}])'.format(obj.key)
+        if cls is dict:
+            return '{{{0}}}'.format(', '.join(
+                '{0}: {1}'.format(self.source(k, depth),
+                                  self.source(v, depth))
+                for k, v in obj.iteritems()))
+        if cls is list:
+            if (len(obj) > _tuple_threshold and
+                    all(type(x) in _repr_types for x in obj)):
+                return 'list({0})'.format(self.constant(tuple(obj)))
+            return '[{0}]'.format(', '.join(
+                self.source(x, depth) for x in obj))
+        if cls in _repr_types:
+            return repr(obj)
+        if cls is float:
+            return self.constant(obj)  # repr() won't do for inf / nan
+        return '_c({0})'.format(self.constant(obj))
+
+
+class SpecBuilder(object):
+    """
+    Callable building a fresh copy of a spec: ``builder(params)``.
+
+    ``params`` supplies the values for the parameters, as in
+    ``support.bind()``; it can be omitted if there are none.
+    """
+
+    def __init__(self, template):
+        compiler = _Compiler()
+        self._build = compiler.function(template)
+        self.keys = frozenset(compiler.keys)
+
+    def __call__(self, params=()):
+        try:
+            return self._build(params)
+        except (KeyError, IndexError, TypeError):
+            for key in self.keys:
+                try:
+                    params[key]
+                except (KeyError, IndexError, TypeError):
+                    raise BindError(
+                        "No value supplied for parameter {0!r}".format(
+                            Parameter(key)))
+            raise
+
+
+def compile_spec(obj):
+    """
+    Compile an expression (or anything ``to_mongo()`` accepts)
+    into a ``SpecBuilder``.
+    """
+    return SpecBuilder(to_mongo(bind(obj, _slot_params)))
@@ -0,0 +1,117 @@
+"""
+Single flight: identical queries running at the same time share one
+server query.
+
+The first of the concurrent queries with the same results (same
+database, collection and spec, see ``mongosql.resultcache``) is run,
+reading all its documents; the others wait for it, and each get a
+copy of them. When there are more than ``max_documents``, the first
+query streams its cursor as usual, and the waiting ones are run on
+their own, as they would have been without single flight.
+
+An error running the query is raised in all of them.
+
+Cursor options (``WITH (...)``) aren't part of the key: queries
+differing only in their batch size or time limit are shared as well.
+"""
+
+import itertools
+import pickle
+import threading
+
+from mongosql.resultcache import result_key
+from mongosql.support import AggregateOperation, SelectOperation
+
+
+def _apply(operation, db, params, options):
+    return operation.apply(db, params, options=options)
+
+
+class _Call(object):
+    """A query in flight"""
+
+    __slots__ = ('done', 'data', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.data = None  # Pickled documents, None if too many
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalescing of concurrent identical queries, for a
+    ``MongoSqlClient``.
+    """
+
+    def __init__(self, max_documents=1000):
+        self.max_documents = max_documents
+        self.queries = 0  # Run for the others
+        self.coalesced = 0  # Served with the results of another one
+        self.skipped = 0  # Too many documents to be shared
+        self.waiting = 0  # Right now
+        self._calls = {}  # {key: _Call}
+        self._lock = threading.Lock()
+
+    def apply(self, operation, db, params=None, options=None, run=None):
+        """
+        Run ``operation`` on ``db``, as ``run(operation, db, params,
+        options)`` (by default, its ``apply()``) or get the results
+        of an identical query in flight: returns a list of documents,
+        or an iterator over the ones too many to be shared.
+        """
+        run = run or _apply
+        if not isinstance(operation, (SelectOperation, AggregateOperation)):
+            return run(operation, db, params, options)
+
+        key = result_key(
+            getattr(db, 'name', None), operation, params, options)
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+            else:
+                self.waiting += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            with self._lock:
+                self.waiting -= 1
+                if call.data is not None:
+                    self.coalesced += 1
+            if call.error is not None:
+                raise call.error
+            if call.data is None:
+                return run(operation, db, params, options)
+            return pickle.loads(call.data)
+
+        try:
+            cursor = iter(run(operation, db, params, options))
+            documents = list(
+                itertools.islice(cursor, self.max_documents + 1))
+            if len(documents) > self.max_documents:
+                with self._lock:
+                    self.skipped += 1
+                return itertools.chain(documents, cursor)
+            call.data = pickle.dumps(documents, pickle.HIGHEST_PROTOCOL)
+            return documents
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self.queries += 1
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queries': self.queries,
+                'coalesced': self.coalesced,
+                'skipped': self.skipped,
+                'waiting': self.waiting,
+                'in_flight': len(self._calls),
+            }
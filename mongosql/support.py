@@ -3,59 +3,617 @@ Support objects for MongoSQL
 """
 
 import copy
+import hashlib
+import itertools
+import json
+from collections import OrderedDict
+
+from six.moves import intern
 
 
 def to_mongo(obj):
     if hasattr(obj, 'to_mongo'):
         return obj.to_mongo()
+    if type(obj) is list:
+        return [to_mongo(x) for x in obj]
+    return copy_literal(obj)
+
+
+## Immutable values, that can be shared instead of copied
+_scalar_types = (basestring, int, long, float, bool, type(None))
+
+
+def copy_literal(obj):
+    """
+    Copy a literal value: plain dicts and lists are copied,
+    scalars are shared; anything else is deep-copied.
+    """
+    if isinstance(obj, _scalar_types):
+        return obj
+    cls = type(obj)
+    if cls is dict:
+        return dict((k, copy_literal(v)) for k, v in obj.iteritems())
+    if cls is list:
+        return [copy_literal(x) for x in obj]
     return copy.deepcopy(obj)
 
 
-class DatabaseOperation(object):
+def intern_name(name):
+    """Intern a name, so that all its occurrences share the same string"""
+    ## Only native strings can be interned (no unicode on Python 2)
+    if type(name) is str:
+        return intern(name)
+    return name
+
+
+_slot_names = {}
+
+
+def slot_names(cls):
+    """Names of all the slots of a class, including inherited ones"""
+    try:
+        return _slot_names[cls]
+    except KeyError:
+        names = _slot_names[cls] = tuple(
+            name for klass in reversed(cls.__mro__)
+            for name in getattr(klass, '__slots__', ()))
+        return names
+
+
+def bind(obj, params):
+    """Return a copy of obj, with parameters replaced by their values"""
+    if hasattr(obj, 'bind'):
+        return obj.bind(params)
+    if isinstance(obj, list):
+        return [bind(x, params) for x in obj]
+    return obj
+
+
+def copy_tree(obj):
+    """
+    Deep copy of a parsed object: operations, expression nodes, lists
+    and dicts are copied, values (strings, numbers, ..) are shared.
+    Much cheaper than ``copy.deepcopy()``, for the parse cache.
+    """
+    cls = type(obj)
+    if cls in _tree_values:
+        return obj
+    if cls is list:
+        return [copy_tree(x) for x in obj]
+    if isinstance(obj, dict):  # Map, OrderedDict
+        return cls((key, copy_tree(value)) for key, value in obj.iteritems())
+    if isinstance(obj, tuple):
+        if hasattr(obj, '_make'):  # namedtuple
+            return obj._make(copy_tree(x) for x in obj)
+        return cls(copy_tree(x) for x in obj)
+    names = slot_names(cls)
+    state = getattr(obj, '__dict__', None)
+    if not names and state is None:
+        return obj  # Other value, or stateless node
+    other = cls.__new__(cls)
+    for name in names:
+        if hasattr(obj, name):
+            setattr(other, name, copy_tree(getattr(obj, name)))
+    if state is not None:  # Subclass without __slots__
+        other.__dict__.update(copy_tree(state))
+    if isinstance(obj, DatabaseOperation):
+        other._compiled = [None, 0, None]  # Compiled for its own tree
+    return other
+
+
+## Types copy_tree() shares as they are
+_tree_values = frozenset((str, unicode, int, long, float, bool, type(None)))
+
+
+def get_field(document, name):
+    """Value of a field, None if missing; ``name`` can be a dotted path"""
+    if name in document:
+        return document[name]
+    value = document
+    for part in name.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def shape(obj):
+    """
+    Canonical text of ``obj``, with all the values left out (``?``):
+    the queries differing only in their values, spacing, keyword case
+    or order of the AND / OR operands have the same shape. Strings
+    starting with ``$`` are field paths, and are kept.
+    """
+    if hasattr(obj, 'to_shape'):
+        return obj.to_shape()
+    if isinstance(obj, list):
+        items = [shape(x) for x in obj]
+        if all(item == '?' for item in items):
+            return '[?]'  # Any number of values
+        return '[{0}]'.format(', '.join(items))
+    if isinstance(obj, basestring) and obj.startswith('$'):
+        return json.dumps(obj)  # Field path, in aggregation expressions
+    return '?'
+
+
+def digest(text):
+    """Stable hash of a text: the same in every process and version"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def fingerprint(obj):
+    """Hash of the shape of ``obj``, see ``shape()``"""
+    return digest(shape(obj))
+
+
+def _sort_shape(sort):
+    return ', '.join(
+        '{0} {1}'.format(name, 'ASC' if direction > 0 else 'DESC')
+        for name, direction in sort.items())
+
+
+def _assignments_shape(args):
+    return ', '.join(
+        '{0} = {1}'.format(item.name, shape(item.expression))
+        for item in args)
+
+
+class BindError(Exception):
     pass
 
 
+class DatabaseOperation(object):
+    __slots__ = ('_compiled', 'options')
+
+    ## Number of runs after which the spec gets compiled: compiling
+    ## costs about as much as 15 tree walks, but then building the
+    ## spec gets 5-100 times faster.
+    compile_threshold = 16
+
+    ## Names of the options accepted in the WITH (...) clause
+    option_names = ()
+
+    def __init__(self, options=None):
+        ## [source, runs, builder], shared with clones: the first
+        ## run claims it, clones with a different source replace it.
+        self._compiled = [None, 0, None]
+        self.options = options  # {cursor option: value}
+
+    def _spec_source(self):
+        """The object(s) the spec is built from"""
+        raise NotImplementedError
+
+    def _options_shape(self):
+        if not self.options:
+            return ''
+        return ' WITH ({0})'.format(', '.join(sorted(self.options)))
+
+    def fingerprint(self):
+        return fingerprint(self)
+
+    def _get_spec_builder(self):
+        """
+        Return a compiled ``SpecBuilder`` for this operation, or None
+        if it's not worth compiling (yet): one-off queries are just
+        serialized by walking the tree.
+        """
+        source = self._spec_source()
+        compiled = self._compiled
+        if compiled[0] is None:
+            compiled[0] = source
+        elif compiled[0] != source:
+            compiled = self._compiled = [source, 0, None]
+        if compiled[2] is None:
+            compiled[1] += 1
+            if compiled[1] < self.compile_threshold:
+                return None
+            ## Imported here, as the serializer depends on this module
+            from mongosql.serializer import compile_spec
+            compiled[2] = compile_spec(source)
+        return compiled[2]
+
+    def _build_spec(self, params=None):
+        builder = self._get_spec_builder()
+        if builder is not None:
+            return builder(() if params is None else params)
+        source = self._spec_source()
+        if params is not None:
+            source = bind(source, params)
+        return to_mongo(source)
+
+    def clone(self):
+        """
+        Return a copy of this operation that can be modified
+        without affecting the original one.
+
+        Expression trees are shared between the copies and must be
+        treated as read-only once parsed.
+        """
+        cls = self.__class__
+        other = cls.__new__(cls)
+        for name in slot_names(cls):
+            setattr(other, name, getattr(self, name))
+        if hasattr(self, '__dict__'):  # Subclass without __slots__
+            other.__dict__.update(self.__dict__)
+        if self.options is not None:
+            other.options = dict(self.options)
+        return other
+
+    def _bind_options(self, params):
+        return dict((name, bind(value, params))
+                    for name, value in self.options.iteritems())
+
+    def _cursor_options(self, params, defaults):
+        """
+        Options for a run: the ``defaults`` (ignoring the ones that
+        don't apply to this kind of operation), overridden by the
+        ones in the WITH (...) clause.
+        """
+        options = {}
+        for name, value in (defaults or {}).iteritems():
+            if name in self.option_names:
+                options[name] = value
+            elif name not in _known_options:
+                raise ValueError("Unknown cursor option: {0}".format(name))
+        if self.options:
+            if params is not None:
+                options.update(self._bind_options(params))
+            else:
+                options.update(self.options)
+        for name in cache_options + result_options:
+            options.pop(name, None)
+        return options
+
+    def _raw(self, params, defaults):
+        """Whether to return raw BSON documents: ``WITH (raw)``"""
+        value = (defaults or {}).get('raw', False)
+        if self.options and 'raw' in self.options:
+            value = self.options['raw']
+            if params is not None:
+                value = bind(value, params)
+        return bool(to_mongo(value))
+
+    def _cache_options(self, params):
+        """Result cache options in the WITH (...) clause"""
+        options = {}
+        for name in cache_options:
+            if self.options and name in self.options:
+                value = self.options[name]
+                if params is not None:
+                    value = bind(value, params)
+                options[name] = to_mongo(value)
+        return options
+
+
+## Options that can be set on find() cursors, via ``WITH (...)``
+cursor_options = (
+    'batch_size',  # Documents per batch (getMore round trip)
+    'max_time_ms',  # Server-side time limit
+    'hint',  # Index to use: name or {field: direction}
+    'comment',  # Shows up in the server logs / profiler
+    'no_cursor_timeout',  # Keep idle cursors alive
+    'exhaust',  # Stream all the batches without waiting for getMores
+)
+
+## Options of the result cache (see ``mongosql.resultcache``), for
+## the queries run through a client having one
+cache_options = (
+    'no_cache',  # Neither read nor store the results
+    'cache_ttl',  # Seconds the results are kept
+)
+
+## Options on the results of SELECT and AGGREGATE
+result_options = (
+    'raw',  # Documents decoded lazily, as their fields are read
+)
+
+
+def raw_collection(collection):
+    """
+    ``collection``, returning ``LazyDocument``s (``RawBSONDocument``s):
+    the BSON data as received, decoded field by field as they're read.
+    """
+    from mongosql.rawbson import codec_options_lazy
+    return collection.with_options(codec_options=codec_options_lazy)
+
+
+## Boolean options, set as wire protocol flags via Cursor.add_option()
+_cursor_flags = {
+    'no_cursor_timeout': 16,
+    'exhaust': 64,
+}
+
+
+def apply_cursor_options(cursor, options):
+    """Set cursor options ({name: value}) on a pymongo cursor"""
+    for name, value in options.iteritems():
+        if name not in cursor_options:
+            raise ValueError("Unknown cursor option: {0}".format(name))
+        value = to_mongo(value)
+        if name in _cursor_flags:
+            if value:
+                cursor = cursor.add_option(_cursor_flags[name])
+            continue
+        if name in ('batch_size', 'max_time_ms'):
+            assert isinstance(value, (int, long))
+        elif name == 'hint' and isinstance(value, dict):
+            value = list(value.iteritems())  # [(field, direction)]
+        cursor = getattr(cursor, name)(value)
+    return cursor
+
+
+## Options of AGGREGATE queries, via ``WITH (...)``
+aggregate_options = (
+    'batch_size',  # Documents per batch
+    'max_time_ms',
+    'allow_disk_use',  # Let $group / $sort spill to temporary files
+    'comment',
+    'hint',
+)
+
+## Corresponding arguments of Collection.aggregate()
+_aggregate_arguments = {
+    'max_time_ms': 'maxTimeMS',
+    'allow_disk_use': 'allowDiskUse',
+    'comment': 'comment',
+    'hint': 'hint',
+}
+
+
+def aggregate_kwargs(options):
+    """
+    Keyword arguments for ``Collection.aggregate()``, for the given
+    options ({name: value}); results always come through a cursor.
+    """
+    kwargs = {'cursor': {}}
+    for name, value in options.iteritems():
+        if name not in aggregate_options:
+            raise ValueError("Unknown cursor option: {0}".format(name))
+        value = to_mongo(value)
+        if name == 'batch_size':
+            assert isinstance(value, (int, long))
+            kwargs['cursor']['batchSize'] = value
+            continue
+        if name == 'max_time_ms':
+            assert isinstance(value, (int, long))
+        elif name == 'allow_disk_use':
+            value = bool(value)
+        elif name == 'hint' and isinstance(value, dict):
+            value = list(value.iteritems())  # [(field, direction)]
+        kwargs[_aggregate_arguments[name]] = value
+    return kwargs
+
+
+## Options of INSERT / UPDATE / DELETE, via ``WITH (...)``
+write_options = (
+    'chunk_size',  # Documents (or executemany() statements) per request
+    'ordered',  # Stop at the first error; writes are unordered by default
+    'bypass_document_validation',
+)
+
+## Options of UPDATE only
+update_options = (
+    'upsert',  # Insert a document if none matches
+)
+
+## Options of COPY (see ``mongosql.loader.load()``)
+copy_options = (
+    'workers',  # Threads inserting the chunks
+    'delimiter',  # Of the CSV values
+)
+
+## File formats for COPY
+copy_formats = ('csv', 'jsonl')
+
+## File formats for INTO OUTFILE; Arrow ones need pyarrow, BSON pymongo
+export_formats = copy_formats + ('parquet', 'arrow', 'bson')
+
+_known_options = frozenset(
+    cursor_options + aggregate_options + cache_options + result_options +
+    write_options + update_options + copy_options)
+
+
 class SelectOperation(DatabaseOperation):
+    __slots__ = ('collection', 'query', 'fields', 'limit', 'skip', 'sort')
+
+    option_names = cursor_options + cache_options + result_options
+
     def __init__(self, collection, query=None, fields=None, limit=None,
-                 skip=None, sort=None):
-        self.collection = collection  # string
+                 skip=None, sort=None, options=None):
+        super(SelectOperation, self).__init__(options)
+        self.collection = intern_name(collection)  # string
         self.query = query  # Query() object
+        if fields is not None:
+            fields = [intern_name(f) for f in fields]
         self.fields = fields  # list
         self.limit = limit  # int
         self.skip = skip  # int
         self.sort = sort  # {field: direction}
 
-    def apply(self, db):
+    def clone(self):
+        other = super(SelectOperation, self).clone()
+        if self.fields is not None:
+            other.fields = list(self.fields)
+        if self.sort is not None:
+            other.sort = copy.copy(self.sort)
+        return other
+
+    def bind(self, params):
+        other = self.clone()
+        other.query = bind(self.query, params)
+        other.limit = bind(self.limit, params)
+        other.skip = bind(self.skip, params)
+        if self.options is not None:
+            other.options = self._bind_options(params)
+        return other
+
+    def _spec_source(self):
+        return self.query
+
+    def to_shape(self):
+        parts = ['SELECT', '*' if self.fields is None else
+                 ', '.join(self.fields), 'FROM', self.collection]
+        if self.query is not None:
+            parts.extend(('WHERE', shape(self.query)))
+        if self.sort:
+            parts.extend(('ORDER BY', _sort_shape(self.sort)))
+        if self.limit is not None:
+            parts.append('LIMIT ?')
+        if self.skip is not None:
+            parts.append('SKIP ?')
+        return ' '.join(parts) + self._options_shape()
+
+    def find_kwargs(self, params=None):
+        """Keyword arguments for ``Collection.find()`` (pymongo >= 3)"""
+        limit, skip = self.limit, self.skip
+        if params is not None:
+            limit, skip = bind(limit, params), bind(skip, params)
         kwargs = {}
         if self.query is not None:
-            kwargs['spec'] = to_mongo(self.query)
+            kwargs['filter'] = self._build_spec(params)
         if self.fields is not None:
             assert isinstance(self.fields, (list, tuple))
-            kwargs['fields'] = self.fields
-        if self.limit is not None:
-            assert isinstance(self.limit, (int, long))
-            kwargs['limit'] = self.limit
-        if self.skip is not None:
-            assert isinstance(self.skip, (int, long))
-            kwargs['skip'] = self.skip
+            kwargs['projection'] = self.fields
+        if limit is not None:
+            assert isinstance(limit, (int, long))
+            kwargs['limit'] = limit
+        if skip is not None:
+            assert isinstance(skip, (int, long))
+            kwargs['skip'] = skip
         if self.sort is not None:
             kwargs['sort'] = to_mongo(self.sort)
-        return db[self.collection].find(**kwargs)
+        return kwargs
+
+    def apply(self, db, params=None, options=None):
+        """
+        Run the query on ``db``; ``params`` are the values
+        for the parameters, if any (see ``bind()``).
+
+        ``options`` are default cursor options, overridden
+        by the ones in the ``WITH (...)`` clause.
+        """
+        collection = db[self.collection]
+        if self._raw(params, options):
+            collection = raw_collection(collection)
+        return self._find(collection.find, params, options)
+
+    def apply_raw_batches(self, db, params=None, options=None):
+        """
+        Run the query on ``db``, returning a cursor over batches of
+        results as BSON data (the documents one after the other),
+        not decoded at all (pymongo >= 3.6).
+        """
+        return self._find(db[self.collection].find_raw_batches,
+                          params, options)
+
+    def _find(self, find, params, options):
+        cursor = find(**self.find_kwargs(params))
+        options = self._cursor_options(params, options)
+        if options:
+            cursor = apply_cursor_options(cursor, options)
+        return cursor
+
+    def paginate(self, db, token=None, page_size=None, params=None,
+                 options=None):
+        """
+        Return a ``(documents, token)`` page of results, where
+        ``token`` is passed back to get the next page (and is None
+        after the last one). Pages are ``page_size`` long, or
+        ``LIMIT`` if not given.
+
+        Instead of skipping the previous pages, each page starts
+        right after the end of the previous one: see
+        ``mongosql.pagination``.
+        """
+        from mongosql.pagination import paginate
+        return paginate(self, db, token, page_size, params, options)
+
+    def fetch_columns(self, db, params=None, options=None, batch_size=1000):
+        """
+        Run the query, reading the results into columns, a batch of
+        ``batch_size`` documents at a time (also the default cursor
+        batch size): returns ``{field: Column}``, see
+        ``mongosql.columns``.
+        """
+        from mongosql.columns import fetch_columns
+        options = dict(options or {})
+        options.setdefault('batch_size', batch_size)
+        return fetch_columns(self.apply(db, params, options=options),
+                             self.fields, batch_size)
+
+    def to_numpy(self, db, params=None, options=None, batch_size=1000):
+        """
+        Run the query, returning ``{field: numpy array}``; missing
+        values are masked. Needs NumPy.
+        """
+        from mongosql.columns import to_numpy
+        return to_numpy(self.fetch_columns(db, params, options, batch_size))
 
 
 class AggregateOperation(DatabaseOperation):
     """Aggregation framework: DB operation wrapper"""
 
-    def __init__(self, collection):
-        self.collection = collection
+    __slots__ = ('collection', 'pipeline')
+
+    option_names = aggregate_options + cache_options + result_options
+
+    def __init__(self, collection, options=None):
+        super(AggregateOperation, self).__init__(options)
+        self.collection = intern_name(collection)
         self.pipeline = []
 
-    def apply(self, db):
-        return db[self.collection].aggregate(
-            self._get_pipeline_to_mongo())
+    def clone(self):
+        other = super(AggregateOperation, self).clone()
+        other.pipeline = list(self.pipeline)
+        return other
+
+    def bind(self, params):
+        other = self.clone()
+        other.pipeline = bind(self.pipeline, params)
+        if self.options is not None:
+            other.options = self._bind_options(params)
+        return other
+
+    def _spec_source(self):
+        return list(self.pipeline)
+
+    def to_shape(self):
+        parts = ['AGGREGATE', self.collection]
+        parts.extend(shape(stage) for stage in self.pipeline)
+        return ' '.join(parts) + self._options_shape()
+
+    def apply(self, db, params=None, options=None):
+        """
+        Run the pipeline on ``db``; ``params`` are the values
+        for the parameters, if any (see ``bind()``).
+
+        Returns a cursor, fetching the results a batch at a time;
+        ``options`` are the defaults for the ``WITH (...)`` clause.
+        """
+        collection = db[self.collection]
+        if self._raw(params, options):
+            collection = raw_collection(collection)
+        return self._aggregate(collection.aggregate, params, options)
+
+    def apply_raw_batches(self, db, params=None, options=None):
+        """
+        Run the pipeline on ``db``, returning a cursor over batches
+        of results as BSON data, not decoded at all (pymongo >= 3.6).
+        """
+        return self._aggregate(db[self.collection].aggregate_raw_batches,
+                               params, options)
+
+    def _aggregate(self, aggregate, params, options):
+        kwargs = aggregate_kwargs(self._cursor_options(params, options))
+        cursor = aggregate(self._build_spec(params), **kwargs)
+        batch_size = kwargs['cursor'].get('batchSize')
+        if batch_size is not None:
+            ## The size of the following batches (getMore)
+            cursor = cursor.batch_size(batch_size)
+        return cursor
 
     def _get_pipeline_to_mongo(self):
-        return [to_mongo(i) for i in self.pipeline]
+        return self._build_spec()
 
     def to_mongo(self):
         return {
@@ -64,60 +622,667 @@ class AggregateOperation(DatabaseOperation):
         }
 
 
+class ExplainOperation(DatabaseOperation):
+    """
+    ``EXPLAIN [ANALYZE] <operation>``: running it returns how the
+    operation is translated, planned and (with ANALYZE) executed;
+    see ``mongosql.explain``.
+    """
+
+    __slots__ = ('operation', 'analyze', '_source')
+
+    def __init__(self, operation, analyze=False):
+        super(ExplainOperation, self).__init__()
+        self.operation = operation
+        self.analyze = analyze
+        ## (query, engine, tokenizer, rules) the operation was
+        ## parsed with, set by ``parse()``, to time the phases.
+        self._source = None
+
+    def clone(self):
+        other = super(ExplainOperation, self).clone()
+        other.operation = self.operation.clone()
+        return other
+
+    def bind(self, params):
+        other = self.clone()
+        other.operation = bind(self.operation, params)
+        return other
+
+    def _spec_source(self):
+        return self.operation._spec_source()
+
+    def to_shape(self):
+        return '{0} {1}'.format(
+            'EXPLAIN ANALYZE' if self.analyze else 'EXPLAIN',
+            shape(self.operation))
+
+    def apply(self, db, params=None, options=None):
+        """Explain the operation on ``db``: returns a report (dict)"""
+        from mongosql.explain import explain
+        return explain(self, db, params, options)
+
+
+class ExportOperation(DatabaseOperation):
+    """
+    ``<operation> INTO OUTFILE 'path' [FORMAT <format>]``: write the
+    results of a SELECT or AGGREGATE to a file, as they're read;
+    see ``mongosql.export``. Without FORMAT, it comes from the file
+    extension.
+    """
+
+    __slots__ = ('operation', 'target', 'format')
+
+    def __init__(self, operation, target, format=None):
+        super(ExportOperation, self).__init__()
+        self.operation = operation
+        self.target = target  # Path, or Parameter
+        self.format = format
+
+    def clone(self):
+        other = super(ExportOperation, self).clone()
+        other.operation = self.operation.clone()
+        return other
+
+    def bind(self, params):
+        other = self.clone()
+        other.operation = bind(self.operation, params)
+        other.target = bind(self.target, params)
+        return other
+
+    def _spec_source(self):
+        return self.operation._spec_source()
+
+    def to_shape(self):
+        return '{0} INTO OUTFILE {1}{2}'.format(
+            shape(self.operation), shape(self.target),
+            '' if self.format is None else ' FORMAT ' + self.format)
+
+    def apply(self, db, params=None, options=None):
+        """
+        Export the results to the file: returns ``{'exported': n}``
+        """
+        from mongosql.export import export
+        target = self.target
+        if params is not None:
+            target = bind(target, params)
+        if not isinstance(target, basestring):
+            raise ValueError("Invalid path: {0!r}".format(target))
+        return export(db, self.operation, target, self.format, params,
+                      options=options)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class WriteOperation(DatabaseOperation):
+    """
+    Common base of INSERT, UPDATE and DELETE: running them returns
+    the counts of documents written, as a dict.
+
+    ``apply_many()`` runs the statement once per set of parameter
+    values, sending the writes in unordered batches of
+    ``chunk_size`` (``bulk_write()`` / ``insert_many()``).
+    """
+
+    __slots__ = ('collection',)
+
+    option_names = write_options
+
+    default_chunk_size = 1000
+
+    def __init__(self, collection, options=None):
+        super(WriteOperation, self).__init__(options)
+        self.collection = intern_name(collection)
+
+    def _write_options(self, params, defaults):
+        options = dict(
+            (name, to_mongo(value)) for name, value in
+            self._cursor_options(params, defaults).iteritems())
+        chunk_size = options.pop('chunk_size', self.default_chunk_size)
+        if not isinstance(chunk_size, (int, long)) or chunk_size < 1:
+            raise ValueError("Invalid chunk_size: {0!r}".format(chunk_size))
+        kwargs = {'ordered': bool(options.pop('ordered', False))}
+        if options.pop('bypass_document_validation', False):
+            kwargs['bypass_document_validation'] = True
+        return chunk_size, kwargs, options
+
+    def apply(self, db, params=None, options=None):
+        """
+        Run the statement on ``db``; ``params`` are the values
+        for the parameters, if any (see ``bind()``).
+
+        ``options`` are the defaults for the ``WITH (...)`` clause.
+        """
+        return self._write(db, [params], self._write_options(params, options))
+
+    def apply_many(self, db, params_seq, options=None):
+        """
+        Run the statement once for each set of parameter values in
+        ``params_seq`` (which can be a generator): returns the total
+        counts. Options in the ``WITH (...)`` clause can't be
+        parameters here.
+        """
+        return self._write(db, params_seq, self._write_options(None, options))
+
+    def _write(self, db, params_seq, options):
+        raise NotImplementedError
+
+
+class InsertOperation(WriteOperation):
+    """``INSERT INTO <collection> VALUES <document>, ...``"""
+
+    __slots__ = ('documents',)
+
+    def __init__(self, collection, documents, options=None):
+        super(InsertOperation, self).__init__(collection, options)
+        self.documents = documents  # [Map or Parameter]
+
+    def clone(self):
+        other = super(InsertOperation, self).clone()
+        other.documents = list(self.documents)
+        return other
+
+    def bind(self, params):
+        other = self.clone()
+        other.documents = bind(self.documents, params)
+        if self.options is not None:
+            other.options = self._bind_options(params)
+        return other
+
+    def _spec_source(self):
+        return self.documents
+
+    def to_shape(self):
+        return 'INSERT INTO {0} VALUES {1}{2}'.format(
+            self.collection, ', '.join(shape(d) for d in self.documents),
+            self._options_shape())
+
+    def _write(self, db, params_seq, options):
+        chunk_size, kwargs, _ = options
+        collection = db[self.collection]
+        documents = itertools.chain.from_iterable(
+            self._build_spec(params) for params in params_seq)
+        inserted = 0
+        for chunk in _chunks(documents, chunk_size):
+            result = collection.insert_many(chunk, **kwargs)
+            inserted += len(result.inserted_ids)
+        return {'inserted': inserted}
+
+
+class _FilteredWriteOperation(WriteOperation):
+    """Writes to the documents matching a ``WHERE`` condition"""
+
+    __slots__ = ('query',)
+
+    def __init__(self, collection, query=None, options=None):
+        super(_FilteredWriteOperation, self).__init__(collection, options)
+        self.query = query
+
+    def bind(self, params):
+        other = self.clone()
+        other.query = bind(self.query, params)
+        if self.options is not None:
+            other.options = self._bind_options(params)
+        return other
+
+    def _where_shape(self):
+        if self.query is None:
+            return ''
+        return ' WHERE ' + shape(self.query)
+
+    def _filter(self, spec):
+        return {} if spec is None else spec
+
+
+class UpdateOperation(_FilteredWriteOperation):
+    """
+    ``UPDATE <collection> SET <name> = <expression>, ... WHERE ...``
+
+    Values are set with ``$set``; when any is an expression (like
+    ``n = '$n' + 1``), the update is a pipeline, where ``'$name'``
+    strings refer to the fields of the document.
+    """
+
+    __slots__ = ('assignments',)
+
+    option_names = write_options + update_options
+
+    def __init__(self, collection, assignments, query=None, options=None):
+        super(UpdateOperation, self).__init__(collection, query, options)
+        self.assignments = assignments  # [assignment(name, expression)]
+
+    def clone(self):
+        other = super(UpdateOperation, self).clone()
+        other.assignments = list(self.assignments)
+        return other
+
+    def bind(self, params):
+        other = super(UpdateOperation, self).bind(params)
+        other.assignments = [
+            item._replace(expression=bind(item.expression, params))
+            for item in self.assignments]
+        return other
+
+    def _update_source(self):
+        update = Map({'$set': Map(
+            (item.name, item.expression) for item in self.assignments)})
+        if any(isinstance(item.expression, Expression)
+               for item in self.assignments):
+            return [update]  # Pipeline
+        return update
+
+    def _spec_source(self):
+        return [self.query, self._update_source()]
+
+    def to_shape(self):
+        return 'UPDATE {0} SET {1}{2}{3}'.format(
+            self.collection, _assignments_shape(self.assignments),
+            self._where_shape(), self._options_shape())
+
+    def _write(self, db, params_seq, options):
+        chunk_size, kwargs, extra = options
+        upsert = bool(extra.get('upsert', False))
+        collection = db[self.collection]
+        counts = {'matched': 0, 'modified': 0, 'upserted': 0}
+        if isinstance(params_seq, list) and len(params_seq) == 1:
+            kwargs.pop('ordered')
+            query, update = self._build_spec(params_seq[0])
+            result = collection.update_many(
+                self._filter(query), update, upsert=upsert, **kwargs)
+            counts['matched'] = result.matched_count
+            counts['modified'] = result.modified_count
+            counts['upserted'] = int(result.upserted_id is not None)
+            return counts
+
+        from pymongo import UpdateMany
+        requests = (
+            UpdateMany(self._filter(query), update, upsert=upsert)
+            for query, update in (
+                self._build_spec(params) for params in params_seq))
+        for chunk in _chunks(requests, chunk_size):
+            result = collection.bulk_write(chunk, **kwargs)
+            counts['matched'] += result.matched_count
+            counts['modified'] += result.modified_count
+            counts['upserted'] += result.upserted_count
+        return counts
+
+
+class DeleteOperation(_FilteredWriteOperation):
+    """``DELETE FROM <collection> WHERE ...``"""
+
+    __slots__ = ()
+
+    def _spec_source(self):
+        return self.query
+
+    def to_shape(self):
+        return 'DELETE FROM {0}{1}{2}'.format(
+            self.collection, self._where_shape(), self._options_shape())
+
+    def _write(self, db, params_seq, options):
+        chunk_size, kwargs, _ = options
+        kwargs.pop('bypass_document_validation', None)
+        collection = db[self.collection]
+        if isinstance(params_seq, list) and len(params_seq) == 1:
+            kwargs.pop('ordered')
+            result = collection.delete_many(
+                self._filter(self._build_spec(params_seq[0])), **kwargs)
+            return {'deleted': result.deleted_count}
+
+        from pymongo import DeleteMany
+        requests = (
+            DeleteMany(self._filter(self._build_spec(params)))
+            for params in params_seq)
+        deleted = 0
+        for chunk in _chunks(requests, chunk_size):
+            deleted += collection.bulk_write(chunk, **kwargs).deleted_count
+        return {'deleted': deleted}
+
+
+class CopyOperation(WriteOperation):
+    """
+    ``COPY <collection> FROM 'path' FORMAT csv|jsonl``: insert the
+    documents of a file, read by the client (see ``mongosql.loader``).
+    The path can be a parameter; ``apply_many()`` loads several files.
+    """
+
+    __slots__ = ('source', 'format')
+
+    option_names = write_options + copy_options
+
+    def __init__(self, collection, source, format, options=None):
+        super(CopyOperation, self).__init__(collection, options)
+        self.source = source  # Path, or Parameter
+        self.format = format
+
+    def bind(self, params):
+        other = self.clone()
+        other.source = bind(self.source, params)
+        if self.options is not None:
+            other.options = self._bind_options(params)
+        return other
+
+    def _spec_source(self):
+        return self.source
+
+    def to_shape(self):
+        return 'COPY {0} FROM {1} FORMAT {2}{3}'.format(
+            self.collection, shape(self.source), self.format,
+            self._options_shape())
+
+    def _write(self, db, params_seq, options):
+        ## Imported here, as the loader depends on this module
+        from mongosql.loader import load
+        chunk_size, kwargs, extra = options
+        kwargs.update(extra)  # workers, delimiter
+        inserted = 0
+        for params in params_seq:
+            source = self._build_spec(params)
+            if not isinstance(source, basestring):
+                raise ValueError("Invalid path: {0!r}".format(source))
+            inserted += load(db, self.collection, source, self.format,
+                             chunk_size=chunk_size, **kwargs)['inserted']
+        return {'inserted': inserted}
+
+
 class AggregateCmdProject(object):
     """Aggregation framework: $project command"""
 
+    __slots__ = ('_args',)
+
+    operator = '$project'
+    keyword = 'PROJECT'
+
     def __init__(self, args):
         self._args = args
 
-    def to_mongo(self):
+    def _bind_args(self, params):
+        return [item._replace(expression=bind(item.expression, params))
+                for item in self._args]
+
+    def bind(self, params):
+        return self.__class__(self._bind_args(params))
+
+    def _args_to_mongo(self):
         ## Named expressions are just squashed in the same dict.
         ## Any previously defined project: will be overridden.
         ## todo: should we merge instead?
-        projection = dict(
+        return dict(
             (to_mongo(item.name), to_mongo(item.expression))
             for item in self._args)
-        return {'$project': projection}
+
+    def to_mongo(self):
+        return {self.operator: self._args_to_mongo()}
+
+    def to_shape(self):
+        return '{0} {1}'.format(self.keyword, _assignments_shape(self._args))
+
+
+class AggregateCmdGeoNear(AggregateCmdProject):
+    """
+    Aggregation framework: $geoNear command; takes the options
+    (``near``, ``distanceField``, ..) as an assignment list.
+    """
+
+    __slots__ = ()
+
+    operator = '$geoNear'
+    keyword = 'GEO_NEAR'
+
+
+class AggregateCmdGroup(AggregateCmdProject):
+    """
+    Aggregation framework: $group command. ``key`` is the ``BY``
+    expression, accumulators are the assignments:
+
+    GROUP BY '$author', total = sum('$views')
+    -> {'$group': {'_id': '$author', 'total': {'$sum': '$views'}}}
+
+    A bare field name is the value of that field: ``GROUP BY author``
+    is ``GROUP BY '$author'``.
+    """
+
+    __slots__ = ('key',)
+
+    operator = '$group'
+    keyword = 'GROUP'
+
+    def __init__(self, args, key=None):
+        super(AggregateCmdGroup, self).__init__(args)
+        self.key = key
+
+    def bind(self, params):
+        return self.__class__(self._bind_args(params), bind(self.key, params))
+
+    def _args_to_mongo(self):
+        key = self.key
+        if isinstance(key, Symbol):
+            key = '${0}'.format(key.name)
+        group = {'_id': to_mongo(key)}
+        for item in self._args:
+            expression = item.expression
+            ## Accumulators take a single argument
+            if (isinstance(expression, FunctionCall) and
+                    len(expression.args) == 1):
+                value = {'${0}'.format(expression.function):
+                         to_mongo(expression.args[0])}
+            else:
+                value = to_mongo(expression)
+            group[to_mongo(item.name)] = value
+        return group
+
+    def to_shape(self):
+        if self.key is None:
+            return super(AggregateCmdGroup, self).to_shape()
+        return 'GROUP BY {0}, {1}'.format(
+            shape(self.key), _assignments_shape(self._args))
+
+
+class AggregateCmdMatch(object):
+    """Aggregation framework: $match command"""
+
+    __slots__ = ('query',)
+
+    operator = '$match'
+
+    def __init__(self, query):
+        self.query = query  # Query() object
+
+    def bind(self, params):
+        return self.__class__(bind(self.query, params))
+
+    def to_mongo(self):
+        query = to_mongo(self.query)
+        return {self.operator: {} if query is None else query}
+
+    def to_shape(self):
+        return 'MATCH ' + shape(self.query)
+
+
+class _AggregateCmdValue(object):
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value  # int
+
+    def bind(self, params):
+        return self.__class__(bind(self.value, params))
+
+    def to_mongo(self):
+        return {self.operator: to_mongo(self.value)}
+
+    def to_shape(self):
+        return self.keyword + ' ?'
+
+
+class AggregateCmdLimit(_AggregateCmdValue):
+    """Aggregation framework: $limit command"""
+
+    __slots__ = ()
+
+    operator = '$limit'
+    keyword = 'LIMIT'
+
+
+class AggregateCmdSkip(_AggregateCmdValue):
+    """Aggregation framework: $skip command"""
+
+    __slots__ = ()
+
+    operator = '$skip'
+    keyword = 'SKIP'
+
+
+class AggregateCmdUnwind(object):
+    """Aggregation framework: $unwind command"""
+
+    __slots__ = ('path',)
+
+    operator = '$unwind'
+
+    def __init__(self, path):
+        ## Field name, without the leading $
+        self.path = intern_name(path[1:] if path.startswith('$') else path)
+
+    def bind(self, params):
+        return self
+
+    def to_mongo(self):
+        return {self.operator: '$' + self.path}
+
+    def to_shape(self):
+        return 'UNWIND ' + self.path
+
+
+class AggregateCmdSort(object):
+    """Aggregation framework: $sort command"""
+
+    __slots__ = ('sort',)
+
+    operator = '$sort'
+
+    def __init__(self, sort):
+        self.sort = sort  # OrderedDict: {field: direction}
+
+    def bind(self, params):
+        return self
+
+    def to_mongo(self):
+        return {self.operator: OrderedDict(self.sort)}
+
+    def to_shape(self):
+        return 'ORDER BY ' + _sort_shape(self.sort)
 
 
 class Symbol(object):
     """Used to represent generic symbols"""
 
+    __slots__ = ('name',)
+
     def __init__(self, name):
-        self.name = name
+        self.name = intern_name(name)
+
+    def bind(self, params):
+        return self
 
     def to_mongo(self):
         return self.name  # Name is used as-is..
 
+    def to_shape(self):
+        return self.name
+
+
+class Parameter(object):
+    """
+    Placeholder for a value to be bound later.
+
+    The key is an int for positional (``?``) parameters,
+    a string for named (``:name``) ones.
+    """
+
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def bind(self, params):
+        try:
+            return params[self.key]
+        except (KeyError, IndexError, TypeError):
+            raise BindError(
+                "No value supplied for parameter {0!r}".format(self))
+
+    def to_mongo(self):
+        raise BindError("Unbound parameter: {0!r}".format(self))
+
+    def to_shape(self):
+        return '?'
+
+    def __repr__(self):
+        if isinstance(self.key, basestring):
+            return ':{0}'.format(self.key)
+        return '?{0}'.format(self.key)
+
 
 class Map(dict):
     """Wrapper around dict, allowing to_mongo() serialization"""
 
+    __slots__ = ()
+
+    def bind(self, params):
+        return Map((key, bind(val, params)) for key, val in self.iteritems())
+
     def to_mongo(self):
         return dict((key, to_mongo(val)) for key, val in self.iteritems())
 
+    def to_shape(self):
+        return '{{{0}}}'.format(', '.join(sorted(
+            '{0} = {1}'.format(key, shape(val))
+            for key, val in self.iteritems())))
+
 
 class Expression(object):
     """Common base for expressions"""
-    pass
+
+    __slots__ = ()
+
+    def fingerprint(self):
+        return fingerprint(self)
 
 
 class NamedExpression(Expression):
+    __slots__ = ('name', 'expression')
+
     def __init__(self, name, expression):
-        self.name = name
+        self.name = intern_name(name)
         assert isinstance(self.name, basestring)
         self.expression = expression
 
+    def bind(self, params):
+        return NamedExpression(self.name, bind(self.expression, params))
+
     def to_mongo(self):
         return {self.name: to_mongo(self.expression)}
 
+    def to_shape(self):
+        return '{0} AS {1}'.format(shape(self.expression), self.name)
+
 
 class OperationBase(Expression):
+    __slots__ = ('first', 'operator', 'second')
+
     operator_names = {}
 
     def __init__(self, first, operator, second):
         self.first = first
-        self.operator = operator.upper()  # Always uppercase..
+        self.operator = intern_name(operator.upper())  # Always uppercase..
         self.second = second
 
     def _get_operator(self):
@@ -125,13 +1290,24 @@ class OperationBase(Expression):
             return self.operator_names[self.operator]
         raise ValueError("Invalid operator: {0!r}".format(self.operator))
 
+    def bind(self, params):
+        return self.__class__(
+            bind(self.first, params), self.operator,
+            bind(self.second, params))
+
     def to_mongo(self):
         return {
             self._get_operator(): [
                 to_mongo(x) for x in (self.first, self.second)]}
 
+    def to_shape(self):
+        return '({0} {1} {2})'.format(
+            shape(self.first), self.operator, shape(self.second))
+
 
 class Operation(OperationBase):
+    __slots__ = ()
+
     operator_names = {
         '+': '$add',
         '-': '$subtract',
@@ -142,6 +1318,8 @@ class Operation(OperationBase):
 
 
 class Comparison(OperationBase):
+    __slots__ = ()
+
     operator_names = {
         '<': '$lt',
         '<=': '$lte',
@@ -162,8 +1340,14 @@ class Comparison(OperationBase):
             return {to_mongo(self.first): {op: to_mongo(self.second)}}
         raise NotImplementedError("What should I do?")
 
+    def to_shape(self):
+        return '{0} {1} {2}'.format(
+            shape(self.first), self.operator, shape(self.second))
+
 
 class LogicalOperationBase(OperationBase):
+    __slots__ = ('_expressions',)
+
     def __init__(self, *expressions):
         self._expressions = []
         for expr in expressions:
@@ -177,9 +1361,22 @@ class LogicalOperationBase(OperationBase):
         else:
             self._expressions.append(expr)
 
+    def bind(self, params):
+        return self.__class__(*[bind(e, params) for e in self._expressions])
+
     def _expressions_to_mongo(self):
         return [to_mongo(e) for e in self._expressions]
 
+    def to_shape(self):
+        ## Operands are sorted: the order doesn't change the meaning
+        shapes = []
+        for expr in self._expressions:
+            text = shape(expr)
+            if isinstance(expr, LogicalOperationBase):
+                text = '({0})'.format(text)
+            shapes.append(text)
+        return ' {0} '.format(self.keyword).join(sorted(shapes))
+
     def __repr__(self):
         return "{0}({1})".format(
             self.__class__.__name__,
@@ -187,22 +1384,105 @@ class LogicalOperationBase(OperationBase):
 
 
 class LogicalAnd(LogicalOperationBase):
+    __slots__ = ()
+
+    keyword = 'AND'
+
     def to_mongo(self):
         return {'$and': self._expressions_to_mongo()}
 
 
+class Conjunction(LogicalAnd):
+    """
+    Logical AND, rendered as an implicit conjunction: conditions are
+    merged in the same document, grouped by field, and an explicit
+    ``$and`` is only used for what doesn't fit in there.
+
+    ``a == 1 AND b > 2 AND b < 5`` -> ``{'a': 1, 'b': {'$gt': 2, '$lt': 5}}``
+    """
+
+    __slots__ = ()
+
+    def to_mongo(self):
+        fields, names, others = {}, [], []
+        for expr in self._expressions:
+            if (not isinstance(expr, Comparison) or
+                    not isinstance(expr.first, Symbol)):
+                others.append(to_mongo(expr))
+                continue
+            name, op = expr.first.name, expr._get_operator()
+            conditions = fields.get(name)
+            if conditions is None:
+                conditions = fields[name] = {}
+                names.append(name)
+            if op in conditions:  # Same operator twice on a field
+                others.append(to_mongo(expr))
+            else:
+                conditions[op] = to_mongo(expr.second)
+
+        spec = {}
+        for name in names:
+            conditions = fields[name]
+            if len(conditions) == 1 and '$eq' in conditions:
+                spec[name] = conditions['$eq']
+            else:
+                spec[name] = conditions
+        extra = []
+        for other in others:
+            if (isinstance(other, dict) and '$and' not in other and
+                    not any(key in spec for key in other)):
+                spec.update(other)
+            else:
+                extra.append(other)
+        if extra:
+            spec['$and'] = extra
+        return spec
+
+
+class MatchNothing(Expression):
+    """A condition no document can satisfy"""
+
+    __slots__ = ()
+
+    def bind(self, params):
+        return self
+
+    def to_mongo(self):
+        return {'_id': {'$in': []}}
+
+    def to_shape(self):
+        return 'FALSE'
+
+    def __repr__(self):
+        return '{0}()'.format(self.__class__.__name__)
+
+
 class LogicalOr(LogicalOperationBase):
+    __slots__ = ()
+
+    keyword = 'OR'
+
     def to_mongo(self):
         return {'$or': self._expressions_to_mongo()}
 
 
-class LogicalNot(object):
+class LogicalNot(Expression):
+    __slots__ = ('_expression',)
+
     def __init__(self, expression):
         self._expression = expression
 
+    def bind(self, params):
+        return LogicalNot(bind(self._expression, params))
+
     def to_mongo(self):
         return {'$not': to_mongo(self._expression)}
 
+    def to_shape(self):
+        if isinstance(self._expression, LogicalOperationBase):
+            return 'NOT ({0})'.format(shape(self._expression))
+        return 'NOT ' + shape(self._expression)
+
     def __repr__(self):
         return "{0}({1})".format(
             self.__class__.__name__,
@@ -217,10 +1497,15 @@ class FunctionCall(Expression):
     func(a, b, c) -> {'$func': [a, b, c]}
     """
 
+    __slots__ = ('function', 'args')
+
     def __init__(self, function, args):
-        self.function = function
+        self.function = intern_name(function)
         self.args = args
 
+    def bind(self, params):
+        return FunctionCall(self.function, bind(self.args, params))
+
     def to_mongo(self):
         return {
             '${0}'.format(self.function): [
@@ -228,6 +1513,10 @@ class FunctionCall(Expression):
             ]
         }
 
+    def to_shape(self):
+        return '{0}({1})'.format(
+            self.function, ', '.join(shape(a) for a in self.args))
+
     def __repr__(self):
         return "{0}({1})".format(
             self.function,
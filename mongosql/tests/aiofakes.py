@@ -0,0 +1,97 @@
+"""
+Async stand-ins for an async driver (pymongo's ``AsyncMongoClient``,
+Motor), over the in-memory ``fakes``. Python >= 3.5 only.
+
+Cursors hand out their documents a batch at a time, after ``delay``
+seconds, counting the ones ``fetched`` and whether they got
+``killed`` before the end.
+"""
+
+import asyncio
+
+from mongosql.tests.fakes import FakeDatabase
+
+
+class FakeAsyncCursor(object):
+    def __init__(self, cursor, delay=0):
+        self.cursor = cursor  # FakeCursor
+        self.delay = delay
+        self.fetched = 0
+        self.killed = False
+        self.closed = False
+        self._batch = []
+
+    def __getattr__(self, name):
+        ## Cursor options
+        method = getattr(self.cursor, name)
+
+        def wrapper(*args):
+            method(*args)
+            return self
+        return wrapper
+
+    @property
+    def options(self):
+        return self.cursor.options
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._batch:
+            documents = self.cursor._documents
+            if self.closed or self.fetched == len(documents):
+                raise StopAsyncIteration
+            await asyncio.sleep(self.delay)
+            size = self.cursor.options.get('batch_size') or 101
+            self._batch = documents[self.fetched:self.fetched + size]
+            self.fetched += len(self._batch)
+        return self._batch.pop(0)
+
+    async def close(self):
+        if not self.closed:
+            self.closed = True
+            self.killed = self.fetched < len(self.cursor._documents)
+
+
+class FakeAsyncCollection(object):
+    """find() returns a cursor, aggregate() a coroutine, as pymongo's"""
+
+    def __init__(self, collection, delay=0):
+        self.collection = collection
+        self.delay = delay
+        self.cursors = []
+
+    def find(self, **kwargs):
+        cursor = FakeAsyncCursor(self.collection.find(**kwargs), self.delay)
+        self.cursors.append(cursor)
+        return cursor
+
+    async def aggregate(self, pipeline, **kwargs):
+        await asyncio.sleep(self.delay)
+        cursor = FakeAsyncCursor(
+            self.collection.aggregate(pipeline, **kwargs), self.delay)
+        self.cursors.append(cursor)
+        return cursor
+
+
+class FakeAsyncDatabase(object):
+    def __init__(self, database=None, delay=0):
+        self.database = database if database is not None else FakeDatabase()
+        self.delay = delay
+        self.collections = {}
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = FakeAsyncCollection(
+                self.database[name], self.delay)
+        return self.collections[name]
+
+
+class FakeAsyncClient(dict):
+    def __missing__(self, name):
+        database = self[name] = FakeAsyncDatabase()
+        return database
+
+    def close(self):
+        pass
@@ -0,0 +1,7 @@
+import sys
+
+## async / await syntax: the asyncio client is Python >= 3.5 only, and
+## not installed before (see setup.py)
+collect_ignore = []
+if sys.version_info < (3, 5):
+    collect_ignore.append('test_aio.py')
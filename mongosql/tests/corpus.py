@@ -0,0 +1,153 @@
+"""
+Corpus of queries, shared by the tests comparing different
+implementations (of the tokenizer, parser, ..) against each other.
+"""
+
+from collections import OrderedDict
+
+from mongosql.support import slot_names
+
+QUERIES = [
+    ## From test_lexer
+    """
+    SELECT one, two FROM table
+    MATCH field == "value"
+    GROUP _id = name, count = sum(1);
+    """,
+    """
+    SELECT one, two  # This is a comment
+    FROM table  // The table!
+    SORT one ASC;
+    -- Will ignore this too!
+    """,
+    """
+    SELECT one, /* two, */ three /* , four */
+    FROM table /*
+    This just a comment: /* <-- This is cool
+    */ SORT one ASC;
+    """,
+    """
+    Nesting /* comments is /* not */ allowed: */ is starslash;
+    """,
+
+    ## From test_parser
+    "SELECT * FROM mycollection WHERE field == 'value'",
+    """
+    SELECT field, field1, field2
+    FROM mycollection
+    WHERE field == 'value'
+    LIMIT 100 SKIP 20
+    SORT field1 ASC, field2 DESC
+    """,
+    'SELECT * FROM coll WHERE foo == "Spam" AND bar == "Eggs"',
+
+    ## From test_cursor_options
+    "SELECT * FROM c WHERE a == 1 WITH (batch_size = 500, hint = 'a_1')",
+    'SELECT a FROM c WITH (max_time_ms = ?, exhaust) LIMIT 10',
+
+    ## From test_parser_aggregation
+    'AGGREGATE article PROJECT title = 1, author = 1',
+    'AGGREGATE article PROJECT _id = 0, title = 1, author = 1',
+    'AGGREGATE article PROJECT title = 1, '
+    'doctoredPageViews = "$pageViews" + 10',
+    """
+    AGGREGATE article
+    PROJECT title = 1,
+            page_views = '$pageViews',
+            bar = '$other.foo'
+    """,
+    """
+    AGGREGATE article
+    PROJECT title = 1,
+            stats = {
+                pv = '$pageViews',
+                foo = '$other.foo',
+                dpv = '$pageViews' + 10,
+            }
+    """,
+
+    ## From the functional tests
+    'SELECT * FROM mycollection',
+    'SELECT * FROM mycollection WHERE item == "apple"',
+    """
+    SELECT * FROM mycollection
+    WHERE item == "apple" OR item == "banana"
+    """,
+    """
+    SELECT * FROM mycollection
+    WHERE item IN ["apple", "banana"] OR price > 20
+    """,
+    "SELECT * FROM mycollection WHERE price > 12",
+    "SELECT * FROM mycollection WHERE price >= 12",
+    "SELECT * FROM mycollection WHERE price < 12",
+    "SELECT * FROM mycollection WHERE price <= 12",
+    "SELECT * FROM mycollection WHERE price <= 10 or price > 18",
+
+    ## Parameters
+    'SELECT * FROM coll WHERE a == ? AND b IN [?, ?] LIMIT ? SKIP ?',
+    'SELECT * FROM coll WHERE name == :name OR age > :age',
+    'AGGREGATE article PROJECT score = "$pageViews" + :bonus, tags = [?]',
+
+    ## Misc expressions
+    "select a.b.c from Coll where a.b.c != null and d == true",
+    "SELECT * FROM c WHERE (a + 2) * 3 - -4.5 / b % 7 < 10.25",
+    "SELECT * FROM c WHERE x == 'it\\'s' OR y == \"say \\\"hi\\\"\\n\"",
+    "SELECT * FROM c WHERE s == '\\x41\\t\\65\\\\'",
+    "SELECT * FROM c WHERE a == 1 AND b == 2 AND (c == 3 OR d == 4)",
+    "SELECT * FROM c WHERE a IN [1, 2, 3,] ORDER BY a DESC, b",
+    "SELECT * FROM c WHERE f == {x: [1, {y = 2}]}",
+    "SELECT * FROM c WHERE f == {\"x\":false} LIMIT 1",
+    "SELECT a FROM c SORT BY a ORDER b DESC SKIP 3;",
+    "AGGREGATE c PROJECT total = add('$a', '$b', 3), n = size()",
+    "AGGREGATE c PROJECT x = 1 PROJECT y = '$x' * 2;;",
+    """
+    AGGREGATE orders
+    MATCH status == 'paid' AND total > 100
+    UNWIND items
+    GROUP BY '$items.sku', count = sum(1), revenue = sum('$items.price')
+    SORT revenue DESC, _id
+    SKIP ? LIMIT 10
+    """,
+    "AGGREGATE places GEO_NEAR near = {type = 'Point', coordinates = [1, 2]}, "
+    "distanceField = 'dist', spherical = true MATCH dist < 100",
+    "AGGREGATE c UNWIND '$tags' GROUP total = sum('$n') ORDER BY total",
+    'AGGREGATE c GROUP BY a.b, n = sum(1) GROUP BY {x = _id}, m = max(n)',
+    'AGGREGATE c WITH (batch_size = 10) MATCH a > 1 WITH (allow_disk_use)',
+    'EXPLAIN SELECT a FROM c WHERE b > 1 ORDER BY a',
+    'EXPLAIN ANALYZE AGGREGATE c MATCH a == ? LIMIT 5;',
+    "INSERT INTO c VALUES {a = 1, b = [2]}, ?, {\"x\": :x} WITH (ordered)",
+    'UPDATE c SET a = 1, n = "$n" + ? WHERE b > 2 AND c IN [1, 2]',
+    'UPDATE c SET a = ? WITH (upsert, chunk_size = 10);',
+    'DELETE FROM c WHERE a == 1 OR b != 2',
+    'DELETE FROM c WITH (bypass_document_validation)',
+    "COPY c FROM '/data/c.csv' FORMAT csv WITH (workers = 2, ordered)",
+    'COPY c FROM ? FORMAT JSONL;',
+    "SELECT a, b FROM c WHERE a > 1 INTO OUTFILE '/tmp/c.csv' FORMAT csv",
+    'AGGREGATE c MATCH a == ? WITH (batch_size = 5) INTO OUTFILE :path',
+    'SELECT _id FROM c WITH (raw, batch_size = 100)',
+    "AGGREGATE c MATCH a > 1 WITH (raw = ?) INTO OUTFILE 'c.bson' FORMAT bson",
+    'SELECT * FROM c WHERE a == {k :v} AND b == {"k" :1} LIMIT :n',
+    "SELECT * FROM c WHERE a == {k: :x} AND b IN:y",
+    "1 + 2 * 3",
+    "concat('a', 'b') == 'ab'",
+    "\tSELECT\t*\tFROM\tc\n\n\nWHERE\ta==1",
+]
+
+
+def dump(obj):
+    """Structural representation of a parsed object, for comparisons"""
+    name = type(obj).__name__
+    if isinstance(obj, OrderedDict):
+        return (name, [(k, dump(v)) for k, v in obj.items()])
+    if isinstance(obj, dict):
+        return (name, sorted((k, dump(v)) for k, v in obj.items()))
+    if isinstance(obj, (list, tuple)):
+        return (name, [dump(x) for x in obj])
+    if hasattr(obj, '__dict__'):
+        return (name, sorted((k, dump(v)) for k, v in vars(obj).items()))
+    slots = slot_names(type(obj))
+    if slots:
+        return (name, sorted(
+            (k, dump(getattr(obj, k, None))) for k in slots
+            if k not in ('_compiled', '_source')))
+    return obj
@@ -0,0 +1,542 @@
+"""
+In-memory stand-ins for MongoDB, to check what the generated
+specs actually do without a server.
+
+``matches(spec, document)`` implements the MongoDB query semantics
+for the subset of operators MongoSQL generates: implicit equality,
+comparisons (with type brackets), ``$in``, ``$and`` / ``$or``, array
+fields (a condition holds if it holds on any element), missing fields
+(equal to null).  ``$not`` on a whole document stands for negation.
+
+``evaluate(expression)`` computes aggregation arithmetic, and
+``run_pipeline(pipeline, documents)`` runs the aggregation stages
+MongoSQL generates.
+
+``FakeDatabase`` / ``FakeCollection`` / ``FakeCursor`` stand for the
+pymongo ones (>= 3), with the same signatures, recording how they're
+called.  Documents go through BSON
+(with bson, from pymongo) for ``with_options(codec_options=...)`` and
+the ``*_raw_batches()`` methods.
+"""
+
+import copy
+import math
+import threading
+import time
+
+
+MISSING = object()
+
+_number_types = (int, long, float)
+
+
+def _bracket(value):
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, _number_types):
+        return 'number'
+    if isinstance(value, basestring):
+        return 'string'
+    if value is None or value is MISSING:
+        return 'null'
+    if isinstance(value, list):
+        return 'array'
+    return 'object'
+
+
+def _equal(first, second):
+    if _bracket(first) != _bracket(second):
+        return False
+    if isinstance(first, list):
+        return (len(first) == len(second) and
+                all(_equal(a, b) for a, b in zip(first, second)))
+    if isinstance(first, dict):
+        return (sorted(first) == sorted(second) and
+                all(_equal(first[k], second[k]) for k in first))
+    if first is MISSING or second is MISSING:
+        return True  # Both null-ish
+    return first == second
+
+
+def _candidates(value):
+    ## The value itself, plus all the elements of an array
+    if isinstance(value, list):
+        return [value] + value
+    return [value]
+
+
+def _eq(value, expected):
+    return any(_equal(v, expected) for v in _candidates(value))
+
+
+def _compare(value, operator, bound):
+    for v in _candidates(value):
+        if v is MISSING or _bracket(v) != _bracket(bound):
+            continue
+        if _bracket(v) not in ('number', 'string'):
+            continue
+        if ((operator == '$gt' and v > bound) or
+                (operator == '$gte' and v >= bound) or
+                (operator == '$lt' and v < bound) or
+                (operator == '$lte' and v <= bound)):
+            return True
+    return False
+
+
+def _is_operators(condition):
+    return (isinstance(condition, dict) and condition and
+            all(k.startswith('$') for k in condition))
+
+
+def _field_matches(value, condition):
+    if not _is_operators(condition):
+        return _eq(value, condition)
+    for operator, argument in condition.items():
+        if operator == '$eq':
+            result = _eq(value, argument)
+        elif operator == '$ne':
+            result = not _eq(value, argument)
+        elif operator == '$in':
+            result = any(_eq(value, a) for a in argument)
+        elif operator == '$nin':
+            result = not any(_eq(value, a) for a in argument)
+        elif operator in ('$gt', '$gte', '$lt', '$lte'):
+            result = _compare(value, operator, argument)
+        else:
+            raise ValueError("Unsupported operator: {0}".format(operator))
+        if not result:
+            return False
+    return True
+
+
+def matches(spec, document):
+    """Whether ``document`` matches the query ``spec``"""
+    if spec is None or spec is True:
+        return True
+    if spec is False:
+        return False
+    for name, condition in spec.items():
+        if name == '$and':
+            result = all(matches(s, document) for s in condition)
+        elif name == '$or':
+            result = any(matches(s, document) for s in condition)
+        elif name == '$not':
+            result = not matches(condition, document)
+        elif name.startswith('$'):
+            raise ValueError("Unsupported operator: {0}".format(name))
+        else:
+            result = _field_matches(document.get(name, MISSING), condition)
+        if not result:
+            return False
+    return True
+
+
+def _mod(first, second):
+    ## Truncated division, as in MongoDB
+    if second == 0:
+        raise ZeroDivisionError("$mod by zero")
+    if isinstance(first, float) or isinstance(second, float):
+        return math.fmod(first, second)
+    quotient = abs(first) // abs(second)
+    if (first < 0) != (second < 0):
+        quotient = -quotient
+    return first - second * quotient
+
+
+_arithmetic = {
+    '$add': lambda a, b: a + b,
+    '$subtract': lambda a, b: a - b,
+    '$multiply': lambda a, b: a * b,
+    '$divide': lambda a, b: float(a) / b,
+    '$mod': _mod,
+}
+
+
+def evaluate(expression, document=None):
+    """
+    Value of an aggregation expression made of arithmetic; ``$name``
+    strings refer to the fields of ``document``, if given.
+    """
+    if isinstance(expression, dict):
+        (operator, args), = expression.items()
+        first, second = [evaluate(a, document) for a in args]
+        if document is not None and (first is None or second is None):
+            return None
+        return _arithmetic[operator](first, second)
+    if (document is not None and isinstance(expression, basestring) and
+            expression.startswith('$')):
+        value = document.get(expression[1:], MISSING)
+        return None if value is MISSING else value
+    return expression
+
+
+##------------------------------------------------------------
+## Aggregation pipelines
+##------------------------------------------------------------
+
+## BSON comparison order of the type brackets
+_sort_order = ['null', 'number', 'string', 'object', 'array', 'bool']
+
+
+def _sort_key(value):
+    bracket = _bracket(value)
+    if bracket in ('number', 'string', 'bool'):
+        return (_sort_order.index(bracket), value)
+    return (_sort_order.index(bracket), 0)
+
+
+def _project(projection, document):
+    exclude = [k for k, v in projection.items() if v in (0, False)]
+    if len(exclude) == len(projection):
+        return dict((k, v) for k, v in document.items() if k not in exclude)
+    result = {}
+    if '_id' in document and '_id' not in exclude:
+        result['_id'] = document['_id']
+    for name, value in projection.items():
+        if value is True or value == 1 and not isinstance(value, bool):
+            if name in document:
+                result[name] = document[name]
+        elif name not in exclude:
+            result[name] = evaluate(value, document)
+    return result
+
+
+def _unwind(path, document):
+    value = document.get(path[1:], MISSING)
+    if value is MISSING or value is None:
+        return []
+    if not isinstance(value, list):
+        return [document]
+    return [dict(document, **{path[1:]: v}) for v in value]
+
+
+def run_pipeline(pipeline, documents):
+    """Results of an aggregation ``pipeline`` on ``documents``"""
+    documents = [dict(d) for d in documents]
+    for stage in pipeline:
+        (operator, argument), = stage.items()
+        if operator == '$match':
+            documents = [d for d in documents if matches(argument, d)]
+        elif operator == '$project':
+            documents = [_project(argument, d) for d in documents]
+        elif operator == '$unwind':
+            documents = sum([_unwind(argument, d) for d in documents], [])
+        elif operator == '$sort':
+            for name, direction in reversed(list(argument.items())):
+                documents.sort(
+                    key=lambda d: _sort_key(d.get(name, MISSING)),
+                    reverse=direction < 0)
+        elif operator == '$limit':
+            documents = documents[:argument]
+        elif operator == '$skip':
+            documents = documents[argument:]
+        else:
+            raise ValueError("Unsupported stage: {0}".format(operator))
+    return documents
+
+
+##------------------------------------------------------------
+## Database objects
+##------------------------------------------------------------
+
+## Other arguments of pymongo's ``find()``, not implemented
+_find_arguments = frozenset([
+    'no_cursor_timeout', 'cursor_type', 'allow_partial_results',
+    'oplog_replay', 'batch_size', 'collation', 'hint', 'max_time_ms',
+    'max', 'min', 'return_key', 'show_record_id', 'comment', 'session',
+    'allow_disk_use'])
+
+
+class FakeCursor(object):
+    """
+    Cursor over the documents matching a ``find()``;
+    records the options set on it in ``options``.
+    """
+
+    def __init__(self, documents, filter=None, projection=None, skip=0,
+                 limit=0, sort=None, **kwargs):
+        unknown = set(kwargs) - _find_arguments
+        if unknown:
+            raise TypeError("Unexpected find() arguments: {0}".format(
+                ', '.join(sorted(unknown))))
+        self.options = {}
+        self.flags = 0
+        self.closed = False
+        documents = [d for d in documents if matches(filter, d)]
+        sort = sort or []
+        if isinstance(sort, dict):
+            sort = list(sort.items())
+        for name, direction in reversed(sort):  # Stable sorts
+            documents.sort(key=lambda d: d.get(name), reverse=direction < 0)
+        documents = documents[skip:skip + limit if limit else None]
+        fields = projection
+        if fields is not None:
+            ## Whole embedded documents, for dotted names
+            fields = set(name.split('.')[0] for name in fields)
+            documents = [
+                dict((k, v) for k, v in d.items() if k in fields or k == '_id')
+                for d in documents]
+        else:
+            documents = [dict(d) for d in documents]
+        self._documents = documents
+
+    def _set(name):
+        def method(self, value):
+            self.options[name] = value
+            return self
+        method.__name__ = name
+        return method
+
+    batch_size = _set('batch_size')
+    max_time_ms = _set('max_time_ms')
+    hint = _set('hint')
+    comment = _set('comment')
+    del _set
+
+    def add_option(self, mask):
+        self.flags |= mask
+        return self
+
+    def close(self):
+        self.closed = True
+
+    def __iter__(self):
+        return iter(self._documents)
+
+
+class FakeRawBatchCursor(FakeCursor):
+    """
+    Cursor of ``find_raw_batches()`` / ``aggregate_raw_batches()``:
+    the documents as BSON data, a batch at a time.
+    """
+
+    def __iter__(self):
+        import bson
+        size = self.options.get('batch_size') or 101
+        for start in range(0, len(self._documents), size):
+            yield b''.join(bson.encode(document) for document
+                           in self._documents[start:start + size])
+
+
+class FakeResult(object):
+    """Result of a write: the counts pymongo results have"""
+
+    def __init__(self, **kwargs):
+        self.inserted_ids = []
+        self.matched_count = self.modified_count = 0
+        self.upserted_count = self.deleted_count = 0
+        self.upserted_id = None
+        self.__dict__.update(kwargs)
+
+
+def _update(update, document):
+    if isinstance(update, list):  # Pipeline
+        for stage in update:
+            for name, value in stage['$set'].items():
+                document[name] = evaluate(value, document)
+    else:
+        document.update(update['$set'])
+
+
+class FakeCollection(object):
+    """``indexes``: names of the (single) fields with an index"""
+
+    codec_options = None
+
+    def __init__(self, documents=(), indexes=()):
+        self.documents = list(documents)
+        self.indexes = list(indexes)
+        self.cursors = []
+        self.calls = []
+
+    def with_options(self, codec_options=None, **kwargs):
+        """The same collection (documents, records), other options"""
+        collection = copy.copy(self)
+        collection.codec_options = codec_options
+        return collection
+
+    def _decode(self, cursor):
+        ## As decoded by pymongo, a batch at a time, with the codec
+        ## options
+        if self.codec_options is not None:
+            import bson
+            cursor._documents = bson.decode_all(
+                b''.join(bson.encode(document)
+                         for document in cursor._documents),
+                self.codec_options)
+        return cursor
+
+    def find(self, *args, **kwargs):
+        return self._find(FakeCursor, args, kwargs)
+
+    def find_raw_batches(self, *args, **kwargs):
+        return self._find(FakeRawBatchCursor, args, kwargs)
+
+    def _find(self, cursor_class, args, kwargs):
+        self.calls.append(kwargs)
+        cursor = self._decode(cursor_class(self.documents, *args, **kwargs))
+        cursor.kwargs = kwargs
+        self.cursors.append(cursor)
+        return cursor
+
+    def aggregate(self, pipeline, **kwargs):
+        return self._aggregate(FakeCursor, pipeline, kwargs)
+
+    def aggregate_raw_batches(self, pipeline, **kwargs):
+        return self._aggregate(FakeRawBatchCursor, pipeline, kwargs)
+
+    def _aggregate(self, cursor_class, pipeline, kwargs):
+        self.calls.append(dict(kwargs, pipeline=pipeline))
+        cursor = self._decode(
+            cursor_class(run_pipeline(pipeline, self.documents)))
+        cursor.kwargs = kwargs
+        self.cursors.append(cursor)
+        return cursor
+
+    def insert_many(self, documents, **kwargs):
+        self.calls.append(dict(kwargs, insert=documents))
+        for document in documents:
+            document.setdefault('_id', len(self.documents))
+            self.documents.append(document)
+        return FakeResult(inserted_ids=[d['_id'] for d in documents])
+
+    def _update_many(self, spec, update, upsert=False):
+        matched = [d for d in self.documents if matches(spec, d)]
+        for document in matched:
+            _update(update, document)
+        if not matched and upsert:
+            document = dict((k, v) for k, v in spec.items()
+                            if not k.startswith('$'))
+            _update(update, document)
+            document.setdefault('_id', len(self.documents))
+            self.documents.append(document)
+            return FakeResult(upserted_id=document['_id'], upserted_count=1)
+        return FakeResult(matched_count=len(matched),
+                          modified_count=len(matched))
+
+    def update_many(self, filter, update, **kwargs):
+        self.calls.append(dict(kwargs, filter=filter, update=update))
+        return self._update_many(filter, update, kwargs.get('upsert', False))
+
+    def _delete_many(self, spec):
+        kept = [d for d in self.documents if not matches(spec, d)]
+        deleted = len(self.documents) - len(kept)
+        self.documents[:] = kept
+        return FakeResult(deleted_count=deleted)
+
+    def delete_many(self, filter, **kwargs):
+        self.calls.append(dict(kwargs, filter=filter))
+        return self._delete_many(filter)
+
+    def bulk_write(self, requests, **kwargs):
+        ## pymongo's UpdateMany / DeleteMany
+        self.calls.append(dict(kwargs, requests=requests))
+        total = FakeResult()
+        for request in requests:
+            if type(request).__name__ == 'UpdateMany':
+                result = self._update_many(
+                    request._filter, request._doc, request._upsert)
+            else:
+                result = self._delete_many(request._filter)
+            for name in ('matched_count', 'modified_count',
+                         'upserted_count', 'deleted_count'):
+                setattr(total, name,
+                        getattr(total, name) + getattr(result, name))
+        return total
+
+
+class FakeLoadCollection(FakeCollection):
+    """
+    For bulk loads: ``insert_many()`` can be called from several
+    threads, takes ``delay`` seconds and fails on the call number
+    ``fail_at``, if set; ``concurrency`` is the most calls that ran
+    at the same time.
+    """
+
+    def __init__(self, documents=(), delay=0, fail_at=None):
+        super(FakeLoadCollection, self).__init__(documents)
+        self.delay = delay
+        self.fail_at = fail_at
+        self.running = self.concurrency = 0
+        self.lock = threading.Lock()
+
+    def insert_many(self, documents, **kwargs):
+        with self.lock:
+            self.running += 1
+            self.concurrency = max(self.concurrency, self.running)
+            number = len(self.calls)
+            self.calls.append(dict(kwargs, insert=documents))
+        try:
+            time.sleep(self.delay)
+            if number == self.fail_at:
+                raise ValueError("Insert failed")
+            with self.lock:
+                for document in documents:
+                    document.setdefault('_id', len(self.documents))
+                    self.documents.append(document)
+        finally:
+            with self.lock:
+                self.running -= 1
+        return FakeResult(inserted_ids=[d['_id'] for d in documents])
+
+
+def _fake_plan(collection, query, sort):
+    ## An index on the first field of the query, or a collection scan
+    index = next((name for name in (query or {})
+                  if name in collection.indexes), None)
+    if index is None:
+        plan = {'stage': 'COLLSCAN', 'direction': 'forward'}
+        keys, examined = 0, len(collection.documents)
+    else:
+        examined = len([d for d in collection.documents
+                        if matches({index: query[index]}, d)])
+        keys = examined
+        plan = {'stage': 'FETCH', 'inputStage': {
+            'stage': 'IXSCAN', 'indexName': index + '_1',
+            'keyPattern': {index: 1}}}
+    if sort:
+        plan = {'stage': 'SORT', 'sortPattern': sort, 'inputStage': plan}
+    return plan, keys, examined
+
+
+class FakeDatabase(dict):
+    """
+    Collections are created on first access; ``command()`` only
+    knows ``explain``, with plans made up from the collection
+    ``indexes``, and records the commands in ``commands``.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(FakeDatabase, self).__init__(*args, **kwargs)
+        self.commands = []
+
+    def __missing__(self, name):
+        collection = self[name] = FakeCollection()
+        return collection
+
+    def command(self, command):
+        self.commands.append(command)
+        explained = command['explain']
+        if 'find' in explained:
+            collection = self[explained['find']]
+            query = explained.get('filter')
+            sort = explained.get('sort')
+            returned = len(list(FakeCursor(
+                collection.documents, filter=query,
+                skip=explained.get('skip', 0),
+                limit=explained.get('limit', 0))))
+        else:
+            collection = self[explained['aggregate']]
+            pipeline = explained['pipeline']
+            first = pipeline[0] if pipeline else {}
+            query, sort = first.get('$match'), None
+            returned = len(run_pipeline(pipeline, collection.documents))
+        plan, keys, examined = _fake_plan(collection, query, sort)
+        explain = {'queryPlanner': {'winningPlan': plan}}
+        if command.get('verbosity') == 'executionStats':
+            explain['executionStats'] = {
+                'nReturned': returned, 'totalKeysExamined': keys,
+                'totalDocsExamined': examined}
+        if 'aggregate' in explained:
+            explain = {'stages': [{'$cursor': explain}]}
+        return explain
@@ -0,0 +1,129 @@
+"""
+Tests for the asyncio client, against fake async collections
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from mongosql import aio
+from mongosql.aio import AsyncCursor, AsyncMongoSqlClient
+from mongosql.tests.aiofakes import FakeAsyncClient
+from mongosql.tests.fakes import FakeCollection
+from mongosql.wrapper import parse_cache
+
+
+def _run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def _client(delay=0):
+    fake = FakeAsyncClient()
+    database = fake['testdb']
+    database.delay = delay
+    database.database['c'] = FakeCollection(
+        {'_id': i, 'a': i % 4} for i in range(20))
+    return AsyncMongoSqlClient(client=fake), database
+
+
+def test_select():
+    client, fake = _client()
+
+    async def run():
+        cursor = await client.testdb.sql(
+            'SELECT * FROM c WHERE a == ? WITH (batch_size = 2)', [1])
+        assert isinstance(cursor, AsyncCursor)
+        return [document async for document in cursor]
+
+    assert _run(run()) == [{'_id': i, 'a': 1} for i in range(1, 20, 4)]
+    assert fake['c'].cursors[0].options == {'batch_size': 2}
+    assert fake['c'].cursors[0].closed
+
+
+def test_aggregate():
+    client, fake = _client(delay=0.001)
+
+    async def run():
+        cursor = await client.testdb.sql(
+            'AGGREGATE c MATCH a == 0 LIMIT 3 WITH (batch_size = 2)')
+        return await cursor.to_list()
+
+    assert _run(run()) == [{'_id': i, 'a': 0} for i in (0, 4, 8)]
+    assert fake['c'].collection.calls[0]['cursor'] == {'batchSize': 2}
+
+
+def test_backpressure():
+    ## Batches are only fetched as the documents are read
+    client, fake = _client()
+
+    async def run():
+        cursor = await client.testdb.sql(
+            'SELECT * FROM c WITH (batch_size = 5)')
+        fetched = []
+        async with cursor:
+            async for document in cursor:
+                fetched.append(fake['c'].cursors[0].fetched)
+                if len(fetched) == 7:
+                    break
+        return fetched
+
+    assert _run(run()) == [5] * 5 + [10] * 2
+    assert fake['c'].cursors[0].killed  # Left early
+
+
+def test_cancel():
+    client, fake = _client(delay=0.01)
+    read = []
+
+    async def consume():
+        cursor = await client.testdb.sql(
+            'SELECT * FROM c WITH (batch_size = 1)')
+        async for document in cursor:
+            read.append(document)
+
+    async def run():
+        task = asyncio.ensure_future(consume())
+        while len(read) < 3:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    _run(run())
+    cursor = fake['c'].cursors[0]
+    assert cursor.killed and cursor.fetched < 20
+
+
+def test_parse_in_executor(monkeypatch):
+    client, _ = _client()
+    threads = []
+    parse = aio.parse
+
+    def recording_parse(query):
+        threads.append(threading.current_thread())
+        return parse(query)
+
+    monkeypatch.setattr(aio, 'parse', recording_parse)
+    monkeypatch.setattr(aio, 'parse_in_executor', 30)
+    parse_cache.clear()
+    queries = ['SELECT * FROM c', 'SELECT * FROM c WHERE a == 1 AND _id > 3']
+
+    async def run():
+        for query in queries + queries:
+            await (await client.testdb.sql(query)).to_list()
+
+    _run(run())
+    main = threading.current_thread()
+    ## The long one in an executor, then from the cache
+    assert [thread is main for thread in threads] == [True, False, True, True]
+
+
+def test_unsupported():
+    client, _ = _client()
+    with pytest.raises(TypeError):
+        _run(client.testdb.sql('EXPLAIN SELECT * FROM c'))
@@ -0,0 +1,111 @@
+"""
+Tests for batches of queries run concurrently
+"""
+
+import threading
+import time
+
+import pytest
+
+from mongosql import parse
+from mongosql.batch import BatchResults, DeadlineExceeded, run_many
+from mongosql.lexer import LexerError
+from mongosql.parser import ParserError
+from mongosql.tests.fakes import FakeCollection, FakeDatabase
+
+
+class Database(FakeDatabase):
+    def sql(self, query, params=None):
+        return parse(query).apply(self, params)
+
+
+class GatheringCollection(FakeCollection):
+    """``find()`` waits until ``count`` calls are running at once"""
+
+    def __init__(self, documents, count):
+        super(GatheringCollection, self).__init__(documents)
+        self.count = count
+        self.running = 0
+        self.gathered = threading.Event()
+        self.lock = threading.Lock()
+
+    def find(self, *args, **kwargs):
+        with self.lock:
+            self.running += 1
+            if self.running == self.count:
+                self.gathered.set()
+        assert self.gathered.wait(5), "Not concurrent"
+        time.sleep(0.05)
+        return super(GatheringCollection, self).find(*args, **kwargs)
+
+
+def _database(collection=FakeCollection, *args):
+    db = Database()
+    db['c'] = collection(
+        [{'_id': i, 'a': i % 4} for i in range(20)], *args)
+    return db
+
+
+def test_run_many():
+    db = _database(GatheringCollection, 4)
+    queries = ['SELECT * FROM c WHERE a == {0}'.format(i) for i in range(4)]
+    for query in queries:
+        parse(query)  # Not timing the parser tables loading
+    results = run_many(db, queries, max_workers=4)
+    assert isinstance(results, BatchResults)
+    assert [r.query for r in results] == queries
+    for i, result in enumerate(results):
+        assert result.error is None
+        assert result.result() == [
+            {'_id': n, 'a': i} for n in range(i, 20, 4)]
+        assert result.duration > 0
+    stats = results.stats()
+    assert (stats['queries'], stats['unique'], stats['errors']) == (4, 4, 0)
+    assert stats['query_time'] >= stats['wall_time'] * 0.9
+    assert stats['parallelism'] > 1.5
+
+
+def test_duplicates_and_errors():
+    db = _database()
+    results = run_many(db, [
+        'SELECT * FROM c WHERE a == 1',
+        ('select * from c where a == ?', [1]),
+        'SELECT * FROM c WHERE',
+        'SELECT * FROM c WHERE a == ?',  # Missing parameter
+        ('SELECT * FROM c WHERE a == ?', [2]),
+        'EXPLAIN SELECT * FROM c',
+    ])
+    assert len(db['c'].calls) == 2
+    assert results[0].result() == results[1].result()
+    assert results[0].documents is not results[1].documents
+    assert isinstance(results[2].error, (LexerError, ParserError))
+    assert results[3].error is not None
+    with pytest.raises(Exception):
+        results[3].result()
+    assert len(results[4].result()) == 5
+    assert results[5].result()['plan']
+    assert results.stats()['unique'] == 3
+    assert results.stats()['errors'] == 2
+
+
+def test_deadline():
+    ## The first query never gets the others to run at the same time
+    db = _database(GatheringCollection, 2)
+    results = run_many(db, ['SELECT * FROM c', 'SELECT * FROM c LIMIT 1'],
+                       max_workers=1, deadline=0.05)
+    assert all(isinstance(r.error, DeadlineExceeded) for r in results)
+    assert results.wall_time < 1000
+
+
+def test_client(monkeypatch):
+    pytest.importorskip('pymongo')
+    from pymongo.collection import Collection
+    from mongosql.client import MongoSqlClient
+
+    client = MongoSqlClient('mongodb://localhost:1', connect=False)
+    fake = _database()
+    monkeypatch.setattr(Collection, 'find',
+                        lambda self, **kwargs: fake[self.name].find(**kwargs))
+    results = client.testdb.sql_many(
+        ['SELECT * FROM c LIMIT 2', 'SELECT * FROM c SKIP 19'])
+    assert [len(r.result()) for r in results] == [2, 1]
@@ -0,0 +1,128 @@
+"""
+Tests for the parse cache
+"""
+
+import threading
+
+from mongosql import parse
+from mongosql.cache import LRUCache
+from mongosql.support import SelectOperation
+from mongosql.wrapper import _cache_key, parse_cache
+
+
+def test_lru_cache_eviction():
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'b' is now the least recently used
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.get('b') is None
+    assert cache.stats() == {
+        'hits': 3, 'misses': 1, 'evictions': 1, 'size': 2, 'maxsize': 2}
+
+
+def test_lru_cache_resize():
+    cache = LRUCache(maxsize=3)
+    for key in 'abc':
+        cache.put(key, key)
+    cache.resize(1)
+    assert len(cache) == 1
+    assert 'c' in cache
+    assert cache.stats()['evictions'] == 2
+
+    cache.resize(0)
+    cache.put('d', 'd')
+    assert len(cache) == 0
+
+
+def test_lru_cache_threads():
+    cache = LRUCache(maxsize=50)
+
+    def worker(n):
+        for i in range(1000):
+            key = (n + i) % 100
+            if cache.get(key) is None:
+                cache.put(key, key)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = cache.stats()
+    assert stats['size'] == 50
+    assert stats['hits'] + stats['misses'] == 8000
+
+
+def test_parse_uses_cache():
+    query = 'SELECT a, b FROM cached_coll WHERE a == 1 SORT b'
+    parse_cache.clear()
+    first = parse(query)
+    second = parse(query)
+    stats = parse_cache.stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 1
+
+    assert isinstance(second, SelectOperation)
+    assert first is not second
+    assert second.query.to_mongo() == {'a': 1}
+
+
+def test_parse_cache_isolates_callers():
+    query = 'SELECT a, b FROM cached_coll SORT b LIMIT 10'
+    first = parse(query)
+    first.limit = 5
+    first.fields.append('c')
+    first.sort['a'] = -1
+
+    second = parse(query)
+    assert second.limit == 10
+    assert second.fields == ['a', 'b']
+    assert second.sort == {'b': 1}
+
+
+def test_parse_cache_isolates_aggregate_pipeline():
+    query = 'AGGREGATE article PROJECT title = 1'
+    first = parse(query)
+    first.pipeline.append(first.pipeline[0])
+    second = parse(query)
+    assert len(second.pipeline) == 1
+
+
+def test_parse_without_cache():
+    parse_cache.clear()
+    parse('SELECT * FROM uncached', cache=False)
+    assert parse_cache.stats()['misses'] == 0
+    assert _cache_key('SELECT * FROM uncached') not in parse_cache
+
+
+def test_parse_cache_isolates_trees():
+    query = 'SELECT * FROM c WHERE a IN [1, 2] AND b == {x = 1} AND c > 1'
+    first = parse(query)
+    first.query._expressions[0].second.append(3)
+    first.query._expressions[1].second['x'] = 2
+    first.query.append(parse('SELECT * FROM c WHERE d == 1').query)
+    second = parse(query)
+    assert second.query.to_mongo() == {'$and': [
+        {'a': {'$in': [1, 2]}}, {'b': {'x': 1}}, {'c': {'$gt': 1}}]}
+
+    query = "AGGREGATE c GROUP BY '$a', n = sum(1)"
+    parse(query).pipeline[0]._args[0].expression.args.append(2)
+    assert parse(query).pipeline[0].to_mongo() == {
+        '$group': {'_id': '$a', 'n': {'$sum': 1}}}
+
+
+def test_parse_cache_engines():
+    parse_cache.clear()
+    query = 'SELECT * FROM engines WHERE a == 1'
+    for engine, tokenizer in (('ply', 'ply'), ('pratt', 'ply'),
+                              ('ply', 'fast'), ('pratt', 'fast')):
+        parse(query, engine=engine, tokenizer=tokenizer)
+        assert _cache_key(query, engine, tokenizer) in parse_cache
+    assert parse_cache.stats()['misses'] == 4
+    parse(query, engine='pratt', tokenizer='fast')
+    assert parse_cache.stats()['hits'] == 1
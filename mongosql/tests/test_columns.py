@@ -0,0 +1,151 @@
+"""
+Tests for columnar results: ``mongosql.columns``
+"""
+
+import datetime
+import math
+from array import array
+
+import pytest
+
+from mongosql import parse
+from mongosql.columns import Column, _typecodes, fetch_columns
+from mongosql.tests.fakes import FakeCollection, FakeDatabase
+
+
+def _ints(values):
+    ## The buffer of an int column
+    if 'int' not in _typecodes:
+        return list(values)
+    return array(_typecodes['int'], values)
+
+
+def _database():
+    db = FakeDatabase()
+    db['c'] = FakeCollection(
+        {'_id': i, 'a': i % 4, 'f': i / 2.0, 's': 'x{0}'.format(i),
+         'b': i % 2 == 0, 'e': {'n': i}}
+        for i in range(10))
+    return db
+
+
+def test_typed():
+    db = _database()
+    columns = parse('SELECT a, f, s, b, e.n, x FROM c').fetch_columns(
+        db, batch_size=3)
+    assert list(columns) == ['a', 'f', 's', 'b', 'e.n', 'x']
+    assert [column.kind for column in columns.values()] == [
+        'int', 'float', 'str', 'bool', 'int', None]
+    assert columns['a'].values == _ints(i % 4 for i in range(10))
+    assert columns['f'].values == array('d', [i / 2.0 for i in range(10)])
+    assert columns['b'].values == array('B', [1, 0] * 5)
+    assert columns['s'].tolist() == ['x{0}'.format(i) for i in range(10)]
+    assert columns['e.n'].tolist() == list(range(10))
+    assert all(column.mask is None for column in list(columns.values())[:5])
+    assert columns['x'].tolist() == [None] * 10
+    assert db['c'].cursors[0].options == {'batch_size': 3}
+
+
+def test_sparse():
+    db = FakeDatabase()
+    db['c'] = FakeCollection(
+        dict({'_id': i}, **({'a': i * 1.5} if i < 3 else {}))
+        for i in range(10))
+    columns = parse('SELECT a FROM c').fetch_columns(db, batch_size=3)
+    assert columns['a'].kind == 'float'
+    assert columns['a'].tolist() == [0.0, 1.5, 3.0] + [None] * 7
+
+
+def test_missing():
+    column = Column()
+    column.extend([1, None, 3])
+    column.extend([4, 5])
+    assert column.kind == 'int'
+    assert column.values == _ints([1, 0, 3, 4, 5])
+    assert column.mask == bytearray([0, 1, 0, 0, 0])
+    assert column.tolist() == [1, None, 3, 4, 5]
+
+    column = Column(missing=2)
+    column.extend([True, None])
+    assert column.values == array('B', [0, 0, 1, 0])
+    assert column.tolist() == [None, None, True, None]
+
+    ## A batch of missing values only keeps the kind
+    column = Column()
+    column.extend([1.5, 2.0])
+    column.extend([None, None])
+    assert column.kind == 'float'
+    assert column.mask == bytearray([0, 0, 1, 1])
+    assert column.tolist() == [1.5, 2.0, None, None]
+
+
+def test_no_int64_array(monkeypatch):
+    ## Platforms where array has no 64-bit type: a list
+    monkeypatch.delitem(_typecodes, 'int', raising=False)
+    column = Column(missing=1)
+    column.extend([1, 2])
+    column.extend([3.5])
+    assert isinstance(column.values, array)
+    assert column.tolist() == [None, 1.0, 2.0, 3.5]
+    column = Column()
+    column.extend([1, None])
+    assert column.values == [1, 0]
+    assert column.tolist() == [1, None]
+
+
+def test_promotion():
+    column = Column()
+    column.extend([1, None])
+    column.extend([2.5])
+    assert column.kind == 'float'
+    assert column.values[0] == 1.0 and math.isnan(column.values[1])
+    assert column.tolist() == [1.0, None, 2.5]
+
+    column.extend(['x', None])
+    assert column.kind == 'object'
+    assert column.tolist() == [1.0, None, 2.5, 'x', None]
+
+    column = Column()
+    column.extend([1, 2 ** 70])  # Over 64 bits
+    assert column.kind == 'object'
+    column = Column()
+    column.extend([1])
+    column.extend([-2 ** 64])
+    assert column.tolist() == [1, -2 ** 64]
+
+    column = Column()
+    column.extend([True, 1])  # Not a boolean column
+    assert (column.kind, column.tolist()) == ('object', [True, 1])
+
+
+def test_select_star():
+    documents = [{'a': 1}, {'a': 2, 'b': 'x'}, {'b': 'y', 'c': [1]}]
+    columns = fetch_columns(documents, batch_size=2)
+    assert list(columns) == ['a', 'b', 'c']
+    assert [column.tolist() for column in columns.values()] == [
+        [1, 2, None], [None, 'x', 'y'], [None, None, [1]]]
+    assert columns['c'].kind == 'object'
+    assert fetch_columns([]) == {}
+
+
+def test_numpy():
+    numpy = pytest.importorskip('numpy')
+    db = _database()
+    db['c'].documents[3]['a'] = None
+    db['c'].documents[4]['t'] = datetime.datetime(2020, 1, 2)
+    arrays = parse('SELECT a, f, s, b, t FROM c').to_numpy(db)
+    assert arrays['a'].dtype == numpy.int64
+    assert arrays['a'].mask.tolist() == [i == 3 for i in range(10)]
+    assert arrays['f'].dtype == numpy.float64
+    assert not isinstance(arrays['f'], numpy.ma.MaskedArray)
+    assert arrays['s'].dtype.kind == 'U'
+    assert arrays['b'].dtype == numpy.bool_
+    assert arrays['t'].dtype == numpy.dtype('datetime64[us]')
+    assert arrays['t'].count() == 1
+
+    column = Column()
+    column.extend([1, 2, 3])
+    assert numpy.shares_memory(column.to_numpy(), column.to_numpy())
+    column = Column()
+    column.extend([[1, 2], 'x'])
+    assert column.to_numpy().shape == (2,)
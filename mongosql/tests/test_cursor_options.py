@@ -0,0 +1,169 @@
+"""
+Tests for the WITH (...) clause: cursor options
+"""
+
+import pytest
+
+from mongosql import parse, prepare
+from mongosql.parser import ParserError
+from mongosql.support import (
+    Parameter, aggregate_kwargs, apply_cursor_options)
+from mongosql.tests.fakes import FakeCollection, FakeCursor, FakeDatabase
+
+
+def _run(query, **kwargs):
+    db = FakeDatabase()
+    cursor = parse(query).apply(db, **kwargs)
+    return db['c'].calls[0], cursor
+
+
+@pytest.mark.parametrize('engine', ['ply', 'pratt'])
+def test_parse_options(engine):
+    operation = parse(
+        "SELECT * FROM c WHERE a == 1 WITH (batch_size = 500, "
+        "MAX_TIME_MS = 1000, hint = 'a_1', exhaust) LIMIT 10",
+        cache=False, engine=engine)
+    assert operation.options == {
+        'batch_size': 500, 'max_time_ms': 1000, 'hint': 'a_1',
+        'exhaust': True}
+    assert operation.limit == 10
+
+    operation = parse('SELECT * FROM c WITH (hint = {a: 1}) '
+                      'WITH (batch_size = ?, no_cursor_timeout = false)',
+                      cache=False, engine=engine)
+    assert operation.options['hint'] == {'a': 1}
+    assert isinstance(operation.options['batch_size'], Parameter)
+    assert operation.options['no_cursor_timeout'] is False
+
+    assert parse('SELECT * FROM c', engine=engine).options is None
+
+
+@pytest.mark.parametrize('engine', ['ply', 'pratt'])
+@pytest.mark.parametrize('query', [
+    'SELECT * FROM c WITH ()',
+    'SELECT * FROM c WITH (foo = 1)',
+    'SELECT * FROM c WITH (batch_size = )',
+    'SELECT * FROM c WITH (batch_size = 1,)',
+    'SELECT * FROM c WITH batch_size = 1',
+    'SELECT * FROM c WITH (allow_disk_use)',
+    'AGGREGATE c WITH (exhaust)',
+    'AGGREGATE c MATCH a == 1 WITH (no_cursor_timeout)',
+])
+def test_invalid_options(engine, query):
+    with pytest.raises(ParserError):
+        parse(query, cache=False, engine=engine)
+
+
+def test_apply_options():
+    kwargs, cursor = _run(
+        "SELECT a FROM c WHERE a > 1 LIMIT 5 WITH (batch_size = 1000, "
+        "max_time_ms = 50, hint = {a: -1}, comment = 'export', "
+        "no_cursor_timeout, exhaust)")
+    assert kwargs == {
+        'filter': {'a': {'$gt': 1}}, 'projection': ['a'], 'limit': 5}
+    assert cursor.options == {
+        'batch_size': 1000, 'max_time_ms': 50, 'hint': [('a', -1)],
+        'comment': 'export'}
+    assert cursor.flags == 16 | 64
+
+    _, cursor = _run('SELECT * FROM c WITH (exhaust = false)')
+    assert cursor.flags == 0 and cursor.options == {}
+
+    ## pymongo 2 arguments are gone from pymongo 4
+    with pytest.raises(TypeError):
+        FakeCollection().find(spec={'a': 1}, fields=['a'])
+
+
+def test_default_options():
+    defaults = {'batch_size': 100, 'max_time_ms': 10}
+    _, cursor = _run('SELECT * FROM c WITH (batch_size = 5)',
+                     options=defaults)
+    assert cursor.options == {'batch_size': 5, 'max_time_ms': 10}
+    assert defaults == {'batch_size': 100, 'max_time_ms': 10}
+
+    with pytest.raises(ValueError):
+        _run('SELECT * FROM c', options={'close': True})
+
+
+def test_bound_options():
+    stmt = prepare('SELECT * FROM c WHERE a == ? WITH (batch_size = :n)')
+    db = FakeDatabase()
+    for n in (10, 20):
+        cursor = stmt.execute(db, {0: 1, 'n': n})
+        assert cursor.options == {'batch_size': n}
+    assert stmt.bind({0: 1, 'n': 30}).options == {'batch_size': 30}
+    assert isinstance(stmt.operation.options['batch_size'], Parameter)
+
+
+def test_invalid_values():
+    cursor = FakeCursor([])
+    with pytest.raises(AssertionError):
+        apply_cursor_options(cursor, {'batch_size': 'many'})
+
+
+@pytest.mark.parametrize('engine', ['ply', 'pratt'])
+def test_parse_aggregate_options(engine):
+    operation = parse(
+        'AGGREGATE c WITH (batch_size = 100) GROUP BY "$a", n = sum(1) '
+        'WITH (ALLOW_DISK_USE, max_time_ms = ?) SORT n DESC',
+        cache=False, engine=engine)
+    assert operation.bind([5]).options == {
+        'batch_size': 100, 'allow_disk_use': True, 'max_time_ms': 5}
+    assert len(operation.pipeline) == 2
+
+
+def test_aggregate_cursor():
+    db = FakeDatabase()
+    db['c'] = FakeCollection({'_id': i, 'a': i % 3} for i in range(10))
+    operation = parse('AGGREGATE c MATCH a == 1 WITH (batch_size = 2, '
+                      'allow_disk_use, comment = "report") SORT _id DESC')
+    cursor = operation.apply(db, options={'max_time_ms': 10, 'exhaust': True})
+    assert db['c'].calls == [{
+        'pipeline': [{'$match': {'a': 1}}, {'$sort': {'_id': -1}}],
+        'cursor': {'batchSize': 2}, 'allowDiskUse': True,
+        'comment': 'report', 'maxTimeMS': 10}]
+    assert cursor.options == {'batch_size': 2}
+    assert [d['_id'] for d in cursor] == [7, 4, 1]
+
+    ## Always a cursor, even without options
+    cursor = parse('AGGREGATE c LIMIT 1').apply(db)
+    assert db['c'].calls[-1] == {'pipeline': [{'$limit': 1}], 'cursor': {}}
+    assert cursor.options == {}
+
+    stmt = prepare('AGGREGATE c WITH (batch_size = :n, hint = {a: 1})')
+    stmt.execute(db, {'n': 5})
+    assert db['c'].calls[-1]['cursor'] == {'batchSize': 5}
+    assert db['c'].calls[-1]['hint'] == [('a', 1)]
+    assert stmt.bind({'n': 6}).options['batch_size'] == 6
+
+    with pytest.raises(ValueError):
+        parse('AGGREGATE c').apply(db, options={'close': True})
+    with pytest.raises(ValueError):
+        aggregate_kwargs({'exhaust': True})
+    with pytest.raises(AssertionError):
+        aggregate_kwargs({'batch_size': 1.5})
+
+
+def test_client_defaults(monkeypatch):
+    pytest.importorskip('pymongo')
+    from mongosql.client import MongoSqlClient, MongoSqlDatabase
+
+    client = MongoSqlClient(
+        'mongodb://localhost:1', connect=False,
+        cursor_options={'batch_size': 1000})
+    for db in (client.testdb, client['testdb']):
+        assert isinstance(db, MongoSqlDatabase)
+        assert db.cursor_options == {'batch_size': 1000}
+
+    fake = FakeDatabase()
+    monkeypatch.setattr(MongoSqlDatabase, '__getitem__',
+                        lambda self, name: fake[name])
+    cursor = client.testdb.sql('SELECT * FROM c WITH (max_time_ms = 5)')
+    assert cursor.options == {'batch_size': 1000, 'max_time_ms': 5}
+    cursor = client.testdb.sql('SELECT * FROM c WHERE a == ?', [1])
+    assert cursor.options == {'batch_size': 1000}
+    assert fake['c'].calls[-1] == {'filter': {'a': 1}}
+
+    cursor = client.testdb.sql('AGGREGATE c WITH (allow_disk_use)')
+    assert cursor.options == {'batch_size': 1000}
+    assert fake['c'].calls[-1]['allowDiskUse'] is True
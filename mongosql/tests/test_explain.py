@@ -0,0 +1,145 @@
+"""
+Tests for EXPLAIN [ANALYZE]
+"""
+
+import pytest
+
+from mongosql import parse, prepare
+from mongosql.explain import summarize
+from mongosql.support import (
+    AggregateOperation, ExplainOperation, SelectOperation)
+from mongosql.tests.fakes import FakeCollection, FakeDatabase
+
+
+DOCUMENTS = [{'_id': i, 'a': i % 5, 'b': i % 7} for i in range(100)]
+
+
+def _database(indexes=()):
+    db = FakeDatabase()
+    db['c'] = FakeCollection(DOCUMENTS, indexes=indexes)
+    return db
+
+
+@pytest.mark.parametrize('engine', ['ply', 'pratt'])
+def test_parse(engine):
+    operation = parse('EXPLAIN SELECT * FROM c WHERE a == 1',
+                      cache=False, engine=engine)
+    assert isinstance(operation, ExplainOperation)
+    assert isinstance(operation.operation, SelectOperation)
+    assert operation.analyze is False
+
+    operation = parse('explain analyze AGGREGATE c MATCH a == 1',
+                      cache=False, engine=engine)
+    assert isinstance(operation.operation, AggregateOperation)
+    assert operation.analyze is True
+
+
+def test_explain_select():
+    db = _database()
+    report = parse('EXPLAIN SELECT b FROM c WHERE a == 1 ORDER BY b '
+                   'LIMIT 5').apply(db)
+    assert report['spec'] == {
+        'filter': {'a': 1}, 'projection': ['b'], 'sort': {'b': 1}, 'limit': 5}
+    assert db.commands[0]['verbosity'] == 'queryPlanner'
+    assert dict(db.commands[0]['explain']) == {
+        'find': 'c', 'filter': {'a': 1}, 'projection': {'b': 1},
+        'sort': {'b': 1}, 'limit': 5}
+    assert report['plan'] == {
+        'stages': ['SORT', 'COLLSCAN'], 'indexes': [], 'collscan': True}
+    assert [w.split(':')[0] for w in report['warnings']] == [
+        'COLLSCAN', 'SORT']
+    assert list(report['timings']) == [
+        'lex', 'parse', 'optimize', 'serialize']
+    assert report['timings']['optimize'] is None
+    ## Not run
+    assert db['c'].calls == []
+
+
+def test_explain_analyze():
+    db = _database(indexes=['a'])
+    report = parse('EXPLAIN ANALYZE SELECT * FROM c WHERE a == 1 '
+                   'WITH (batch_size = 10)', optimize=True).apply(db)
+    assert db.commands[0]['verbosity'] == 'executionStats'
+    assert db.commands[0]['explain']['batchSize'] == 10
+    assert report['plan'] == {
+        'stages': ['FETCH', 'IXSCAN'], 'indexes': ['a_1'],
+        'collscan': False, 'keys_examined': 20, 'docs_examined': 20,
+        'returned': 20}
+    assert report['warnings'] == []
+    assert list(report['timings']) == [
+        'lex', 'parse', 'optimize', 'serialize', 'fetch']
+    assert all(t >= 0 for t in report['timings'].values())
+    assert db['c'].calls == [{'filter': {'a': 1}}]
+    assert db['c'].cursors[0].options == {'batch_size': 10}
+    assert db['c'].cursors[0].closed
+
+
+def test_explain_aggregate():
+    db = _database()
+    report = parse('EXPLAIN ANALYZE AGGREGATE c MATCH b == 3 WITH '
+                   '(allow_disk_use) SORT a LIMIT 5').apply(db)
+    pipeline = [{'$match': {'b': 3}}, {'$sort': {'a': 1}}, {'$limit': 5}]
+    assert report['spec'] == pipeline
+    assert dict(db.commands[0]['explain']) == {
+        'aggregate': 'c', 'pipeline': pipeline, 'cursor': {},
+        'allowDiskUse': True}
+    assert report['plan']['collscan'] is True
+    assert report['plan']['docs_examined'] == 100
+    assert report['plan']['returned'] == 5
+    assert db['c'].calls[0]['pipeline'] == pipeline
+    assert db['c'].cursors[0].closed
+
+
+def test_optimize_hint():
+    db = _database()
+    query = 'EXPLAIN SELECT * FROM c WHERE a == 1 OR a == 1'
+    report = parse(query).apply(db)
+    assert report['warnings'][1] == (
+        "The query is not optimized: with parse(query, optimize=True) "
+        "the spec is {'filter': {'a': 1}}")
+    report = parse(query, optimize=True).apply(db)
+    assert report['spec'] == {'filter': {'a': 1}}
+    assert len(report['warnings']) == 1
+    assert report['timings']['optimize'] >= 0
+
+
+def test_params():
+    db = _database(indexes=['b'])
+    stmt = prepare('EXPLAIN SELECT * FROM c WHERE b == ? LIMIT :n')
+    report = stmt.execute(db, {0: 2, 'n': 3})
+    assert report['spec'] == {'filter': {'b': 2}, 'limit': 3}
+    assert report['plan']['indexes'] == ['b_1']
+
+    ## Built by hand: no query text to time
+    operation = ExplainOperation(parse('SELECT * FROM c'))
+    report = operation.apply(db)
+    assert report['timings']['lex'] is None
+    assert report['timings']['serialize'] >= 0
+
+
+def test_summarize():
+    explain = {
+        'queryPlanner': {'winningPlan': {'queryPlan': {
+            'stage': 'PROJECTION_SIMPLE', 'inputStage': {
+                'stage': 'OR', 'inputStages': [
+                    {'stage': 'IXSCAN', 'indexName': 'a_1'},
+                    {'stage': 'IXSCAN', 'indexName': 'b_1_c_-1'}]}}}},
+        'executionStats': {
+            'nReturned': 3, 'totalKeysExamined': 7,
+            'totalDocsExamined': 5}}
+    assert summarize(explain) == {
+        'stages': ['PROJECTION_SIMPLE', 'OR', 'IXSCAN', 'IXSCAN'],
+        'indexes': ['a_1', 'b_1_c_-1'], 'collscan': False,
+        'keys_examined': 7, 'docs_examined': 5, 'returned': 3}
+
+    sharded = {'queryPlanner': {'winningPlan': {
+        'stage': 'SHARD_MERGE', 'shards': [
+            {'winningPlan': {'stage': 'COLLSCAN'}},
+            {'winningPlan': {'stage': 'FETCH', 'inputStage': {
+                'stage': 'IXSCAN', 'indexName': 'a_1'}}}]}}}
+    assert summarize(sharded) == {
+        'stages': ['SHARD_MERGE', 'COLLSCAN', 'FETCH', 'IXSCAN'],
+        'indexes': ['a_1'], 'collscan': True}
+
+    assert summarize({'stages': [{'$group': {}}]}) == {
+        'stages': [], 'indexes': [], 'collscan': False}
@@ -0,0 +1,221 @@
+"""
+Tests for result exports: ``mongosql.export`` and INTO OUTFILE
+"""
+
+import csv
+import datetime
+import io
+import json
+
+import pytest
+
+from mongosql import export as export_module
+from mongosql import parse
+from mongosql.export import export, guess_format
+from mongosql.loader import read
+from mongosql.parser import ParserError
+from mongosql.support import ExportOperation, SelectOperation, shape
+from mongosql.tests.fakes import FakeCollection, FakeCursor, FakeDatabase
+
+
+def _database():
+    db = FakeDatabase()
+    db['c'] = FakeCollection(
+        {'_id': i, 'a': i % 4, 'b': {'c': [i]}, 'd': i % 2 == 0}
+        for i in range(10))
+    return db
+
+
+class StreamingCursor(FakeCursor):
+    """Counts the documents read, in ``collection.read``"""
+
+    def __iter__(self):
+        for document in self._documents:
+            self.collection.read += 1
+            yield document
+
+
+class StreamingCollection(FakeCollection):
+    read = 0
+
+    def find(self, **kwargs):
+        cursor = StreamingCursor(self.documents, **kwargs)
+        cursor.collection = self
+        return cursor
+
+
+class RecordingSink(io.StringIO):
+    """Records how many documents were read at each write"""
+
+    def __init__(self, collection):
+        super(RecordingSink, self).__init__()
+        self.collection = collection
+        self.reads = []
+
+    def write(self, text):
+        self.reads.append(self.collection.read)
+        return super(RecordingSink, self).write(text)
+
+
+def test_csv():
+    db = _database()
+    sink = io.StringIO()
+    result = export(db, 'SELECT a, d, x FROM c WHERE a == 1', sink)
+    assert result == {'exported': 3}
+    assert sink.getvalue() == 'a,d,x\n' + '1,false,\n' * 3
+    assert db['c'].cursors[0].options == {'batch_size': 1000}
+
+    sink = io.StringIO()
+    export(db, 'SELECT * FROM c LIMIT 2', sink,
+           options={'batch_size': 10, 'comment': 'x'})
+    ## Columns in the order of the fields of the documents
+    header, first, _ = sink.getvalue().splitlines()
+    assert dict(zip(header.split(','), next(csv.reader([first])))) == {
+        '_id': '0', 'a': '0', 'b': '{"c":[0]}', 'd': 'true'}
+    assert db['c'].cursors[1].options == {'batch_size': 10, 'comment': 'x'}
+
+    ## Read back by COPY
+    sink.seek(0)
+    assert list(read(sink))[1] == {'_id': 1, 'a': 1, 'b': '{"c":[1]}',
+                                   'd': False}
+
+
+def test_csv_text(tmpdir):
+    db = _database()
+    db['c'].documents[0]['s'] = u'\xe9t\xe9, "x"'
+    sink = io.StringIO()
+    export(db, 'SELECT s FROM c WHERE _id == 0', sink)
+    assert sink.getvalue() == u's\n"\xe9t\xe9, ""x"""\n'
+    path = tmpdir.join('out.csv')
+    export(db, 'SELECT s FROM c WHERE _id == 0', str(path))
+    assert path.read_text('utf-8') == sink.getvalue()
+
+
+def test_columns():
+    db = _database()
+    db['c'].documents[0]['t'] = datetime.datetime(2020, 1, 2, 3, 4)
+    sink = io.StringIO()
+    export(db, 'AGGREGATE c MATCH _id < 2', sink,
+           columns=['_id', 'b.c', 't', 'b.x.y'])
+    assert sink.getvalue().splitlines() == [
+        '_id,b.c,t,b.x.y', '0,[0],2020-01-02T03:04:00,', '1,[1],,']
+
+    ## Without columns: the fields of the first batch
+    sink = io.StringIO()
+    db['c'].documents[7]['new'] = 1
+    with pytest.warns(UserWarning) as warnings:
+        export(db, 'SELECT * FROM c WHERE _id > 3', sink, batch_size=2)
+    header = sink.getvalue().splitlines()[0]
+    assert sorted(header.split(',')) == ['_id', 'a', 'b', 'd']
+    assert len(sink.getvalue().splitlines()) == 7
+    assert len(warnings) == 1
+    assert 'left out of the export: new;' in str(warnings[0].message)
+
+
+def test_jsonl():
+    db = _database()
+    db['c'].documents[0]['t'] = datetime.date(2020, 1, 2)
+    sink = io.StringIO()
+    export(db, parse('SELECT a, t FROM c WHERE _id < ?'), sink, 'jsonl',
+           params=[2])
+    assert [json.loads(line) for line in sink.getvalue().splitlines()] == [
+        {'_id': 0, 'a': 0, 't': '2020-01-02'}, {'_id': 1, 'a': 1}]
+
+
+def test_batches():
+    db = FakeDatabase()
+    db['c'] = StreamingCollection({'_id': i} for i in range(2500))
+    sink = RecordingSink(db['c'])
+    assert export(db, 'SELECT * FROM c', sink, batch_size=100) == {
+        'exported': 2500}
+    ## A write per batch, right after reading it
+    assert sink.reads == [100 * i for i in range(1, 26)]
+
+
+def test_errors(monkeypatch):
+    class FailingCursor(FakeCursor):
+        def __iter__(self):
+            yield self._documents[0]
+            raise ValueError("Connection lost")
+
+    class FailingCollection(FakeCollection):
+        def find(self, **kwargs):
+            return FailingCursor(self.documents, **kwargs)
+
+    class BrokenWriter(export_module._CsvWriter):
+        def close(self, failed=False):
+            raise IOError("Disk full")
+
+    db = FakeDatabase()
+    db['c'] = FailingCollection({'_id': i} for i in range(5))
+    ## The error of the query, not the one of closing the file
+    monkeypatch.setitem(export_module._writers, 'csv', BrokenWriter)
+    with pytest.raises(ValueError):
+        export(db, 'SELECT * FROM c', io.StringIO(), batch_size=1)
+    with pytest.raises(IOError):
+        export(_database(), 'SELECT * FROM c', io.StringIO())
+
+
+def test_invalid(tmpdir):
+    db = _database()
+    with pytest.raises(TypeError):
+        export(db, 'DELETE FROM c', io.StringIO())
+    with pytest.raises(ValueError):
+        export(db, 'SELECT * FROM c', io.StringIO(), 'xml')
+    assert guess_format('x.PARQUET') == 'parquet'
+    assert guess_format('x.ndjson') == 'jsonl'
+    assert guess_format('x.txt') == guess_format(io.StringIO()) == 'csv'
+
+
+def test_arrow(tmpdir):
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+    db = _database()
+    path = str(tmpdir.join('out.parquet'))
+    assert export(db, 'SELECT a, d FROM c', path, batch_size=3) == {
+        'exported': 10}
+    table = pyarrow.parquet.read_table(path)
+    assert table.column_names == ['a', 'd']
+    assert table.column('a').to_pylist() == [i % 4 for i in range(10)]
+
+    path = str(tmpdir.join('out.arrow'))
+    export(db, 'SELECT * FROM c WHERE a == 99', path)
+    assert pyarrow.ipc.open_file(path).read_all().num_rows == 0
+
+
+@pytest.mark.parametrize('engine', ['ply', 'pratt'])
+def test_parse(engine):
+    operation = parse("SELECT a FROM c WHERE a > ? INTO OUTFILE '/tmp/x' "
+                      "FORMAT JSONL", cache=False, engine=engine)
+    assert isinstance(operation, ExportOperation)
+    assert isinstance(operation.operation, SelectOperation)
+    assert (operation.target, operation.format) == ('/tmp/x', 'jsonl')
+    operation = parse('AGGREGATE c MATCH a == 1 INTO OUTFILE :path;',
+                      cache=False, engine=engine)
+    assert operation.format is None
+    assert shape(operation) == 'AGGREGATE c MATCH a == ? INTO OUTFILE ?'
+
+    for query in ("SELECT * FROM c INTO OUTFILE 'x' FORMAT xml",
+                  "SELECT * FROM c INTO 'x'",
+                  "EXPLAIN SELECT * FROM c INTO OUTFILE 'x'",
+                  "DELETE FROM c INTO OUTFILE 'x'",
+                  "SELECT * FROM c INTO OUTFILE 1"):
+        with pytest.raises(ParserError):
+            parse(query, cache=False, engine=engine)
+
+
+def test_apply(tmpdir):
+    db = _database()
+    path = tmpdir.join('out.jsonl')
+    operation = parse('SELECT a FROM c WHERE a == ? INTO OUTFILE ?',
+                      optimize=True)
+    assert operation.apply(db, [3, str(path)]) == {'exported': 2}
+    assert [json.loads(line) for line in path.read().splitlines()] == [
+        {'_id': 3, 'a': 3}, {'_id': 7, 'a': 3}]
+
+    path = tmpdir.join('out')
+    parse("SELECT _id FROM c LIMIT 1 INTO OUTFILE '{0}' FORMAT csv".format(
+        path)).apply(db)
+    assert path.read() == '_id\n0\n'
+    with pytest.raises(ValueError):
+        operation.apply(db, [3, 4])
@@ -0,0 +1,137 @@
+"""
+Tests for query fingerprints: normalized text and parsed shapes
+"""
+
+import pytest
+
+from mongosql import parse
+from mongosql.lexer import LexerError
+from mongosql.normalizer import fingerprint, fingerprint_cache, normalize
+from mongosql.parser import ParserError
+from mongosql.support import shape
+from mongosql.tests.corpus import QUERIES
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('select * from c', 'SELECT * FROM c'),
+    ('SELECT a,b FROM c WHERE a==1 AND b  !=  "x"',
+     'SELECT a, b FROM c WHERE a == ? AND b != ?'),
+    ('SELECT * FROM c -- comment\n/* another */ WHERE a # one more',
+     'SELECT * FROM c WHERE a'),
+    ('SELECT * FROM c WHERE a IN [1, 2, 3] OR b IN [] OR c IN [[1], 2]',
+     'SELECT * FROM c WHERE a IN [?] OR b IN [] OR c IN [[?], ?]'),
+    ('SELECT * FROM c WHERE a == -1.5 AND b == 2 - -x AND c == - 3',
+     'SELECT * FROM c WHERE a == ? AND b == ? - - x AND c == ?'),
+    ('SELECT * FROM c WHERE a == ? AND b == :b AND c == true',
+     'SELECT * FROM c WHERE a == ? AND b == ? AND c == ?'),
+    ('SELECT * FROM c WHERE a == {x = 1, y: [null]} AND f(b,2) > 1',
+     'SELECT * FROM c WHERE a == {x = ?, y: [?]} AND f(b, ?) > ?'),
+    ('SELECT * FROM c WHERE a == {"x": "y", "z": {"w": 1}}',
+     'SELECT * FROM c WHERE a == {"x": ?, "z": {"w": ?}}'),
+    ('SELECT * FROM c SORT a, b desc LIMIT 10 SKIP 5;;',
+     'SELECT * FROM c ORDER BY a, b DESC LIMIT ? SKIP ?'),
+    ('SELECT * FROM c ORDER a WITH (batch_size = 10, exhaust)',
+     'SELECT * FROM c ORDER BY a WITH (batch_size = ?, exhaust)'),
+    ('aggregate c group by "$a", n = sum(1) sort by n',
+     'AGGREGATE c GROUP BY "$a", n = sum(?) ORDER BY n'),
+    ("AGGREGATE c UNWIND '$t' PROJECT x = '$t.x', y = 'z'",
+     'AGGREGATE c UNWIND t PROJECT x = "$t.x", y = ?'),
+    ('explain Analyze SELECT * FROM c',
+     'EXPLAIN ANALYZE SELECT * FROM c'),
+    ('SELECT * FROM c WHERE c == 1 OR b == 2 AND a == 3 ORDER BY z, y',
+     'SELECT * FROM c WHERE a == ? AND b == ? OR c == ? ORDER BY z, y'),
+    ('SELECT * FROM c WHERE (d OR c) AND NOT f(b AND a, {y: z AND x})',
+     'SELECT * FROM c WHERE (c OR d) AND NOT f(a AND b, {y: x AND z})'),
+    ('AGGREGATE c MATCH b > 1 AND a < 2 PROJECT x = b AND a, y = 1',
+     'AGGREGATE c MATCH a < ? AND b > ? PROJECT x = a AND b, y = ?'),
+])
+def test_normalize(query, expected):
+    for tokenizer in ('ply', 'fast'):
+        assert normalize(query, tokenizer) == expected
+    assert normalize(expected) == expected
+
+
+def test_fingerprint():
+    same = [
+        'SELECT * FROM c WHERE a == 1 ORDER BY b LIMIT 5',
+        'select *\n  from c\n where a == "x"  -- comment\n sort b limit 50',
+        'SELECT * FROM c WHERE a == :a ORDER BY b LIMIT ?;',
+    ]
+    assert len(set(fingerprint(q) for q in same)) == 1
+    different = [
+        'SELECT * FROM c WHERE a == 1 ORDER BY b',
+        'SELECT * FROM c WHERE A == 1 ORDER BY b LIMIT 5',
+        'SELECT * FROM d WHERE a == 1 ORDER BY b LIMIT 5',
+        'SELECT * FROM c WHERE a > 1 ORDER BY b LIMIT 5',
+        'SELECT * FROM c WHERE a == 1 ORDER BY b DESC LIMIT 5',
+    ]
+    assert len(set(fingerprint(q) for q in same[:1] + different)) == 6
+    ## AND / OR commute
+    assert (fingerprint('SELECT * FROM c WHERE a == 1 AND b == 2') ==
+            fingerprint('SELECT * FROM c WHERE b == 2 AND a == 1'))
+    assert (fingerprint('SELECT * FROM c WHERE a == 1 OR b == 2 AND c') !=
+            fingerprint('SELECT * FROM c WHERE (a == 1 OR b == 2) AND c'))
+    assert len(fingerprint(same[0])) == 16
+    ## Stable across processes and versions
+    assert fingerprint('SELECT * FROM c') == '622686c29b0f9c68'
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('SELECT * FROM c', 'SELECT * FROM c'),
+    ('SELECT a, b FROM c WHERE b == 1 AND a > "x" ORDER BY a DESC LIMIT 3',
+     'SELECT a, b FROM c WHERE a > ? AND b == ? ORDER BY a DESC LIMIT ?'),
+    ('SELECT * FROM c WHERE (b == 1 OR a == 2) AND NOT (c == 1 AND d == 2)',
+     'SELECT * FROM c WHERE (a == ? OR b == ?) AND NOT (c == ? AND d == ?)'),
+    ('SELECT * FROM c WHERE a IN [1, 2] AND b == f(x + 1, [])',
+     'SELECT * FROM c WHERE a IN [?] AND b == f((x + ?), [?])'),
+    ('SELECT * FROM c WHERE a == {y = [1], x = 2} WITH (hint = "a_1")',
+     'SELECT * FROM c WHERE a == {x = ?, y = [?]} WITH (hint)'),
+    ('AGGREGATE c MATCH a == ? UNWIND "$t" GROUP BY "$t", n = sum(1) '
+     'SORT n DESC SKIP 1 LIMIT 2',
+     'AGGREGATE c MATCH a == ? UNWIND t GROUP BY "$t", n = sum(?) '
+     'ORDER BY n DESC SKIP ? LIMIT ?'),
+    ('EXPLAIN AGGREGATE c PROJECT a = 1, b = "$x" GEO_NEAR near = [1, 2]',
+     'EXPLAIN AGGREGATE c PROJECT a = ?, b = "$x" GEO_NEAR near = [?]'),
+])
+def test_shape(query, expected):
+    for engine in ('ply', 'pratt'):
+        operation = parse(query, cache=False, engine=engine)
+        assert shape(operation) == expected
+        assert operation.fingerprint() == parse(expected).fingerprint()
+
+
+def test_fingerprint_cache():
+    query = 'SELECT * FROM c WHERE a == 1 AND b == 2 -- cached'
+    assert fingerprint(query, 'ply') == fingerprint(query, 'fast')
+    ## Cached per tokenizer
+    assert (query, 'ply') in fingerprint_cache
+    assert (query, 'fast') in fingerprint_cache
+
+
+def test_commutative():
+    first = parse('SELECT * FROM c WHERE a == 1 AND (b == 2 OR c == 3)')
+    second = parse('SELECT * FROM c WHERE (c == 9 OR b == 8) AND a == 7')
+    assert first.fingerprint() == second.fingerprint()
+    assert first.query.fingerprint() == second.query.fingerprint()
+    ## Both AND, spelled differently by the optimizer
+    optimized = parse('SELECT * FROM c WHERE b == 1 AND a == 2',
+                      optimize=True)
+    assert optimized.fingerprint() == parse(
+        'SELECT * FROM c WHERE a == 1 AND b == 2').fingerprint()
+    ## Not commutative
+    assert (parse('a - b').fingerprint() !=
+            parse('b - a').fingerprint())
+
+
+def test_corpus():
+    for query in QUERIES:
+        try:
+            operation = parse(query)
+        except (LexerError, ParserError):
+            continue
+        ## The normalized text is a query with the same shape
+        normalized = normalize(query)
+        assert normalize(normalized) == normalized
+        assert shape(parse(normalized)) == shape(operation)
+        ## and so is the shape
+        assert shape(parse(shape(operation))) == shape(operation)
@@ -0,0 +1,179 @@
+"""
+Tests for the instrumentation hooks and the query stats registry
+"""
+
+import random
+
+import pytest
+
+from mongosql import instrumentation
+from mongosql.instrumentation import (
+    Histogram, InstrumentedCursor, QueryStats, add_hook, execute,
+    remove_hook)
+from mongosql.tests.fakes import FakeCollection, FakeDatabase
+from mongosql.wrapper import parse_cache
+
+
+@pytest.fixture
+def events():
+    events = []
+    add_hook(events.append)
+    yield events
+    remove_hook(events.append)
+
+
+def _database():
+    db = FakeDatabase()
+    db['c'] = FakeCollection({'_id': i, 'a': i % 4} for i in range(20))
+    return db
+
+
+def test_events(events):
+    parse_cache.clear()
+    query = 'SELECT * FROM c WHERE a == ? WITH (batch_size = 2)'
+    cursor = execute(_database(), query, [1])
+    assert isinstance(cursor, InstrumentedCursor)
+    assert cursor.options == {'batch_size': 2}
+    assert [e.name for e in events] == [
+        'parse_start', 'parse_end', 'translate', 'execute']
+    documents = list(cursor)
+    assert len(documents) == 5
+    assert [e.name for e in events[4:]] == ['first_batch', 'exhausted']
+    exhausted = events[-1]
+    assert exhausted.documents == 5
+    assert exhausted.duration >= sum(e.duration for e in events[1:5])
+    assert all(e.query == query for e in events)
+    assert len(set(e.fingerprint for e in events)) == 1
+    assert list(cursor) == []
+    assert len(events) == 6
+
+    del events[:]
+    list(execute(_database(), query, [2]))
+    assert [e.name for e in events] == [
+        'parse_start', 'cache_hit', 'parse_end', 'translate', 'execute',
+        'first_batch', 'exhausted']
+
+
+def test_sizes(events):
+    pytest.importorskip('bson')
+    list(execute(_database(), 'SELECT * FROM c LIMIT 3'))
+    ## Not encoded unless a hook asks for the sizes
+    assert events[-1].documents == 3 and events[-1].size is None
+
+    stats = QueryStats(sizes=True)
+    add_hook(stats)
+    try:
+        list(execute(_database(), 'SELECT * FROM c LIMIT 3'))
+    finally:
+        remove_hook(stats)
+    ## {'_id': int32, 'a': int32}: 4 + (1 + 4 + 4) + (1 + 2 + 4) + 1 bytes
+    assert events[-1].size == 3 * 21
+    stat, = stats.snapshot().values()
+    assert stat['size'] == 3 * 21
+
+
+def test_chained_calls(events):
+    cursor = execute(_database(), 'SELECT * FROM c WHERE a == 1')
+    assert cursor.batch_size(2).max_time_ms(5) is cursor
+    assert cursor.options == {'batch_size': 2, 'max_time_ms': 5}
+    assert len(list(cursor)) == 5
+    assert events[-1].name == 'exhausted' and events[-1].documents == 5
+
+
+def test_aggregate_and_explain(events):
+    db = _database()
+    documents = list(execute(db, 'AGGREGATE c MATCH a == 0 LIMIT 2'))
+    assert len(documents) == 2
+    assert [e.name for e in events if e.name != 'cache_hit'] == [
+        'parse_start', 'parse_end', 'translate', 'execute', 'first_batch',
+        'exhausted']
+
+    del events[:]
+    report = execute(db, 'EXPLAIN SELECT * FROM c')
+    assert report['plan']['collscan'] is True
+    assert [e.name for e in events if e.name != 'cache_hit'] == [
+        'parse_start', 'parse_end']
+
+
+def test_stats():
+    stats = QueryStats()
+    add_hook(stats)
+    try:
+        db = _database()
+        for i in range(10):
+            ## Same statement, different values
+            list(execute(db, 'SELECT * FROM c WHERE a == {0}'.format(i % 4)))
+        execute(db, 'SELECT * FROM c LIMIT 1')  # Not read
+    finally:
+        remove_hook(stats)
+
+    snapshot = dict((s['query'], s) for s in stats.snapshot().values())
+    assert sorted(snapshot) == [
+        'SELECT * FROM c LIMIT ?', 'SELECT * FROM c WHERE a == ?']
+    stat = snapshot['SELECT * FROM c WHERE a == ?']
+    assert stat['count'] == 10
+    assert stat['cache_hits'] >= 6
+    assert stat['documents'] == 50
+    assert 0 < stat['p50'] <= stat['p95'] <= stat['p99'] <= stat['max']
+    stat = snapshot['SELECT * FROM c LIMIT ?']
+    assert stat['count'] == 1 and stat['p50'] is None
+
+    stats.reset()
+    assert stats.snapshot() == {}
+
+
+def test_stats_shared_results():
+    ## Results from a result cache: no find(), but still an execution
+    stats = QueryStats()
+    add_hook(stats)
+    try:
+        for _ in range(3):
+            list(execute(_database(), 'SELECT * FROM c',
+                         run=lambda operation, db, params, options: [{}]))
+    finally:
+        remove_hook(stats)
+    stat, = stats.snapshot().values()
+    assert stat['count'] == 3 and stat['documents'] == 3
+    assert stat['size'] is None
+
+
+def test_histogram():
+    histogram = Histogram()
+    assert histogram.percentile(50) is None
+    rnd = random.Random(1)
+    values = [rnd.expovariate(0.1) for _ in range(10000)]
+    for value in values:
+        histogram.add(value)
+    values.sort()
+    for percent in (50, 95, 99):
+        exact = values[int(len(values) * percent / 100.0) - 1]
+        assert exact <= histogram.percentile(percent) <= exact * 1.2
+    assert histogram.percentile(100) == histogram.max == values[-1]
+    assert histogram.count == 10000
+
+    histogram.add(0)
+    assert histogram.percentile(0) == Histogram.minimum
+
+
+def test_client_hooks(monkeypatch, events):
+    pytest.importorskip('pymongo')
+    from mongosql.client import MongoSqlClient, MongoSqlDatabase
+
+    client = MongoSqlClient('mongodb://localhost:1', connect=False,
+                            cursor_options={'max_time_ms': 5})
+    fake = _database()
+    monkeypatch.setattr(MongoSqlDatabase, '__getitem__',
+                        lambda self, name: fake[name])
+    cursor = client.testdb.sql('SELECT * FROM c WHERE a == ?', [3])
+    assert cursor.options == {'max_time_ms': 5}
+    assert len(list(cursor)) == 5
+    assert events[-1].name == 'exhausted'
+
+    ## No hooks: not instrumented at all
+    remove_hook(events.append)
+    try:
+        monkeypatch.setattr(instrumentation, 'execute', None)
+        cursor = client.testdb.sql('SELECT * FROM c')
+        assert not isinstance(cursor, InstrumentedCursor)
+    finally:
+        add_hook(events.append)
@@ -24,7 +24,7 @@ def test_lexer_simple():
         ('MATCH', 'MATCH'),
         ('SYMBOL', 'field'),
         ('DBLEQUAL', '=='),
-        ('STRING', '"value"'),
+        ('STRING', 'value'),
 
         ('GROUP', 'GROUP'),
         ('SYMBOL', '_id'),
@@ -0,0 +1,101 @@
+"""
+Tests for the fast tokenizer: must produce exactly the same
+token stream as the PLY lexer.
+"""
+
+import pytest
+
+from mongosql import parse
+from mongosql.lexer import (
+    lexer, FastLexer, LexerError, get_lexer, get_ply_lexer, keywords,
+    unescape)
+from mongosql.tests.corpus import QUERIES, dump
+
+
+def _tokenize(lex, query):
+    lex.input(query)
+    return [(t.type, t.value, t.lexpos) for t in lex]
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_same_token_stream(query):
+    assert _tokenize(FastLexer(), query) == _tokenize(lexer, query)
+
+
+@pytest.mark.parametrize('query', [
+    "SELECT * FROM c WHERE a == 1 \r\n",
+    "SELECT * FROM c WHERE a == $foo",
+    "SELECT * FROM c WHERE a == 'unterminated",
+])
+def test_same_errors(query):
+    with pytest.raises(LexerError) as ply_error:
+        _tokenize(lexer, query)
+    with pytest.raises(LexerError) as fast_error:
+        _tokenize(FastLexer(), query)
+    assert str(fast_error.value) == str(ply_error.value)
+
+
+def test_string_escapes():
+    lex = FastLexer()
+    assert _tokenize(lex, r"'a\'b' " + r'"\x41\n\t\65\\\q"') == [
+        ('STRING', "a'b", 0),
+        ('STRING', 'A\n\tA\\q', 7),
+    ]
+
+
+@pytest.mark.parametrize('tokenizer', ['ply', 'fast'])
+def test_string_escapes_utf8(tokenizer):
+    assert unescape(b'\xc3\xa9\\x41') == u'\xe9A'
+    query = u"SELECT * FROM c WHERE a == '\xe9\\x41'"
+    if bytes is str:  # A UTF-8 byte string query, on Python 2
+        query = query.encode('utf-8')
+    operation = parse(query, cache=False, tokenizer=tokenizer)
+    assert operation.query.to_mongo() == {'a': u'\xe9A'}
+
+
+def test_keywords_read_only():
+    with pytest.raises(TypeError):
+        keywords['FOO'] = ('FOO', None)
+    with pytest.raises(TypeError):
+        keywords.update(FOO=('FOO', None))
+    assert 'FOO' not in keywords
+
+
+def test_keywords_case_insensitive():
+    lex = FastLexer()
+    assert [t[:2] for t in _tokenize(lex, 'select True null Sort')] == [
+        ('SELECT', 'select'),
+        ('TRUE', True),
+        ('NULL', None),
+        ('SORT', 'Sort'),
+    ]
+
+
+def test_line_numbers():
+    lex = FastLexer()
+    lex.input('a\n\nb /* c\n */ d')
+    assert [(t.value, t.lineno) for t in lex] == [
+        ('a', 1), ('b', 3), ('d', 3)]
+
+
+def test_get_lexer():
+    ply_lexer = get_lexer('ply')
+    assert ply_lexer is not get_ply_lexer()
+    assert ply_lexer is not get_lexer('ply')
+    assert ply_lexer.lexre is get_ply_lexer().lexre
+    assert isinstance(get_lexer('fast'), FastLexer)
+    with pytest.raises(ValueError):
+        get_lexer('foo')
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_parse_with_fast_tokenizer(query):
+    try:
+        expected = parse(query, cache=False, tokenizer='ply')
+    except Exception as e:
+        with pytest.raises(type(e)):
+            parse(query, cache=False, tokenizer='fast')
+        return
+
+    result = parse(query, cache=False, tokenizer='fast')
+    assert dump(result) == dump(expected)
@@ -0,0 +1,169 @@
+"""
+Tests for bulk loads: COPY statements and ``mongosql.loader``
+"""
+
+import io
+import json
+
+import pytest
+
+from mongosql import parse
+from mongosql.loader import LoadError, convert_value, load, read
+from mongosql.parser import ParserError
+from mongosql.support import CopyOperation, shape
+from mongosql.tests.fakes import FakeDatabase, FakeLoadCollection
+
+CSV = u'a,b,c\n1,x,1.5\n2,,true\n-3,"y, z",007\n'
+
+
+def _csv(rows):
+    yield u'n,name\n'
+    for i in range(rows):
+        yield u'{0},row {0}\n'.format(i)
+
+
+def test_convert_value():
+    assert [convert_value(text) for text in (
+        '1', '-2', '1.5', '.5', '1e3', 'TRUE', 'false', 'null', '007',
+        '-', 'nan', 'x')] == [
+        1, -2, 1.5, 0.5, 1000.0, True, False, None, '007', '-', 'nan', 'x']
+
+
+def test_read_csv():
+    assert list(read(io.StringIO(CSV))) == [
+        {'a': 1, 'b': 'x', 'c': 1.5}, {'a': 2, 'c': True},
+        {'a': -3, 'b': 'y, z', 'c': '007'}]
+    assert list(read([u'1;2\n'], delimiter=';', columns=['a', 'b'],
+                     types={'b': str})) == [{'a': 1, 'b': '2'}]
+    assert list(read([])) == []
+    with pytest.raises(LoadError) as e:
+        list(read([u'a\n', u'1\n', u'1,2\n']))
+    assert e.value.line == 3
+
+
+def test_read_csv_utf8(tmpdir):
+    path = tmpdir.join('data.csv')
+    path.write_binary(u'n,\xe9t\xe9\n1,caf\xe9\n2,"\u20ac, \xe9"\n'.encode(
+        'utf-8'))
+    expected = [{'n': 1, u'\xe9t\xe9': u'caf\xe9'},
+                {'n': 2, u'\xe9t\xe9': u'\u20ac, \xe9'}]
+    assert list(read(str(path))) == expected
+    with io.open(str(path), encoding='utf-8') as f:
+        assert list(read(f)) == expected
+    assert list(read([u'a;b\n', u'\xe9;1\n'], delimiter=u';')) == [
+        {'a': u'\xe9', 'b': 1}]
+    db = FakeDatabase()
+    db['c'] = FakeLoadCollection()
+    assert parse('COPY c FROM ? FORMAT csv').apply(db, [str(path)]) == {
+        'inserted': 2}
+    assert sorted(d[u'\xe9t\xe9'] for d in db['c'].documents) == [
+        u'caf\xe9', u'\u20ac, \xe9']
+
+
+def test_read_jsonl():
+    lines = [u'{"a": 1, "b": [1]}\n', u'\n', u'{"a": "2"}\n']
+    assert list(read(lines, 'jsonl', types={'a': int})) == [
+        {'a': 1, 'b': [1]}, {'a': 2}]
+    for line in (u'{"a": \n', u'[1]\n'):
+        with pytest.raises(LoadError) as e:
+            list(read([u'{}', line], 'jsonl'))
+        assert e.value.line == 2
+    with pytest.raises(ValueError):
+        read([], 'xml')
+
+
+def test_load(tmpdir):
+    path = tmpdir.join('data.jsonl')
+    path.write(''.join(json.dumps({'n': i}) + '\n' for i in range(2500)))
+    db = FakeDatabase()
+    db['c'] = FakeLoadCollection(delay=0.01)
+    states = []
+    result = load(db, 'c', str(path), 'jsonl', chunk_size=100, workers=4,
+                  progress=lambda state: states.append(
+                      (state.inserted, state.chunks)))
+    assert result == {'inserted': 2500}
+    assert sorted(d['n'] for d in db['c'].documents) == list(range(2500))
+    assert states == [(100 * i, i) for i in range(1, 26)]
+    assert db['c'].concurrency > 1
+    assert db['c'].calls[0]['ordered'] is False
+
+
+def test_backpressure():
+    db = FakeDatabase()
+    db['c'] = FakeLoadCollection(delay=0.005)
+    lead = []
+
+    def progress(state):
+        lead.append(state.rows - state.inserted)
+
+    load(db, 'c', _csv(5000), chunk_size=50, workers=2, progress=progress)
+    assert len(db['c'].documents) == 5000
+    ## Chunks in the queue, being inserted, and being read
+    assert max(lead) <= (2 * 2 + 1) * 50
+
+
+def test_ordered():
+    db = FakeDatabase()
+    db['c'] = FakeLoadCollection()
+    load(db, 'c', _csv(100), chunk_size=10, workers=4, ordered=True,
+         bypass_document_validation=True)
+    assert [d['n'] for d in db['c'].documents] == list(range(100))
+    assert db['c'].concurrency == 1
+    assert db['c'].calls[0]['bypass_document_validation'] is True
+
+
+def test_errors():
+    db = FakeDatabase()
+    db['c'] = FakeLoadCollection(fail_at=2)
+    with pytest.raises(ValueError) as e:
+        load(db, 'c', _csv(10000), chunk_size=10, workers=2)
+    assert str(e.value) == 'Insert failed'
+    ## Stopped early
+    assert len(db['c'].calls) < 100
+
+    db['c'] = FakeLoadCollection()
+    lines = [u'{}\n'] * 50 + [u'x\n']
+    with pytest.raises(LoadError):
+        load(db, 'c', lines, 'jsonl', chunk_size=10)
+    assert len(db['c'].documents) == 50
+
+
+@pytest.mark.parametrize('engine', ['ply', 'pratt'])
+def test_parse(engine):
+    operation = parse("COPY c FROM '/tmp/data.csv' FORMAT CSV "
+                      "WITH (chunk_size = 10, workers = 2)",
+                      cache=False, engine=engine)
+    assert isinstance(operation, CopyOperation)
+    assert (operation.collection, operation.format) == ('c', 'csv')
+    assert operation._build_spec() == '/tmp/data.csv'
+    assert operation.options == {'chunk_size': 10, 'workers': 2}
+    operation = parse('COPY c FROM :path FORMAT jsonl;', cache=False,
+                      engine=engine)
+    assert operation._build_spec({'path': 'x'}) == 'x'
+    assert shape(operation) == 'COPY c FROM ? FORMAT jsonl'
+
+    for query in ("COPY c FROM 'x'", "COPY c FROM 'x' FORMAT xml",
+                  "COPY c FROM 1 FORMAT csv", "COPY FROM 'x' FORMAT csv",
+                  "COPY c FROM 'x' FORMAT csv WITH (upsert)"):
+        with pytest.raises(ParserError):
+            parse(query, cache=False, engine=engine)
+
+
+def test_apply(tmpdir):
+    path = tmpdir.join('data.csv')
+    path.write(CSV)
+    db = FakeDatabase()
+    db['c'] = FakeLoadCollection()
+    operation = parse("COPY c FROM ? FORMAT csv WITH (chunk_size = 2)")
+    assert operation.apply(db, [str(path)]) == {'inserted': 3}
+    assert [len(call['insert']) for call in db['c'].calls] == [2, 1]
+
+    assert operation.apply_many(db, [[str(path)], [str(path)]]) == {
+        'inserted': 6}
+    with pytest.raises(ValueError):
+        operation.apply(db, [1])
+
+    path.write(u'a|b\n1|2\n')
+    parse("COPY c FROM '{0}' FORMAT csv WITH (delimiter = '|')".format(
+        path)).apply(db)
+    assert db['c'].documents[-1] == {'_id': 9, 'a': 1, 'b': 2}
@@ -0,0 +1,366 @@
+"""
+Tests for the query optimizer: rewritten queries must match exactly
+the same documents as the original ones (checked against the
+in-memory matcher in ``fakes``), with any combination of rules.
+"""
+
+import itertools
+import random
+
+import pytest
+
+from mongosql import parse, prepare
+from mongosql.optimizer import RULES, Optimizer, default_rules, get_rules
+from mongosql.support import MatchNothing, to_mongo
+from mongosql.tests.fakes import MISSING, evaluate, matches, run_pipeline
+
+
+def _spec(where, rules=True):
+    operation = parse('SELECT * FROM c WHERE ' + where, optimize=rules)
+    if operation.query is None:
+        return None
+    return to_mongo(operation.query)
+
+
+@pytest.mark.parametrize('where, expected', [
+    ## OR to IN
+    ('a == 1 OR a == 2 OR a == 3', {'a': {'$in': [1, 2, 3]}}),
+    ('a == 1 OR a IN [2, 1] OR b == 2',
+     {'$or': [{'a': {'$in': [1, 2]}}, {'b': 2}]}),
+    ('a IN [1]', {'a': 1}),
+    ('a == 1 OR a == 1', {'a': 1}),
+
+    ## Implicit conjunctions, ranges
+    ('a == 1 AND b == 2', {'a': 1, 'b': 2}),
+    ('x > 5 AND x < 10', {'x': {'$gt': 5, '$lt': 10}}),
+    ('x > 5 AND x >= 7 AND x < 10 AND x <= 10', {'x': {'$gte': 7, '$lt': 10}}),
+    ('x >= 5 AND x > 5', {'x': {'$gt': 5}}),
+    ('x == 7 AND x > 5 AND x < 10', {'x': 7}),
+    ('x == 7 AND x < "z"', {'x': {'$eq': 7, '$lt': 'z'}}),
+    ('x > 1 AND x > "a"', {'x': {'$gt': 1}, '$and': [{'x': {'$gt': 'a'}}]}),
+    ('x > 10 AND x < 5', {'x': {'$gt': 10, '$lt': 5}}),
+    ('a == 1 AND (b == 1 OR c == 1) AND (d == 1 OR e == 1)', {
+        'a': 1, '$or': [{'b': 1}, {'c': 1}],
+        '$and': [{'$or': [{'d': 1}, {'e': 1}]}]}),
+    ('(a == 1 AND b == 2) OR c == 3',
+     {'$or': [{'a': 1, 'b': 2}, {'c': 3}]}),
+
+    ## Negation
+    ('NOT (NOT (a == 1))', {'a': 1}),
+    ('NOT (a == 1) AND NOT (b != "x")', {'a': {'$ne': 1}, 'b': 'x'}),
+    ('NOT (a > 1)', {'$not': {'a': {'$gt': 1}}}),
+
+    ## Contradictions and tautologies
+    ('a == 1 AND true', {'a': 1}),
+    ('a == 1 OR false', {'a': 1}),
+    ('a == 1 AND NOT (a == 1)', {'_id': {'$in': []}}),
+    ('a == 1 AND a != 1', {'_id': {'$in': []}}),
+    ('a IN [] OR b == 2', {'b': 2}),
+    ('a == 1 OR a != 1', None),
+    ('b == 2 OR true', None),
+
+    ## Constant folding
+    ('a == 1 + 2 * 3', {'a': 7}),
+    ('a == 7 % -3 AND b == -7 % 3 AND c == 1 / 4 AND d == 1.5 * 2',
+     {'a': 1, 'b': -1, 'c': 0.25, 'd': 3.0}),
+    ('a == 1 / 0', {'a': {'$divide': [1, 0]}}),
+    ('a == b + (2 - 1)', {'a': {'$add': ['b', 1]}}),
+])
+def test_rewrites(where, expected):
+    assert _spec(where) == expected
+
+
+def test_range_contradictions():
+    rules = default_rules | set(['range_contradictions'])
+    assert _spec('x > 10 AND x < 5', rules) == {'_id': {'$in': []}}
+    assert _spec('x > 10 AND x <= 10', rules) == {'_id': {'$in': []}}
+    assert _spec('x >= 10 AND x <= 10', rules) == {'x': {
+        '$gte': 10, '$lte': 10}}
+    assert _spec('a == 1 AND a == 2', rules) == {'_id': {'$in': []}}
+    assert _spec('a == 1 AND a > 5', rules) == {'_id': {'$in': []}}
+
+
+def test_rules_are_toggleable():
+    query = 'a == 1 OR a == 2'
+    assert _spec(query, default_rules - set(['or_to_in'])) == {
+        '$or': [{'a': 1}, {'a': 2}]}
+    query = 'a == 1 AND b == 2'
+    assert _spec(query, default_rules - set(['implicit_and'])) == {
+        '$and': [{'a': 1}, {'b': 2}]}
+    query = 'a == 1 + 2'
+    assert _spec(query, default_rules - set(['constant_folding'])) == {
+        'a': {'$add': [1, 2]}}
+    query = 'NOT (NOT (a == 1))'
+    assert _spec(query, default_rules - set(['negation'])) == {
+        '$not': {'$not': {'a': 1}}}
+    query = 'x > 1 AND x > 2'
+    assert _spec(query, ['implicit_and']) == {
+        'x': {'$gt': 1}, '$and': [{'x': {'$gt': 2}}]}
+    query = 'a == 1 AND a != 1'
+    assert _spec(query, ['implicit_and']) == {'a': {'$eq': 1, '$ne': 1}}
+    assert _spec('a == 1', []) == {'a': 1}
+
+    with pytest.raises(ValueError):
+        get_rules(['foo'])
+    assert get_rules(False) is None
+    assert get_rules(True) == default_rules
+    assert 'range_contradictions' not in default_rules
+
+
+def test_parse_cache():
+    query = 'SELECT * FROM c WHERE a == 1 OR a == 2'
+    assert to_mongo(parse(query).query) == {'$or': [{'a': 1}, {'a': 2}]}
+    assert to_mongo(parse(query, optimize=True).query) == {
+        'a': {'$in': [1, 2]}}
+    assert to_mongo(parse(query, optimize=['flatten']).query) == {
+        '$or': [{'a': 1}, {'a': 2}]}
+    assert to_mongo(parse(query).query) == {'$or': [{'a': 1}, {'a': 2}]}
+
+
+def test_operations():
+    optimizer = Optimizer()
+    operation = parse('SELECT * FROM c WHERE a == 1 OR true LIMIT 3')
+    optimized = optimizer.optimize(operation)
+    assert optimized.query is None and optimized.limit == 3
+    assert to_mongo(operation.query) == {'$or': [{'a': 1}, True]}
+
+    assert isinstance(optimizer.optimize(
+        parse('SELECT * FROM c WHERE a == 1 AND false')).query, MatchNothing)
+    assert optimizer.optimize(True) is None
+
+    operation = parse('AGGREGATE c PROJECT a = 1 + 2, b = "$x" * (2 + 3)')
+    assert optimizer.optimize(operation).to_mongo()['pipeline'] == [
+        {'$project': {'a': 3, 'b': {'$multiply': ['$x', 5]}}}]
+    assert operation.to_mongo()['pipeline'][0]['$project']['a'] == {
+        '$add': [1, 2]}
+
+    stmt = prepare('SELECT * FROM c WHERE a == ? OR a == :b AND x > 1 + 1',
+                   optimize=True)
+    assert to_mongo(stmt.bind({0: 1, 'b': 2}).query) == {
+        '$or': [{'a': 1}, {'a': 2, 'x': {'$gt': 2}}]}
+
+
+##------------------------------------------------------------
+## Semantic equivalence, on random queries and documents
+##------------------------------------------------------------
+
+VALUES = ['0', '1', '2', '3', '"x"', '"y"', 'true', 'null']
+
+FIELD_VALUES = [MISSING, None, 0, 1, 2, 3, 'x', True, [], [1, 3], [0, 'x']]
+
+DOCUMENTS = [
+    dict((k, v) for k, v in (('a', a), ('b', b)) if v is not MISSING)
+    for a, b in itertools.product(FIELD_VALUES, repeat=2)]
+
+SCALAR_DOCUMENTS = [
+    d for d in DOCUMENTS if not any(isinstance(v, list) for v in d.values())]
+
+
+def _random_condition(rnd, depth=0):
+    kind = rnd.random()
+    if depth > 3 or kind < 0.45:
+        field = rnd.choice('ab')
+        operator = rnd.choice(['==', '==', '!=', '<', '<=', '>', '>=', 'IN'])
+        if operator == 'IN':
+            value = '[{0}]'.format(', '.join(
+                rnd.sample(VALUES, rnd.randint(0, 3))))
+        else:
+            value = rnd.choice(VALUES)
+        return '{0} {1} {2}'.format(field, operator, value)
+    if kind < 0.5:
+        return rnd.choice(['true', 'false'])
+    if kind < 0.6:
+        return 'NOT ({0})'.format(_random_condition(rnd, depth + 1))
+    operator = rnd.choice([' AND ', ' OR '])
+    return '({0})'.format(operator.join(
+        _random_condition(rnd, depth + 1)
+        for _ in range(rnd.randint(2, 4))))
+
+
+def _random_conditions(count):
+    rnd = random.Random(1)
+    conditions = []
+    while len(conditions) < count:
+        condition = _random_condition(rnd)
+        if condition not in ('true', 'false'):  # Not valid in WHERE
+            conditions.append(condition)
+    return conditions
+
+
+def _check_equivalent(where, rules, documents):
+    original = _spec(where, False)
+    optimized = _spec(where, rules)
+    for document in documents:
+        assert matches(optimized, document) == matches(original, document), (
+            where, rules, document, original, optimized)
+
+
+@pytest.mark.parametrize('rules', [default_rules] + [
+    [rule] for rule in RULES if rule != 'range_contradictions'])
+def test_equivalence(rules):
+    for where in _random_conditions(200):
+        _check_equivalent(where, rules, DOCUMENTS)
+
+
+def test_equivalence_range_contradictions():
+    ## Only holds without arrays
+    rules = default_rules | set(['range_contradictions'])
+    for where in _random_conditions(200):
+        _check_equivalent(where, rules, SCALAR_DOCUMENTS)
+
+
+def _random_arithmetic(rnd, depth=0):
+    if depth > 3 or rnd.random() < 0.3:
+        return rnd.choice(['0', '1', '2', '7', '-3', '2.5', '-0.5', '1000.0'])
+    return '({0} {1} {2})'.format(
+        _random_arithmetic(rnd, depth + 1), rnd.choice('+-*/%'),
+        _random_arithmetic(rnd, depth + 1))
+
+
+def test_constant_folding():
+    rnd = random.Random(2)
+    optimizer = Optimizer(['constant_folding'])
+    for _ in range(500):
+        expression = parse(_random_arithmetic(rnd))
+        folded = optimizer.fold(expression)
+        try:
+            expected = evaluate(to_mongo(expression))
+        except ZeroDivisionError:
+            assert not isinstance(folded, (int, long, float))
+            continue
+        assert type(folded) is type(expected)
+        assert folded == pytest.approx(expected)
+
+
+##------------------------------------------------------------
+## Aggregation pipelines
+##------------------------------------------------------------
+
+def _pipeline(stages, rules=True):
+    operation = parse('AGGREGATE c ' + stages, optimize=rules)
+    return operation.to_mongo()['pipeline']
+
+
+@pytest.mark.parametrize('stages, expected', [
+    ## $match pushdown
+    ('PROJECT a = 1, b = 1 MATCH a > 1',
+     [{'$match': {'a': {'$gt': 1}}}, {'$project': {'a': 1, 'b': 1}}]),
+    ('PROJECT a = 1, b = "$x" MATCH b > 1',
+     [{'$project': {'a': 1, 'b': '$x'}}, {'$match': {'b': {'$gt': 1}}}]),
+    ('PROJECT a = 1 MATCH b > 1',
+     [{'$project': {'a': 1}}, {'$match': {'b': {'$gt': 1}}}]),
+    ('PROJECT a = 0 MATCH b > 1 AND _id == 2',
+     [{'$match': {'b': {'$gt': 1}, '_id': 2}}, {'$project': {'a': 0}}]),
+    ('PROJECT a = 0 MATCH a.b > 1',
+     [{'$project': {'a': 0}}, {'$match': {'a.b': {'$gt': 1}}}]),
+    ('PROJECT _id = 0, a = 1 MATCH _id == 1',
+     [{'$project': {'_id': 0, 'a': 1}}, {'$match': {'_id': 1}}]),
+    ('UNWIND tags SORT a MATCH a == 1 AND b.c == 2',
+     [{'$match': {'a': 1, 'b.c': 2}}, {'$unwind': '$tags'},
+      {'$sort': {'a': 1}}]),
+    ('UNWIND tags MATCH tags == 1',
+     [{'$unwind': '$tags'}, {'$match': {'tags': 1}}]),
+    ('UNWIND tags MATCH tags.x == 1',
+     [{'$unwind': '$tags'}, {'$match': {'tags.x': 1}}]),
+    ('LIMIT 5 MATCH a == 1',
+     [{'$limit': 5}, {'$match': {'a': 1}}]),
+    ('GROUP BY "$a", n = sum(1) MATCH n > 1',
+     [{'$group': {'_id': '$a', 'n': {'$sum': 1}}},
+      {'$match': {'n': {'$gt': 1}}}]),
+
+    ## Merging
+    ('MATCH a == 1 MATCH b == 2 OR b == 3',
+     [{'$match': {'a': 1, 'b': {'$in': [2, 3]}}}]),
+    ('MATCH a == 1 MATCH a != 1', [{'$match': {'_id': {'$in': []}}}]),
+    ('MATCH a == 1 OR a != 1 LIMIT 1', [{'$limit': 1}]),
+    ('PROJECT a = 1, b = "$x" + 1, c = 1 PROJECT b = 1, a = 1',
+     [{'$project': {'b': {'$add': ['$x', 1]}, 'a': 1}}]),
+    ('PROJECT _id = 0, a = 1 PROJECT a = true, _id = 1',
+     [{'$project': {'_id': 0, 'a': 1}}]),
+    ('PROJECT a = 1, b = 1 PROJECT _id = 0',
+     [{'$project': {'_id': 0, 'a': 1, 'b': 1}}]),
+    ('PROJECT a = 1 PROJECT b = "$a"',
+     [{'$project': {'a': 1}}, {'$project': {'b': '$a'}}]),
+    ('PROJECT a = 0 PROJECT b = 1',
+     [{'$project': {'a': 0}}, {'$project': {'b': 1}}]),
+    ('LIMIT 10 LIMIT 5 SKIP 1 SKIP 2', [{'$limit': 5}, {'$skip': 3}]),
+
+    ## $sort + $limit
+    ('SORT a SKIP 20 LIMIT 10',
+     [{'$sort': {'a': 1}}, {'$limit': 30}, {'$skip': 20}]),
+    ('SORT a PROJECT a = 1, b = "$c" * 2 LIMIT 10',
+     [{'$sort': {'a': 1}}, {'$limit': 10},
+      {'$project': {'a': 1, 'b': {'$multiply': ['$c', 2]}}}]),
+    ('SORT a PROJECT a = 1 SKIP 5 PROJECT b = 1 LIMIT 5', [
+        {'$sort': {'a': 1}}, {'$limit': 10}, {'$skip': 5},
+        {'$project': {'a': 1}}, {'$project': {'b': 1}}]),
+    ('SORT a UNWIND b LIMIT 10',
+     [{'$sort': {'a': 1}}, {'$unwind': '$b'}, {'$limit': 10}]),
+    ('SORT a SKIP ? LIMIT 10',
+     [{'$sort': {'a': 1}}, {'$skip': 5}, {'$limit': 10}]),
+
+    ## Reporting pipeline
+    ("PROJECT day = 1, amount = 1, status = 1, region = 1 "
+     "UNWIND region SORT amount DESC "
+     "MATCH status == 'paid' AND amount > 10 * 10 "
+     "PROJECT day = 1, amount = 1 SKIP 50 LIMIT 50",
+     [{'$match': {'status': 'paid', 'amount': {'$gt': 100}}},
+      {'$project': {'day': 1, 'amount': 1, 'status': 1, 'region': 1}},
+      {'$unwind': '$region'}, {'$sort': {'amount': -1}},
+      {'$limit': 100}, {'$skip': 50}, {'$project': {'day': 1, 'amount': 1}}]),
+])
+def test_pipeline_rewrites(stages, expected):
+    operation = parse('AGGREGATE c ' + stages, optimize=True)
+    assert operation.bind([5]).to_mongo()['pipeline'] == expected
+
+
+def test_pipeline_rules_are_toggleable():
+    stages = 'PROJECT a = 1 MATCH a == 1 MATCH b == 1 SKIP 1 LIMIT 2'
+    assert _pipeline(stages, False) == [
+        {'$project': {'a': 1}}, {'$match': {'a': 1}}, {'$match': {'b': 1}},
+        {'$skip': 1}, {'$limit': 2}]
+    assert _pipeline(stages, default_rules - set(['match_pushdown'])) == [
+        {'$project': {'a': 1}}, {'$match': {'a': 1, 'b': 1}},
+        {'$limit': 3}, {'$skip': 1}]
+    assert _pipeline(stages, default_rules - set(['merge_stages'])) == [
+        {'$match': {'a': 1}}, {'$project': {'a': 1}}, {'$match': {'b': 1}},
+        {'$limit': 3}, {'$skip': 1}]
+    assert _pipeline(stages, ['sort_limit']) == [
+        {'$project': {'a': 1}}, {'$match': {'a': 1}}, {'$match': {'b': 1}},
+        {'$limit': 3}, {'$skip': 1}]
+    assert _pipeline('PROJECT a = 1 LIMIT 2', ['limit_pushdown']) == [
+        {'$limit': 2}, {'$project': {'a': 1}}]
+    assert _pipeline('PROJECT a = 1 LIMIT 2', ['merge_stages']) == [
+        {'$project': {'a': 1}}, {'$limit': 2}]
+
+
+PIPELINE_STAGES = [
+    'MATCH a > 1', 'MATCH b == 2 OR a == 1', 'MATCH tags == 2',
+    'MATCH c == "x" OR c == 1', 'MATCH _id < 10', 'MATCH NOT (b IN [1, 3])',
+    'PROJECT a = 1, b = 1, tags = 1', 'PROJECT a = 1, tags = 1',
+    'PROJECT a = 1, b = 1, c = 1', 'PROJECT b = 1, c = "$a"',
+    'PROJECT _id = 0, a = 1, b = 1, c = 1, tags = 1', 'PROJECT c = 0',
+    'PROJECT a = 1, b = "$b" + 1, tags = 1', 'PROJECT _id = "$a", b = 1',
+    'UNWIND tags', 'SORT a, _id', 'SORT b DESC, a', 'SORT c DESC',
+    'LIMIT 5', 'LIMIT 3', 'SKIP 2', 'SKIP 4',
+]
+
+PIPELINE_DOCUMENTS = [
+    {'_id': i, 'a': i % 4, 'b': i % 3, 'c': 'xy'[i % 2],
+     'tags': [[], [1, 2], [2, 3, 2], None, 4][i % 5]}
+    for i in range(20)] + [{'_id': 20}, {'_id': 21, 'c': 1, 'tags': 2}]
+
+
+@pytest.mark.parametrize('rules', [default_rules] + [
+    [rule] for rule in
+    ('match_pushdown', 'merge_stages', 'sort_limit', 'limit_pushdown')])
+def test_pipeline_equivalence(rules):
+    rnd = random.Random(3)
+    for _ in range(300):
+        stages = ' '.join(
+            rnd.choice(PIPELINE_STAGES) for _ in range(rnd.randint(2, 6)))
+        original = _pipeline(stages, False)
+        optimized = _pipeline(stages, rules)
+        assert (run_pipeline(optimized, PIPELINE_DOCUMENTS) ==
+                run_pipeline(original, PIPELINE_DOCUMENTS)), (
+            stages, original, optimized)
@@ -0,0 +1,128 @@
+"""
+Tests for keyset pagination
+"""
+
+import pytest
+
+from mongosql import parse, prepare
+from mongosql.pagination import after_condition, decode_token, sort_keys
+from mongosql.tests.fakes import FakeCollection, FakeDatabase, matches
+
+
+DOCUMENTS = [
+    {'_id': i, 'score': (i * 7) % 5, 'name': 'n{0}'.format((i * 3) % 4)}
+    for i in range(50)]
+
+
+def _database():
+    db = FakeDatabase()
+    db['c'] = FakeCollection(DOCUMENTS)
+    return db
+
+
+def _all_pages(operation, db, **kwargs):
+    pages = []
+    documents, token = operation.paginate(db, **kwargs)
+    pages.append(documents)
+    while token is not None:
+        documents, token = operation.paginate(db, token, **kwargs)
+        pages.append(documents)
+    return pages
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('SELECT * FROM c LIMIT 7',
+     sorted(DOCUMENTS, key=lambda d: d['_id'])),
+    ('SELECT * FROM c WHERE score >= 2 ORDER BY score DESC, name LIMIT 7',
+     sorted([d for d in DOCUMENTS if d['score'] >= 2],
+            key=lambda d: (-d['score'], d['name'], d['_id']))),
+    ('SELECT * FROM c ORDER BY name DESC, score DESC LIMIT 10',
+     sorted(DOCUMENTS,
+            key=lambda d: (d['name'], d['score'], -d['_id']), reverse=True)),
+    ('SELECT * FROM c ORDER BY _id DESC LIMIT 50',
+     sorted(DOCUMENTS, key=lambda d: -d['_id'])),
+])
+def test_pages(query, expected):
+    db = _database()
+    pages = _all_pages(parse(query), db)
+    assert sum(pages, []) == expected
+    assert [len(p) for p in pages[:-1]] == [len(pages[0])] * (len(pages) - 1)
+    assert pages[-1]
+    for kwargs in db['c'].calls:
+        assert 'skip' not in kwargs
+
+
+def test_page_size_and_fields():
+    db = _database()
+    operation = parse('SELECT name FROM c WHERE score == 1 ORDER BY score')
+    pages = _all_pages(operation, db, page_size=3)
+    assert [len(p) for p in pages] == [3, 3, 3, 1]
+    assert sum(pages, []) == [
+        {'_id': d['_id'], 'name': d['name']}
+        for d in DOCUMENTS if d['score'] == 1]
+    assert db['c'].calls[-1]['projection'] == ['name', 'score']
+    assert db['c'].calls[-1]['limit'] == 4
+
+    with pytest.raises(ValueError):
+        operation.paginate(db)
+    with pytest.raises(ValueError):
+        parse('SELECT * FROM c LIMIT 5 SKIP 5').paginate(db)
+
+
+def test_tokens():
+    db = _database()
+    operation = parse('SELECT * FROM c ORDER BY score DESC LIMIT 5')
+    documents, token = operation.paginate(db)
+    assert decode_token(token, sort_keys(operation.sort)) == [
+        documents[-1]['score'], documents[-1]['_id']]
+
+    other = parse('SELECT * FROM c ORDER BY score ASC LIMIT 5')
+    with pytest.raises(ValueError):
+        other.paginate(db, token)
+    for invalid in ('', 'foo', token[:-3], 1):
+        with pytest.raises(ValueError):
+            operation.paginate(db, invalid)
+
+    documents, token = parse('SELECT * FROM c LIMIT 100').paginate(db)
+    assert len(documents) == 50 and token is None
+
+
+def test_params_and_options():
+    db = _database()
+    stmt = prepare('SELECT * FROM c WHERE score == :s ORDER BY name '
+                   'LIMIT ? WITH (batch_size = ?)')
+    params = {'s': 3, 0: 4, 1: 100}
+    pages = _all_pages(stmt.operation, db, params=params,
+                       options={'max_time_ms': 10})
+    assert sum(pages, []) == sorted(
+        [d for d in DOCUMENTS if d['score'] == 3],
+        key=lambda d: (d['name'], d['_id']))
+    assert len(pages[0]) == 4
+    assert db['c'].cursors[-1].options == {
+        'batch_size': 100, 'max_time_ms': 10}
+
+
+def test_after_condition():
+    keys = [('a', 1), ('b', -1), ('_id', 1)]
+    condition = after_condition(keys, [1, {'x': 1}, 3])
+    assert condition == {'$or': [
+        {'a': {'$gt': 1}},
+        {'a': 1, 'b': {'$lt': {'x': 1}}},
+        {'a': 1, 'b': {'$eq': {'x': 1}}, '_id': {'$gt': 3}}]}
+    assert after_condition([('_id', -1)], [5]) == {'_id': {'$lt': 5}}
+
+    values = [(a, b, i) for a in range(3) for b in range(3) for i in range(2)]
+    documents = [{'a': a, 'b': b, '_id': i} for a, b, i in values]
+    ordered = sorted(values, key=lambda v: (v[0], -v[1], v[2]))
+    for position, value in enumerate(ordered):
+        condition = after_condition(keys, list(value))
+        after = [(d['a'], d['b'], d['_id']) for d in documents
+                 if matches(condition, d)]
+        assert sorted(after) == sorted(ordered[position + 1:])
+
+
+def test_sort_order():
+    for engine in ('ply', 'pratt'):
+        operation = parse('SELECT * FROM c ORDER BY b, a DESC, c',
+                          engine=engine, cache=False)
+        assert list(operation.sort.items()) == [('b', 1), ('a', -1), ('c', 1)]
@@ -1,3 +1,5 @@
+from six.moves import intern
+
 from mongosql import parse
 from mongosql.support import Comparison, SelectOperation
 
@@ -13,8 +15,8 @@ def test_simple_parsing():
 
     class FakeCollection(object):
         def find(self, **kwargs):
-            assert kwargs.keys() == ['spec']
-            assert kwargs['spec'] == {'field': 'value'}
+            assert kwargs.keys() == ['filter']
+            assert kwargs['filter'] == {'field': 'value'}
 
     parsed.apply({'mycollection': FakeCollection()})
     pass
@@ -45,9 +47,9 @@ def test_parsing_all_parts():
     class FakeCollection(object):
         def find(self, **kwargs):
             assert set(kwargs.keys()) == set((
-                'spec', 'fields', 'limit', 'skip', 'sort'))
-            assert kwargs['spec'] == {'field': 'value'}
-            assert kwargs['fields'] == ['field', 'field1', 'field2']
+                'filter', 'projection', 'limit', 'skip', 'sort'))
+            assert kwargs['filter'] == {'field': 'value'}
+            assert kwargs['projection'] == ['field', 'field1', 'field2']
             assert kwargs['limit'] == 100
             assert kwargs['skip'] == 20
             assert kwargs['sort'] == {'field1': 1, 'field2': -1}
@@ -68,3 +70,23 @@ def test_parsing_expressions():
         ],
     }
     pass
+
+
+def test_compact_nodes():
+    first = parse('SELECT * FROM coll WHERE foo == 1 OR bar > f(foo)',
+                  cache=False)
+    second = parse('SELECT * FROM coll WHERE foo < 2', cache=False)
+    nodes = [first, first.query] + first.query._expressions + [
+        first.query._expressions[1].second]
+    for node in nodes:
+        assert not hasattr(node, '__dict__'), node
+
+    ## Names and operators are shared between statements
+    assert first.collection is second.collection
+    assert first.query._expressions[0].first.name is second.query.first.name
+    assert first.query._expressions[1].operator is intern('>')
+
+    other = first.clone()
+    assert other.query is first.query
+    other.limit = 10
+    assert first.limit is None
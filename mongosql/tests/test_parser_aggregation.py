@@ -74,3 +74,72 @@ def test_aggregation_project_subdocument():
                 'dpv': {'$add': ["$pageViews", 10]}
             },
         }}]
+
+
+def test_aggregation_stages():
+    result = parse("""
+    AGGREGATE orders
+    MATCH status == 'paid' AND total > 100
+    UNWIND items
+    GROUP BY '$items.sku', count = sum(1), revenue = sum('$items.price')
+    SORT revenue DESC, _id
+    SKIP 20 LIMIT 10
+    """)
+    assert result.to_mongo()['pipeline'] == [
+        {'$match': {'$and': [{'status': 'paid'}, {'total': {'$gt': 100}}]}},
+        {'$unwind': '$items'},
+        {'$group': {
+            '_id': '$items.sku',
+            'count': {'$sum': 1},
+            'revenue': {'$sum': '$items.price'}}},
+        {'$sort': {'revenue': -1, '_id': 1}},
+        {'$skip': 20},
+        {'$limit': 10},
+    ]
+    assert list(result.to_mongo()['pipeline'][3]['$sort']) == [
+        'revenue', '_id']
+
+
+def test_aggregation_group():
+    result = parse("AGGREGATE c UNWIND '$tags' GROUP total = sum('$n'), "
+                   "avg('$n') AS mean, first = concat('$a', '$b')")
+    assert result.to_mongo()['pipeline'] == [
+        {'$unwind': '$tags'},
+        {'$group': {
+            '_id': None,
+            'total': {'$sum': '$n'},
+            'mean': {'$avg': '$n'},
+            'first': {'$concat': ['$a', '$b']}}},
+    ]
+
+
+def test_aggregation_group_by_field():
+    result = parse("AGGREGATE c GROUP BY items.sku, n = sum(1) "
+                   "GROUP BY {sku = '$_id', n = '$n'}, count = sum(1)")
+    assert result.to_mongo()['pipeline'] == [
+        {'$group': {'_id': '$items.sku', 'n': {'$sum': 1}}},
+        {'$group': {
+            '_id': {'sku': '$_id', 'n': '$n'},
+            'count': {'$sum': 1}}},
+    ]
+    assert result.to_shape() == (
+        'AGGREGATE c GROUP BY items.sku, n = sum(?) '
+        'GROUP BY {n = "$n", sku = "$_id"}, count = sum(?)')
+
+
+def test_aggregation_geo_near():
+    result = parse("""
+    AGGREGATE places
+    GEO_NEAR near = {type = 'Point', coordinates = [12.5, 41.9]},
+             distanceField = 'distance', maxDistance = 1000,
+             spherical = true
+    LIMIT :n
+    """)
+    assert result.bind({'n': 5}).to_mongo()['pipeline'] == [
+        {'$geoNear': {
+            'near': {'type': 'Point', 'coordinates': [12.5, 41.9]},
+            'distanceField': 'distance',
+            'maxDistance': 1000,
+            'spherical': True}},
+        {'$limit': 5},
+    ]
@@ -0,0 +1,114 @@
+"""
+Differential tests: the Pratt parser must build exactly the same
+objects as the PLY one, and reject the same queries.
+"""
+
+import random
+
+import pytest
+
+from mongosql import parse
+from mongosql.parser import ParserError
+from mongosql.tests.corpus import QUERIES, dump
+
+
+def _parse_both(query, tokenizer):
+    results = []
+    for engine in ('ply', 'pratt'):
+        try:
+            results.append(dump(parse(
+                query, cache=False, engine=engine, tokenizer=tokenizer)))
+        except (ParserError, AssertionError) as e:
+            results.append(type(e))
+    return results
+
+
+def _check_same(query):
+    for tokenizer in ('ply', 'fast'):
+        expected, result = _parse_both(query, tokenizer)
+        assert result == expected, query
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_corpus(query):
+    _check_same(query)
+
+
+@pytest.mark.parametrize('query', [
+    'a == 1 OR b == 2 AND c == 3',
+    'a + b * c - d / e % f',
+    'a < b == c > d != e IN f',
+    'NOT a == 1 AND NOT b',
+    'SELECT * FROM c WHERE NOT a == 1',
+    'NOT NOT -1',
+    '1 - -1',
+    'a -1',
+    '{}', '[]', '[1,]', '{a: 1,}', '{a = 1, b = 2,}', '{"a": 1}',
+    '{a + 1 AS b, c = 2}', '{"a" AS b}',
+    'f()', 'f(1, g(2), [3])',
+    'SELECT * FROM c WHERE a == 1;;;',
+    'SELECT a, b FROM c ORDER BY a DESC, b ASC SORT a LIMIT 1 LIMIT 2',
+    'SELECT * FROM c WHERE a == :a SKIP ? LIMIT :n',
+    'AGGREGATE c PROJECT a = 1, b + 2 AS c PROJECT d = "$e"',
+])
+def test_valid(query):
+    _check_same(query)
+    for engine in ('ply', 'pratt'):
+        parse(query, cache=False, engine=engine)
+
+
+@pytest.mark.parametrize('query', [
+    '', ';', 'SELECT', 'SELECT * FROM', 'SELECT FROM c',
+    'SELECT * FROM c WHERE', 'SELECT * FROM c WHERE a',
+    'SELECT * FROM c LIMIT 1.5', 'SELECT * FROM c LIMIT -1',
+    'SELECT * FROM c SORT', 'SELECT * FROM c ORDER BY a,',
+    'AGGREGATE', 'AGGREGATE c PROJECT', 'AGGREGATE c PROJECT a',
+    'AGGREGATE c PROJECT a = 1,',
+    'AGGREGATE c MATCH', 'AGGREGATE c LIMIT a', 'AGGREGATE c UNWIND 1',
+    'AGGREGATE c GROUP BY a', 'AGGREGATE c GROUP BY a, b',
+    'AGGREGATE c SORT', 'AGGREGATE c GEO_NEAR',
+    '{a: 1, b: 2}', '{"a" = 1}', '[1,,]', 'f(1,)', '(1', '1 +', '- a',
+    'a b', 'a == 1 AS b',
+    'EXPLAIN', 'EXPLAIN ANALYZE', 'EXPLAIN 1', 'EXPLAIN EXPLAIN SELECT',
+    'ANALYZE SELECT * FROM c', 'EXPLAIN ANALYZE ANALYZE AGGREGATE c',
+])
+def test_invalid(query):
+    for tokenizer in ('ply', 'fast'):
+        expected, result = _parse_both(query, tokenizer)
+        assert isinstance(expected, type)
+        assert result == expected
+
+
+def _random_expression(rnd, depth=0):
+    if depth > 3 or rnd.random() < 0.3:
+        return rnd.choice([
+            'a', 'b.c', '1', '2.5', '-3', '"s"', 'true', 'null', '?',
+            ':p', '[1, x]', '{k = 1}', '{k: v}', 'f()', 'g(1, y)'])
+    kind = rnd.random()
+    if kind < 0.1:
+        return 'NOT ' + _random_expression(rnd, depth + 1)
+    if kind < 0.2:
+        return '(' + _random_expression(rnd, depth + 1) + ')'
+    operator = rnd.choice([
+        'AND', 'OR', '==', '!=', '<', '<=', '>', '>=', 'IN',
+        '+', '-', '*', '/', '%'])
+    return ' '.join((
+        _random_expression(rnd, depth + 1), operator,
+        _random_expression(rnd, depth + 1)))
+
+
+def test_random_expressions():
+    rnd = random.Random(42)
+    for _ in range(300):
+        _check_same(_random_expression(rnd))
+
+
+@pytest.mark.parametrize('engine', ['ply', 'pratt'])
+def test_operator_precedence(engine):
+    result = parse('a == 1 + 2 * b', cache=False, engine=engine)
+    assert result.to_mongo() == {
+        'a': {'$add': [1, {'$multiply': [2, 'b']}]}}
+
+    result = parse('(1 + 2) * 3 - 4 - 5', cache=False, engine=engine)
+    assert result.to_mongo() == {'$subtract': [
+        {'$subtract': [{'$multiply': [{'$add': [1, 2]}, 3]}, 4]}, 5]}
@@ -0,0 +1,138 @@
+"""
+Tests for prepared statements / bind parameters
+"""
+
+import pytest
+
+from mongosql import parse, prepare
+from mongosql.lexer import lexer
+from mongosql.support import BindError, Parameter, SelectOperation
+
+
+def _tokens(query):
+    lexer.input(query)
+    return [(t.type, t.value) for t in lexer]
+
+
+def test_lexer_parameters():
+    assert _tokens('a == ? AND b IN [?, ?]') == [
+        ('SYMBOL', 'a'), ('DBLEQUAL', '=='), ('PARAM', 0),
+        ('AND', 'AND'), ('SYMBOL', 'b'), ('IN', 'IN'),
+        ('LBRACKET', '['), ('PARAM', 1), ('COMMA', ','),
+        ('PARAM', 2), ('RBRACKET', ']'),
+    ]
+
+    ## Numbering restarts on each input
+    assert _tokens('?') == [('PARAM', 0)]
+    assert _tokens('?') == [('PARAM', 0)]
+
+    assert _tokens('a == :value') == [
+        ('SYMBOL', 'a'), ('DBLEQUAL', '=='), ('NAMED_PARAM', 'value')]
+
+
+def test_lexer_map_colon_is_not_a_parameter():
+    assert _tokens('{key:value}') == [
+        ('LBRACE', '{'), ('SYMBOL', 'key'), ('COLON', ':'),
+        ('SYMBOL', 'value'), ('RBRACE', '}')]
+    assert _tokens('{"key":value}') == [
+        ('LBRACE', '{'), ('STRING', 'key'), ('COLON', ':'),
+        ('SYMBOL', 'value'), ('RBRACE', '}')]
+    assert _tokens('{key: :value}') == [
+        ('LBRACE', '{'), ('SYMBOL', 'key'), ('COLON', ':'),
+        ('NAMED_PARAM', 'value'), ('RBRACE', '}')]
+    ## Spaces before the colon
+    assert _tokens('{a :1}') == [
+        ('LBRACE', '{'), ('SYMBOL', 'a'), ('COLON', ':'),
+        ('INTEGER', 1), ('RBRACE', '}')]
+    assert _tokens('{a.b \n :value}')[2:4] == [
+        ('COLON', ':'), ('SYMBOL', 'value')]
+    assert _tokens("{'a' :value}")[2:4] == [
+        ('COLON', ':'), ('SYMBOL', 'value')]
+    assert _tokens('{a: :x}')[2:4] == [('COLON', ':'), ('NAMED_PARAM', 'x')]
+    ## Parameters after keywords and operators
+    assert _tokens('LIMIT :n')[1] == ('NAMED_PARAM', 'n')
+    assert _tokens('a IN:x')[2] == ('NAMED_PARAM', 'x')
+    assert _tokens('a==:x')[2] == ('NAMED_PARAM', 'x')
+
+
+@pytest.mark.parametrize('tokenizer', ['ply', 'fast'])
+def test_parse_map_colon(tokenizer):
+    def spec(query, params=None):
+        operation = parse(query, cache=False, tokenizer=tokenizer)
+        if params is not None:
+            operation = operation.bind(params)
+        return operation.query.to_mongo()
+
+    assert spec('SELECT * FROM c WHERE a == {k :1}') == {'a': {'k': 1}}
+    assert spec('SELECT * FROM c WHERE a == {k :v}') == {'a': {'k': 'v'}}
+    assert spec('SELECT * FROM c WHERE a == {"k" :v}') == {'a': {'k': 'v'}}
+    assert spec('SELECT * FROM c WHERE a == {k: :x}', {'x': 2}) == {
+        'a': {'k': 2}}
+
+
+def test_parse_parameters():
+    result = parse('SELECT * FROM coll WHERE a == ? AND b > :min LIMIT ?')
+    assert isinstance(result, SelectOperation)
+    assert isinstance(result.limit, Parameter)
+    assert result.limit.key == 1
+    with pytest.raises(BindError):
+        result.query.to_mongo()
+
+
+def test_prepared_bind_positional():
+    stmt = prepare('SELECT * FROM coll WHERE a == ? AND b IN [?, ?] '
+                   'LIMIT ? SKIP ?')
+    op = stmt.bind(['foo', 1, 2, 10, 20])
+    assert op.query.to_mongo() == {'$and': [
+        {'a': 'foo'},
+        {'b': {'$in': [1, 2]}},
+    ]}
+    assert op.limit == 10
+    assert op.skip == 20
+
+    ## The statement itself is left untouched
+    other = stmt.bind(['bar', 3, 4, 5, 6])
+    assert other.query.to_mongo()['$and'][0] == {'a': 'bar'}
+    assert isinstance(stmt.operation.limit, Parameter)
+
+
+def test_prepared_bind_named():
+    stmt = prepare('SELECT * FROM coll WHERE name == :name OR age > :age')
+    op = stmt.bind({'name': 'it\'s "quoted"', 'age': 18})
+    assert op.query.to_mongo() == {'$or': [
+        {'name': 'it\'s "quoted"'},
+        {'age': {'$gt': 18}},
+    ]}
+
+
+def test_prepared_bind_aggregate():
+    stmt = prepare('AGGREGATE article PROJECT title = 1, '
+                   'score = "$pageViews" + :bonus, tags = [?]')
+    op = stmt.bind({'bonus': 10, 0: 'x'})
+    assert op.to_mongo()['pipeline'] == [{'$project': {
+        'title': 1,
+        'score': {'$add': ['$pageViews', 10]},
+        'tags': ['x'],
+    }}]
+
+
+def test_prepared_missing_value():
+    stmt = prepare('SELECT * FROM coll WHERE a == ? AND b == :b')
+    with pytest.raises(BindError):
+        stmt.bind(['a'])
+    with pytest.raises(BindError):
+        stmt.bind({0: 'a'})
+
+
+def test_prepared_execute():
+    calls = []
+
+    class FakeCollection(object):
+        def find(self, **kwargs):
+            calls.append(kwargs)
+
+    stmt = prepare('SELECT * FROM coll WHERE a == ?')
+    db = {'coll': FakeCollection()}
+    stmt.execute(db, [1])
+    stmt.execute(db, [2])
+    assert calls == [{'filter': {'a': 1}}, {'filter': {'a': 2}}]
@@ -0,0 +1,163 @@
+"""
+Tests for raw BSON results: ``WITH (raw)`` and ``FORMAT bson`` exports
+"""
+
+import io
+import pickle
+
+import pytest
+
+from mongosql import parse
+from mongosql.export import export
+from mongosql.instrumentation import add_hook, execute, remove_hook
+from mongosql.resultcache import ResultCache, result_key
+from mongosql.support import raw_collection
+from mongosql.tests.fakes import FakeCollection, FakeDatabase
+
+bson = pytest.importorskip('bson')
+from bson.raw_bson import RawBSONDocument  # noqa: E402
+from bson.son import SON  # noqa: E402
+from mongosql.rawbson import (  # noqa: E402
+    LazyDocument, codec_options_lazy, find_element)
+
+
+def _database():
+    db = FakeDatabase()
+    db['c'] = FakeCollection(
+        {'_id': i, 'a': i % 4, 'b': {'c': [i]}} for i in range(10))
+    return db
+
+
+@pytest.mark.parametrize('query', [
+    'SELECT * FROM c WHERE a == 1 WITH ({0}, batch_size = 2)',
+    'AGGREGATE c MATCH a == 1 WITH (batch_size = 2, {0})',
+])
+def test_raw(query):
+    db = _database()
+    documents = list(parse(query.format('raw')).apply(db))
+    assert all(isinstance(d, RawBSONDocument) for d in documents)
+    assert [d['_id'] for d in documents] == [1, 5, 9]
+    assert documents[0]['b']['c'] == [1]
+    ## Not a cursor option
+    assert db['c'].cursors[0].options == {'batch_size': 2}
+
+    assert list(parse(query.format('raw = true')).apply(db)) == documents
+    documents = list(parse(query.format('raw = ?')).apply(db, [False]))
+    assert documents[0] == {'_id': 1, 'a': 1, 'b': {'c': [1]}}
+
+
+def test_lazy():
+    data = bson.encode(SON([
+        ('_id', 1), ('s', u'\xe9t\xe9'), ('d', {'x': [1, {'y': 2}]}),
+        ('b', bson.Binary(b'xy', 5)), ('r', bson.Regex('a.*')), ('n', None),
+        ('z', 1.5)]))
+    document = LazyDocument(data)
+    assert document['z'] == 1.5
+    assert document['s'] == u'\xe9t\xe9'
+    assert document['d']['x'][1]['y'] == 2
+    assert isinstance(document['d'], LazyDocument)
+    ## Only the fields read were decoded
+    assert sorted(document._fields) == ['d', 's', 'z']
+    assert 'n' in document and 'x' not in document and 1 not in document
+    assert document.get('x') is None
+    with pytest.raises(KeyError):
+        document['x']
+    assert find_element(data, 'n') == b'\x0an\x00'
+    assert list(document) == ['_id', 's', 'd', 'b', 'r', 'n', 'z']
+    assert pickle.loads(pickle.dumps(document))['b'] == bson.Binary(b'xy', 5)
+
+
+def test_decode():
+    ## As pymongo decodes the batches of results
+    data = b''.join(bson.encode(d) for d in _database()['c'].documents)
+    documents = bson.decode_all(data, codec_options_lazy)
+    assert [type(d) for d in documents] == [LazyDocument] * 10
+    assert dict(documents[3]['b']) == {'c': [3]}
+    assert isinstance(documents[3]['b'], LazyDocument)
+    assert sorted(documents[3]) == ['_id', 'a', 'b']
+    assert (documents[3]['_id'], documents[3]['a']) == (3, 3)
+    assert [d.raw for d in bson.decode_all(
+        data, codec_options_lazy.with_options(tz_aware=True))] == [
+            d.raw for d in documents]
+
+
+def test_pymongo():
+    ## Cursors are made without connecting: pymongo checks the
+    ## arguments and the codec options
+    pymongo = pytest.importorskip('pymongo')
+    from pymongo.cursor import Cursor
+    client = pymongo.MongoClient('mongodb://localhost:1', connect=False)
+    db = client['db']
+    operation = parse('SELECT a FROM c WHERE a == 1 LIMIT 2 WITH (raw)')
+    cursor = operation.apply(db)
+    assert isinstance(cursor, Cursor)
+    assert cursor.collection.codec_options.document_class is LazyDocument
+    batches = operation.apply_raw_batches(db)
+    assert type(batches).__name__ == 'RawBatchCursor'
+    assert raw_collection(db['c']).codec_options == codec_options_lazy
+    client.close()
+
+
+def test_defaults():
+    db = _database()
+    operation = parse('SELECT a FROM c LIMIT 2')
+    documents = list(operation.apply(db, options={'raw': True}))
+    assert isinstance(documents[0], RawBSONDocument)
+    assert db['c'].cursors[0].options == {}
+    documents = list(parse('SELECT a FROM c WITH (raw = false)').apply(
+        db, options={'raw': True}))
+    assert type(documents[0]) is dict
+
+
+def test_result_cache():
+    db = _database()
+    cache = ResultCache()
+    operation = parse('SELECT * FROM c WHERE a == 1')
+    raw = parse('SELECT * FROM c WHERE a == 1 WITH (raw)')
+    assert result_key('db', operation) != result_key('db', raw)
+    assert result_key('db', raw) == result_key(
+        'db', operation, options={'raw': True})
+
+    decoded = list(cache.apply(operation, db))
+    assert type(decoded[0]) is dict
+    documents = list(cache.apply(raw, db))
+    assert isinstance(documents[0], RawBSONDocument)
+    assert list(cache.apply(raw, db)) == documents
+    assert len(db['c'].calls) == 2
+
+
+def test_instrumentation():
+    events = []
+
+    def hook(event):
+        events.append(event)
+    hook.sizes = True
+
+    add_hook(hook)
+    try:
+        documents = list(execute(_database(), 'SELECT * FROM c WITH (raw)'))
+    finally:
+        remove_hook(hook)
+    assert isinstance(documents[0], RawBSONDocument)
+    assert events[-1].name == 'exhausted'
+    assert events[-1].documents == 10
+    assert events[-1].size == sum(len(d.raw) for d in documents)
+
+
+def test_export(tmpdir):
+    db = _database()
+    sink = io.BytesIO()
+    assert export(db, 'SELECT a FROM c WHERE a == 1', sink, 'bson',
+                  batch_size=2) == {'exported': 3}
+    assert bson.decode_all(sink.getvalue()) == [
+        {'_id': i, 'a': 1} for i in (1, 5, 9)]
+    assert db['c'].cursors[0].options == {'batch_size': 2}
+
+    path = tmpdir.join('out.bson')
+    operation = parse('AGGREGATE c MATCH a == ? INTO OUTFILE ?')
+    assert operation.apply(db, [2, str(path)]) == {'exported': 2}
+    assert bson.decode_all(path.read_binary()) == [
+        db['c'].documents[2], db['c'].documents[6]]
+    assert export(db, 'SELECT * FROM c WHERE a == 9', str(path)) == {
+        'exported': 0}
+    assert path.read_binary() == b''
@@ -0,0 +1,198 @@
+"""
+Tests for the result cache
+"""
+
+import pytest
+
+from mongosql import parse
+from mongosql.cache import TTLCache
+from mongosql.resultcache import ResultCache
+from mongosql.tests.fakes import FakeCollection, FakeDatabase
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _database():
+    db = FakeDatabase()
+    db['c'] = FakeCollection({'_id': i, 'a': i % 4} for i in range(20))
+    db['d'] = FakeCollection({'_id': i} for i in range(3))
+    return db
+
+
+def _run(cache, db, query, params=None, options=None):
+    return list(cache.apply(parse(query), db, params, options=options))
+
+
+def test_ttl_cache():
+    clock = Clock()
+    cache = TTLCache(maxsize=3, maxbytes=100, clock=clock)
+    cache.put('a', 1, ttl=10, size=10, tag='x')
+    cache.put('b', 2, ttl=20, size=10, tag='y')
+    assert cache.get('a') == 1
+    clock.now += 15
+    assert cache.get('a') is None
+    assert 'b' in cache
+    assert cache.stats()['expirations'] == 1
+
+    ## LRU, both in number of items and in size
+    cache.put('c', 3, ttl=60, size=10, tag='x')
+    cache.put('d', 4, ttl=60, size=10, tag='x')
+    cache.get('b')
+    cache.put('e', 5, ttl=60, size=10, tag='y')
+    assert 'c' not in cache and 'b' in cache
+    cache.put('f', 6, ttl=60, size=80, tag='y')
+    assert sorted(k for k in 'bcdef' if k in cache) == ['b', 'e', 'f']
+    assert cache.size == 100
+    cache.put('g', 7, ttl=60, size=101)  # Larger than the whole cache
+    assert 'g' not in cache
+
+    assert cache.invalidate('y') == 3
+    assert len(cache) == 0 and cache.size == 0
+    assert cache.stats()['evictions'] == 2
+
+
+def test_hits():
+    db = _database()
+    cache = ResultCache()
+    first = _run(cache, db, 'SELECT * FROM c WHERE a == 1')
+    assert len(first) == 5
+    ## Same spec: spacing, parameters and operand order don't matter
+    first[0]['a'] = 'changed'
+    assert _run(cache, db, 'select *  from c where a==?', [1]) == [
+        {'_id': i, 'a': 1} for i in range(1, 20, 4)]
+    assert len(db['c'].calls) == 1
+    _run(cache, db, 'SELECT * FROM c WHERE a == 1 AND _id > 2')
+    _run(cache, db, 'SELECT * FROM c WHERE _id > 2 AND a == 1')
+    assert len(db['c'].calls) == 2
+    ## Different specs
+    _run(cache, db, 'SELECT * FROM c WHERE a == 2')
+    _run(cache, db, 'SELECT * FROM c WHERE a == true')
+    _run(cache, db, 'SELECT * FROM c WHERE a == 1 ORDER BY _id DESC')
+    _run(cache, db, 'AGGREGATE c MATCH a == 1')
+    _run(cache, db, 'AGGREGATE c MATCH a == 1')
+    assert len(db['c'].calls) == 6
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['items']) == (3, 6, 6)
+    assert stats['hit_rate'] == 3 / 9.0
+    assert stats['bytes'] > 0
+
+
+def test_options():
+    db = _database()
+    cache = ResultCache(backend=TTLCache(clock=Clock()), ttl=60)
+    for engine in ('ply', 'pratt'):
+        operation = parse('SELECT * FROM c WITH (no_cache, batch_size = 2)',
+                          cache=False, engine=engine)
+        assert operation._cache_options(None) == {'no_cache': True}
+    for _ in range(2):
+        _run(cache, db, 'SELECT * FROM c WITH (no_cache, batch_size = 2)')
+    assert len(db['c'].calls) == 2
+    ## Not cursor options
+    assert db['c'].cursors[-1].options == {'batch_size': 2}
+    assert cache.stats()['misses'] == 0
+
+    query = 'SELECT * FROM c WITH (cache_ttl = ?)'
+    _run(cache, db, query, [10])
+    cache.backend.clock.now += 5
+    _run(cache, db, query, [10])
+    assert len(db['c'].calls) == 3
+    cache.backend.clock.now += 10
+    _run(cache, db, query, [10])
+    assert len(db['c'].calls) == 4
+    _run(cache, db, 'SELECT * FROM c WITH (cache_ttl = 0)')
+    _run(cache, db, 'SELECT * FROM c WITH (cache_ttl = 0)')
+    assert len(db['c'].calls) == 6
+
+    ## Other operations are run as usual
+    assert cache.apply(parse('EXPLAIN SELECT * FROM c'), db)['plan']
+
+
+def test_max_documents():
+    db = _database()
+    cache = ResultCache(max_documents=10)
+    for _ in range(2):
+        assert len(_run(cache, db, 'SELECT * FROM c')) == 20
+        assert len(_run(cache, db, 'SELECT * FROM c LIMIT 10')) == 10
+    assert len(db['c'].calls) == 3
+    assert cache.stats()['skipped'] == 2
+
+
+def test_invalidate():
+    db = _database()
+    cache = ResultCache()
+    _run(cache, db, 'SELECT * FROM c')
+    _run(cache, db, 'SELECT * FROM d')
+    db['c'].documents.append({'_id': 20, 'a': 0})
+    cache.invalidate(None, 'c')
+    assert len(_run(cache, db, 'SELECT * FROM c')) == 21
+    _run(cache, db, 'SELECT * FROM d')
+    assert (len(db['c'].calls), len(db['d'].calls)) == (2, 1)
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_invalidated_while_reading():
+    ## Results read before a write are not stored after it
+    db = _database()
+    cache = ResultCache()
+    find = db['c'].find
+
+    def writing_find(**kwargs):
+        cursor = find(**kwargs)
+        cache.invalidate(None, 'c')
+        return cursor
+
+    db['c'].find = writing_find
+    _run(cache, db, 'SELECT * FROM c')
+    db['c'].find = find
+    _run(cache, db, 'SELECT * FROM c')
+    _run(cache, db, 'SELECT * FROM c')
+    assert len(db['c'].calls) == 2
+
+
+def test_client(monkeypatch):
+    pytest.importorskip('pymongo')
+    from pymongo.collection import Collection
+    from mongosql.client import MongoSqlClient, MongoSqlCollection
+
+    client = MongoSqlClient('mongodb://localhost:1', connect=False,
+                            result_cache=True)
+    db = client.testdb
+    fake = _database()
+    monkeypatch.setattr(Collection, 'find',
+                        lambda self, **kwargs: fake[self.name].find(**kwargs))
+    monkeypatch.setattr(Collection, 'insert_one',
+                        lambda self, document: None)
+    assert isinstance(db.c, MongoSqlCollection)
+    db.sql('SELECT * FROM c')
+    db.sql('SELECT * FROM c WHERE a == ?', [1])
+    db.sql('SELECT * FROM c')
+    assert len(fake['c'].calls) == 2
+
+    db.c.insert_one({'a': 1})
+    db.sql('SELECT * FROM c')
+    assert len(fake['c'].calls) == 3
+    stats = client.result_cache.stats()
+    assert stats['invalidations'] == 1 and stats['hits'] == 1
+
+    ## Renaming replaces the results of both collections
+    monkeypatch.setattr(Collection, 'rename',
+                        lambda self, new_name, **kwargs: None)
+    db.sql('SELECT * FROM d')
+    db.sql('SELECT * FROM c')
+    db.c.rename('d')
+    db.sql('SELECT * FROM d')
+    db.sql('SELECT * FROM c')
+    assert len(fake['d'].calls) == 2
+    assert len(fake['c'].calls) == 4
+
+    ## No cache
+    client = MongoSqlClient('mongodb://localhost:1', connect=False)
+    assert client.result_cache is None
+    assert not isinstance(client.testdb.c, MongoSqlCollection)
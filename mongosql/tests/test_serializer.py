@@ -0,0 +1,139 @@
+"""
+Tests for the compiled serializer: must build exactly the
+same specs as the to_mongo() tree walk.
+"""
+
+from collections import OrderedDict
+
+import pytest
+
+from mongosql import parse, prepare
+from mongosql.parser import ParserError
+from mongosql.serializer import compile_spec
+from mongosql.support import (
+    AggregateOperation, BindError, DatabaseOperation, Symbol,
+    bind, copy_literal, to_mongo)
+from mongosql.tests.corpus import QUERIES
+
+
+class AnyParams(object):
+    """Supplies a value for any parameter"""
+
+    def __getitem__(self, key):
+        return ['value', key]
+
+
+def _source(parsed):
+    if isinstance(parsed, DatabaseOperation):
+        return parsed._spec_source()
+    return parsed
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_same_as_to_mongo(query):
+    try:
+        source = _source(parse(query))
+    except ParserError:
+        return
+    try:
+        expected = to_mongo(bind(source, AnyParams()))
+    except NotImplementedError:
+        with pytest.raises(NotImplementedError):
+            compile_spec(source)
+        return
+    assert compile_spec(source)(AnyParams()) == expected
+
+
+def test_fresh_containers():
+    builder = compile_spec(parse(
+        'SELECT * FROM c WHERE a IN [1, 2, 3, 4, 5, 6, 7, 8, 9, 10] '
+        'AND b == {x: ["s", 1.5]} AND c == ?').query)
+    value = {'nested': [1]}
+    first, second = builder([value]), builder([value])
+    assert first == second == {'$and': [
+        {'a': {'$in': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]}},
+        {'b': {'x': ['s', 1.5]}},
+        {'c': {'nested': [1]}},
+    ]}
+
+    first['$and'][0]['a']['$in'].append(11)
+    first['$and'][1]['b']['x'].pop()
+    first['$and'][2]['c']['nested'].append(2)
+    assert second == builder([value])
+    assert value == {'nested': [1]}
+
+
+def test_deep_nesting():
+    query = 'SELECT * FROM c WHERE a == ' + '(1 + ' * 100 + '1' + ')' * 100
+    operation = parse(query)
+    assert compile_spec(operation.query)() == to_mongo(operation.query)
+
+
+def test_missing_parameters():
+    builder = compile_spec(parse(
+        'SELECT * FROM c WHERE a == ? AND b == :b').query)
+    assert builder({0: 1, 'b': 2}) == {'$and': [{'a': 1}, {'b': 2}]}
+    with pytest.raises(BindError) as excinfo:
+        builder({0: 1})
+    assert ':b' in str(excinfo.value)
+    with pytest.raises(BindError):
+        builder()
+
+
+def test_copy_literal():
+    value = {'a': [1, {'b': 'c'}], 'd': OrderedDict([('x', 1), ('y', 2)])}
+    result = copy_literal(value)
+    assert result == value
+    assert result['a'] is not value['a']
+    assert result['a'][1] is not value['a'][1]
+    assert isinstance(result['d'], OrderedDict)
+    assert to_mongo([Symbol('a'), [Symbol('b'), 1]]) == ['a', ['b', 1]]
+
+
+class FakeCollection(object):
+    def __init__(self):
+        self.calls = []
+
+    def find(self, **kwargs):
+        self.calls.append(kwargs)
+
+    def aggregate(self, pipeline, **kwargs):
+        self.calls.append(pipeline)
+
+
+def test_compiled_once_per_operation():
+    query = 'SELECT * FROM c WHERE a == 1 AND b > 2'
+    runs = DatabaseOperation.compile_threshold
+    collection = FakeCollection()
+    operation = parse(query)
+    for _ in range(runs - 1):
+        operation.apply({'c': collection})
+    assert operation._compiled[2] is None  # Not worth it yet
+    operation.apply({'c': collection})
+    builder = operation._compiled[2]
+    assert builder is not None
+    operation.apply({'c': collection})
+    assert operation._compiled[2] is builder
+    assert collection.calls == [
+        {'filter': {'$and': [{'a': 1}, {'b': {'$gt': 2}}]}}] * (runs + 1)
+    ## Other parses of the query have trees of their own
+    assert parse(query)._compiled[2] is None
+
+    ## Replacing the query recompiles
+    operation.query = parse('SELECT * FROM c WHERE x == 1').query
+    operation.apply({'c': collection})
+    assert operation._compiled[2] is None
+    assert collection.calls[-1] == {'filter': {'x': 1}}
+
+
+def test_prepared_execute_compiled():
+    stmt = prepare('AGGREGATE c PROJECT a = "$b" + ?, c = [:c]')
+    collection = FakeCollection()
+    runs = DatabaseOperation.compile_threshold + 2
+    for i in range(runs):
+        stmt.execute({'c': collection}, {0: i, 'c': 'x'})
+    assert isinstance(stmt.operation, AggregateOperation)
+    assert stmt.operation._compiled[2] is not None
+    assert collection.calls == [
+        [{'$project': {'a': {'$add': ['$b', i]}, 'c': ['x']}}]
+        for i in range(runs)]
@@ -0,0 +1,156 @@
+"""
+Tests for the single flight of concurrent identical queries
+"""
+
+import threading
+import time
+
+import pytest
+
+from mongosql import parse
+from mongosql.resultcache import ResultCache
+from mongosql.singleflight import SingleFlight
+from mongosql.tests.fakes import FakeCollection, FakeDatabase
+
+
+THREADS = 20
+
+
+class SlowCollection(FakeCollection):
+    """``find()`` blocks until ``release`` is set"""
+
+    def __init__(self, *args, **kwargs):
+        super(SlowCollection, self).__init__(*args, **kwargs)
+        self.release = threading.Event()
+        self.error = None
+
+    def find(self, *args, **kwargs):
+        cursor = super(SlowCollection, self).find(*args, **kwargs)
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return cursor
+
+
+def _database():
+    db = FakeDatabase()
+    db['c'] = SlowCollection({'_id': i, 'a': i % 4} for i in range(20))
+    return db
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "Timed out"
+        time.sleep(0.001)
+
+
+def _concurrently(flight, db, queries, params=None, run=None):
+    """Run ``queries`` at once; returns {index: result or exception}"""
+    results = {}
+
+    def target(n):
+        try:
+            results[n] = list(flight.apply(
+                parse(queries[n]), db, params, run=run))
+        except Exception as e:
+            results[n] = e
+
+    threads = [threading.Thread(target=target, args=(n,))
+               for n in range(len(queries))]
+    for thread in threads:
+        thread.start()
+    ## All but the first are waiting for it
+    _wait_for(lambda: flight.waiting == len(queries) - 1)
+    db['c'].release.set()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_coalesced():
+    db = _database()
+    flight = SingleFlight()
+    queries = ['SELECT * FROM c WHERE a == 1'] * (THREADS // 2) + [
+        'select * from c where a == ? WITH (batch_size = 5)'] * (THREADS // 2)
+    results = _concurrently(flight, db, queries, [1])
+    assert len(db['c'].calls) == 1
+    expected = [{'_id': i, 'a': 1} for i in range(1, 20, 4)]
+    assert all(results[n] == expected for n in range(THREADS))
+    ## Copies
+    results[0][0]['a'] = 'changed'
+    assert results[1] == expected
+    assert flight.stats() == {
+        'queries': 1, 'coalesced': THREADS - 1, 'skipped': 0, 'waiting': 0,
+        'in_flight': 0}
+
+    ## Done: run again
+    list(flight.apply(parse('SELECT * FROM c WHERE a == 1'), db))
+    assert len(db['c'].calls) == 2
+
+
+def test_different_queries():
+    db = _database()
+    db['c'].release.set()
+    flight = SingleFlight()
+    for query in ('SELECT * FROM c WHERE a == 1',
+                  'SELECT * FROM c WHERE a == 2',
+                  'AGGREGATE c MATCH a == 1'):
+        list(flight.apply(parse(query), db))
+    assert len(db['c'].calls) == 3
+    assert flight.apply(parse('EXPLAIN SELECT * FROM c'), db)['plan']
+
+
+def test_too_many_documents():
+    db = _database()
+    flight = SingleFlight(max_documents=10)
+    results = _concurrently(flight, db, ['SELECT * FROM c'] * 4)
+    assert len(db['c'].calls) == 4
+    assert all(len(results[n]) == 20 for n in range(4))
+    assert flight.stats()['skipped'] == 1
+
+
+def test_errors():
+    db = _database()
+    db['c'].error = ValueError('boom')
+    flight = SingleFlight()
+    results = _concurrently(flight, db, ['SELECT * FROM c'] * 5)
+    assert len(db['c'].calls) == 1
+    assert all(isinstance(results[n], ValueError) for n in range(5))
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_result_cache():
+    ## Concurrent misses are run once, and stored
+    db = _database()
+    flight, cache = SingleFlight(), ResultCache()
+    _concurrently(flight, db, ['SELECT * FROM c'] * 5, run=cache.apply)
+    assert len(db['c'].calls) == 1
+    assert cache.stats()['misses'] == 1
+    list(flight.apply(parse('SELECT * FROM c'), db, run=cache.apply))
+    assert len(db['c'].calls) == 1
+
+
+def test_client(monkeypatch):
+    pytest.importorskip('pymongo')
+    from pymongo.collection import Collection
+    from mongosql.client import MongoSqlClient
+
+    client = MongoSqlClient('mongodb://localhost:1', connect=False,
+                            single_flight=True)
+    fake = _database()
+    monkeypatch.setattr(Collection, 'find',
+                        lambda self, **kwargs: fake[self.name].find(**kwargs))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        client.testdb.sql('SELECT * FROM c WHERE a == 3')))
+        for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: client.single_flight.waiting == THREADS - 1)
+    fake['c'].release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(fake['c'].calls) == 1
+    assert len(results) == THREADS
+    assert all(len(result) == 5 for result in results)
@@ -0,0 +1,90 @@
+"""
+Tests for import-time behavior: nothing heavy should happen
+(or be written to disk) until a query is actually parsed.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+import ply.yacc as yacc
+
+import mongosql
+from mongosql import parser as parser_module
+
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(
+    mongosql.__file__)))
+
+
+def _run_python(code, cwd, *flags):
+    env = dict(os.environ, PYTHONPATH=PACKAGE_ROOT)
+    proc = subprocess.Popen(
+        [sys.executable] + list(flags) + ['-c', code], cwd=cwd, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True)
+    out, err = proc.communicate()
+    assert proc.returncode == 0, err
+    return out, err
+
+
+def test_parse_tables_up_to_date():
+    ## If this fails, the grammar changed: rebuild the tables
+    ## with build_parser(write_tables=True)
+    pinfo = yacc.ParserReflect(vars(parser_module))
+    pinfo.get_all()
+    table = yacc.LRTable()
+    assert table.read_table('mongosql.parsetab') == pinfo.signature()
+
+
+def test_import_is_lazy():
+    code = '\n'.join((
+        'from __future__ import print_function',
+        'import sys, mongosql',
+        'from mongosql import lexer, parser',
+        'print(lexer._ply_lexer is None, parser._ply_parser is None)',
+        'print(any(m.split(".")[0] in ("pymongo", "bson")',
+        '          for m in sys.modules))',
+    ))
+    out, _ = _run_python(code, tempfile.gettempdir())
+    assert out.split() == ['True', 'True', 'False']
+
+    ## Until the client is used
+    code = '\n'.join((
+        'import sys, mongosql',
+        'client = mongosql.MongoSqlClient',
+        'assert client.__name__ == "MongoSqlClient"',
+        'assert "pymongo" in sys.modules',
+        'from mongosql import MongoSqlClient, parse',
+        'assert MongoSqlClient is client and parse is mongosql.parse',
+    ))
+    _run_python(code, tempfile.gettempdir())
+
+
+def test_no_files_written():
+    workdir = tempfile.mkdtemp()
+    code = '\n'.join((
+        'from mongosql import parse',
+        'parse("SELECT * FROM c WHERE a == 1", engine="ply")',
+    ))
+    _, err = _run_python(code, workdir)
+    assert 'Generating' not in err  # Tables were loaded, not rebuilt
+    assert os.listdir(workdir) == []
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7),
+                    reason='Requires python -X importtime')
+def test_import_time():
+    _, err = _run_python('import mongosql', tempfile.gettempdir(),
+                         '-X', 'importtime')
+    ## Lines look like: "import time:  self [us] | cumulative | name"
+    cumulative = {}
+    for line in err.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            parts = [p.strip() for p in line[12:].split('|')]
+            if parts[1].isdigit():
+                cumulative[parts[2]] = int(parts[1])
+    assert 'mongosql' in cumulative
+    assert not any(n.split('.')[0] in ('pymongo', 'bson') for n in cumulative)
@@ -0,0 +1,97 @@
+"""
+Stress tests for concurrent parsing: many threads parsing
+different queries at the same time must not disturb each other.
+"""
+
+import random
+import sys
+import threading
+
+import pytest
+
+from mongosql import parse
+from mongosql.lexer import get_lexer
+from mongosql.tests.corpus import dump
+
+
+THREADS = 8
+
+QUERIES = [
+    'SELECT a, b{0} FROM c{0} WHERE a == {0} AND b IN [?, :p{0}] '
+    'LIMIT {1} SKIP ? SORT a DESC'.format(i, i % 7)
+    for i in range(500)
+] + [
+    'AGGREGATE c{0} PROJECT x = "$a" + {0} * (:k - {1}), y = [{1}]'.format(
+        i, i % 11)
+    for i in range(500)
+]
+
+COMBINATIONS = [
+    (engine, tokenizer)
+    for engine in ('ply', 'pratt')
+    for tokenizer in ('ply', 'fast')]
+
+
+@pytest.fixture
+def busy_switching():
+    ## Switch threads as often as possible, to make
+    ## any interference much more likely to show up.
+    if hasattr(sys, 'setswitchinterval'):
+        old = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        yield
+        sys.setswitchinterval(old)
+    else:
+        old = sys.getcheckinterval()
+        sys.setcheckinterval(1)
+        yield
+        sys.setcheckinterval(old)
+
+
+def _run_threads(target, count):
+    errors = []
+
+    def run(n):
+        try:
+            target(n)
+        except Exception as e:  # Reported by the main thread
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(n,))
+               for n in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+@pytest.mark.parametrize('cache', [False, True])
+def test_concurrent_parsing(busy_switching, cache):
+    expected = [dump(parse(q, cache=False)) for q in QUERIES]
+    mismatches = []
+
+    def worker(n):
+        engine, tokenizer = COMBINATIONS[n % len(COMBINATIONS)]
+        order = list(range(len(QUERIES)))
+        random.Random(n).shuffle(order)
+        for i in order:
+            result = parse(QUERIES[i], cache=cache,
+                           engine=engine, tokenizer=tokenizer)
+            if dump(result) != expected[i]:
+                mismatches.append((engine, tokenizer, QUERIES[i]))
+
+    _run_threads(worker, THREADS)
+    assert mismatches == []
+
+
+@pytest.mark.parametrize('tokenizer', ['ply', 'fast'])
+def test_interleaved_lexers(tokenizer):
+    ## Lexers don't share any scanning state
+    first, second = get_lexer(tokenizer), get_lexer(tokenizer)
+    first.input('a == ? AND b == ?')
+    assert first.token().value == 'a'
+    second.input('? ?')
+    assert parse('c == ? OR d', cache=False, tokenizer=tokenizer)
+    assert [t.value for t in second] == [0, 1]
+    assert [t.value for t in first] == ['==', 0, 'AND', 'b', '==', 1]
@@ -0,0 +1,176 @@
+"""
+Tests for INSERT, UPDATE and DELETE statements
+"""
+
+import pytest
+
+from mongosql import parse, prepare
+from mongosql.parser import ParserError
+from mongosql.support import (
+    DeleteOperation, InsertOperation, UpdateOperation, shape)
+from mongosql.tests.fakes import FakeCollection, FakeDatabase
+
+
+def _database():
+    db = FakeDatabase()
+    db['c'] = FakeCollection({'_id': i, 'a': i % 4} for i in range(20))
+    return db
+
+
+@pytest.mark.parametrize('engine', ['ply', 'pratt'])
+def test_parse(engine):
+    operation = parse(
+        'INSERT INTO c VALUES {a = 1, b = "x"}, ?, {"c": [1]} '
+        'WITH (chunk_size = 10)', cache=False, engine=engine)
+    assert isinstance(operation, InsertOperation)
+    assert operation.collection == 'c'
+    assert operation._build_spec([{'d': 2}]) == [
+        {'a': 1, 'b': 'x'}, {'d': 2}, {'c': [1]}]
+    assert operation.options == {'chunk_size': 10}
+
+    operation = parse('UPDATE c SET a = 1, b = [?] WHERE a > 2 AND b == ?',
+                      cache=False, engine=engine)
+    assert isinstance(operation, UpdateOperation)
+    assert operation._build_spec(['x', 'y']) == [
+        {'$and': [{'a': {'$gt': 2}}, {'b': 'y'}]},
+        {'$set': {'a': 1, 'b': ['x']}}]
+    ## Expressions: a pipeline
+    operation = parse('UPDATE c SET n = "$n" + 1, m = 0 WITH (upsert)',
+                      cache=False, engine=engine)
+    assert operation._build_spec() == [
+        None, [{'$set': {'n': {'$add': ['$n', 1]}, 'm': 0}}]]
+    assert operation.options == {'upsert': True}
+
+    operation = parse('DELETE FROM c WHERE a IN [1, 2];',
+                      cache=False, engine=engine)
+    assert isinstance(operation, DeleteOperation)
+    assert operation._build_spec() == {'a': {'$in': [1, 2]}}
+    assert parse('DELETE FROM c', cache=False, engine=engine).query is None
+
+
+@pytest.mark.parametrize('query', [
+    'INSERT INTO c VALUES 1', 'INSERT INTO c VALUES {a = 1}, "x"',
+    'INSERT INTO c VALUES', 'INSERT c VALUES {a = 1}',
+    'INSERT INTO c VALUES {a = 1} WHERE a == 1',
+    'UPDATE c SET', 'UPDATE c WHERE a == 1', 'UPDATE c SET a == 1',
+    'UPDATE c SET a = 1 LIMIT 1', 'DELETE c', 'DELETE FROM c SET a = 1',
+    'SELECT * FROM c WITH (chunk_size = 1)',
+    'DELETE FROM c WITH (upsert)', 'EXPLAIN DELETE FROM c',
+])
+def test_invalid(query):
+    for engine in ('ply', 'pratt'):
+        with pytest.raises(ParserError):
+            parse(query, cache=False, engine=engine)
+
+
+def test_shape():
+    for query in ('INSERT INTO c VALUES {a = ?, b = [?]}, ? WITH (ordered)',
+                  'UPDATE c SET a = ?, n = ("$n" + ?) WHERE a > ?',
+                  'DELETE FROM c WHERE a IN [?]'):
+        assert shape(parse(query)) == query
+    assert (parse('delete from c where b == 2 and a == 1').fingerprint() ==
+            parse('DELETE FROM c WHERE a == 3 AND b == 4').fingerprint())
+
+
+def test_insert():
+    db = _database()
+    result = parse('INSERT INTO c VALUES {a = 1}, {a = :a}, {_id = "x"} '
+                   'WITH (chunk_size = 2)').apply(db, {'a': 5})
+    assert result == {'inserted': 3}
+    calls = db['c'].calls
+    assert [len(call['insert']) for call in calls] == [2, 1]
+    assert calls[0]['ordered'] is False
+    assert db['c'].documents[-3:] == [
+        {'_id': 20, 'a': 1}, {'_id': 21, 'a': 5}, {'_id': 'x'}]
+
+    parse('INSERT INTO c VALUES ? WITH (ordered, bypass_document_validation)'
+          ).apply(db, [{'a': 9}])
+    assert db['c'].calls[-1]['ordered'] is True
+    assert db['c'].calls[-1]['bypass_document_validation'] is True
+
+
+def test_update():
+    db = _database()
+    result = parse('UPDATE c SET b = "x", n = "$a" * 10 WHERE a == ?'
+                   ).apply(db, [1])
+    assert result == {'matched': 5, 'modified': 5, 'upserted': 0}
+    assert db['c'].documents[1] == {'_id': 1, 'a': 1, 'b': 'x', 'n': 10}
+    assert 'b' not in db['c'].documents[0]
+
+    result = parse('UPDATE c SET b = 1 WHERE a == 7 WITH (upsert)').apply(db)
+    assert result['upserted'] == 1
+    assert db['c'].documents[-1] == {'_id': 20, 'a': 7, 'b': 1}
+    assert db['c'].calls[-1]['upsert'] is True
+
+
+def test_delete():
+    db = _database()
+    assert parse('DELETE FROM c WHERE a > 1').apply(db) == {'deleted': 10}
+    assert parse('DELETE FROM c').apply(db) == {'deleted': 10}
+    assert db['c'].calls[-1]['filter'] == {}
+    assert db['c'].documents == []
+
+
+def test_optimized():
+    db = _database()
+    operation = parse('DELETE FROM c WHERE a == 1 OR a == 2', optimize=True)
+    assert operation._build_spec() == {'a': {'$in': [1, 2]}}
+    assert operation.apply(db) == {'deleted': 10}
+
+
+def test_executemany_insert():
+    db = _database()
+    statement = prepare('INSERT INTO c VALUES {x = ?, y = ?} '
+                        'WITH (chunk_size = 100)')
+    rows = ((i, -i) for i in range(250))  # Not a list
+    assert statement.executemany(db, rows) == {'inserted': 250}
+    assert [len(call['insert']) for call in db['c'].calls] == [100, 100, 50]
+    assert db['c'].documents[-1] == {'_id': 269, 'x': 249, 'y': -249}
+
+    with pytest.raises(TypeError):
+        prepare('SELECT * FROM c').executemany(db, [[]])
+
+
+def test_executemany_bulk():
+    pytest.importorskip('pymongo')
+    db = _database()
+    statement = prepare('UPDATE c SET b = :b WHERE a == :a '
+                        'WITH (chunk_size = 3)')
+    result = statement.executemany(
+        db, [{'a': a, 'b': a * 10} for a in range(4)] + [{'a': 9, 'b': 0}])
+    assert result == {'matched': 20, 'modified': 20, 'upserted': 0}
+    assert [len(call['requests']) for call in db['c'].calls] == [3, 2]
+    assert db['c'].calls[0]['ordered'] is False
+    assert all(d['b'] == d['a'] * 10 for d in db['c'].documents)
+
+    result = prepare('DELETE FROM c WHERE a == ?').executemany(
+        db, [[0], [1], [5]])
+    assert result == {'deleted': 10}
+    assert len(db['c'].documents) == 10
+
+
+def test_client(monkeypatch):
+    pytest.importorskip('pymongo')
+    from pymongo.collection import Collection
+    from mongosql.client import MongoSqlClient
+
+    client = MongoSqlClient('mongodb://localhost:1', connect=False,
+                            result_cache=True)
+    fake = _database()
+
+    def method(name):
+        def call(self, *args, **kwargs):
+            return getattr(fake[self.name], name)(*args, **kwargs)
+        return call
+
+    for name in ('find', 'insert_many', 'update_many', 'bulk_write'):
+        monkeypatch.setattr(Collection, name, method(name))
+
+    db = client.testdb
+    assert len(db.sql('SELECT * FROM c WHERE a == 9')) == 0
+    assert db.sql('INSERT INTO c VALUES {a = 9}') == {'inserted': 1}
+    ## The cached results were dropped
+    assert len(db.sql('SELECT * FROM c WHERE a == 9')) == 1
+    assert db.executemany('UPDATE c SET b = ? WHERE a == ?',
+                          [(1, 9), (2, 0)])['matched'] == 6
+    assert db.sql('SELECT * FROM c WHERE a == 9')[0]['b'] == 1
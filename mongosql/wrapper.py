@@ -1,6 +1,82 @@
-from mongosql.lexer import lexer
-from mongosql.parser import parser
+import os
 
+from mongosql import instrumentation, lexer
+from mongosql.cache import LRUCache
+from mongosql.lexer import get_lexer
+from mongosql.optimizer import get_rules, optimize
+from mongosql.parser import new_ply_parser
+from mongosql.pratt import PrattParser
+from mongosql.prepared import PreparedStatement
+from mongosql.support import ExplainOperation, copy_tree
 
-def parse(query):
-    return parser.parse(query, lexer=lexer)
+
+## Parsed queries, keyed on the query text, parser engine, tokenizer
+## and optimizer rules.
+## Size can be tuned via the MONGOSQL_PARSE_CACHE_SIZE environment
+## variable, or later on via ``parse_cache.resize()``.
+parse_cache = LRUCache(
+    maxsize=int(os.environ.get('MONGOSQL_PARSE_CACHE_SIZE', 512)))
+
+## Parser engine used by default, either 'ply' or 'pratt'
+default_engine = os.environ.get('MONGOSQL_PARSER', 'ply')
+
+_missing = object()
+
+
+def get_parser(engine=None):
+    ## Parsers and lexers are never shared: every parse gets its own
+    ## (cheap to make) instances, so parsing is thread-safe and
+    ## reentrant without any locking.
+    engine = engine or default_engine
+    if engine == 'ply':
+        return new_ply_parser()
+    if engine == 'pratt':
+        return PrattParser()
+    raise ValueError("Unknown parser engine: {0!r}".format(engine))
+
+
+def _copy_parsed(obj):
+    ## Cached objects are never handed out: every caller gets a copy
+    ## of its own, expression tree included, free to modify it.
+    return copy_tree(obj)
+
+
+def _parse(query, engine, tokenizer, rules):
+    parsed = get_parser(engine).parse(query, lexer=get_lexer(tokenizer))
+    if rules is not None:
+        parsed = optimize(parsed, rules)
+    if isinstance(parsed, ExplainOperation):
+        parsed._source = (query, engine, tokenizer, rules)
+    return parsed
+
+
+def _cache_key(query, engine=None, tokenizer=None, rules=None):
+    ## Engines and tokenizers build the same objects, but a caller
+    ## asking for one must not get the result of another.
+    return (query, engine or default_engine,
+            tokenizer or lexer.default_tokenizer, rules)
+
+
+def parse(query, cache=True, engine=None, tokenizer=None, optimize=False):
+    """
+    Parse a query.
+
+    ``optimize`` runs the query through the optimizer: ``True`` for
+    the default rules, or a collection of rule names (see
+    ``mongosql.optimizer``).
+    """
+    rules = get_rules(optimize)
+    if not cache:
+        return _parse(query, engine, tokenizer, rules)
+    key = _cache_key(query, engine, tokenizer, rules)
+    parsed = parse_cache.get(key, _missing)
+    if parsed is _missing:
+        parsed = _parse(query, engine, tokenizer, rules)
+        parse_cache.put(key, parsed)
+    elif instrumentation.hooks:
+        instrumentation.emit('cache_hit', query)
+    return _copy_parsed(parsed)
+
+
+def prepare(query, optimize=False):
+    return PreparedStatement(query, parse(query, optimize=optimize))
@@ -1,13 +1,14 @@
 import os
 import sys
 from setuptools import setup, find_packages
+from setuptools.command.build_py import build_py
 from setuptools.command.test import test as TestCommand
 
 version = '0.1'
 install_requires = [
     'ply',
     'six',
-    'pymongo',
+    'pymongo>=3.6',  # find_raw_batches(), aggregate_raw_batches()
 ]
 tests_require = [
     'pytest',
@@ -20,6 +21,31 @@ if sys.version_info >= (3,):
     extra['use_2to3'] = True
 
 
+## The asyncio client and its tests, with async / await syntax: only
+## installed on Python >= 3.5, and never run through 2to3
+async_modules = (
+    'mongosql/aio.py',
+    'mongosql/tests/aiofakes.py',
+    'mongosql/tests/test_aio.py',
+)
+
+
+def _is_async_module(path):
+    return path.replace(os.sep, '/').endswith(async_modules)
+
+
+class BuildPy(build_py):
+    def find_package_modules(self, package, package_dir):
+        modules = build_py.find_package_modules(self, package, package_dir)
+        if sys.version_info < (3, 5):
+            modules = [m for m in modules if not _is_async_module(m[2])]
+        return modules
+
+    def run_2to3(self, files, *args, **kwargs):
+        files = [f for f in files if not _is_async_module(f)]
+        return build_py.run_2to3(self, files, *args, **kwargs)
+
+
 class PyTest(TestCommand):
     test_package_name = 'mongosql'
 
@@ -90,12 +116,12 @@ setup(
         "License :: OSI Approved :: BSD License",
         "Development Status :: 3 - Alpha",
         "Programming Language :: Python :: 2",
-        "Programming Language :: Python :: 2.6",
         "Programming Language :: Python :: 2.7",
         "Programming Language :: Python :: 3.2",
         "Programming Language :: Python :: 3.3",
+        "Programming Language :: Python :: 3.5",
         #"Programming Language :: Python :: Implementation :: PyPy",
     ],
     package_data={'': ['README.md', 'LICENSE']},
-    cmdclass={'test': PyTest},
+    cmdclass={'build_py': BuildPy, 'test': PyTest},
     **extra)